@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Long-running analysis service for the dashboard.
+
+Spawning a Python interpreter per request re-imports pandas, matplotlib and
+anthropic, re-reads every CSV and re-runs analyze_all_datasets() each time. This
+server keeps one warm OuraAnalysis per user and answers over HTTP (TCP or a Unix
+socket) with the same JSON the Next.js routes used to print:
+
+    GET /health
+    GET /metrics                  (Prometheus text, with --instrument)
+    GET /users/<user_id>/daily[?force=1]
+    GET /users/<user_id>/overview
+    GET /users/<user_id>/local
+
+Analyzers come from an AnalyzerRegistry: built on first use, rebuilt when the
+user's CSV files change, and evicted least-recently-used beyond --memory-budget-mb.
+Users are configured with --users or found under --data-root/<user_id>/.
+
+With --workers N the server pre-forks: the parent loads and analyzes every user
+once, then forks N workers that inherit the warm analyzers copy-on-write and
+accept from the same listening socket, so requests are spread across cores by
+the kernel. The parent restarts workers that die or stop heartbeating, and each
+worker exits after --max-requests requests to be replaced by a fresh fork.
+
+Usage:
+    python analysis_server.py --port 8765
+    python analysis_server.py --port 8765 --workers 4
+    python analysis_server.py --socket /tmp/aurient-analysis.sock
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import signal
+import socketserver
+import tempfile
+import threading
+import time
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+from analyzer_registry import AnalyzerRegistry, load_analyzer
+from instrumentation import default_instrumentation
+from oura_analysis import OuraAnalysis
+
+
+DEFAULT_PORT = 8765
+
+
+class AnalysisService:
+    """
+    Warm per-user OuraAnalysis instances and the operations served on them.
+    """
+
+    OPERATIONS = ("daily", "overview", "local")
+
+    def __init__(self, users: Optional[Dict[str, Dict[str, Any]]] = None,
+                 loader: Callable[[Dict[str, Any], str], OuraAnalysis] = load_analyzer,
+                 registry: Optional[AnalyzerRegistry] = None):
+        """
+        Initialize the service.
+
+        Args:
+            users: User configuration by user id, each with 'metadata' and 'data_dir'
+            loader: Function building an analyzed OuraAnalysis from (metadata, data_dir)
+            registry: Analyzer registry to serve from; built from users and loader when omitted
+        """
+        self.registry = registry if registry is not None else AnalyzerRegistry(users, loader=loader)
+        # (user_id, 'llm' or 'local') -> lock
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0}
+
+    def _lock(self, user_id: str, operation: str) -> threading.Lock:
+        """Per-user lock of an operation: 'local' never waits behind a Claude call."""
+        kind = "local" if operation == "local" else "llm"
+        with self._locks_guard:
+            return self._locks.setdefault((user_id, kind), threading.Lock())
+
+    def preload(self) -> None:
+        """Load every explicitly configured user up front."""
+        for user_id in self.registry.users:
+            self.registry.get(user_id)
+
+    def loaded_users(self) -> list:
+        return sorted(self.registry.loaded_users())
+
+    def run(self, user_id: str, operation: str, force: bool = False) -> Tuple[int, Dict[str, Any]]:
+        """
+        Run an operation for a user.
+
+        Claude operations ('daily', 'overview') for the same user are serialized,
+        since they update the analyzer's usage counters, prompt digest and advice
+        state. 'local' only reads the datasets, so it has its own lock and is not
+        held up by a slow Claude call; different users are served concurrently.
+
+        Args:
+            user_id: Configured user id
+            operation: 'daily', 'overview' or 'local'
+            force: Regenerate daily advice even if the day context is unchanged
+
+        Returns:
+            Tuple of (HTTP status, response dictionary)
+        """
+        # Handler threads update the count concurrently
+        with self._stats_lock:
+            self.stats["requests"] += 1
+        if user_id not in self.registry:
+            return HTTPStatus.NOT_FOUND, {"success": False, "error": f"Unknown user: {user_id}"}
+        if operation not in self.OPERATIONS:
+            return HTTPStatus.NOT_FOUND, {"success": False, "error": f"Unknown operation: {operation}"}
+
+        try:
+            analyzer = self.registry.get(user_id)
+            with self._lock(user_id, operation):
+                if operation == "daily":
+                    advice = analyzer.generate_daily_advice_structured(force=force)
+                elif operation == "overview":
+                    advice = analyzer.generate_personalized_advice_structured()
+                else:
+                    advice = analyzer.generate_local_daily_advice()
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"success": False, "error": str(e), "advice": None}
+
+        return HTTPStatus.OK, {
+            "success": True,
+            "structured_advice": advice,
+            "user_metadata": analyzer.user_metadata,
+            "data_summary": {
+                "datasets": list(analyzer.health_data.keys()) if analyzer.health_data else [],
+                "total_records": sum(df.shape[0] for df in analyzer.health_data.values()) if analyzer.health_data else 0,
+            },
+        }
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes GET requests to the server's AnalysisService.
+    """
+
+    server_version = "AurientAnalysis/1.0"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        service: AnalysisService = self.server.service
+
+        if parts == ["health"]:
+            status, body = HTTPStatus.OK, {"status": "ok", "pid": os.getpid(),
+                                           "loaded_users": service.loaded_users(),
+                                           "memory_bytes": service.registry.memory_usage(),
+                                           "stats": {**service.stats, **service.registry.stats}}
+        elif parts == ["metrics"]:
+            payload = default_instrumentation().prometheus().encode("utf-8")
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        elif len(parts) == 3 and parts[0] == "users":
+            force = parse_qs(url.query).get("force", ["0"])[0] in ("1", "true")
+            status, body = service.run(parts[1], parts[2], force=force)
+        else:
+            status, body = HTTPStatus.NOT_FOUND, {"success": False, "error": f"Not found: {url.path}"}
+        self._send_json(status, body)
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+
+class _CountingMixin:
+    """Counts accepted requests (used to recycle pre-forked workers)."""
+
+    handled = 0
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        self.handled += 1
+        return True
+
+
+class AnalysisHTTPServer(_CountingMixin, ThreadingHTTPServer):
+    """Threaded HTTP server over TCP sharing one AnalysisService."""
+
+    def __init__(self, address: Tuple[str, int], service: AnalysisService):
+        super().__init__(address, AnalysisRequestHandler)
+        self.service = service
+
+
+class UnixAnalysisServer(_CountingMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server over a Unix domain socket sharing one AnalysisService."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: AnalysisService):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, AnalysisRequestHandler)
+        self.service = service
+
+
+class PreforkArbiter:
+    """
+    Pre-forked worker pool around one bound analysis server.
+
+    The parent preloads the service (unless preload is off, in which case each
+    worker loads users on first request) and freezes the garbage collector so the
+    analyzers' pages stay shared after fork (collections would otherwise write to
+    every object header). Workers serve requests from the inherited socket and
+    touch a heartbeat file between requests; the parent replaces workers that
+    exit and kills those whose heartbeat is older than `timeout`.
+    """
+
+    def __init__(self, server: Union[AnalysisHTTPServer, UnixAnalysisServer], workers: int = os.cpu_count() or 1,
+                 max_requests: int = 1000, max_requests_jitter: int = 50, timeout: float = 120.0,
+                 poll_interval: float = 1.0, preload: bool = True):
+        """
+        Initialize the arbiter.
+
+        Args:
+            server: Bound server whose socket and service the workers inherit
+            workers: Number of worker processes
+            max_requests: Requests a worker serves before it is recycled (0 disables recycling)
+            max_requests_jitter: Random extra requests per worker, so workers do not all recycle at once
+            timeout: Seconds without a heartbeat before a worker is killed
+            poll_interval: Seconds between the parent's checks and the workers' heartbeats
+            preload: Load every configured user in the parent before forking
+        """
+        self.server = server
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.preload = preload
+        self.workers: Dict[int, str] = {}
+        self.stopping = False
+        self.stats = {"spawned": 0, "exited": 0, "killed": 0}
+
+    def _spawn(self) -> None:
+        fd, heartbeat = tempfile.mkstemp(prefix="aurient-worker-")
+        os.close(fd)
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                self._work(heartbeat)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        self.workers[pid] = heartbeat
+        self.stats["spawned"] += 1
+
+    def _work(self, heartbeat: str) -> None:
+        """Worker loop: serve requests until recycled or told to stop."""
+        alive = [True]
+
+        def stop(signum, frame):
+            alive[0] = False
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        server = self.server
+        server.timeout = self.poll_interval
+        # Let in-flight requests finish when the worker exits
+        server.daemon_threads = False
+        server.block_on_close = True
+        server.handled = 0
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else None
+
+        while alive[0] and (limit is None or server.handled < limit):
+            os.utime(heartbeat)
+            server.handle_request()
+        server.server_close()
+
+    def _reap(self) -> None:
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            heartbeat = self.workers.pop(pid, None)
+            if heartbeat is not None:
+                self.stats["exited"] += 1
+                if os.path.exists(heartbeat):
+                    os.unlink(heartbeat)
+
+    def _check_heartbeats(self) -> None:
+        now = time.time()
+        for pid, heartbeat in list(self.workers.items()):
+            try:
+                silent = now - os.stat(heartbeat).st_mtime
+            except FileNotFoundError:
+                continue
+            if silent > self.timeout:
+                print(f"✗ Worker {pid} silent for {silent:.0f}s; killing it")
+                self.stats["killed"] += 1
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _stop(self, graceful_timeout: float = 30.0) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+
+    def run(self) -> None:
+        """Preload, fork the workers and supervise them until SIGTERM or SIGINT."""
+        if self.preload:
+            self.server.service.preload()
+        gc.collect()
+        gc.freeze()
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        print(f"✓ Pre-forking {self.num_workers} workers (parent {os.getpid()})")
+        try:
+            while not self.stopping:
+                self._reap()
+                self._check_heartbeats()
+                while len(self.workers) < self.num_workers and not self.stopping:
+                    self._spawn()
+                time.sleep(self.poll_interval)
+        finally:
+            self._stop()
+            self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve warm Oura analyses over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("ANALYSIS_SERVICE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--socket", help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument("--users", help="JSON file of users: {user_id: {metadata, data_dir}}")
+    parser.add_argument("--data-root", help="Directory of per-user data partitions (<data-root>/<user_id>/)")
+    parser.add_argument("--memory-budget-mb", type=float, default=1024,
+                        help="Memory for loaded datasets before least recently used users are evicted")
+    parser.add_argument("--no-preload", action="store_true", help="Load users on first request")
+    parser.add_argument("--workers", type=int, default=1, help="Pre-forked worker processes (1 serves in-process)")
+    parser.add_argument("--max-requests", type=int, default=1000, help="Requests before a worker is recycled")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a silent worker is killed")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Record per-stage timings of the analyzers and serve them on /metrics")
+    parser.add_argument("--optimize-memory", action="store_true",
+                        help="Store datasets with compact dtypes (categoricals, downcast numbers, datetimes)")
+    args = parser.parse_args()
+
+    if args.instrument:
+        default_instrumentation().enable()
+    users = None
+    if args.users:
+        with open(args.users, "r", encoding="utf-8") as f:
+            users = json.load(f)
+    registry = AnalyzerRegistry(users, data_root=args.data_root,
+                                memory_budget=int(args.memory_budget_mb * 1024 ** 2),
+                                loader=partial(load_analyzer, optimize_memory=args.optimize_memory))
+    service = AnalysisService(registry=registry)
+    if not args.no_preload and args.workers <= 1:
+        service.preload()
+
+    if args.socket:
+        server = UnixAnalysisServer(args.socket, service)
+        print(f"✓ Analysis service listening on unix:{args.socket}")
+    else:
+        server = AnalysisHTTPServer((args.host, args.port), service)
+        print(f"✓ Analysis service listening on http://{args.host}:{args.port}")
+    if args.workers > 1:
+        PreforkArbiter(server, workers=args.workers, max_requests=args.max_requests, timeout=args.timeout,
+                       preload=not args.no_preload).run()
+        return
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Many users' OuraAnalysis instances in one process, within a memory budget.
+
+AnalyzerRegistry loads a user's analyzer on first use, from the user's own data
+directory (either configured explicitly or partitioned as <data_root>/<user_id>/
+with an optional metadata.json), and keeps it warm until its data files change.
+Each instance's memory is measured from its DataFrames plus the state derived from
+them (summary statistics, drawn figures, the sleep architecture table, LLM state),
+and re-measured when that state grows; when the total exceeds the budget the least
+recently used users are evicted.
+
+Evicted users leave a snapshot of their loaded data (with the paths of any
+datasets spilled by OuraAnalysis.optimize_memory) and summary statistics on
+disk, so bringing them back skips CSV parsing and analysis. Their LLM responses
+and daily advice already live in the on-disk response cache, keyed by user.
+"""
+
+import gc
+import json
+import pickle
+import re
+import sys
+import tempfile
+import threading
+import types
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from oura_analysis import OuraAnalysis
+
+
+DEFAULT_DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent / "cache" / "analyzers"
+DEFAULT_MEMORY_BUDGET = 1024 ** 3
+
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Emma's metadata (the dashboard's only user for now)
+DEFAULT_USERS = {
+    "emma": {
+        "metadata": {
+            "name": "Emma",
+            "age": 26,
+            "goals": "performance",
+            "activity_level": "high",
+            "focus_areas": ["sleep optimization", "recovery", "cardiovascular health"],
+        },
+        "data_dir": str(DEFAULT_DATA_DIR),
+    },
+}
+
+
+def data_version(data_dir: str) -> Tuple[Tuple[str, int, int], ...]:
+    """Name, size and modification time of every CSV and JSON file (e.g. WHOOP payloads) in a directory."""
+    path = Path(data_dir)
+    if not path.is_dir():
+        return ()
+    files = [*path.glob("*.csv"), *path.glob("*.json")]
+    return tuple(sorted((f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in files))
+
+
+def load_analyzer(metadata: Dict[str, Any], data_dir: str, optimize_memory: bool = False) -> OuraAnalysis:
+    """Load and analyze one user's data, optionally with compact dtypes (OuraAnalysis.optimize_memory)."""
+    analyzer = OuraAnalysis(user_metadata=metadata)
+    analyzer.load_from_cache(data_dir)
+    if optimize_memory:
+        analyzer.optimize_memory()
+    analyzer.analyze_all_datasets()
+    return analyzer
+
+
+_UNCOUNTED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+              types.CodeType)
+
+
+def object_memory(obj: Any) -> int:
+    """
+    Approximate bytes reachable from an object (sys.getsizeof over its referents).
+
+    DataFrames, Series and arrays count their (deep) buffers; classes, modules and
+    functions are shared by every analyzer and are not counted.
+
+    Args:
+        obj: Object to measure, e.g. a matplotlib Figure or a dictionary of statistics
+
+    Returns:
+        Approximate size in bytes
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _UNCOUNTED):
+            continue
+        seen.add(id(item))
+        if isinstance(item, pd.DataFrame):
+            total += int(item.memory_usage(deep=True).sum())
+        elif isinstance(item, (pd.Series, pd.Index)):
+            total += int(item.memory_usage(deep=True))
+        elif isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+        else:
+            total += sys.getsizeof(item)
+            stack.extend(gc.get_referents(item))
+    return total
+
+
+def analyzer_memory(analyzer: OuraAnalysis) -> int:
+    """Bytes held by an analyzer's datasets (deep, including string columns) and derived state."""
+    datasets = sum(df.memory_usage(deep=True).sum() for df in analyzer.health_data.values())
+    return int(datasets) + object_memory(analyzer.cached_state())
+
+
+def _state_shape(analyzer: OuraAnalysis) -> Tuple[Any, ...]:
+    """Cheap marker of an analyzer's derived state, which changes when it needs re-measuring."""
+    state = analyzer.cached_state()
+    return (tuple(state["figures"]), id(state["summary_stats"]), id(state["sleep_architecture"]),
+            id(state["stats_digest"]))
+
+
+class AnalyzerRegistry:
+    """
+    LRU registry of warm analyzers keyed by user id, bounded by total memory.
+    """
+
+    def __init__(self, users: Optional[Dict[str, Dict[str, Any]]] = None, data_root: Optional[str] = None,
+                 memory_budget: Optional[int] = DEFAULT_MEMORY_BUDGET,
+                 loader: Callable[[Dict[str, Any], str], OuraAnalysis] = load_analyzer,
+                 factory: Optional[Callable[[Dict[str, Any], Dict[str, pd.DataFrame]], OuraAnalysis]] = None,
+                 snapshot_dir: Optional[str] = str(DEFAULT_SNAPSHOT_DIR)):
+        """
+        Initialize the registry.
+
+        Args:
+            users: Explicit user configuration by user id, each with 'metadata' and 'data_dir'
+            data_root: Directory of per-user partitions (<data_root>/<user_id>/*.csv and an
+                optional metadata.json) for users not in `users`
+            memory_budget: Total bytes of loaded datasets before LRU users are evicted
+                (None disables eviction)
+            loader: Function building an analyzed OuraAnalysis from (metadata, data_dir)
+            factory: Function building an OuraAnalysis from (metadata, health_data) when
+                restoring a snapshot; a default OuraAnalysis by default
+            snapshot_dir: Directory for evicted users' snapshots (None disables snapshots)
+        """
+        self.users = users if users is not None else ({} if data_root else DEFAULT_USERS)
+        self.data_root = Path(data_root) if data_root else None
+        self.memory_budget = memory_budget
+        self.loader = loader
+        self.factory = factory or (lambda metadata, health_data: OuraAnalysis(health_data=health_data,
+                                                                             user_metadata=metadata))
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        # user_id -> (data version, analyzer, bytes, state shape when measured), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Any, OuraAnalysis, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "loads": 0, "restores": 0, "evictions": 0}
+
+    def config(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Configuration of a user.
+
+        Args:
+            user_id: User id
+
+        Returns:
+            Dictionary with 'metadata' (including 'user_id') and 'data_dir', or None if unknown
+        """
+        if user_id in self.users:
+            config = self.users[user_id]
+        elif self.data_root is not None and USER_ID_PATTERN.match(user_id) and (self.data_root / user_id).is_dir():
+            data_dir = self.data_root / user_id
+            metadata_path = data_dir / "metadata.json"
+            metadata = json.loads(metadata_path.read_text(encoding="utf-8")) if metadata_path.exists() else {}
+            config = {"metadata": metadata, "data_dir": str(data_dir)}
+        else:
+            return None
+        return {"metadata": {"user_id": user_id, **config["metadata"]}, "data_dir": config["data_dir"]}
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.config(user_id) is not None
+
+    def loaded_users(self) -> List[str]:
+        """Loaded user ids, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def memory_usage(self) -> int:
+        """Bytes held by all loaded analyzers' datasets and derived state."""
+        with self._lock:
+            return sum(entry[2] for entry in self._entries.values())
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _snapshot_path(self, user_id: str) -> Optional[Path]:
+        return self.snapshot_dir / f"{user_id}.pkl" if self.snapshot_dir is not None else None
+
+    def _restore(self, user_id: str, config: Dict[str, Any], version: Any) -> Optional[OuraAnalysis]:
+        path = self._snapshot_path(user_id)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            print(f"Warning: Failed to read snapshot for {user_id}: {e}")
+            return None
+        if snapshot.get("version") != version:
+            return None
+        spilled = snapshot.get("spilled_datasets", {})
+        if not all(Path(path).exists() for path in spilled.values()):
+            return None
+        analyzer = self.factory(config["metadata"], snapshot["health_data"])
+        analyzer.spilled_datasets = dict(spilled)
+        analyzer.restore_analysis(snapshot["summary_stats"])
+        return analyzer
+
+    def _save_snapshot(self, user_id: str, version: Any, analyzer: OuraAnalysis) -> None:
+        path = self._snapshot_path(user_id)
+        if path is None or not analyzer.summary_stats:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with open(fd, "wb") as f:
+                pickle.dump({"version": version, "health_data": analyzer.health_data,
+                             "spilled_datasets": analyzer.spilled_datasets,
+                             "summary_stats": analyzer.summary_stats}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            Path(tmp).replace(path)
+        except Exception as e:
+            print(f"Warning: Failed to write snapshot for {user_id}: {e}")
+
+    def get(self, user_id: str) -> OuraAnalysis:
+        """
+        Return a user's warm analyzer, loading (or restoring) it if needed.
+
+        Args:
+            user_id: User id
+
+        Returns:
+            Analyzed OuraAnalysis for the user
+
+        Raises:
+            KeyError: If the user is unknown
+        """
+        config = self.config(user_id)
+        if config is None:
+            raise KeyError(user_id)
+        version = data_version(config["data_dir"])
+
+        with self._user_lock(user_id):
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    analyzer = entry[1]
+                    if _state_shape(analyzer) == entry[3]:
+                        return analyzer
+
+            if entry is None or entry[0] != version:
+                analyzer = self._restore(user_id, config, version)
+                if analyzer is not None:
+                    self.stats["restores"] += 1
+                else:
+                    analyzer = self.loader(config["metadata"], config["data_dir"])
+                    self.stats["loads"] += 1
+
+            # Measured on load, and again on a hit once figures or other derived state were added
+            shape = _state_shape(analyzer)
+            size = analyzer_memory(analyzer)
+            with self._lock:
+                self._entries[user_id] = (version, analyzer, size, shape)
+                self._entries.move_to_end(user_id)
+                evicted = self._over_budget(keep=user_id)
+        for evicted_id, (evicted_version, evicted_analyzer, *_) in evicted:
+            self._save_snapshot(evicted_id, evicted_version, evicted_analyzer)
+        return analyzer
+
+    def _over_budget(self, keep: str) -> List[Tuple[str, Tuple[Any, OuraAnalysis, int, Any]]]:
+        """Pop least recently used entries until within budget. Caller holds the lock."""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        total = sum(entry[2] for entry in self._entries.values())
+        for user_id in list(self._entries):
+            if total <= self.memory_budget:
+                break
+            if user_id == keep:
+                continue
+            entry = self._entries.pop(user_id)
+            total -= entry[2]
+            evicted.append((user_id, entry))
+            self.stats["evictions"] += 1
+        return evicted
+
+    def evict(self, user_id: str) -> bool:
+        """
+        Evict a user, leaving a snapshot on disk.
+
+        Args:
+            user_id: User id
+
+        Returns:
+            True if the user was loaded
+        """
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return False
+        self.stats["evictions"] += 1
+        self._save_snapshot(user_id, entry[0], entry[1])
+        return True
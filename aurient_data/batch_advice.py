@@ -0,0 +1,301 @@
+"""
+Bulk daily advice generation through the Message Batches API.
+
+The nightly job builds the structured daily programmes request for every user,
+submits them as message batches (cheaper than individual calls and outside the
+per-minute rate limits), polls until the batches end and writes each response
+into that user's response cache under the same key the synchronous path uses.
+Later calls to generate_daily_advice_structured() for those users are then
+served from the cache without another API call. Each result is logged to the
+user's telemetry under generate_daily_advice_structured, priced at batch rates,
+with its latency measured from submission.
+"""
+
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from oura_analysis import CLAUDE_MODEL, DAILY_ADVICE_MAX_TOKENS, OuraAnalysis
+from stream_json import DAILY_CARD_SECTIONS
+
+
+# The API accepts up to 100,000 requests per batch; smaller batches finish sooner
+# and limit the work lost if one expires.
+BATCH_LIMIT = 10_000
+
+# Batch results are logged as the call they stand in for
+METHOD = "generate_daily_advice_structured"
+
+
+class AnthropicBatchBackend:
+    """
+    Batch backend backed by the Anthropic Message Batches API.
+    """
+
+    def __init__(self, client: Any):
+        """
+        Initialize the backend.
+
+        Args:
+            client: Anthropic client (anthropic.Anthropic)
+        """
+        self.client = client
+
+    def create(self, requests: List[Dict[str, Any]]) -> str:
+        """Submit requests and return the batch id."""
+        return self.client.messages.batches.create(requests=requests).id
+
+    def status(self, batch_id: str) -> str:
+        """Return the processing status of a batch ('in_progress', 'canceling' or 'ended')."""
+        return self.client.messages.batches.retrieve(batch_id).processing_status
+
+    def results(self, batch_id: str) -> Iterable[Any]:
+        """Iterate over the results of an ended batch."""
+        return self.client.messages.batches.results(batch_id)
+
+
+class LocalBatchBackend:
+    """
+    Local stand-in for the Message Batches API.
+
+    Each request is answered by calling messages.create on the given client (for
+    example a FakeClaudeClient) when results are read, and results have the same
+    shape as the API's: custom_id plus a 'succeeded' or 'errored' result.
+    """
+
+    def __init__(self, client: Any, polls_until_ended: int = 1):
+        """
+        Initialize the backend.
+
+        Args:
+            client: Client whose messages.create answers each request
+            polls_until_ended: Number of status checks reporting 'in_progress'
+                before a batch is reported as ended
+        """
+        self.client = client
+        self.polls_until_ended = polls_until_ended
+        self.batches: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"msgbatch_local_{len(self.batches) + 1}"
+        self.batches[batch_id] = {"requests": list(requests), "polls": self.polls_until_ended}
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.batches[batch_id]
+        if batch["polls"] > 0:
+            batch["polls"] -= 1
+            return "in_progress"
+        return "ended"
+
+    def results(self, batch_id: str) -> Iterator[Any]:
+        for request in self.batches[batch_id]["requests"]:
+            try:
+                message = self.client.messages.create(**request["params"])
+                result = SimpleNamespace(type="succeeded", message=message)
+            except Exception as e:
+                result = SimpleNamespace(type="errored", error=SimpleNamespace(
+                    type="error", error=SimpleNamespace(type="api_error", message=str(e))))
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+
+def _result_error(result: Any) -> str:
+    """Describe a batch result that did not succeed."""
+    error = getattr(result, "error", None)
+    detail = getattr(error, "error", error)
+    message = getattr(detail, "message", None)
+    return f"Batch request {result.type}" + (f": {message}" if message else "")
+
+
+class BatchAdviceGenerator:
+    """
+    Generate structured daily advice for many users with message batches.
+    """
+
+    def __init__(self, analyzers: Iterable[OuraAnalysis], backend: Optional[Any] = None,
+                 poll_interval: float = 60.0, timeout: float = 24 * 3600,
+                 batch_limit: int = BATCH_LIMIT, sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the generator.
+
+        Args:
+            analyzers: Analyzed users (analyze_all_datasets() already run); each
+                user's own response cache receives their result
+            backend: Batch backend; defaults to the Message Batches API using the
+                first analyzer's Claude client
+            poll_interval: Seconds between batch status checks
+            timeout: Seconds to wait for batches to end before giving up
+            batch_limit: Maximum number of requests per submitted batch
+            sleep: Function used to wait between polls
+            clock: Monotonic clock used for the timeout
+        """
+        self.analyzers = list(analyzers)
+        if backend is None:
+            client = next((a.claude_client for a in self.analyzers if a.claude_client), None)
+            if client is None:
+                raise ValueError("No Claude client available for the Message Batches API. "
+                                 "Please set ANTHROPIC_API_KEY or pass a backend.")
+            backend = AnthropicBatchBackend(client)
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.batch_limit = batch_limit
+        self.sleep = sleep
+        self.clock = clock
+        self._contexts: Dict[str, Dict[str, Any]] = {}
+        self._submitted: Dict[str, float] = {}
+        self.stats = {"users": 0, "reused": 0, "cached": 0, "submitted": 0, "succeeded": 0, "failed": 0,
+                      "batches": 0}
+
+    def build_requests(self) -> Tuple[List[Dict[str, Any]], Dict[str, OuraAnalysis], Dict[str, dict]]:
+        """
+        Build batch requests for every user whose daily advice is not cached.
+
+        Users whose day context has not changed materially since their last
+        advice reuse it and are not submitted.
+
+        Returns:
+            Tuple of (batch requests, analyzer by custom_id, results already
+            available by user id from reuse, the cache or validation errors)
+        """
+        requests: List[Dict[str, Any]] = []
+        pending: Dict[str, OuraAnalysis] = {}
+        results: Dict[str, dict] = {}
+        self._contexts: Dict[str, Dict[str, Any]] = {}
+
+        for analyzer in self.analyzers:
+            self.stats["users"] += 1
+            if not analyzer.summary_stats:
+                results[analyzer.user_id] = {"error": "No analysis data available. Please run analyze_all_datasets() first."}
+                continue
+
+            context = analyzer.get_day_context()
+            reused = analyzer._reusable_daily_advice(context)
+            if reused is not None:
+                self.stats["reused"] += 1
+                results[analyzer.user_id] = reused
+                continue
+            self._contexts[analyzer.user_id] = context
+
+            request = analyzer.get_daily_prompt_blocks()
+            params = analyzer._request_params(request["messages"], DAILY_ADVICE_MAX_TOKENS, request["system"])
+            # The cache key is a sha256 hex digest: 64 characters, a valid custom_id
+            key = analyzer.response_cache_key(params)
+
+            cached = analyzer._cached_response(key)
+            if cached is not None:
+                with analyzer._generation(DAILY_ADVICE_MAX_TOKENS, method=METHOD) as record:
+                    analyzer._served_from(record, "response_cache")
+                analyzer.llm_usage["response_cache_hits"] += 1
+                self.stats["cached"] += 1
+                advice = analyzer._parse_structured_response(cached, DAILY_CARD_SECTIONS)
+                analyzer._remember_daily_advice(context, advice)
+                results[analyzer.user_id] = advice
+                continue
+            if key in pending:
+                continue
+
+            pending[key] = analyzer
+            requests.append({"custom_id": key, "params": {"model": CLAUDE_MODEL, **params}})
+
+        return requests, pending, results
+
+    def submit(self, requests: List[Dict[str, Any]]) -> List[str]:
+        """
+        Submit requests in batches of at most batch_limit.
+
+        Args:
+            requests: Batch requests from build_requests()
+
+        Returns:
+            List of batch ids
+        """
+        batch_ids = []
+        for start in range(0, len(requests), self.batch_limit):
+            chunk = requests[start:start + self.batch_limit]
+            batch_ids.append(self.backend.create(chunk))
+            self._submitted[batch_ids[-1]] = time.perf_counter()
+            print(f"✓ Submitted batch {batch_ids[-1]} ({len(chunk)} requests)")
+        self.stats["submitted"] += len(requests)
+        self.stats["batches"] += len(batch_ids)
+        return batch_ids
+
+    def wait(self, batch_ids: List[str]) -> None:
+        """
+        Poll until every batch has ended.
+
+        Args:
+            batch_ids: Batch ids from submit()
+
+        Raises:
+            TimeoutError: If the batches have not ended within the timeout
+        """
+        deadline = self.clock() + self.timeout
+        remaining = list(batch_ids)
+        while True:
+            remaining = [batch_id for batch_id in remaining if self.backend.status(batch_id) != "ended"]
+            if not remaining:
+                return
+            if self.clock() >= deadline:
+                raise TimeoutError(f"Batches still processing after {self.timeout}s: {', '.join(remaining)}")
+            self.sleep(self.poll_interval)
+
+    def collect(self, batch_ids: List[str], pending: Dict[str, OuraAnalysis]) -> Dict[str, dict]:
+        """
+        Fan batch results back into per-user caches and parse them.
+
+        Args:
+            batch_ids: Ended batch ids
+            pending: Analyzer by custom_id, from build_requests()
+
+        Returns:
+            Structured daily advice (or an error dictionary) by user id
+        """
+        results: Dict[str, dict] = {}
+        for batch_id in batch_ids:
+            for entry in self.backend.results(batch_id):
+                analyzer = pending.pop(entry.custom_id, None)
+                if analyzer is None:
+                    continue
+                with analyzer._generation(DAILY_ADVICE_MAX_TOKENS, method=METHOD, batch=True) as record:
+                    if record is not None:
+                        record["_start"] = self._submitted.get(batch_id, record["_start"])
+                        record["_attempts"] = 1
+                    if entry.result.type != "succeeded":
+                        self.stats["failed"] += 1
+                        results[analyzer.user_id] = {"error": _result_error(entry.result)}
+                        if record is not None:
+                            record["error"] = entry.result.type
+                        continue
+
+                    message = entry.result.message
+                    text = message.content[0].text
+                    analyzer._record_usage(getattr(message, "usage", None), record)
+                analyzer._cache_response(entry.custom_id, text)
+                self.stats["succeeded"] += 1
+                advice = analyzer._parse_structured_response(text, DAILY_CARD_SECTIONS)
+                analyzer._remember_daily_advice(self._contexts[analyzer.user_id], advice)
+                results[analyzer.user_id] = advice
+
+        for analyzer in pending.values():
+            self.stats["failed"] += 1
+            results[analyzer.user_id] = {"error": "No result returned for batch request"}
+        return results
+
+    def run(self) -> Dict[str, dict]:
+        """
+        Generate daily advice for every user.
+
+        Returns:
+            Structured daily advice (or an error dictionary) by user id
+        """
+        self.stats = dict.fromkeys(self.stats, 0)
+        requests, pending, results = self.build_requests()
+        if requests:
+            batch_ids = self.submit(requests)
+            self.wait(batch_ids)
+            results.update(self.collect(batch_ids, pending))
+        print(f"✓ Daily advice ready for {self.stats['users']} users "
+              f"({self.stats['reused']} unchanged, {self.stats['cached']} cached, {self.stats['succeeded']} generated, {self.stats['failed']} failed)")
+        return results
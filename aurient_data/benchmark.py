@@ -0,0 +1,327 @@
+"""
+Benchmark harness for the analysis pipeline on synthetic Oura data.
+
+For each profiled user of a synthetic cohort (see synthetic_oura.py; only
+the profiled users are generated) the pipeline runs in four timed stages, each with its peak traced memory:
+
+    load     OuraAnalysis.load_from_cache on the user's 14 export CSVs
+    analyze  analyze_all_datasets (summary statistics)
+    prompt   the stats digest and the analysis and daily prompt blocks
+    render   drawing every dataset's figure and encoding it as a PNG
+
+Results give per-stage medians and 95th percentiles over the profiled users,
+the memory of a warm analyzer (what AnalyzerRegistry budgets for), and totals
+extrapolated to the whole cohort for hardware sizing. They can be saved as a
+baseline and later runs compared against it, failing on regressions:
+
+    python benchmark.py --scale small --save-baseline
+    python benchmark.py --scale small          # exits 1 on a regression
+
+Baselines are only comparable on the same hardware, so keep one per CI runner.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analyzer_registry import analyzer_memory
+from fake_claude import FakeClaudeClient
+from oura_analysis import OuraAnalysis
+from response_cache import ResponseCache
+from synthetic_oura import SCALES, generate_cohort
+
+
+STAGES = ("load", "analyze", "prompt", "render")
+DEFAULT_PROFILE_USERS = 10
+DEFAULT_TOLERANCE = 0.25
+# Timing differences below this are noise, whatever the relative change
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MB = 5.0
+
+DEFAULT_BENCHMARK_DIR = Path(__file__).parent / "cache" / "benchmark"
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+
+
+def scenario_name(users: int, years: float) -> str:
+    return f"{users}users-{years:g}y"
+
+
+def _render_all(analyzer: OuraAnalysis) -> None:
+    import matplotlib.pyplot as plt
+
+    for name in analyzer.summary_stats:
+        fig = analyzer.plots[name]
+        fig.savefig(io.BytesIO(), format="png", dpi=72)
+        plt.close(fig)
+
+
+def _run_stages(data_dir: Path, metadata: Dict[str, Any], stages: Sequence[str],
+                trace: bool) -> Tuple[OuraAnalysis, Dict[str, float]]:
+    """
+    Run the pipeline on a fresh analyzer; per-stage seconds, or peak MB when tracing.
+
+    The analyzer's response cache (and so its sleep architecture store and other
+    per-user stores) lives in a temporary directory, so every run starts cold and
+    nothing is written to the application cache.
+    """
+    cache_dir = tempfile.TemporaryDirectory()
+    analyzer = OuraAnalysis(user_metadata=metadata, claude_client=FakeClaudeClient("{}"),
+                            response_cache=ResponseCache(cache_dir.name))
+    steps: Dict[str, Callable[[], Any]] = {
+        "load": lambda: analyzer.load_from_cache(str(data_dir)),
+        "analyze": analyzer.analyze_all_datasets,
+        "prompt": lambda: (analyzer.get_analysis_prompt_blocks(), analyzer.get_daily_prompt_blocks()),
+        "render": lambda: _render_all(analyzer),
+    }
+    measured = {}
+    if trace:
+        tracemalloc.start()
+    try:
+        for stage in STAGES:
+            if stage != "load" and stage not in stages:
+                continue
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                steps[stage]()
+            if trace:
+                measured[stage] = (tracemalloc.get_traced_memory()[1] - before) / 1024 ** 2
+            else:
+                measured[stage] = time.perf_counter() - start
+    finally:
+        if trace:
+            tracemalloc.stop()
+        cache_dir.cleanup()
+    return analyzer, measured
+
+
+def profile_user(data_dir: Path, metadata: Dict[str, Any], stages: Sequence[str] = STAGES,
+                 memory: bool = True) -> Dict[str, Any]:
+    """
+    Run the pipeline stages for one user, timing each and tracing its peak memory.
+
+    Tracing slows Python-heavy stages (plotting) several times over, so timings
+    come from a separate untraced run.
+
+    Args:
+        data_dir: User's data directory
+        metadata: User metadata
+        stages: Stages to run, in pipeline order ('load' always runs)
+        memory: Whether to trace memory (a second run of the pipeline)
+
+    Returns:
+        Dictionary with per-stage 'seconds' and 'peak_mb' (None without tracing),
+        the analyzer's 'analyzer_mb' and the number of 'rows' loaded
+    """
+    analyzer, seconds = _run_stages(data_dir, metadata, stages, trace=False)
+    peaks = _run_stages(data_dir, metadata, stages, trace=True)[1] if memory else {}
+    return {
+        "stages": {stage: {"seconds": seconds[stage], "peak_mb": peaks.get(stage)} for stage in seconds},
+        "analyzer_mb": analyzer_memory(analyzer) / 1024 ** 2,
+        "rows": int(sum(len(df) for df in analyzer.health_data.values())),
+    }
+
+
+def summarize(runs: List[Dict[str, Any]], users: int) -> Dict[str, Any]:
+    """
+    Aggregate per-user runs.
+
+    Args:
+        runs: Results of profile_user
+        users: Users in the whole cohort, for extrapolated totals
+
+    Returns:
+        Dictionary with per-stage median/p95 seconds and max peak memory, and
+        per-user and extrapolated cohort figures
+    """
+    stages = {}
+    for stage in STAGES:
+        seconds = [r["stages"][stage]["seconds"] for r in runs if stage in r["stages"]]
+        if not seconds:
+            continue
+        peaks = [r["stages"][stage]["peak_mb"] for r in runs
+                 if stage in r["stages"] and r["stages"][stage]["peak_mb"] is not None]
+        stages[stage] = {
+            "median_seconds": float(np.median(seconds)),
+            "p95_seconds": float(np.percentile(seconds, 95)),
+            "peak_mb": float(np.max(peaks)) if peaks else None,
+            "cohort_seconds": float(np.mean(seconds) * users),
+        }
+    analyzer_mb = [r["analyzer_mb"] for r in runs]
+    return {
+        "stages": stages,
+        "rows_per_user": float(np.median([r["rows"] for r in runs])),
+        "analyzer_mb": float(np.median(analyzer_mb)),
+        "cohort_analyzer_gb": float(np.mean(analyzer_mb) * users / 1024),
+    }
+
+
+def run_benchmark(users: int, years: float, data_dir: Optional[Path] = None, seed: int = 0,
+                  profile_users: int = DEFAULT_PROFILE_USERS, stages: Sequence[str] = STAGES,
+                  jobs: Optional[int] = 1, memory: bool = True) -> Dict[str, Any]:
+    """
+    Generate (if needed) a sample of a synthetic cohort's users and profile them.
+
+    Only the profiled users are written to disk; cohort totals are extrapolated
+    from them (see summarize).
+
+    Args:
+        users: Users in the cohort
+        years: Years of history per user
+        data_dir: Cohort directory; under cache/benchmark by default
+        seed: Cohort seed
+        profile_users: Users profiled, spread evenly over the cohort
+        stages: Stages to run
+        jobs: Worker processes for generating the sampled users
+        memory: Whether to trace each stage's peak memory
+
+    Returns:
+        Summary (see summarize) with the scenario and environment
+    """
+    name = scenario_name(users, years)
+    root = Path(data_dir) if data_dir else DEFAULT_BENCHMARK_DIR / f"{name}-seed{seed}"
+    indices = np.unique(np.linspace(0, users - 1, min(profile_users, users)).astype(int)).tolist()
+    ids = generate_cohort(root, users, years, seed, jobs, indices=indices)
+    sample = [ids[i] for i in indices]
+
+    runs = []
+    for user_id in sample:
+        metadata = json.loads((root / user_id / "metadata.json").read_text(encoding="utf-8"))
+        runs.append(profile_user(root / user_id, metadata, stages, memory))
+        stage_times = ", ".join(f"{s} {v['seconds']:.2f}s" for s, v in runs[-1]["stages"].items())
+        print(f"  {user_id}: {stage_times}")
+
+    summary = summarize(runs, users)
+    summary.update({
+        "scenario": name,
+        "users": users,
+        "years": years,
+        "profiled_users": len(sample),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+    })
+    return summary
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Regressions of a run against a baseline of the same scenario.
+
+    A stage regresses when its median time or peak memory exceeds the baseline
+    by more than `tolerance` (relative) and a small absolute margin.
+
+    Args:
+        summary: Result of run_benchmark
+        baseline: Earlier result of run_benchmark
+        tolerance: Allowed relative increase
+
+    Returns:
+        One message per regression; empty if none
+    """
+    regressions = []
+    for stage, current in summary["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        for key, unit, margin in (("median_seconds", "s", MIN_REGRESSION_SECONDS),
+                                  ("peak_mb", "MB", MIN_REGRESSION_MB)):
+            if current.get(key) is None or previous.get(key) is None:
+                continue
+            limit = max(previous[key] * (1 + tolerance), previous[key] + margin)
+            if current[key] > limit:
+                regressions.append(f"{stage} {key}: {current[key]:.3f}{unit} vs baseline "
+                                   f"{previous[key]:.3f}{unit} (+{current[key] / previous[key] - 1:.0%})")
+    return regressions
+
+
+def load_baselines(path: Path) -> Dict[str, Any]:
+    """Baselines keyed by scenario name ({} if the file does not exist)."""
+    if not Path(path).exists():
+        return {}
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, summary: Dict[str, Any]) -> None:
+    """Record a run as the baseline of its scenario, keeping the other scenarios."""
+    baselines = load_baselines(path)
+    baselines[summary["scenario"]] = summary
+    Path(path).write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """Human-readable summary of a run."""
+    lines = [f"Scenario {summary['scenario']} ({summary['profiled_users']} of {summary['users']} users profiled, "
+             f"{summary['rows_per_user']:,.0f} rows per user)",
+             f"{'stage':<10}{'median':>10}{'p95':>10}{'peak MB':>10}{'cohort':>12}"]
+    for stage, s in summary["stages"].items():
+        peak = f"{s['peak_mb']:.1f}" if s["peak_mb"] is not None else "-"
+        lines.append(f"{stage:<10}{s['median_seconds']:>9.3f}s{s['p95_seconds']:>9.3f}s{peak:>10}"
+                     f"{s['cohort_seconds'] / 3600:>11.2f}h")
+    lines.append(f"Warm analyzer: {summary['analyzer_mb']:.1f} MB per user, "
+                 f"{summary['cohort_analyzer_gb']:.1f} GB to keep the whole cohort warm")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline on synthetic Oura data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Preset users and years")
+    parser.add_argument("--users", type=int, help="Users in the cohort (overrides the scale)")
+    parser.add_argument("--years", type=float, help="Years of history per user (overrides the scale)")
+    parser.add_argument("--data-dir", help="Cohort directory (generated if missing)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile-users", type=int, default=DEFAULT_PROFILE_USERS)
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--jobs", type=int, default=1, help="Processes generating the cohort (0 for one per CPU)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the memory tracing run")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    users, years = SCALES[args.scale]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    summary = run_benchmark(args.users or users, args.years or years, args.data_dir and Path(args.data_dir),
+                            args.seed, args.profile_users, stages, args.jobs or None, not args.no_memory)
+    print(format_report(summary))
+
+    if args.save_baseline:
+        save_baseline(Path(args.baseline), summary)
+        print(f"✓ Saved baseline for {summary['scenario']} to {args.baseline}")
+        return 0
+    baseline = load_baselines(Path(args.baseline)).get(summary["scenario"])
+    if baseline is None:
+        print(f"No baseline for {summary['scenario']} in {args.baseline}; run with --save-baseline to record one")
+        return 0
+    regressions = compare(summary, baseline, args.tolerance)
+    for message in regressions:
+        print(f"✗ Regression: {message}")
+    if not regressions:
+        print(f"✓ No regressions against the {summary['scenario']} baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""
+Population statistics over many users' day-level metrics.
+
+Each user is represented by the mean of each metric over their most recent days
+(so users with longer histories do not weigh more). A cohort is a frame with one
+row per user: exact percentile ranks, overall and within age/goal segments, come
+from vectorized ranking over that frame.
+
+For cohorts that do not fit in one process, CohortSummary accumulates fixed-bin
+histograms and moments per segment. Summaries built from separate partitions (or
+chunks of a long day-level table) merge by adding arrays, and give distributions,
+approximate percentile ranks and segment tables without revisiting the users.
+Segments smaller than `min_users` are suppressed, as these aggregates are shown
+to marketplace buyers.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from stats_digest import DATE_COLUMNS
+
+
+# metric -> (dataset, column, divisor)
+COHORT_METRICS = {
+    "readiness_score": ("daily_readiness", "score", 1),
+    "temperature_deviation": ("daily_readiness", "temperature_deviation", 1),
+    "sleep_score": ("daily_sleep", "score", 1),
+    "activity_score": ("daily_activity", "score", 1),
+    "steps": ("daily_activity", "steps", 1),
+    "average_hrv": ("sleep_detailed", "average_hrv", 1),
+    "lowest_heart_rate": ("sleep_detailed", "lowest_heart_rate", 1),
+    "stress_high_minutes": ("daily_stress", "stress_high", 60),
+}
+
+# metric -> histogram bin edges; values outside are clipped into the end bins
+METRIC_BINS = {
+    "readiness_score": np.linspace(0, 100, 101),
+    "temperature_deviation": np.linspace(-3, 3, 121),
+    "sleep_score": np.linspace(0, 100, 101),
+    "activity_score": np.linspace(0, 100, 101),
+    "steps": np.linspace(0, 40_000, 161),
+    "average_hrv": np.linspace(0, 200, 201),
+    "lowest_heart_rate": np.linspace(30, 110, 81),
+    "stress_high_minutes": np.linspace(0, 720, 145),
+}
+
+AGE_BANDS = (18, 25, 35, 45, 55, 65)
+AGE_BAND_LABELS = [f"{low}-{high - 1}" for low, high in zip(AGE_BANDS, AGE_BANDS[1:])] + [f"{AGE_BANDS[-1]}+"]
+SEGMENT_COLUMNS = ("age_band", "goals")
+MIN_SEGMENT_USERS = 5
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def age_bands(ages: Any) -> pd.Series:
+    """
+    Age band labels such as '25-34' for many ages at once.
+
+    Args:
+        ages: Ages (array-like); unknown or under-age values map to None
+
+    Returns:
+        Series of labels
+    """
+    ages = pd.to_numeric(pd.Series(ages), errors="coerce")
+    bands = pd.cut(ages, bins=[*AGE_BANDS, np.inf], right=False, labels=AGE_BAND_LABELS)
+    return bands.astype(object).where(bands.notna(), None)
+
+
+def _daily_series(health_data: Dict[str, pd.DataFrame], dataset: str, column: str) -> Optional[pd.Series]:
+    df = health_data.get(dataset)
+    if df is None or df.empty or column not in df.columns:
+        return None
+    date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+    if date_col is None:
+        return None
+    if dataset == "sleep_detailed" and "type" in df.columns and (df["type"] == "long_sleep").any():
+        df = df[df["type"] == "long_sleep"]
+    values = pd.to_numeric(df[column], errors="coerce")
+    values.index = pd.to_datetime(df[date_col], errors="coerce")
+    return values[values.index.notna()].groupby(level=0).mean()
+
+
+def user_daily_metrics(health_data: Dict[str, pd.DataFrame],
+                       metrics: Sequence[str] = tuple(COHORT_METRICS)) -> pd.DataFrame:
+    """
+    Day-level cohort metrics for one user.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        metrics: Metric names from COHORT_METRICS
+
+    Returns:
+        DataFrame indexed by day with one column per metric
+    """
+    columns = {}
+    for metric in metrics:
+        dataset, column, divisor = COHORT_METRICS[metric]
+        series = _daily_series(health_data, dataset, column)
+        if series is not None:
+            columns[metric] = series / divisor
+    return pd.DataFrame(columns).reindex(columns=list(metrics)).sort_index()
+
+
+def user_profiles(daily: pd.DataFrame, window_days: int = 28) -> pd.DataFrame:
+    """
+    Reduce a long day-level table to one row per user.
+
+    Args:
+        daily: Long table with 'user_id', 'day' and metric columns (any other
+            per-user columns such as 'age' and 'goals' are carried over)
+        window_days: Days before each user's latest day averaged into their profile
+
+    Returns:
+        DataFrame indexed by user_id with the metric means and the carried-over columns
+    """
+    days = pd.to_datetime(daily["day"])
+    latest = days.groupby(daily["user_id"]).transform("max")
+    recent = daily[days > latest - pd.Timedelta(days=window_days)]
+    metrics = [c for c in recent.columns if c in COHORT_METRICS]
+    profiles = recent.groupby("user_id")[metrics].mean()
+    extra = [c for c in daily.columns if c not in metrics and c not in ("user_id", "day")]
+    if extra:
+        profiles = profiles.join(daily.groupby("user_id")[extra].last())
+    return profiles
+
+
+def build_cohort(users: Iterable[Tuple[Dict[str, Any], Dict[str, pd.DataFrame]]], window_days: int = 28,
+                 metrics: Sequence[str] = tuple(COHORT_METRICS)) -> pd.DataFrame:
+    """
+    Build a cohort frame from (user_metadata, health_data) pairs.
+
+    Args:
+        users: Iterable of (user metadata, health data), e.g. from an AnalyzerRegistry
+        window_days: Days averaged into each user's profile
+        metrics: Metric names from COHORT_METRICS
+
+    Returns:
+        DataFrame indexed by user_id with metric columns plus 'age_band' and 'goals'
+    """
+    frames = []
+    for metadata, health_data in users:
+        daily = user_daily_metrics(health_data, metrics)
+        if daily.empty:
+            continue
+        daily = daily.rename_axis("day").reset_index()
+        daily["user_id"] = str(metadata.get("user_id") or metadata.get("name"))
+        daily["age_band"] = age_bands([metadata.get("age")])[0]
+        daily["goals"] = metadata.get("goals")
+        frames.append(daily)
+    if not frames:
+        return pd.DataFrame(columns=[*metrics, *SEGMENT_COLUMNS])
+    return user_profiles(pd.concat(frames, ignore_index=True), window_days)
+
+
+def percentile_ranks(cohort: pd.DataFrame, by: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Exact percentile rank (0-100) of every user on every metric.
+
+    Args:
+        cohort: Cohort frame from build_cohort() or user_profiles()
+        by: Segment columns to rank within (e.g. ['age_band']); the whole cohort by default
+
+    Returns:
+        DataFrame like the cohort's metric columns, NaN where a user has no value
+    """
+    metrics = [c for c in cohort.columns if c in COHORT_METRICS]
+    if by:
+        ranked = cohort.groupby(list(by), dropna=False)[metrics].rank(pct=True)
+    else:
+        ranked = cohort[metrics].rank(pct=True)
+    return ranked * 100
+
+
+class CohortSummary:
+    """
+    Mergeable histograms and moments of user profiles, per segment.
+    """
+
+    def __init__(self, metrics: Sequence[str] = tuple(COHORT_METRICS), min_users: int = MIN_SEGMENT_USERS):
+        """
+        Initialize an empty summary.
+
+        Args:
+            metrics: Metric names with bins in METRIC_BINS
+            min_users: Segments with fewer users are suppressed in reports
+        """
+        self.metrics = list(metrics)
+        self.min_users = min_users
+        self.edges = [METRIC_BINS[m] for m in self.metrics]
+        self.n_bins = max(len(e) - 1 for e in self.edges)
+        # segment -> counts (metrics x bins), moments (metrics x [n, sum, sum of squares]), users
+        self.counts: Dict[str, np.ndarray] = {}
+        self.moments: Dict[str, np.ndarray] = {}
+        self.users: Dict[str, int] = {}
+
+    def _segment(self, name: str) -> None:
+        if name not in self.counts:
+            self.counts[name] = np.zeros((len(self.metrics), self.n_bins), dtype=np.int64)
+            self.moments[name] = np.zeros((len(self.metrics), 3))
+            self.users[name] = 0
+
+    def add(self, cohort: pd.DataFrame) -> "CohortSummary":
+        """
+        Accumulate a cohort frame (one row per user).
+
+        Args:
+            cohort: Frame with metric columns and optionally 'age_band' and 'goals'
+
+        Returns:
+            self, for chaining
+        """
+        if cohort.empty:
+            return self
+        values = cohort.reindex(columns=self.metrics).to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        bins = np.stack([np.clip(np.searchsorted(edges, values[:, i], side="right") - 1, 0, len(edges) - 2)
+                         for i, edges in enumerate(self.edges)], axis=1)
+        filled = np.where(present, values, 0.0)
+
+        labels = {"all": np.zeros(len(cohort), dtype=np.int64)}
+        names = {"all": ["all"]}
+        for column in SEGMENT_COLUMNS:
+            if column in cohort.columns:
+                codes, uniques = pd.factorize(cohort[column])
+                labels[column] = codes
+                names[column] = [f"{column}={u}" for u in uniques]
+
+        metric_index = np.broadcast_to(np.arange(len(self.metrics)), values.shape)
+        for column, codes in labels.items():
+            for code, name in enumerate(names[column]):
+                rows = codes == code
+                if not rows.any():
+                    continue
+                self._segment(name)
+                mask = present[rows]
+                np.add.at(self.counts[name], (metric_index[rows][mask], bins[rows][mask]), 1)
+                self.moments[name] += np.stack([mask.sum(axis=0), filled[rows].sum(axis=0),
+                                                (filled[rows] ** 2).sum(axis=0)], axis=1)
+                self.users[name] += int(rows.sum())
+        return self
+
+    def merge(self, other: "CohortSummary") -> "CohortSummary":
+        """
+        Combine with a summary of another partition.
+
+        Args:
+            other: Summary over the same metrics
+
+        Returns:
+            New summary covering both partitions
+        """
+        if other.metrics != self.metrics:
+            raise ValueError("Cannot merge cohort summaries over different metrics")
+        merged = CohortSummary(self.metrics, self.min_users)
+        for summary in (self, other):
+            for name in summary.counts:
+                merged._segment(name)
+                merged.counts[name] += summary.counts[name]
+                merged.moments[name] += summary.moments[name]
+                merged.users[name] += summary.users[name]
+        return merged
+
+    def _cdf(self, metric: str, segment: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.metrics.index(metric)
+        edges = self.edges[i]
+        counts = self.counts[segment][i, :len(edges) - 1]
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        return edges, cumulative / cumulative[-1] if cumulative[-1] else cumulative.astype(float)
+
+    def percentile_rank(self, metric: str, values: Any, segment: str = "all") -> np.ndarray:
+        """
+        Approximate percentile rank (0-100) of values within a segment.
+
+        Args:
+            metric: Metric name
+            values: Value or array of values
+            segment: 'all', or a segment such as 'age_band=25-34' or 'goals=performance'
+
+        Returns:
+            Array of ranks, interpolated within histogram bins
+        """
+        edges, cdf = self._cdf(metric, segment)
+        return np.interp(np.asarray(values, dtype=float), edges, cdf) * 100
+
+    def distribution(self, metric: str, segment: str = "all") -> Optional[Dict[str, Any]]:
+        """
+        Distribution of a metric within a segment.
+
+        Args:
+            metric: Metric name
+            segment: 'all' or a segment name
+
+        Returns:
+            Dictionary with users, mean, std, quantiles, bin edges and counts, or
+            None if the segment is unknown or smaller than min_users
+        """
+        if segment not in self.counts or self.users[segment] < self.min_users:
+            return None
+        i = self.metrics.index(metric)
+        n, total, squares = self.moments[segment][i]
+        if n == 0:
+            return None
+        edges, cdf = self._cdf(metric, segment)
+        mean = total / n
+        return {
+            "users": int(n),
+            "mean": float(mean),
+            "std": float(np.sqrt(max(squares / n - mean ** 2, 0.0))),
+            "quantiles": {f"p{int(q * 100)}": float(np.interp(q, cdf, edges)) for q in QUANTILES},
+            "bin_edges": edges.tolist(),
+            "counts": self.counts[segment][i, :len(edges) - 1].tolist(),
+        }
+
+    def segment_table(self, metric: str) -> pd.DataFrame:
+        """
+        Per-segment aggregates of a metric, with small segments suppressed.
+
+        Args:
+            metric: Metric name
+
+        Returns:
+            DataFrame indexed by segment with users, mean, std and quantile columns
+        """
+        rows = {}
+        for segment in self.counts:
+            distribution = self.distribution(metric, segment)
+            if distribution is not None:
+                rows[segment] = {"users": distribution["users"], "mean": distribution["mean"],
+                                 "std": distribution["std"], **distribution["quantiles"]}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable form, for storing partition results."""
+        return {
+            "metrics": self.metrics,
+            "min_users": self.min_users,
+            "segments": {name: {"counts": self.counts[name].tolist(), "moments": self.moments[name].tolist(),
+                                "users": self.users[name]} for name in self.counts},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CohortSummary":
+        """Rebuild a summary from to_dict() output."""
+        summary = cls(data["metrics"], data["min_users"])
+        for name, segment in data["segments"].items():
+            summary.counts[name] = np.asarray(segment["counts"], dtype=np.int64)
+            summary.moments[name] = np.asarray(segment["moments"], dtype=float)
+            summary.users[name] = segment["users"]
+        return summary
+
+
+def summarize_long_table(chunks: Iterable[pd.DataFrame], window_days: int = 28,
+                         metrics: Sequence[str] = tuple(COHORT_METRICS),
+                         min_users: int = MIN_SEGMENT_USERS) -> CohortSummary:
+    """
+    Summarize a long day-level table scanned in chunks.
+
+    Each chunk must hold complete users (e.g. one partition of users per chunk),
+    as profiles are computed per chunk.
+
+    Args:
+        chunks: DataFrames with 'user_id', 'day', metric columns and optionally 'age'/'goals'
+        window_days: Days averaged into each user's profile
+        metrics: Metric names
+        min_users: Segment suppression threshold
+
+    Returns:
+        CohortSummary over all chunks
+    """
+    summary = CohortSummary(metrics, min_users)
+    for chunk in chunks:
+        if "age" in chunk.columns and "age_band" not in chunk.columns:
+            chunk = chunk.assign(age_band=age_bands(chunk["age"]).to_numpy()).drop(columns="age")
+        summary = summary.merge(CohortSummary(metrics, min_users).add(user_profiles(chunk, window_days)))
+    return summary
@@ -0,0 +1,244 @@
+"""
+Day-level context fingerprints for change-aware daily advice.
+
+Daily programmes depend on a handful of day-level inputs: the latest readiness,
+sleep and stress figures, the menstrual cycle phase and any metric that is
+anomalous today. build_day_context() extracts them; material_changes() compares
+two contexts under per-field tolerances, so a new day whose inputs barely moved
+can reuse the previous advice instead of calling the model again.
+"""
+
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from stats_digest import DATE_COLUMNS, daily_frame
+
+
+# Numeric fields: absolute change that still counts as "the same day".
+# max_age_days bounds how long advice is reused even if nothing moved.
+DEFAULT_TOLERANCES = {
+    "readiness_score": 5,
+    "temperature_deviation": 0.3,
+    "sleep_score": 5,
+    "average_hrv": 5,
+    "stress_high_minutes": 60,
+    "recovery_high_minutes": 60,
+    "max_age_days": 3,
+}
+
+# Fields that must match exactly
+CATEGORICAL_FIELDS = ("cycle_phase", "stress_summary", "anomalies")
+
+PERIOD_TAG = re.compile(r"period|menstrua", re.IGNORECASE)
+
+# (last cycle day, phase) for a 28-day cycle; scaled to the user's cycle length
+CYCLE_PHASES = ((5, "menstrual"), (13, "follicular"), (16, "ovulatory"), (28, "luteal"))
+
+
+def _latest(health_data: Dict[str, pd.DataFrame], dataset: str,
+            query: Optional[str] = None) -> Optional[pd.Series]:
+    """Most recent row of a dataset, by its day column."""
+    df = health_data.get(dataset)
+    if df is None or df.empty:
+        return None
+    if query is not None:
+        df = df.query(query)
+        if df.empty:
+            return None
+    date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+    if date_col is None:
+        return df.iloc[-1]
+    days = pd.to_datetime(df[date_col], errors="coerce")
+    if days.isna().all():
+        return None
+    return df.loc[days.idxmax()]
+
+
+def _number(row: Optional[pd.Series], column: str, scale: float = 1.0) -> Optional[float]:
+    if row is None or column not in row.index or pd.isna(row[column]):
+        return None
+    try:
+        return round(float(row[column]) / scale, 3)
+    except (TypeError, ValueError):
+        return None
+
+
+def latest_day(health_data: Dict[str, pd.DataFrame]) -> Optional[pd.Timestamp]:
+    """Most recent day with data in any dataset."""
+    days = []
+    for df in health_data.values():
+        date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+        if date_col is not None and not df.empty:
+            days.append(pd.to_datetime(df[date_col], errors="coerce").max())
+    days = [d for d in days if pd.notna(d)]
+    return max(days) if days else None
+
+
+def period_starts(health_data: Dict[str, pd.DataFrame]) -> pd.DatetimeIndex:
+    """Sorted start days of tagged periods."""
+    tags = health_data.get("tags")
+    if tags is None or tags.empty or "start_day" not in tags.columns:
+        return pd.DatetimeIndex([])
+    text = tags.reindex(columns=["tag_type_code", "custom_name", "comment"]).astype(object).fillna("").astype(str).agg(" ".join, axis=1)
+    starts = pd.to_datetime(tags.loc[text.str.contains(PERIOD_TAG), "start_day"], errors="coerce").dropna()
+    return pd.DatetimeIndex(starts.sort_values().unique())
+
+
+def cycle_phases(days: pd.DatetimeIndex, starts: pd.DatetimeIndex, cycle_length: int = 28) -> np.ndarray:
+    """
+    Estimate the cycle phase of many days at once from period start days.
+
+    Args:
+        days: Days to estimate the phase for
+        starts: Sorted period start days
+        cycle_length: Typical cycle length in days
+
+    Returns:
+        Array of phase names, None where unknown (no earlier period, or more than
+        two cycles since the last one)
+    """
+    days = pd.DatetimeIndex(days)
+    phases = np.full(len(days), None, dtype=object)
+    if len(starts) == 0 or len(days) == 0:
+        return phases
+    previous = np.searchsorted(starts.values, days.values, side="right") - 1
+    known = previous >= 0
+    days_since = np.full(len(days), -1)
+    days_since[known] = (days.values[known] - starts.values[previous[known]]) // np.timedelta64(1, "D")
+    known &= days_since < 2 * cycle_length
+    scaled_day = (days_since % cycle_length + 1) * 28 / cycle_length
+    bounds = np.array([last_day for last_day, _ in CYCLE_PHASES])
+    names = np.array([phase for _, phase in CYCLE_PHASES], dtype=object)
+    index = np.minimum(np.searchsorted(bounds, scaled_day, side="left"), len(bounds) - 1)
+    phases[known] = names[index[known]]
+    return phases
+
+
+def cycle_phase(health_data: Dict[str, pd.DataFrame], user_metadata: Optional[Dict[str, Any]] = None,
+                as_of: Optional[pd.Timestamp] = None) -> Optional[str]:
+    """
+    Estimate the menstrual cycle phase.
+
+    A 'cycle_phase' in the user metadata wins. Otherwise the phase is derived from
+    the most recent period tag and the user's 'cycle_length' (28 days by default).
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        user_metadata: User information, optionally with cycle_phase / cycle_length
+        as_of: Day to estimate the phase for; the latest day with data by default
+
+    Returns:
+        'menstrual', 'follicular', 'ovulatory', 'luteal', or None if unknown
+    """
+    user_metadata = user_metadata or {}
+    if user_metadata.get("cycle_phase"):
+        return str(user_metadata["cycle_phase"]).lower()
+
+    as_of = as_of if as_of is not None else latest_day(health_data)
+    if as_of is None:
+        return None
+    cycle_length = int(user_metadata.get("cycle_length") or 28)
+    return cycle_phases(pd.DatetimeIndex([as_of]), period_starts(health_data), cycle_length)[0]
+
+
+def latest_anomalies(health_data: Dict[str, pd.DataFrame], baseline_days: int = 28,
+                     threshold: float = 2.0) -> List[str]:
+    """
+    Metrics whose latest daily value is more than `threshold` SDs from the preceding baseline.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        baseline_days: Days before the latest one used as the baseline
+        threshold: Z-score beyond which a value is anomalous
+
+    Returns:
+        Sorted list of 'dataset.metric' names
+    """
+    anomalies = []
+    for dataset_name, df in health_data.items():
+        daily = daily_frame(df)
+        if daily is None or len(daily) < 4:
+            continue
+        baseline = daily.iloc[-(baseline_days + 1):-1]
+        std = baseline.std().replace(0, np.nan)
+        z = ((daily.iloc[-1] - baseline.mean()) / std).abs()
+        anomalies.extend(f"{dataset_name}.{metric}" for metric in z.index[z > threshold])
+    return sorted(anomalies)
+
+
+def build_day_context(health_data: Dict[str, pd.DataFrame],
+                      user_metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Extract the day-level inputs that daily advice depends on.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        user_metadata: User information (cycle_phase / cycle_length are used)
+
+    Returns:
+        JSON-serialisable dictionary; unavailable values are None
+    """
+    day = latest_day(health_data)
+    readiness = _latest(health_data, "daily_readiness")
+    sleep = _latest(health_data, "daily_sleep")
+    stress = _latest(health_data, "daily_stress")
+    detailed = health_data.get("sleep_detailed")
+    main_sleep = _latest(health_data, "sleep_detailed",
+                         "type == 'long_sleep'" if detailed is not None and "type" in detailed.columns else None)
+
+    return {
+        "latest_day": day.strftime("%Y-%m-%d") if day is not None else None,
+        "readiness_score": _number(readiness, "score"),
+        "temperature_deviation": _number(readiness, "temperature_deviation"),
+        "sleep_score": _number(sleep, "score"),
+        "average_hrv": _number(main_sleep, "average_hrv"),
+        "stress_summary": (None if stress is None or pd.isna(stress.get("day_summary"))
+                           else str(stress.get("day_summary"))),
+        "stress_high_minutes": _number(stress, "stress_high", scale=60),
+        "recovery_high_minutes": _number(stress, "recovery_high", scale=60),
+        "cycle_phase": cycle_phase(health_data, user_metadata, day),
+        "anomalies": latest_anomalies(health_data),
+    }
+
+
+def fingerprint(context: Dict[str, Any]) -> str:
+    """Stable hash of a day context."""
+    return hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def material_changes(previous: Dict[str, Any], current: Dict[str, Any],
+                     tolerances: Optional[Dict[str, float]] = None) -> List[str]:
+    """
+    List the inputs that moved enough to warrant new advice.
+
+    Args:
+        previous: Context the existing advice was generated from
+        current: Today's context
+        tolerances: Per-field tolerances overriding DEFAULT_TOLERANCES
+
+    Returns:
+        Names of the fields that changed materially; empty if the advice can be reused
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    changes = []
+    for field, tolerance in tolerances.items():
+        if field == "max_age_days":
+            continue
+        old, new = previous.get(field), current.get(field)
+        if old is None and new is None:
+            continue
+        if old is None or new is None or abs(new - old) > tolerance:
+            changes.append(field)
+    changes.extend(field for field in CATEGORICAL_FIELDS if previous.get(field) != current.get(field))
+
+    max_age = tolerances.get("max_age_days")
+    if max_age is not None and previous.get("latest_day") and current.get("latest_day"):
+        age = (pd.Timestamp(current["latest_day"]) - pd.Timestamp(previous["latest_day"])).days
+        if age > max_age or age < 0:
+            changes.append("latest_day")
+    return changes
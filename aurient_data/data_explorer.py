@@ -0,0 +1,195 @@
+"""
+Paginated, filtered and sorted views over large health datasets.
+
+DatasetExplorer answers one page of a query at a time, against either a loaded
+DataFrame or a CSV file on disk. Filtering and sorting only touch the columns
+they need (a CSV is scanned in chunks with just those columns), sorting keeps
+the top offset + page_size candidates rather than ordering every row, and only
+the rows of the requested page are materialized with the projected columns. This
+keeps heart rate and workout tables with hundreds of thousands of rows cheap to
+browse.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+CHUNK_SIZE = 100_000
+
+# Columns offered as date range filters and as categorical filters, in order of preference
+DATE_FILTER_COLUMNS = ("day", "start_day", "date", "timestamp", "start_datetime", "bedtime_start")
+CATEGORY_FILTER_COLUMNS = ("source", "activity", "type", "intensity", "day_summary")
+
+
+class DatasetExplorer:
+    """
+    Server-side pagination over one dataset.
+    """
+
+    def __init__(self, source: Union[pd.DataFrame, str, Path], chunk_size: int = CHUNK_SIZE):
+        """
+        Initialize the explorer.
+
+        Args:
+            source: Loaded DataFrame, or path to a CSV file read lazily in chunks
+            chunk_size: Rows per chunk when scanning a CSV file
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        if isinstance(source, pd.DataFrame):
+            self.columns = list(source.columns)
+        else:
+            self.columns = list(pd.read_csv(source, nrows=0).columns)
+
+    @property
+    def date_column(self) -> Optional[str]:
+        """Column used for date range filters, if any."""
+        return next((c for c in DATE_FILTER_COLUMNS if c in self.columns), None)
+
+    @property
+    def category_columns(self) -> List[str]:
+        """Columns offered as categorical filters."""
+        return [c for c in CATEGORY_FILTER_COLUMNS if c in self.columns]
+
+    def _chunks(self, columns: Sequence[str]) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """Yield (position of first row, chunk) with only the given columns."""
+        columns = [c for c in self.columns if c in set(columns)]
+        if isinstance(self.source, pd.DataFrame):
+            yield 0, self.source[columns] if columns else self.source.iloc[:, :0]
+            return
+        start = 0
+        for chunk in pd.read_csv(self.source, usecols=columns or [self.columns[0]], chunksize=self.chunk_size):
+            yield start, chunk if columns else chunk.iloc[:, :0]
+            start += len(chunk)
+
+    def _mask(self, chunk: pd.DataFrame, start: Optional[str], end: Optional[str],
+              equals: Dict[str, Any]) -> np.ndarray:
+        """Rows of a chunk matching the filters."""
+        mask = np.ones(len(chunk), dtype=bool)
+        if (start or end) and self.date_column:
+            # ISO dates and timestamps compare correctly on their YYYY-MM-DD prefix
+            days = chunk[self.date_column].astype(str).str[:10]
+            if start:
+                mask &= (days >= str(start)[:10]).to_numpy()
+            if end:
+                mask &= (days <= str(end)[:10]).to_numpy()
+        for column, value in equals.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= chunk[column].astype(str).isin([str(v) for v in values]).to_numpy()
+        return mask
+
+    def filter_options(self, column: str, limit: int = 50) -> List[str]:
+        """
+        Distinct values of a column, for filter dropdowns.
+
+        Args:
+            column: Column name
+            limit: Maximum number of values returned
+
+        Returns:
+            Sorted distinct values as strings
+        """
+        values = set()
+        for _, chunk in self._chunks([column]):
+            values.update(chunk[column].dropna().astype(str).unique())
+            if len(values) > limit:
+                break
+        return sorted(values)[:limit]
+
+    def date_bounds(self) -> Optional[Tuple[str, str]]:
+        """Earliest and latest day in the date column, as YYYY-MM-DD."""
+        if not self.date_column:
+            return None
+        lows, highs = [], []
+        for _, chunk in self._chunks([self.date_column]):
+            days = chunk[self.date_column].dropna().astype(str).str[:10]
+            if not days.empty:
+                lows.append(days.min())
+                highs.append(days.max())
+        return (min(lows), max(highs)) if lows else None
+
+    def page(self, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE, columns: Optional[Sequence[str]] = None,
+             start: Optional[str] = None, end: Optional[str] = None, equals: Optional[Dict[str, Any]] = None,
+             sort_by: Optional[str] = None, ascending: bool = True) -> Dict[str, Any]:
+        """
+        Return one page of the filtered, sorted dataset.
+
+        Args:
+            page: 1-based page number
+            page_size: Rows per page (at most MAX_PAGE_SIZE)
+            columns: Columns to return; all columns by default
+            start: First day to include (YYYY-MM-DD), on the date column
+            end: Last day to include (YYYY-MM-DD), on the date column
+            equals: Categorical filters, column -> value or list of accepted values
+            sort_by: Column to sort by; file order by default
+            ascending: Sort direction (missing values always sort last)
+
+        Returns:
+            Dictionary with 'rows' (DataFrame of the page), 'total_rows' matching
+            the filters, 'page', 'pages' and 'page_size', or an error dictionary
+        """
+        equals = {c: v for c, v in (equals or {}).items() if v not in (None, "", [], ())}
+        columns = list(columns) if columns else list(self.columns)
+        unknown = [c for c in [*columns, *equals, *([sort_by] if sort_by else [])] if c not in self.columns]
+        if unknown:
+            return {"error": f"Unknown columns: {', '.join(unknown)}"}
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        page = max(1, int(page))
+        offset = (page - 1) * page_size
+
+        # Pass 1: filter (and rank) using only the columns the query needs
+        needed = set(equals) | ({self.date_column} if (start or end) and self.date_column else set())
+        if sort_by:
+            needed.add(sort_by)
+        total = 0
+        selected = []
+        candidates = None
+        for first_row, chunk in self._chunks(needed):
+            mask = self._mask(chunk, start, end, equals)
+            matches = int(mask.sum())
+            if sort_by:
+                keys = pd.DataFrame({"key": chunk[sort_by].to_numpy()[mask],
+                                     "position": first_row + np.flatnonzero(mask)})
+                candidates = keys if candidates is None else pd.concat([candidates, keys], ignore_index=True)
+                candidates = candidates.sort_values(["key", "position"], ascending=[ascending, True],
+                                                    na_position="last").head(offset + page_size)
+            elif total + matches > offset and len(selected) < page_size:
+                positions = first_row + np.flatnonzero(mask)
+                skip = max(0, offset - total)
+                selected.extend(positions[skip:skip + page_size - len(selected)].tolist())
+            total += matches
+
+        if sort_by:
+            selected = candidates["position"].iloc[offset:].tolist() if candidates is not None else []
+
+        # Pass 2: materialize only the page's rows
+        rows = self._rows(selected, columns)
+        return {
+            "rows": rows,
+            "total_rows": total,
+            "page": page,
+            "pages": max(1, -(-total // page_size)),
+            "page_size": page_size,
+        }
+
+    def _rows(self, positions: List[int], columns: List[str]) -> pd.DataFrame:
+        """Rows at the given positions (in that order) with the given columns."""
+        if isinstance(self.source, pd.DataFrame):
+            return self.source.iloc[positions][columns].reset_index(drop=True)
+        if not positions:
+            return pd.DataFrame(columns=columns)
+        wanted = np.array(sorted(positions))
+        parts = []
+        for first_row, chunk in self._chunks(columns):
+            in_chunk = wanted[(wanted >= first_row) & (wanted < first_row + len(chunk))]
+            if len(in_chunk):
+                parts.append(chunk.iloc[in_chunk - first_row].set_axis(in_chunk))
+            if first_row + len(chunk) > wanted[-1]:
+                break
+        found = pd.concat(parts)
+        return found.loc[positions, columns].reset_index(drop=True)
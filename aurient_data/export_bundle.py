@@ -0,0 +1,232 @@
+"""
+Streaming, pseudonymized export bundles for marketplace listings.
+
+export_bundle() turns a user's datasets into a directory that can be pinned to
+IPFS as a listing:
+
+    <bundle>/manifest.json
+    <bundle>/<dataset>/part-00000.parquet   (or .csv.gz without pyarrow)
+    ...
+
+Each dataset is streamed in chunks of `chunk_rows` (CSV files are never read
+whole) through pseudonymization:
+
+- identifier and free-text columns are dropped (`id`, comments, custom tag names);
+- dates and timestamps are shifted by a per-user offset derived from a secret, so
+  intervals and weekdays are preserved but real dates are not;
+- timestamps are coarsened (to the hour by default) and their UTC offsets, which
+  reveal location, are removed.
+
+Every part file is hashed (sha256) while it is written, and the manifest records
+the hashes, row counts and the bundle hash over all parts. With the same data and
+secret the output is byte-for-byte identical, so a listing can be re-created and
+verified.
+"""
+
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import re
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional: fall back to gzip-compressed CSV parts
+    pa = None
+    pq = None
+
+
+BUNDLE_VERSION = 1
+DEFAULT_CHUNK_ROWS = 50_000
+DEFAULT_MAX_SHIFT_DAYS = 180
+DEFAULT_TIMESTAMP_RESOLUTION = "1h"
+
+DROP_COLUMNS = ("id", "user_id", "comment", "custom_name")
+EXCLUDED_DATASETS = ("ring_config",)
+DAY_COLUMNS = ("day", "start_day", "end_day", "date")
+TIMESTAMP_COLUMN = re.compile(r"(timestamp|_datetime|^bedtime_(start|end)|_at$|_time$)")
+
+
+class _HashingWriter(io.RawIOBase):
+    """Writes through to a file while hashing and counting the bytes."""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+        self.bytes = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self.file.write(data)
+        self.sha256.update(data)
+        self.bytes += len(data)
+        return len(data)
+
+
+def user_pseudonym(user_id: str, secret: bytes) -> str:
+    """Stable pseudonym for a user, unlinkable without the secret."""
+    return hmac.new(secret, f"user:{user_id}".encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def date_shift_days(user_id: str, secret: bytes, max_shift_days: int = DEFAULT_MAX_SHIFT_DAYS) -> int:
+    """
+    Per-user date offset in whole weeks, within +/- max_shift_days.
+
+    Whole weeks keep weekday patterns intact.
+    """
+    digest = hmac.new(secret, f"shift:{user_id}".encode("utf-8"), hashlib.sha256).digest()
+    weeks = max_shift_days // 7
+    return 7 * (int.from_bytes(digest[:8], "big") % (2 * weeks + 1) - weeks) if weeks else 0
+
+
+def pseudonymize_chunk(chunk: pd.DataFrame, shift_days: int,
+                       timestamp_resolution: str = DEFAULT_TIMESTAMP_RESOLUTION) -> pd.DataFrame:
+    """
+    Drop identifiers, shift dates and coarsen timestamps in one chunk.
+
+    Args:
+        chunk: Rows of one dataset
+        shift_days: Days added to every date and timestamp
+        timestamp_resolution: pandas frequency timestamps are floored to
+
+    Returns:
+        Pseudonymized copy of the chunk
+    """
+    out = chunk.drop(columns=[c for c in DROP_COLUMNS if c in chunk.columns])
+    shift = pd.Timedelta(days=shift_days)
+    for column in out.columns:
+        if column in DAY_COLUMNS:
+            days = pd.to_datetime(out[column], errors="coerce")
+            out[column] = (days + shift).dt.strftime("%Y-%m-%d")
+        elif TIMESTAMP_COLUMN.search(column) and not pd.api.types.is_numeric_dtype(out[column]):
+            # Keep local wall-clock time; drop the UTC offset
+            text = out[column].astype(str).str[:19].str.replace(" ", "T", regex=False)
+            local = pd.to_datetime(text, format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+            out[column] = (local + shift).dt.floor(timestamp_resolution).dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return out
+
+
+def _chunks(source: Union[pd.DataFrame, str, Path], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    else:
+        yield from pd.read_csv(source, chunksize=chunk_rows)
+
+
+def _write_part(chunk: pd.DataFrame, path: Path, columnar: bool) -> Dict[str, Any]:
+    """Write one part file, hashing it in the same pass."""
+    with open(path, "wb") as f:
+        writer = _HashingWriter(f)
+        if columnar:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            pq.write_table(table, writer, compression="zstd")
+        else:
+            # mtime=0 keeps the gzip header, and so the hash, reproducible
+            with gzip.GzipFile(fileobj=writer, mode="wb", mtime=0, filename="") as gz:
+                gz.write(chunk.to_csv(index=False, lineterminator="\n").encode("utf-8"))
+    return {"path": path.name, "rows": len(chunk), "bytes": writer.bytes, "sha256": writer.sha256.hexdigest()}
+
+
+def export_bundle(sources: Dict[str, Union[pd.DataFrame, str, Path]], out_dir: Union[str, Path], user_id: str,
+                  secret: bytes, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                  timestamp_resolution: str = DEFAULT_TIMESTAMP_RESOLUTION,
+                  max_shift_days: int = DEFAULT_MAX_SHIFT_DAYS, columnar: Optional[bool] = None,
+                  datasets: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Write a pseudonymized export bundle for one user.
+
+    Args:
+        sources: Dataset name -> DataFrame or CSV path (e.g. an analyzer's health_data)
+        out_dir: Bundle directory (created; existing part files are overwritten)
+        user_id: The user's real id; only its pseudonym is written
+        secret: Secret for pseudonyms and date shifts; keep it out of the bundle
+        chunk_rows: Rows per part file, which bounds memory use
+        timestamp_resolution: pandas frequency timestamps are floored to
+        max_shift_days: Bound of the per-user date shift
+        columnar: Write Parquet (True) or gzip CSV (False); Parquet when pyarrow is installed by default
+        datasets: Datasets to export; all but EXCLUDED_DATASETS by default
+
+    Returns:
+        The manifest, also written to <out_dir>/manifest.json
+    """
+    columnar = pq is not None if columnar is None else columnar
+    if columnar and pq is None:
+        raise ImportError("pyarrow is required for Parquet bundles. Install it or pass columnar=False.")
+    extension = "parquet" if columnar else "csv.gz"
+    out_dir = Path(out_dir)
+    shift_days = date_shift_days(user_id, secret, max_shift_days)
+
+    manifest: Dict[str, Any] = {
+        "bundle_version": BUNDLE_VERSION,
+        "subject": user_pseudonym(user_id, secret),
+        "format": extension,
+        "pseudonymization": {
+            "dropped_columns": list(DROP_COLUMNS),
+            "date_shift": f"per-subject, whole weeks within +/-{max_shift_days} days",
+            "timestamp_resolution": timestamp_resolution,
+            "timezone_offsets": "removed",
+        },
+        "datasets": {},
+    }
+    names = datasets if datasets is not None else [n for n in sources if n not in EXCLUDED_DATASETS]
+    for name in sorted(names):
+        dataset_dir = out_dir / name
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+        parts, columns = [], None
+        for index, chunk in enumerate(_chunks(sources[name], chunk_rows)):
+            chunk = pseudonymize_chunk(chunk, shift_days, timestamp_resolution)
+            columns = columns or list(chunk.columns)
+            part = _write_part(chunk, dataset_dir / f"part-{index:05d}.{extension}", columnar)
+            part["path"] = f"{name}/{part['path']}"
+            parts.append(part)
+        manifest["datasets"][name] = {"columns": columns or [], "rows": sum(p["rows"] for p in parts),
+                                      "parts": parts}
+
+    bundle_hash = hashlib.sha256()
+    for dataset in manifest["datasets"].values():
+        for part in dataset["parts"]:
+            bundle_hash.update(f"{part['path']}:{part['sha256']}\n".encode("utf-8"))
+    manifest["bundle_sha256"] = bundle_hash.hexdigest()
+
+    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"✓ Exported {len(manifest['datasets'])} datasets to {out_dir} (bundle {manifest['bundle_sha256'][:12]})")
+    return manifest
+
+
+def verify_bundle(bundle_dir: Union[str, Path]) -> List[str]:
+    """
+    Check every part file against the manifest.
+
+    Args:
+        bundle_dir: Bundle directory
+
+    Returns:
+        Paths of missing or modified parts; empty if the bundle is intact
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest = json.loads((bundle_dir / "manifest.json").read_text(encoding="utf-8"))
+    bad = []
+    for dataset in manifest["datasets"].values():
+        for part in dataset["parts"]:
+            path = bundle_dir / part["path"]
+            if not path.exists():
+                bad.append(part["path"])
+                continue
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 ** 2), b""):
+                    sha256.update(block)
+            if sha256.hexdigest() != part["sha256"]:
+                bad.append(part["path"])
+    return bad
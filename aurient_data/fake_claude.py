@@ -0,0 +1,274 @@
+"""
+Offline stand-in for the Anthropic client used by OuraAnalysis.
+
+The fake mimics the parts of the Messages API the analysis code relies on and
+simulates provider-side prompt caching, so tests and local development can check
+request layout and cache accounting without network access or an API key.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Union
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _content_text(content: Union[str, List[Dict[str, Any]]]) -> str:
+    """Flatten message or system content into plain text."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+class FakeAPIStatusError(Exception):
+    """Fake of anthropic's APIStatusError, raised by injected throttling."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FakeMessages:
+    """Fake implementation of ``client.messages``."""
+
+    def __init__(self, client: "FakeClaudeClient"):
+        self._client = client
+
+    def create(self, **params: Any) -> SimpleNamespace:
+        """Record the request and return a response shaped like anthropic's Message."""
+        return self._client._respond(params)
+
+    def stream(self, **params: Any) -> "FakeMessageStream":
+        """Return a context manager streaming the response in small text chunks."""
+        return FakeMessageStream(self._client, params)
+
+
+class FakeMessageStream:
+    """Fake of anthropic's MessageStream context manager."""
+
+    def __init__(self, client: "FakeClaudeClient", params: Dict[str, Any]):
+        self._client = client
+        self._params = params
+        self._message: Optional[SimpleNamespace] = None
+
+    def __enter__(self) -> "FakeMessageStream":
+        self._message = self._client._build_response(self._params)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for chunk in self._client._chunks(self._message.content[0].text):
+            if self._client.chunk_delay:
+                time.sleep(self._client.chunk_delay)
+            self._client.chunks_sent += 1
+            yield chunk
+
+    def get_final_message(self) -> SimpleNamespace:
+        return self._message
+
+
+class FakeClaudeClient:
+    """
+    Local fake Claude client with simulated prompt caching.
+
+    Every system block marked with ``cache_control`` is treated as a cache
+    breakpoint: the prefix up to and including that block is cached on first use
+    and counted as ``cache_read_input_tokens`` on later requests.
+    """
+
+    def __init__(self, responder: Optional[Union[str, Callable[[Dict[str, Any]], str]]] = None,
+                 latency: float = 0.0, chunk_size: int = 16, chunk_delay: float = 0.0,
+                 failures: Iterable[Optional[int]] = (), requests_per_minute: Optional[int] = None):
+        """
+        Initialize the fake client.
+
+        Args:
+            responder: Fixed response text, or a callable receiving the request
+                parameters and returning the response text
+            latency: Seconds each request takes, to exercise concurrency
+            chunk_size: Characters per streamed text delta
+            chunk_delay: Seconds between streamed text deltas
+            failures: Status codes (e.g. 429, 529) raised by successive requests;
+                None lets that request through
+            requests_per_minute: If set, requests beyond this many in any
+                sliding minute are rejected with a 429
+        """
+        self.responder = responder if responder is not None else "Fake Claude response"
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls: List[Dict[str, Any]] = []
+        self.failures = deque(failures)
+        self.requests_per_minute = requests_per_minute
+        self.rejected: List[int] = []
+        self._accepted_at: Deque[float] = deque()
+        self.messages = FakeMessages(self)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # Streamed text deltas produced so far, over all requests
+        self.chunks_sent = 0
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _response_text(self, params: Dict[str, Any]) -> str:
+        if callable(self.responder):
+            return self.responder(params)
+        return self.responder
+
+    def _cache_usage(self, system: Union[str, List[Dict[str, Any]], None]) -> Dict[str, int]:
+        """Work out cache reads and writes for the system prefix of a request."""
+        usage = {"cache_read_input_tokens": 0, "cache_creation_input_tokens": 0, "uncached_tokens": 0}
+        if not system:
+            return usage
+        if isinstance(system, str):
+            usage["uncached_tokens"] = estimate_tokens(system)
+            return usage
+
+        prefix = hashlib.sha256()
+        prefix_tokens = 0
+        read_upto = 0
+        breakpoints = []
+        for block in system:
+            prefix.update(json.dumps(block.get("text", "")).encode())
+            prefix_tokens += estimate_tokens(block.get("text", ""))
+            if block.get("cache_control"):
+                key = prefix.hexdigest()
+                breakpoints.append((key, prefix_tokens))
+                if key in self._cached_prefixes:
+                    read_upto = prefix_tokens
+
+        cached_upto = read_upto
+        for key, tokens in breakpoints:
+            if tokens > read_upto:
+                self._cached_prefixes.add(key)
+                cached_upto = tokens
+        usage["cache_read_input_tokens"] = read_upto
+        usage["cache_creation_input_tokens"] = cached_upto - read_upto
+        usage["uncached_tokens"] = prefix_tokens - cached_upto
+        return usage
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _respond(self, params: Dict[str, Any]) -> SimpleNamespace:
+        if self.latency:
+            self._enter()
+            try:
+                time.sleep(self.latency)
+            finally:
+                self._exit()
+        return self._build_response(params)
+
+    def _throttle(self) -> None:
+        """Raise an injected failure or a rate limit error for this request. Call with the lock held."""
+        code = self.failures.popleft() if self.failures else None
+        if code is None and self.requests_per_minute is not None:
+            now = time.monotonic()
+            while self._accepted_at and now - self._accepted_at[0] >= 60:
+                self._accepted_at.popleft()
+            if len(self._accepted_at) >= self.requests_per_minute:
+                retry_after = 60 - (now - self._accepted_at[0])
+                self.rejected.append(429)
+                raise FakeAPIStatusError(429, retry_after)
+            self._accepted_at.append(now)
+        if code is not None:
+            self.rejected.append(code)
+            raise FakeAPIStatusError(code)
+
+    def _build_response(self, params: Dict[str, Any]) -> SimpleNamespace:
+        with self._lock:
+            self._throttle()
+            self.calls.append(params)
+            cache = self._cache_usage(params.get("system"))
+        text = self._response_text(params)
+        message_tokens = sum(estimate_tokens(_content_text(m["content"])) for m in params.get("messages", []))
+        usage = SimpleNamespace(
+            input_tokens=message_tokens + cache["uncached_tokens"],
+            output_tokens=estimate_tokens(text),
+            cache_creation_input_tokens=cache["cache_creation_input_tokens"],
+            cache_read_input_tokens=cache["cache_read_input_tokens"],
+        )
+        return SimpleNamespace(
+            id=f"msg_fake_{len(self.calls)}",
+            model=params.get("model"),
+            role="assistant",
+            content=[SimpleNamespace(type="text", text=text)],
+            stop_reason="end_turn",
+            usage=usage,
+        )
+
+
+class FakeAsyncMessages:
+    """Fake implementation of ``AsyncAnthropic().messages``."""
+
+    def __init__(self, client: "FakeAsyncClaudeClient"):
+        self._client = client
+
+    async def create(self, **params: Any) -> SimpleNamespace:
+        """Record the request and return a response after the configured latency."""
+        self._client._enter()
+        try:
+            if self._client.latency:
+                await asyncio.sleep(self._client.latency)
+        finally:
+            self._client._exit()
+        return self._client._build_response(params)
+
+    def stream(self, **params: Any) -> "FakeAsyncMessageStream":
+        """Return an async context manager streaming the response in small text chunks."""
+        return FakeAsyncMessageStream(self._client, params)
+
+
+class FakeAsyncMessageStream(FakeMessageStream):
+    """Fake of anthropic's AsyncMessageStream context manager."""
+
+    async def __aenter__(self) -> "FakeAsyncMessageStream":
+        if self._client.latency:
+            await asyncio.sleep(self._client.latency)
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    @property
+    async def text_stream(self) -> AsyncIterator[str]:
+        for chunk in self._client._chunks(self._message.content[0].text):
+            if self._client.chunk_delay:
+                await asyncio.sleep(self._client.chunk_delay)
+            self._client.chunks_sent += 1
+            yield chunk
+
+    async def get_final_message(self) -> SimpleNamespace:
+        return self._message
+
+
+class FakeAsyncClaudeClient(FakeClaudeClient):
+    """Async variant of FakeClaudeClient, mirroring ``anthropic.AsyncAnthropic``."""
+
+    def __init__(self, responder: Optional[Union[str, Callable[[Dict[str, Any]], str]]] = None,
+                 latency: float = 0.0, chunk_size: int = 16, chunk_delay: float = 0.0,
+                 failures: Iterable[Optional[int]] = (), requests_per_minute: Optional[int] = None):
+        super().__init__(responder, latency, chunk_size, chunk_delay, failures, requests_per_minute)
+        self.messages = FakeAsyncMessages(self)
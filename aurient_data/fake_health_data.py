@@ -0,0 +1,160 @@
+"""
+Small synthetic health datasets and analyzer factories shared by the tests.
+
+The make_* functions build just enough of the Oura datasets for one area of
+the code (the daily context and local recommendation rules, the stats digest,
+prompts). make_analyzer() and load_user() build analyzers whose response cache,
+and with it the daily context store, telemetry log and sleep architecture store,
+live in a temporary directory removed when the test finishes, and which never
+pick up a real Claude client from ANTHROPIC_API_KEY.
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, Optional, Union
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from oura_analysis import OuraAnalysis
+from response_cache import ResponseCache
+
+
+def temp_dir(test: Union[unittest.TestCase, type]) -> str:
+    """A temporary directory, removed when the test (or, given a TestCase class, the class) finishes."""
+    directory = tempfile.TemporaryDirectory()
+    if isinstance(test, type):
+        test.addClassCleanup(directory.cleanup)
+    else:
+        test.addCleanup(directory.cleanup)
+    return directory.name
+
+
+def make_scores(days: int = 2) -> Dict[str, pd.DataFrame]:
+    """A few days of sleep scores: the smallest data an analyzer can prompt on."""
+    day = pd.date_range('2025-06-01', periods=days).strftime('%Y-%m-%d')
+    return {'daily_sleep': pd.DataFrame({'day': day, 'score': np.resize([80, 75], days)})}
+
+
+def make_health_data(days=40, last_hrv=50.0, sleep_hours=8.0, period_start='2025-05-01'):
+    """Detailed sleep, readiness and a period tag, for the daily context and local recommendation rules."""
+    day = pd.date_range('2025-05-01', periods=days).strftime('%Y-%m-%d')
+    hrv = np.full(days, 50.0)
+    hrv[-1] = last_hrv
+    sleep = np.full(days, sleep_hours * 3600)
+    return {
+        'sleep_detailed': pd.DataFrame({'day': day, 'type': 'long_sleep', 'average_hrv': hrv,
+                                        'total_sleep_duration': sleep}),
+        'daily_readiness': pd.DataFrame({'day': day, 'score': 80.0}),
+        'tags': pd.DataFrame({'start_day': [period_start], 'tag_type_code': ['tag_generic_period']}),
+    }
+
+
+def make_daily_inputs(days=30, readiness=None, stress_high=None):
+    """Noisy readiness, sleep and stress days, optionally with a different last day."""
+    rng = np.random.default_rng(3)
+    day = pd.date_range('2025-05-01', periods=days).strftime('%Y-%m-%d')
+    readiness_scores = 75 + rng.normal(0, 2, days)
+    if readiness is not None:
+        readiness_scores[-1] = readiness
+    stress = np.full(days, 3600.0)
+    if stress_high is not None:
+        stress[-1] = stress_high
+    return {
+        'daily_readiness': pd.DataFrame({'day': day, 'score': readiness_scores,
+                                         'temperature_deviation': rng.normal(0, 0.1, days)}),
+        'daily_sleep': pd.DataFrame({'day': day, 'score': 80 + rng.normal(0, 2, days)}),
+        'daily_stress': pd.DataFrame({'day': day, 'stress_high': stress, 'recovery_high': 1800.0,
+                                      'day_summary': 'normal'}),
+        'tags': pd.DataFrame({'start_day': ['2025-05-20'], 'tag_type_code': ['tag_generic_period']}),
+    }
+
+
+def make_trending_data(days=35):
+    """Readiness and sleep with a clear HRV drop over the last week, plus columns the digest should skip."""
+    rng = np.random.default_rng(7)
+    day = pd.date_range('2025-05-01', periods=days).strftime('%Y-%m-%d')
+    hrv = 50 + rng.normal(0, 2, days)
+    hrv[-7:] -= 15
+    return {
+        'daily_readiness': pd.DataFrame({
+            'id': range(days),
+            'day': day,
+            'score': 75 + rng.normal(0, 3, days),
+            'average_hrv': hrv,
+            'constant_flag': 1,
+        }),
+        'daily_sleep': pd.DataFrame({
+            'day': day,
+            'score': 80 + rng.normal(0, 3, days),
+            'contributors_deep_sleep': 70 + rng.normal(0, 5, days),
+        }),
+        'workout': pd.DataFrame(),
+    }
+
+
+def make_readiness_days():
+    """Ten days of readiness scores and temperature deviations."""
+    return {
+        'daily_readiness': pd.DataFrame({
+            'day': pd.date_range('2025-06-01', periods=10).strftime('%Y-%m-%d'),
+            'score': [70, 72, 68, 80, 85, 77, 74, 79, 81, 83],
+            'temperature_deviation': [0.1, -0.2, 0.0, 0.3, 0.2, -0.1, 0.0, 0.1, 0.2, -0.3],
+        })
+    }
+
+
+def offline_analyzer(health_data: Dict[str, pd.DataFrame], user_metadata: Dict[str, Any],
+                     response_cache: Optional[ResponseCache], **kwargs: Any) -> OuraAnalysis:
+    """
+    Analyzed OuraAnalysis that only has the Claude clients it is given, even if ANTHROPIC_API_KEY is set.
+
+    Args:
+        health_data: Datasets
+        user_metadata: User information
+        response_cache: Response cache (its directory also holds the other per-user stores)
+        **kwargs: Other OuraAnalysis arguments
+    """
+    with mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''}):
+        analyzer = OuraAnalysis(health_data=health_data, user_metadata=user_metadata,
+                                response_cache=response_cache, **kwargs)
+    analyzer.analyze_all_datasets()
+    return analyzer
+
+
+def make_analyzer(test: unittest.TestCase, health_data: Optional[Dict[str, pd.DataFrame]] = None,
+                  user_metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> OuraAnalysis:
+    """
+    Analyzed OuraAnalysis with its response cache in a temporary directory.
+
+    Args:
+        test: TestCase owning the temporary directory
+        health_data: Datasets; make_scores() by default
+        user_metadata: User information; Emma by default
+        **kwargs: Other OuraAnalysis arguments, e.g. clients or a shared response_cache
+    """
+    kwargs.setdefault('response_cache', ResponseCache(temp_dir(test)))
+    return offline_analyzer(make_scores() if health_data is None else health_data,
+                            user_metadata or {'name': 'Emma'}, **kwargs)
+
+
+def load_user(test: Union[unittest.TestCase, type], data_dir: str, **kwargs: Any) -> OuraAnalysis:
+    """
+    OuraAnalysis loaded (not analyzed) from an export directory, with its response cache in a temporary directory.
+
+    Args:
+        test: TestCase (or TestCase class) owning the temporary directory
+        data_dir: Directory of export CSVs, e.g. from synthetic_oura.generate_user()
+        **kwargs: Other OuraAnalysis arguments
+    """
+    kwargs.setdefault('response_cache', ResponseCache(temp_dir(test)))
+    kwargs.setdefault('user_metadata', {'name': 'Emma'})
+    with mock.patch.dict(os.environ, {'ANTHROPIC_API_KEY': ''}):
+        analyzer = OuraAnalysis(**kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_from_cache(data_dir)
+    return analyzer
@@ -0,0 +1,374 @@
+"""
+Rate-limit-aware scheduling for Claude requests.
+
+GenerationScheduler admits requests against requests-per-minute and input/output
+tokens-per-minute budgets (token buckets refilled continuously, like the API's
+own limiter), serves the queue by priority so interactive requests overtake
+batch work, and retries throttled or overloaded requests (429/529) with jittered
+exponential backoff instead of dropping them. A throttling response also pauses
+admission for everyone, since the whole quota is exhausted, not one request.
+
+The scheduler is thread-safe and can be shared by sync callers (which block) and
+asyncio callers (which await) in the same process.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from stats_digest import estimate_tokens
+
+
+INTERACTIVE = 0
+BATCH = 1
+
+# 429: rate limited, 529: overloaded; 500/502/503 are transient server errors
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 529})
+THROTTLE_STATUS_CODES = frozenset({429, 529})
+
+
+class TokenBucket:
+    """
+    Continuously refilled budget of units per minute.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute: Units replenished per minute
+            burst_seconds: Seconds of budget that may be spent at once
+            clock: Monotonic clock
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill()
+        # A request larger than the bucket is admitted once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status code of an API error, if it has one."""
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def _retry_after(error: BaseException) -> float:
+    """Seconds requested by a retry-after header, or 0."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def estimate_request_tokens(params: Dict[str, Any]) -> int:
+    """
+    Estimate the input tokens of a messages.create request.
+
+    Args:
+        params: Request parameters (system, messages, ...)
+
+    Returns:
+        Estimated input token count
+    """
+    parts = []
+    system = params.get("system")
+    if isinstance(system, str):
+        parts.append(system)
+    elif system:
+        parts.extend(block.get("text", "") for block in system)
+    for message in params.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get("text", "") for block in content)
+    return sum(estimate_tokens(part) for part in parts)
+
+
+class GenerationScheduler:
+    """
+    Priority queue admitting Claude requests within rate limits, with retries.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = 50,
+                 input_tokens_per_minute: Optional[float] = 40_000,
+                 output_tokens_per_minute: Optional[float] = 8_000,
+                 burst_seconds: float = 10.0, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request budget, or None for no limit
+            input_tokens_per_minute: Input token budget, or None for no limit
+            output_tokens_per_minute: Output token budget, or None for no limit.
+                Each request reserves its max_tokens and the unused part is
+                returned once the response's usage is known (see settle())
+            burst_seconds: Seconds of budget that may be spent at once (the API
+                enforces limits over short intervals, not only per minute)
+            max_retries: Retries for a throttled or failed request before giving up
+            base_delay: First backoff ceiling in seconds; doubles on each retry
+            max_delay: Maximum backoff in seconds
+            sleep: Function used to wait between retries of sync requests
+            rng: Random generator for backoff jitter
+        """
+        limits = {"requests": requests_per_minute, "input_tokens": input_tokens_per_minute,
+                  "output_tokens": output_tokens_per_minute}
+        self.buckets = {name: TokenBucket(limit, burst_seconds)
+                        for name, limit in limits.items() if limit is not None}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+
+        self._cond = threading.Condition()
+        self._queue: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "throttled": 0,
+            "max_queue_depth": 0,
+            "wait_by_priority": {},
+        }
+
+    def _enqueue(self, priority: int) -> List[Any]:
+        entry = [priority, next(self._sequence), time.monotonic(), False]
+        heapq.heappush(self._queue, entry)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+        self._cond.notify_all()
+        return entry
+
+    def _try_admit(self, entry: List[Any], cost: Dict[str, float]) -> Optional[float]:
+        """
+        Admit the entry if it is at the head of the queue and the budgets allow.
+
+        Must be called with the lock held. Returns 0 when admitted, otherwise
+        the seconds to wait, or None to wait until the queue changes.
+        """
+        while self._queue and self._queue[0][3]:
+            heapq.heappop(self._queue)  # cancelled waiters
+        if not self._queue or self._queue[0] is not entry:
+            return None
+
+        wait = max([self._paused_until - time.monotonic()]
+                   + [bucket.wait_time(cost.get(name, 0)) for name, bucket in self.buckets.items()])
+        if wait > 0:
+            return wait
+
+        for name, bucket in self.buckets.items():
+            bucket.consume(cost.get(name, 0))
+        heapq.heappop(self._queue)
+        waited = time.monotonic() - entry[2]
+        waits = self.stats["wait_by_priority"].setdefault(entry[0], {"count": 0, "total": 0.0, "max": 0.0})
+        waits["count"] += 1
+        waits["total"] += waited
+        waits["max"] = max(waits["max"], waited)
+        self._cond.notify_all()
+        return 0.0
+
+    def _cancel(self, entry: List[Any]) -> None:
+        with self._cond:
+            entry[3] = True
+            self._cond.notify_all()
+
+    def admit(self, priority: int = INTERACTIVE, input_tokens: int = 0, max_tokens: int = 0) -> None:
+        """
+        Block until a request may be sent.
+
+        Args:
+            priority: INTERACTIVE or BATCH (lower values are served first)
+            input_tokens: Estimated input tokens of the request
+            max_tokens: Maximum output tokens of the request
+        """
+        cost = {"requests": 1, "input_tokens": input_tokens, "output_tokens": max_tokens}
+        with self._cond:
+            entry = self._enqueue(priority)
+            try:
+                while True:
+                    wait = self._try_admit(entry, cost)
+                    if wait == 0:
+                        return
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                entry[3] = True
+                self._cond.notify_all()
+                raise
+
+    async def aadmit(self, priority: int = INTERACTIVE, input_tokens: int = 0, max_tokens: int = 0) -> None:
+        """Async version of admit()."""
+        cost = {"requests": 1, "input_tokens": input_tokens, "output_tokens": max_tokens}
+        with self._cond:
+            entry = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(entry, cost)
+                if wait == 0:
+                    return
+                # Poll, so a higher-priority arrival or a refill is noticed promptly
+                await asyncio.sleep(min(wait, 0.05) if wait is not None else 0.01)
+        except BaseException:
+            self._cancel(entry)
+            raise
+
+    def settle(self, input_tokens: int, max_tokens: int, usage: Any) -> None:
+        """
+        Correct a request's token reservation once its usage is known.
+
+        The unused part of the max_tokens reservation is returned, and so is any
+        over-estimate of input tokens (prompt cache reads do not count against
+        the input token limit).
+
+        Args:
+            input_tokens: Estimated input tokens reserved at admission
+            max_tokens: Output tokens reserved at admission
+            usage: Usage reported by the response
+        """
+        if usage is None:
+            return
+        actual = {
+            "input_tokens": ((getattr(usage, "input_tokens", None) or 0)
+                             + (getattr(usage, "cache_creation_input_tokens", None) or 0)),
+            "output_tokens": getattr(usage, "output_tokens", None) or 0,
+        }
+        with self._cond:
+            for name, reserved in (("input_tokens", input_tokens), ("output_tokens", max_tokens)):
+                if name in self.buckets:
+                    self.buckets[name].refund(max(0, reserved - actual[name]))
+            self._cond.notify_all()
+
+    def _release_tokens(self, input_tokens: int, max_tokens: int) -> None:
+        """Return the token reservation of a request that was not processed."""
+        with self._cond:
+            for name, amount in (("input_tokens", input_tokens), ("output_tokens", max_tokens)):
+                if name in self.buckets:
+                    self.buckets[name].refund(amount)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Delay before retrying after an error, or None if it should not be retried."""
+        code = status_code(error)
+        if code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+            return None
+        # Full jitter: spreads retries from many callers over the whole window
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        delay = max(delay, _retry_after(error))
+        with self._cond:
+            self.stats["retries"] += 1
+            if code in THROTTLE_STATUS_CODES:
+                self.stats["throttled"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def _finish(self, outcome: str) -> None:
+        with self._cond:
+            self.stats[outcome] += 1
+
+    def call(self, fn: Callable[[], Any], priority: int = INTERACTIVE,
+             input_tokens: int = 0, max_tokens: int = 0) -> Any:
+        """
+        Run a request within the rate limits, retrying throttled attempts.
+
+        Args:
+            fn: Function sending the request; called again for each retry
+            priority: INTERACTIVE or BATCH
+            input_tokens: Estimated input tokens of the request
+            max_tokens: Maximum output tokens of the request
+
+        Returns:
+            Result of fn. If it has a `usage` attribute, the unused output
+            reservation is returned to the budget.
+        """
+        with self._cond:
+            self.stats["submitted"] += 1
+        for attempt in itertools.count():
+            self.admit(priority, input_tokens, max_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self._release_tokens(input_tokens, max_tokens)
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self._finish("failed")
+                    raise
+                self.sleep(delay)
+                continue
+            self.settle(input_tokens, max_tokens, getattr(result, "usage", None))
+            self._finish("completed")
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], priority: int = INTERACTIVE,
+                    input_tokens: int = 0, max_tokens: int = 0) -> Any:
+        """Async version of call(); fn returns an awaitable."""
+        with self._cond:
+            self.stats["submitted"] += 1
+        for attempt in itertools.count():
+            await self.aadmit(priority, input_tokens, max_tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                self._release_tokens(input_tokens, max_tokens)
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self._finish("failed")
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.settle(input_tokens, max_tokens, getattr(result, "usage", None))
+            self._finish("completed")
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler statistics.
+
+        Returns:
+            Counters plus current queue depth and mean/max admission wait per priority
+        """
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queue_depth"] = sum(1 for entry in self._queue if not entry[3])
+            stats["wait_by_priority"] = {
+                priority: {"count": w["count"], "mean": w["total"] / w["count"], "max": w["max"]}
+                for priority, w in self.stats["wait_by_priority"].items()
+            }
+        return stats
@@ -0,0 +1,544 @@
+"""
+Normalized multi-source ingest: Oura CSV exports and WHOOP API payloads.
+
+Each source adapter maps a vendor's raw data into the same four typed tables, in
+vectorized transforms (no per-record Python loops):
+
+    sleep      one row per sleep period: local start/end, stage durations, HRV...
+    recovery   one row per day: readiness (Oura) / recovery (WHOOP) score, RHR, HRV...
+    activity   one row per day: activity score, strain, steps, calories, heart rate
+    heartrate  one row per sample: UTC timestamp and bpm (Oura only; WHOOP's API
+               has no heart rate series)
+
+Every table has a `source` column ('oura' or 'whoop'), so users with more than
+one device get a single set of tables. NormalizedStore persists them per user,
+keyed by a fingerprint of the raw inputs, so analysis never re-parses payloads
+that have not changed. analysis_datasets() presents the tables under the Oura
+dataset names the analysis modules read, and load_normalized_analyzer() plugs
+this into AnalyzerRegistry.
+"""
+
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas uses it for Parquet)
+    HAS_PARQUET = True
+except ImportError:  # Parquet is optional: fall back to pickled DataFrames
+    HAS_PARQUET = False
+
+
+SOURCES = pd.CategoricalDtype(["oura", "whoop"])
+
+# table -> column -> dtype
+SCHEMA: Dict[str, Dict[str, Any]] = {
+    "sleep": {
+        "day": "datetime64[ns]", "source": SOURCES, "start": "datetime64[ns]", "end": "datetime64[ns]",
+        "nap": "bool", "total_sleep_seconds": "float64", "deep_sleep_seconds": "float64",
+        "rem_sleep_seconds": "float64", "light_sleep_seconds": "float64", "awake_seconds": "float64",
+        "efficiency": "float64", "average_hrv": "float64", "lowest_heart_rate": "float64",
+        "respiratory_rate": "float64", "score": "float64",
+    },
+    "recovery": {
+        "day": "datetime64[ns]", "source": SOURCES, "score": "float64", "resting_heart_rate": "float64",
+        "hrv": "float64", "spo2_percentage": "float64", "temperature_deviation": "float64",
+    },
+    "activity": {
+        "day": "datetime64[ns]", "source": SOURCES, "score": "float64", "strain": "float64",
+        "steps": "float64", "total_calories": "float64", "average_heart_rate": "float64",
+        "max_heart_rate": "float64",
+    },
+    "heartrate": {
+        "timestamp": "datetime64[ns]", "source": SOURCES, "bpm": "float64",
+    },
+}
+TABLES = tuple(SCHEMA)
+
+# Oura export file prefix -> dataset name (the suffix is the export's date range)
+OURA_FILES = {
+    "dailysleep": "daily_sleep",
+    "dailyreadiness": "daily_readiness",
+    "dailyactivity": "daily_activity",
+    "dailyspo2": "daily_spo2",
+    "sleep": "sleep_detailed",
+    "heartrate": "heart_rate",
+}
+WHOOP_FILE = "whoop.json"
+
+# Digit-string series (hypnograms, activity classes) that must not be parsed as numbers
+DIGIT_STRING_COLUMNS = ("class_5_min", "sleep_phase_5_min", "movement_30_sec")
+
+# Normalized sleep column -> the Oura `sleep_detailed` column the analysis modules read
+SLEEP_DETAILED_COLUMNS = {
+    "start": "bedtime_start", "end": "bedtime_end", "total_sleep_seconds": "total_sleep_duration",
+    "deep_sleep_seconds": "deep_sleep_duration", "rem_sleep_seconds": "rem_sleep_duration",
+    "light_sleep_seconds": "light_sleep_duration", "awake_seconds": "awake_time",
+    "respiratory_rate": "average_breath",
+}
+
+KILOJOULES_PER_KCAL = 4.184
+DEFAULT_STORE_DIR = Path(__file__).parent / "cache" / "normalized"
+
+
+def conform(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """
+    Give a frame exactly the columns and dtypes of a schema table.
+
+    Args:
+        df: Frame with some or all of the table's columns
+        table: Table name in SCHEMA
+
+    Returns:
+        Frame with the schema's columns, in order; missing columns are empty
+    """
+    schema = SCHEMA[table]
+    out = df.reindex(columns=list(schema))
+    for column, dtype in schema.items():
+        if dtype == "float64":
+            out[column] = pd.to_numeric(out[column], errors="coerce").astype("float64")
+        elif dtype == "bool":
+            out[column] = out[column].fillna(False).astype(bool)
+        else:
+            out[column] = out[column].astype(dtype)
+    return out.reset_index(drop=True)
+
+
+def empty_tables() -> Dict[str, pd.DataFrame]:
+    """One empty frame per schema table."""
+    return {table: conform(pd.DataFrame(), table) for table in TABLES}
+
+
+def _column(df: pd.DataFrame, column: str) -> pd.Series:
+    """A column as numbers, or NaN when it is missing."""
+    if column not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype="float64")
+    return pd.to_numeric(df[column], errors="coerce")
+
+
+def local_time(values: pd.Series) -> pd.Series:
+    """Local wall-clock time of ISO timestamps with UTC offsets (the offset is dropped)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Already parsed, e.g. by memory_optimizer
+        return values.dt.tz_localize(None) if values.dt.tz is not None else values
+    return pd.to_datetime(values.astype(str).str[:19], format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+
+
+def _day(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values, errors="coerce").dt.normalize()
+
+
+# --- Oura -------------------------------------------------------------------
+
+def read_oura_export(data_dir: Union[str, Path]) -> Dict[str, pd.DataFrame]:
+    """
+    Read the Oura CSVs the normalized tables need from an export directory.
+
+    Args:
+        data_dir: Directory of Oura export CSVs (<prefix>_<from>_<to>.csv)
+
+    Returns:
+        Dictionary of DataFrames keyed by the analyzer's dataset names
+    """
+    health_data = {}
+    for path in sorted(Path(data_dir).glob("*.csv")):
+        name = OURA_FILES.get(path.stem.split("_")[0])
+        if name is not None:
+            health_data[name] = pd.read_csv(path, dtype={c: str for c in DIGIT_STRING_COLUMNS})
+    return health_data
+
+
+def normalize_oura(health_data: Mapping[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Map Oura datasets to the normalized tables.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name (as loaded by OuraAnalysis)
+
+    Returns:
+        Dictionary of normalized tables
+    """
+    tables = empty_tables()
+
+    detailed = health_data.get("sleep_detailed")
+    daily_sleep = health_data.get("daily_sleep")
+    if detailed is not None and not detailed.empty:
+        long_sleep = detailed["type"].eq("long_sleep") if "type" in detailed else pd.Series(True, detailed.index)
+        sleep = pd.DataFrame({
+            "day": _day(detailed["day"]),
+            "source": "oura",
+            "start": local_time(detailed["bedtime_start"]) if "bedtime_start" in detailed else pd.NaT,
+            "end": local_time(detailed["bedtime_end"]) if "bedtime_end" in detailed else pd.NaT,
+            "nap": ~long_sleep,
+            "total_sleep_seconds": _column(detailed, "total_sleep_duration"),
+            "deep_sleep_seconds": _column(detailed, "deep_sleep_duration"),
+            "rem_sleep_seconds": _column(detailed, "rem_sleep_duration"),
+            "light_sleep_seconds": _column(detailed, "light_sleep_duration"),
+            "awake_seconds": _column(detailed, "awake_time"),
+            "efficiency": _column(detailed, "efficiency"),
+            "average_hrv": _column(detailed, "average_hrv"),
+            "lowest_heart_rate": _column(detailed, "lowest_heart_rate"),
+            "respiratory_rate": _column(detailed, "average_breath"),
+        })
+        if daily_sleep is not None and not daily_sleep.empty:
+            # The daily sleep score belongs to the night's main sleep
+            scores = _column(daily_sleep, "score").groupby(_day(daily_sleep["day"])).mean()
+            sleep["score"] = sleep["day"].map(scores).where(~sleep["nap"])
+        tables["sleep"] = conform(sleep.sort_values(["day", "start"]), "sleep")
+
+    readiness = health_data.get("daily_readiness")
+    if readiness is not None and not readiness.empty:
+        recovery = pd.DataFrame({
+            "day": _day(readiness["day"]),
+            "source": "oura",
+            "score": _column(readiness, "score"),
+            "temperature_deviation": _column(readiness, "temperature_deviation"),
+        })
+        main_sleep = tables["sleep"][~tables["sleep"]["nap"]].groupby("day")
+        recovery["resting_heart_rate"] = recovery["day"].map(main_sleep["lowest_heart_rate"].min())
+        recovery["hrv"] = recovery["day"].map(main_sleep["average_hrv"].mean())
+        spo2 = health_data.get("daily_spo2")
+        if spo2 is not None and not spo2.empty and "spo2_percentage" in spo2:
+            # Exported as "{'average': 97.1}" or as a plain number
+            values = pd.to_numeric(spo2["spo2_percentage"].astype(str).str.extract(r"([\d.]+)")[0],
+                                   errors="coerce")
+            recovery["spo2_percentage"] = recovery["day"].map(values.groupby(_day(spo2["day"])).mean())
+        tables["recovery"] = conform(recovery.sort_values("day"), "recovery")
+
+    daily_activity = health_data.get("daily_activity")
+    if daily_activity is not None and not daily_activity.empty:
+        activity = pd.DataFrame({
+            "day": _day(daily_activity["day"]),
+            "source": "oura",
+            "score": _column(daily_activity, "score"),
+            "steps": _column(daily_activity, "steps"),
+            "total_calories": _column(daily_activity, "total_calories"),
+        })
+        tables["activity"] = conform(activity.sort_values("day"), "activity")
+
+    heart_rate = health_data.get("heart_rate")
+    if heart_rate is not None and not heart_rate.empty:
+        heartrate = pd.DataFrame({
+            "timestamp": pd.to_datetime(heart_rate["timestamp"], utc=True, errors="coerce").dt.tz_convert(None),
+            "source": "oura",
+            "bpm": _column(heart_rate, "bpm"),
+        })
+        tables["heartrate"] = conform(heartrate.sort_values("timestamp"), "heartrate")
+
+    return tables
+
+
+# --- WHOOP ------------------------------------------------------------------
+
+def _whoop_records(payload: Mapping[str, Any], collection: str) -> pd.DataFrame:
+    """Flatten one WHOOP collection (a list of records or a page with 'records')."""
+    records = payload.get(collection) or []
+    if isinstance(records, Mapping):
+        records = records.get("records") or []
+    return pd.json_normalize(list(records))
+
+
+def _whoop_local(df: pd.DataFrame, column: str) -> pd.Series:
+    """Local time of a WHOOP UTC timestamp, using the record's timezone_offset ('-05:00')."""
+    utc = pd.to_datetime(df[column], utc=True, errors="coerce").dt.tz_convert(None)
+    if "timezone_offset" not in df:
+        return utc
+    parts = df["timezone_offset"].astype(str).str.extract(r"^([+-])(\d{2}):?(\d{2})$")
+    minutes = parts[1].astype(float) * 60 + parts[2].astype(float)
+    offset = pd.to_timedelta(minutes.where(parts[0] == "+", -minutes).fillna(0), unit="min")
+    return utc + offset
+
+
+def normalize_whoop(payload: Mapping[str, Any]) -> Dict[str, pd.DataFrame]:
+    """
+    Map WHOOP API payloads to the normalized tables.
+
+    Args:
+        payload: Dictionary with the 'sleep', 'recovery', 'cycle' and 'workout'
+            collections of the WHOOP developer API (v1), each a list of records
+            or a response page with 'records'
+
+    Returns:
+        Dictionary of normalized tables
+    """
+    tables = empty_tables()
+
+    raw_sleep = _whoop_records(payload, "sleep")
+    sleep_days = pd.Series(dtype="datetime64[ns]")
+    if not raw_sleep.empty:
+        scored = raw_sleep.reindex(columns=["score.stage_summary.total_light_sleep_time_milli",
+                                            "score.stage_summary.total_slow_wave_sleep_time_milli",
+                                            "score.stage_summary.total_rem_sleep_time_milli",
+                                            "score.stage_summary.total_awake_time_milli"]).apply(
+            pd.to_numeric, errors="coerce") / 1000
+        light, deep, rem, awake = (scored.iloc[:, i] for i in range(4))
+        end = _whoop_local(raw_sleep, "end")
+        sleep = pd.DataFrame({
+            # Like Oura, a sleep belongs to the day it ends on
+            "day": end.dt.normalize(),
+            "source": "whoop",
+            "start": _whoop_local(raw_sleep, "start"),
+            "end": end,
+            "nap": raw_sleep["nap"].fillna(False).astype(bool) if "nap" in raw_sleep else False,
+            "total_sleep_seconds": light + deep + rem,
+            "deep_sleep_seconds": deep,
+            "rem_sleep_seconds": rem,
+            "light_sleep_seconds": light,
+            "awake_seconds": awake,
+            "efficiency": _column(raw_sleep, "score.sleep_efficiency_percentage"),
+            "respiratory_rate": _column(raw_sleep, "score.respiratory_rate"),
+            "score": _column(raw_sleep, "score.sleep_performance_percentage"),
+        })
+        tables["sleep"] = conform(sleep.sort_values(["day", "start"]), "sleep")
+        sleep_days = pd.Series(sleep["day"].to_numpy(), index=raw_sleep["id"]) if "id" in raw_sleep else sleep_days
+
+    raw_recovery = _whoop_records(payload, "recovery")
+    if not raw_recovery.empty:
+        # A recovery is scored from the sleep before it; fall back to when it was created
+        day = raw_recovery["sleep_id"].map(sleep_days) if "sleep_id" in raw_recovery else None
+        created = _day(raw_recovery["created_at"]) if "created_at" in raw_recovery else pd.NaT
+        skin_temp = _column(raw_recovery, "score.skin_temp_celsius")
+        recovery = pd.DataFrame({
+            "day": day.fillna(created) if day is not None else created,
+            "source": "whoop",
+            "score": _column(raw_recovery, "score.recovery_score"),
+            "resting_heart_rate": _column(raw_recovery, "score.resting_heart_rate"),
+            "hrv": _column(raw_recovery, "score.hrv_rmssd_milli"),
+            "spo2_percentage": _column(raw_recovery, "score.spo2_percentage"),
+            # Oura reports a deviation from the personal baseline; WHOOP an absolute skin temperature
+            "temperature_deviation": skin_temp - skin_temp.median(),
+        })
+        tables["recovery"] = conform(recovery.sort_values("day"), "recovery")
+
+    raw_cycle = _whoop_records(payload, "cycle")
+    if not raw_cycle.empty:
+        activity = pd.DataFrame({
+            "day": _whoop_local(raw_cycle, "start").dt.normalize(),
+            "source": "whoop",
+            "strain": _column(raw_cycle, "score.strain"),
+            "total_calories": _column(raw_cycle, "score.kilojoule") / KILOJOULES_PER_KCAL,
+            "average_heart_rate": _column(raw_cycle, "score.average_heart_rate"),
+            "max_heart_rate": _column(raw_cycle, "score.max_heart_rate"),
+        })
+        tables["activity"] = conform(activity.sort_values("day"), "activity")
+
+    return tables
+
+
+# --- Combining and persistence ------------------------------------------------
+
+def combine(*sources: Mapping[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Concatenate normalized tables from several sources.
+
+    Args:
+        *sources: Normalized tables, one dictionary per source
+
+    Returns:
+        Dictionary of normalized tables with rows of every source
+    """
+    tables = {}
+    for table in TABLES:
+        frames = [s[table] for s in sources if table in s and not s[table].empty]
+        order = ["timestamp", "source"] if table == "heartrate" else ["day", "source"]
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        tables[table] = conform(combined.sort_values(order, kind="stable") if frames else combined, table)
+    return tables
+
+
+def analysis_datasets(tables: Mapping[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Present normalized tables under the Oura dataset names and columns that the
+    analysis modules (day context, local recommendations, cohort metrics, sleep
+    architecture) read.
+
+    Args:
+        tables: Dictionary of normalized tables
+
+    Returns:
+        Dictionary of DataFrames keyed by dataset name ('daily_readiness',
+        'daily_sleep', 'daily_activity', 'sleep_detailed', 'heart_rate'); empty
+        tables are left out. Every dataset keeps the `source` column.
+    """
+    datasets = {}
+    recovery = tables.get("recovery")
+    if recovery is not None and not recovery.empty:
+        datasets["daily_readiness"] = recovery.copy()
+
+    sleep = tables.get("sleep")
+    if sleep is not None and not sleep.empty:
+        main = sleep[~sleep["nap"]]
+        if main["score"].notna().any():
+            datasets["daily_sleep"] = main.loc[main["score"].notna(), ["day", "source", "score", "efficiency"]]
+        detailed = sleep.drop(columns=["nap", "score"]).rename(columns=SLEEP_DETAILED_COLUMNS)
+        detailed.insert(2, "type", np.where(sleep["nap"], "sleep", "long_sleep"))
+        if recovery is not None and not recovery.empty:
+            # WHOOP scores HRV on the recovery, not the sleep; it belongs to that day's main sleep
+            hrv = recovery.groupby(["day", "source"], observed=True)["hrv"].mean()
+            keys = pd.MultiIndex.from_frame(detailed[["day", "source"]].astype({"source": str}))
+            from_recovery = pd.Series(hrv.reindex(keys).to_numpy(), index=detailed.index)
+            detailed["average_hrv"] = detailed["average_hrv"].fillna(from_recovery.where(~sleep["nap"]))
+        datasets["sleep_detailed"] = detailed
+
+    activity = tables.get("activity")
+    if activity is not None and not activity.empty:
+        datasets["daily_activity"] = activity.copy()
+    heartrate = tables.get("heartrate")
+    if heartrate is not None and not heartrate.empty:
+        datasets["heart_rate"] = heartrate.copy()
+    return {name: df.reset_index(drop=True) for name, df in datasets.items()}
+
+
+def source_fingerprint(oura_dir: Optional[Union[str, Path]] = None,
+                       whoop_payload: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    Fingerprint of the raw inputs: Oura file names, sizes and modification times,
+    and the content of the WHOOP payload.
+    """
+    digest = hashlib.sha256()
+    if oura_dir is not None and Path(oura_dir).is_dir():
+        for path in sorted(Path(oura_dir).glob("*.csv")):
+            stat = path.stat()
+            digest.update(f"oura:{path.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    if whoop_payload:
+        digest.update(b"whoop:")
+        digest.update(json.dumps(whoop_payload, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class NormalizedStore:
+    """
+    Per-user normalized tables on disk (Parquet, or pickle without pyarrow).
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_DIR):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding one subdirectory per user
+        """
+        self.root = Path(root)
+        self.extension = "parquet" if HAS_PARQUET else "pkl"
+
+    def load(self, user_id: str, fingerprint: str) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        Normalized tables of a user, if stored for the same raw inputs.
+
+        Args:
+            user_id: User id
+            fingerprint: Fingerprint of the raw inputs (see source_fingerprint)
+
+        Returns:
+            Dictionary of normalized tables, or None if missing or stale
+        """
+        user_dir = self.root / user_id
+        try:
+            manifest = json.loads((user_dir / "manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if manifest.get("fingerprint") != fingerprint or manifest.get("format") != self.extension:
+            return None
+        try:
+            read = pd.read_parquet if HAS_PARQUET else pd.read_pickle
+            return {table: conform(read(user_dir / f"{table}.{self.extension}"), table) for table in TABLES}
+        except Exception as e:
+            print(f"Warning: Failed to read normalized tables for {user_id}: {e}")
+            return None
+
+    def save(self, user_id: str, fingerprint: str, tables: Mapping[str, pd.DataFrame]) -> None:
+        """
+        Store a user's normalized tables.
+
+        Args:
+            user_id: User id
+            fingerprint: Fingerprint of the raw inputs they were built from
+            tables: Dictionary of normalized tables
+        """
+        user_dir = self.root / user_id
+        try:
+            user_dir.mkdir(parents=True, exist_ok=True)
+            for table in TABLES:
+                fd, tmp = tempfile.mkstemp(dir=user_dir, suffix=".tmp")
+                with open(fd, "wb") as f:
+                    if HAS_PARQUET:
+                        tables[table].to_parquet(f, index=False)
+                    else:
+                        tables[table].to_pickle(f)
+                Path(tmp).replace(user_dir / f"{table}.{self.extension}")
+            # Written last, so a crash mid-save leaves the previous fingerprint stale
+            manifest = {"fingerprint": fingerprint, "format": self.extension,
+                        "rows": {table: len(tables[table]) for table in TABLES}}
+            (user_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        except Exception as e:
+            print(f"Warning: Failed to write normalized tables for {user_id}: {e}")
+
+
+def ingest_user(user_id: str, oura_dir: Optional[Union[str, Path]] = None,
+                whoop_payload: Optional[Mapping[str, Any]] = None,
+                store: Optional[NormalizedStore] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Normalized tables for one user across all their devices.
+
+    Stored tables are reused while the raw inputs are unchanged; otherwise each
+    source is normalized, combined and stored.
+
+    Args:
+        user_id: User id
+        oura_dir: Directory of the user's Oura export CSVs, if any
+        whoop_payload: The user's WHOOP API collections, if any (see normalize_whoop)
+        store: Store for normalized tables (None disables persistence)
+
+    Returns:
+        Dictionary of normalized tables
+    """
+    fingerprint = source_fingerprint(oura_dir, whoop_payload)
+    if store is not None:
+        tables = store.load(user_id, fingerprint)
+        if tables is not None:
+            return tables
+
+    sources: List[Dict[str, pd.DataFrame]] = []
+    if oura_dir is not None and Path(oura_dir).is_dir():
+        sources.append(normalize_oura(read_oura_export(oura_dir)))
+    if whoop_payload:
+        sources.append(normalize_whoop(whoop_payload))
+    tables = combine(*sources)
+    print(f"✓ Normalized {user_id}: " + ", ".join(f"{t} {len(df)} rows" for t, df in tables.items()))
+
+    if store is not None:
+        store.save(user_id, fingerprint, tables)
+    return tables
+
+
+def load_normalized_analyzer(metadata: Dict[str, Any], data_dir: str,
+                             store: Optional[NormalizedStore] = None, **analyzer_options: Any):
+    """
+    AnalyzerRegistry loader analyzing a user's normalized tables.
+
+    Reads the Oura CSVs and an optional whoop.json (the collections returned by
+    the WHOOP API) from the user's data directory.
+
+    Args:
+        metadata: User metadata (with 'user_id', as provided by the registry)
+        data_dir: User's data directory
+        store: Store for normalized tables; the default store by default
+        **analyzer_options: Other OuraAnalysis arguments, e.g. a response_cache
+
+    Returns:
+        Analyzed OuraAnalysis over the normalized tables (see analysis_datasets)
+    """
+    from oura_analysis import OuraAnalysis
+
+    whoop_path = Path(data_dir) / WHOOP_FILE
+    whoop_payload = json.loads(whoop_path.read_text(encoding="utf-8")) if whoop_path.exists() else None
+    tables = ingest_user(metadata.get("user_id", Path(data_dir).name), data_dir, whoop_payload,
+                         store if store is not None else NormalizedStore())
+    analyzer = OuraAnalysis(health_data=analysis_datasets(tables), user_metadata=metadata, **analyzer_options)
+    analyzer.analyze_all_datasets()
+    return analyzer
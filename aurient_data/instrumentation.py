@@ -0,0 +1,330 @@
+"""
+Structured timing and memory instrumentation for the analysis pipeline.
+
+OuraAnalysis wraps each stage in a span: loading each file, analyzing and
+plotting each dataset, building prompts and each LLM call. A span records wall
+time, CPU time (of the calling thread), rows processed, cache hit/miss and,
+when memory tracing is on, the peak memory it allocated above its starting
+point. Spans are aggregated per stage and the most recent ones are kept, so the
+data can be exported as:
+
+- a metrics dictionary (metrics());
+- Prometheus text exposition format (prometheus());
+- OpenTelemetry spans: mirrored live to a tracer passed as `tracer`, or as
+  OTLP-shaped dictionaries (otel_spans()) when no SDK is installed.
+
+A disabled Instrumentation hands out a shared no-op span, so instrumented code
+costs about a function call per stage when it is off. Analyzers use the process
+default from default_instrumentation() unless given their own; it is disabled
+unless AURIENT_INSTRUMENTATION=1 is set or enable() is called.
+
+    with instrumentation.span("load", dataset="heart_rate") as span:
+        df = pd.read_csv(path)
+        span.set(rows=len(df))
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+DEFAULT_MAX_SPANS = 10_000
+PROMETHEUS_PREFIX = "aurient"
+
+
+class _NullSpan:
+    """Span handed out while instrumentation is disabled; does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def set(self, **fields: Any) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """
+    One timed stage. Use as a context manager and report results with set().
+    """
+
+    __slots__ = ("instrumentation", "name", "attributes", "rows", "cache", "error", "start_time",
+                 "wall_seconds", "cpu_seconds", "memory_delta_bytes", "_start", "_cpu_start", "_memory_start",
+                 "_memory_peak", "_otel", "_otel_span")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str, attributes: Dict[str, Any]):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.attributes = attributes
+        self.rows: Optional[int] = None
+        self.cache: Optional[str] = None
+        self.error: Optional[str] = None
+        self.memory_delta_bytes: Optional[int] = None
+        self._otel = None
+
+    def set(self, rows: Optional[int] = None, cache: Optional[str] = None, **attributes: Any) -> None:
+        """
+        Record results of the stage.
+
+        Args:
+            rows: Rows processed
+            cache: 'hit' or 'miss'
+            **attributes: Extra attributes (e.g. max_tokens)
+        """
+        if rows is not None:
+            self.rows = int(rows)
+        if cache is not None:
+            self.cache = cache
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        instrumentation = self.instrumentation
+        if instrumentation.tracer is not None:
+            self._otel = instrumentation.tracer.start_as_current_span(self.name, attributes=dict(self.attributes))
+            self._otel_span = self._otel.__enter__()
+        if instrumentation.trace_memory and tracemalloc.is_tracing():
+            # Fold the running peak into the enclosing spans before resetting it for this one
+            current, peak = tracemalloc.get_traced_memory()
+            for span in instrumentation._stack():
+                span._memory_peak = max(span._memory_peak, peak)
+            tracemalloc.reset_peak()
+            self._memory_start = self._memory_peak = current
+            instrumentation._stack().append(self)
+        self.start_time = time.time()
+        self._cpu_start = time.thread_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        self.wall_seconds = time.perf_counter() - self._start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        instrumentation = self.instrumentation
+        stack = instrumentation._stack()
+        if self in stack:
+            # Interleaved (async) spans may not exit in stack order
+            stack.remove(self)
+            self._memory_peak = max(self._memory_peak, tracemalloc.get_traced_memory()[1])
+            self.memory_delta_bytes = self._memory_peak - self._memory_start
+            if stack:
+                stack[-1]._memory_peak = max(stack[-1]._memory_peak, self._memory_peak)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        if self._otel is not None:
+            for key, value in self._otel_attributes().items():
+                self._otel_span.set_attribute(key, value)
+            self._otel.__exit__(exc_type, exc, tb)
+        instrumentation._record(self)
+        return False
+
+    def _otel_attributes(self) -> Dict[str, Any]:
+        attributes = {f"aurient.{k}": v for k, v in self.attributes.items() if v is not None}
+        attributes["aurient.wall_seconds"] = self.wall_seconds
+        attributes["aurient.cpu_seconds"] = self.cpu_seconds
+        for key in ("rows", "cache", "error", "memory_delta_bytes"):
+            value = getattr(self, key)
+            if value is not None:
+                attributes[f"aurient.{key}"] = value
+        return attributes
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The span as a plain dictionary."""
+        return {
+            "name": self.name,
+            "attributes": dict(self.attributes),
+            "start_time": self.start_time,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "memory_delta_bytes": self.memory_delta_bytes,
+            "rows": self.rows,
+            "cache": self.cache,
+            "error": self.error,
+        }
+
+
+def _new_stage() -> Dict[str, Any]:
+    return {"count": 0, "errors": 0, "wall_seconds": 0.0, "max_wall_seconds": 0.0, "cpu_seconds": 0.0,
+            "rows": 0, "cache_hits": 0, "cache_misses": 0, "max_memory_delta_bytes": None}
+
+
+class Instrumentation:
+    """
+    Collects spans from instrumented code, aggregated per stage.
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False, tracer: Optional[Any] = None,
+                 max_spans: int = DEFAULT_MAX_SPANS):
+        """
+        Initialize the collector.
+
+        Args:
+            enabled: Whether spans are recorded
+            trace_memory: Whether to record each span's peak memory delta. Starts
+                tracemalloc, which slows Python-heavy stages such as plotting
+                several times over; deltas of spans running concurrently in
+                other threads overlap.
+            tracer: Optional OpenTelemetry tracer (opentelemetry.trace.get_tracer(...))
+                every span is mirrored to
+            max_spans: Number of most recent spans kept for export
+        """
+        self.enabled = False
+        self.trace_memory = trace_memory
+        self.tracer = tracer
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if enabled:
+            self.enable()
+
+    def enable(self, trace_memory: Optional[bool] = None) -> None:
+        """
+        Start recording spans.
+
+        Args:
+            trace_memory: Also trace memory (None leaves the setting unchanged)
+        """
+        self.enabled = True
+        if trace_memory is not None:
+            self.trace_memory = trace_memory
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        """Stop recording spans (collected data is kept)."""
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Drop collected spans and aggregates."""
+        with self._lock:
+            self.spans.clear()
+            self.stages = {}
+
+    def span(self, name: str, **attributes: Any) -> Any:
+        """
+        A span for one stage, or a no-op span when disabled.
+
+        Args:
+            name: Stage name ('load', 'analyze', 'plot', 'prompt', 'llm', ...)
+            **attributes: Attributes such as the dataset or file
+
+        Returns:
+            Context manager yielding an object with set(rows=..., cache=..., **attributes)
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            stage = self.stages.setdefault(span.name, _new_stage())
+            stage["count"] += 1
+            stage["errors"] += span.error is not None
+            stage["wall_seconds"] += span.wall_seconds
+            stage["max_wall_seconds"] = max(stage["max_wall_seconds"], span.wall_seconds)
+            stage["cpu_seconds"] += span.cpu_seconds
+            stage["rows"] += span.rows or 0
+            stage["cache_hits"] += span.cache == "hit"
+            stage["cache_misses"] += span.cache == "miss"
+            if span.memory_delta_bytes is not None:
+                stage["max_memory_delta_bytes"] = max(stage["max_memory_delta_bytes"] or 0,
+                                                      span.memory_delta_bytes)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Aggregated metrics.
+
+        Returns:
+            Dictionary with per-stage totals under 'stages' and the recent spans under 'spans'
+        """
+        with self._lock:
+            return {"stages": {name: dict(stage) for name, stage in self.stages.items()},
+                    "spans": [span.to_dict() for span in self.spans]}
+
+    def prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """
+        Aggregated metrics in Prometheus text exposition format.
+
+        Args:
+            prefix: Metric name prefix
+
+        Returns:
+            Exposition text, one sample per stage and metric
+        """
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in sorted(self.stages.items())}
+        families = [
+            ("stage_calls_total", "counter", "Instrumented stage executions", "count"),
+            ("stage_errors_total", "counter", "Stage executions that raised", "errors"),
+            ("stage_seconds_total", "counter", "Wall time spent in the stage", "wall_seconds"),
+            ("stage_cpu_seconds_total", "counter", "CPU time spent in the stage", "cpu_seconds"),
+            ("stage_rows_total", "counter", "Rows processed by the stage", "rows"),
+            ("stage_max_seconds", "gauge", "Slowest execution of the stage", "max_wall_seconds"),
+            ("stage_memory_peak_bytes", "gauge", "Largest traced memory delta of the stage",
+             "max_memory_delta_bytes"),
+        ]
+        lines = []
+        for metric, kind, help_text, key in families:
+            samples = [(name, stage[key]) for name, stage in stages.items() if stage[key] is not None]
+            if not samples:
+                continue
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} {kind}"]
+            lines += [f'{prefix}_{metric}{{stage="{_label(name)}"}} {value:g}' for name, value in samples]
+        cache = [(name, result, stage[key]) for name, stage in stages.items()
+                 for result, key in (("hit", "cache_hits"), ("miss", "cache_misses"))
+                 if stage["cache_hits"] or stage["cache_misses"]]
+        if cache:
+            lines += [f"# HELP {prefix}_cache_requests_total Cache lookups by stage and result",
+                      f"# TYPE {prefix}_cache_requests_total counter"]
+            lines += [f'{prefix}_cache_requests_total{{stage="{_label(name)}",result="{result}"}} {value}'
+                      for name, result, value in cache]
+        return "\n".join(lines) + "\n"
+
+    def otel_spans(self, service_name: str = "aurient-analysis") -> List[Dict[str, Any]]:
+        """
+        Recent spans shaped like OTLP/JSON spans, for export without the OpenTelemetry SDK.
+
+        Args:
+            service_name: Value of the service.name attribute
+
+        Returns:
+            List of span dictionaries (name, start/end in Unix nanoseconds, attributes, status)
+        """
+        with self._lock:
+            spans = list(self.spans)
+        return [{
+            "name": span.name,
+            "start_time_unix_nano": int(span.start_time * 1e9),
+            "end_time_unix_nano": int((span.start_time + span.wall_seconds) * 1e9),
+            "attributes": {"service.name": service_name, **span._otel_attributes()},
+            "status": {"code": "ERROR" if span.error else "OK"},
+        } for span in spans]
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+_DEFAULT = Instrumentation(enabled=os.getenv("AURIENT_INSTRUMENTATION") == "1",
+                           trace_memory=os.getenv("AURIENT_TRACE_MEMORY") == "1")
+
+
+def default_instrumentation() -> Instrumentation:
+    """The process-wide Instrumentation used by analyzers not given their own."""
+    return _DEFAULT
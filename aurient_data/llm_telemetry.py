@@ -0,0 +1,278 @@
+"""
+Per-generation telemetry for Claude calls: tokens, latency, retries and cost.
+
+OuraAnalysis writes one row per generation to a local SQLite log (next to the
+response cache by default): the user, the public method that asked for it (e.g.
+generate_daily_advice_structured), the model, where the text came from (the API,
+the response cache or an identical in-flight request), input/output and prompt
+cache tokens, time to first token for streams, total latency including
+scheduling and retries, the number of retries, the estimated cost (at batch rates
+for Message Batches results) and any error.
+
+The log is plain SQLite, so it can be queried directly:
+
+    sqlite3 cache/llm_responses/llm_telemetry.sqlite3 \\
+        "SELECT method, avg(latency_seconds) FROM generations GROUP BY method"
+
+or through TelemetryLog.records() and summary(), which gives latency and time to
+first token percentiles, token totals, response cache hit rates and cost per
+method (or per user):
+
+    python llm_telemetry.py --by method,user_id --since 7d
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+import pandas as pd
+
+
+# USD per million tokens
+MODEL_PRICING = {
+    "claude-3-5-sonnet-20241022": {"input": 3.00, "output": 15.00, "cache_write": 3.75, "cache_read": 0.30},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.00, "cache_write": 1.00, "cache_read": 0.08},
+    "claude-3-opus-20240229": {"input": 15.00, "output": 75.00, "cache_write": 18.75, "cache_read": 1.50},
+}
+
+# Message Batches API requests are billed at half the standard rates
+BATCH_DISCOUNT = 0.5
+
+TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+SOURCES = ("api", "response_cache", "inflight")
+PERCENTILES = (0.5, 0.9, 0.99)
+DEFAULT_DB_NAME = "llm_telemetry.sqlite3"
+
+COLUMNS = {
+    "timestamp": "REAL NOT NULL",
+    "user_id": "TEXT",
+    "method": "TEXT",
+    "model": "TEXT",
+    "source": "TEXT",
+    "streamed": "INTEGER",
+    "max_tokens": "INTEGER",
+    "input_tokens": "INTEGER",
+    "output_tokens": "INTEGER",
+    "cache_creation_input_tokens": "INTEGER",
+    "cache_read_input_tokens": "INTEGER",
+    "ttft_seconds": "REAL",
+    "latency_seconds": "REAL",
+    "retries": "INTEGER",
+    "cost_usd": "REAL",
+    "error": "TEXT",
+}
+
+
+def estimate_cost(model: str, usage: Dict[str, Any], batch: bool = False) -> Optional[float]:
+    """
+    Estimated cost of a generation.
+
+    Args:
+        model: Model id
+        usage: Token counts (TOKEN_FIELDS; missing counts are zero)
+        batch: Whether it was sent through the Message Batches API
+
+    Returns:
+        Cost in USD, or None for a model without known pricing
+    """
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None:
+        return None
+    discount = BATCH_DISCOUNT if batch else 1.0
+    return discount * (
+        (usage.get("input_tokens") or 0) * pricing["input"]
+        + (usage.get("output_tokens") or 0) * pricing["output"]
+        + (usage.get("cache_creation_input_tokens") or 0) * pricing["cache_write"]
+        + (usage.get("cache_read_input_tokens") or 0) * pricing["cache_read"]
+    ) / 1_000_000
+
+
+def new_generation(user_id: str, method: Optional[str], model: str, max_tokens: int,
+                   streamed: bool = False) -> Dict[str, Any]:
+    """
+    Start a generation record; the caller fills in usage and outcome.
+
+    Args:
+        user_id: User the generation is for
+        method: Public method that requested it
+        model: Model id
+        max_tokens: Maximum output tokens requested
+        streamed: Whether the response is streamed
+
+    Returns:
+        Record with the start time in '_start' and an attempt counter in '_attempts'
+    """
+    record = {column: None for column in COLUMNS}
+    record.update(timestamp=time.time(), user_id=user_id, method=method, model=model, source="api",
+                  streamed=int(streamed), max_tokens=max_tokens, retries=0)
+    record.update({field: 0 for field in TOKEN_FIELDS})
+    record["_start"] = time.perf_counter()
+    record["_attempts"] = 0
+    return record
+
+
+def _since(since: Union[None, float, str]) -> Optional[float]:
+    """Unix time from a timestamp or a relative period such as '7d', '12h' or '30m'."""
+    if since is None or isinstance(since, (int, float)):
+        return since
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return time.time() - float(since[:-1]) * units[since[-1]] if since[-1] in units else float(since)
+
+
+class TelemetryLog:
+    """
+    Append-only SQLite log of generations.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open (and create if needed) a telemetry log.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation: safe across threads and pre-forked workers
+        connection = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection.execute("PRAGMA journal_mode=WAL")
+                columns = ", ".join(f"{name} {kind}" for name, kind in COLUMNS.items())
+                connection.execute(f"CREATE TABLE IF NOT EXISTS generations ({columns})")
+                connection.execute("CREATE INDEX IF NOT EXISTS generations_time ON generations (timestamp)")
+                connection.commit()
+                self._ready = True
+        return connection
+
+    def record(self, record: Dict[str, Any]) -> None:
+        """
+        Append a generation. Failures are reported and never raised.
+
+        Args:
+            record: Generation fields (see COLUMNS); other keys are ignored
+        """
+        values = [record.get(column) for column in COLUMNS]
+        try:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.execute(f"INSERT INTO generations ({', '.join(COLUMNS)}) "
+                                       f"VALUES ({', '.join('?' * len(COLUMNS))})", values)
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            print(f"Warning: Failed to write LLM telemetry to {self.path}: {e}")
+
+    def records(self, user_id: Optional[str] = None, method: Optional[str] = None,
+                since: Union[None, float, str] = None, until: Optional[float] = None,
+                limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Logged generations, most recent first.
+
+        Args:
+            user_id: Only this user's generations
+            method: Only generations requested by this method
+            since: Unix time or relative period ('7d', '12h', '30m')
+            until: Unix time
+            limit: Maximum number of rows
+
+        Returns:
+            DataFrame with one row per generation (COLUMNS)
+        """
+        clauses, params = [], []
+        for clause, value in (("user_id = ?", user_id), ("method = ?", method),
+                              ("timestamp >= ?", _since(since)), ("timestamp < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = "SELECT * FROM generations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        connection = self._connect()
+        try:
+            df = pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+        # Columns that are NULL throughout (e.g. no streams yet) come back as objects
+        real = [name for name, kind in COLUMNS.items() if kind.startswith("REAL")]
+        df[real] = df[real].astype("float64")
+        return df
+
+    def summary(self, by: Sequence[str] = ("method",), **filters: Any) -> pd.DataFrame:
+        """
+        Aggregate latency, tokens, cache use and cost.
+
+        Args:
+            by: Columns to group by (e.g. 'method', 'user_id', 'model')
+            **filters: Filters passed to records()
+
+        Returns:
+            DataFrame indexed by the group columns with call counts, response
+            cache hit rate, latency and time-to-first-token percentiles of API
+            calls, token totals, prompt cache read ratio, retries, errors and cost
+        """
+        df = self.records(**filters)
+        if df.empty:
+            return pd.DataFrame()
+        by = list(by)
+        df[by] = df[by].fillna("unknown")
+        api = df[df["source"] == "api"]
+        groups = df.groupby(by)
+        summary = pd.DataFrame({
+            "calls": groups.size(),
+            "api_calls": api.groupby(by).size(),
+            "response_cache_hit_rate": groups["source"].agg(lambda s: (s != "api").mean()),
+            "errors": groups["error"].count(),
+            "retries": groups["retries"].sum(),
+        })
+        for column in ("latency_seconds", "ttft_seconds"):
+            quantiles = api.groupby(by)[column].quantile(list(PERCENTILES)).unstack() \
+                if not api.empty else pd.DataFrame(columns=list(PERCENTILES))
+            for q in PERCENTILES:
+                summary[f"{column.replace('_seconds', '')}_p{int(q * 100)}"] = quantiles.get(q)
+        for field in TOKEN_FIELDS:
+            summary[field] = groups[field].sum()
+        prompt_tokens = summary["input_tokens"] + summary["cache_creation_input_tokens"] \
+            + summary["cache_read_input_tokens"]
+        summary["prompt_cache_read_ratio"] = (summary["cache_read_input_tokens"] / prompt_tokens).where(
+            prompt_tokens > 0, 0.0)
+        summary["cost_usd"] = groups["cost_usd"].sum(min_count=1)
+        summary["api_calls"] = summary["api_calls"].fillna(0).astype(int)
+        return summary.sort_values("calls", ascending=False)
+
+
+def main() -> None:
+    from response_cache import DEFAULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="Summarize LLM call telemetry")
+    parser.add_argument("--db", default=str(DEFAULT_CACHE_DIR / DEFAULT_DB_NAME), help="Telemetry database")
+    parser.add_argument("--by", default="method", help="Comma-separated columns to group by")
+    parser.add_argument("--since", help="Only generations since e.g. 7d, 12h or a Unix time")
+    parser.add_argument("--user", help="Only this user's generations")
+    args = parser.parse_args()
+
+    if not Path(args.db).exists():
+        print(f"✗ No telemetry at {args.db}")
+        return
+    summary = TelemetryLog(args.db).summary(by=args.by.split(","), since=args.since, user_id=args.user)
+    if summary.empty:
+        print("No generations logged")
+        return
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(summary.round(3))
+        print(f"\nTotal estimated cost: ${summary['cost_usd'].sum():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+Deterministic, rule-based daily programmes computed locally.
+
+The rules are the ones the research report in the analysis prompt spells out:
+
+- HRV against a phase-specific baseline (follicular and luteal baselines kept
+  separately): above 102% proceed with high intensity, 98-102% train moderately,
+  below 98% reduce intensity or recover actively.
+- Luteal phase: 10-15% lower training load, emphasis on technique and recovery,
+  cooler sleep environment and extra hydration.
+- Sleep debt against an 8 hour target caps training intensity.
+
+Features and decisions are computed for every day at once with array operations,
+and the latest day is turned into cards in the same schema as
+OuraAnalysis.generate_daily_advice_structured(), in milliseconds and without an
+API call. Pages can render these immediately and swap in the LLM version later.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from daily_context import cycle_phases, period_starts
+
+
+SLEEP_TARGET_HOURS = 8.0
+SLEEP_DEBT_WINDOW = 7
+# Hours of weekly sleep debt above which intensity is capped at moderate / recovery
+SLEEP_DEBT_MODERATE = 3.5
+SLEEP_DEBT_RECOVERY = 7.0
+HRV_HIGH = 1.02
+HRV_LOW = 0.98
+BASELINE_DAYS = 28
+LUTEAL_VOLUME = 0.85
+
+INTENSITY_LEVELS = np.array(["recovery", "moderate", "high"], dtype=object)
+
+MOVEMENT_PROGRAMMES = {
+    "high": [
+        "Back squat: {sets} sets of 5 reps at about 80% of your 1-rep max, 2-3 minutes rest",
+        "Romanian deadlift: {sets} sets of 6 reps, 2 minutes rest",
+        "Push-ups: {sets} sets of 10-12 reps, 90 seconds rest",
+        "Intervals: {intervals} x 4 minutes hard (able to say only a few words) with 3 minutes easy between",
+    ],
+    "moderate": [
+        "Goblet squat: {sets} sets of 10 reps at a weight you could lift 3 more times, 90 seconds rest",
+        "Single-leg Romanian deadlift: {sets} sets of 8 reps per leg, 60 seconds rest",
+        "Incline push-ups: {sets} sets of 10 reps, 60 seconds rest",
+        "Steady zone 2 cardio: {minutes} minutes at a conversational pace",
+    ],
+    "recovery": [
+        "Brisk walk: {minutes} minutes at a conversational pace, outdoors if possible",
+        "Mobility flow: 3 rounds of cat-cow x 10, world's greatest stretch x 5 per side, hip circles x 10 per side",
+        "Light yoga or stretching: 15 minutes, holding each stretch for 30-60 seconds",
+    ],
+}
+
+MINDFULNESS_PROGRAMMES = {
+    "resonance": [
+        "Sit or lie down somewhere quiet and set a timer for 15 minutes",
+        "Inhale through your nose for 5 seconds, letting your belly rise",
+        "Exhale slowly through your nose for 5 seconds (about 6 breaths per minute)",
+        "Repeat for the full 15 minutes; if your mind wanders, return to counting",
+        "Finish with 1 minute of normal breathing before getting up",
+    ],
+    "box": [
+        "Sit upright with both feet on the floor and set a timer for 10 minutes",
+        "Inhale through your nose for 4 seconds",
+        "Hold your breath for 4 seconds",
+        "Exhale through your mouth for 4 seconds",
+        "Hold for 4 seconds, then repeat the cycle until the timer ends",
+    ],
+}
+
+NUTRITION_PROGRAMMES = {
+    "menstrual": [
+        "Breakfast: Oats cooked with milk, topped with pumpkin seeds and berries",
+        "Lunch: Lentil and spinach soup with wholegrain bread",
+        "Dinner: Lean beef or tofu stir-fry with broccoli, peppers and brown rice",
+        "Snack: Orange slices with a handful of almonds",
+    ],
+    "follicular": [
+        "Breakfast: Three-egg omelette with spinach and wholegrain toast",
+        "Lunch: Grilled chicken or tempeh quinoa bowl with roasted vegetables",
+        "Dinner: Baked salmon with sweet potato and green beans",
+        "Snack: Greek yoghurt with honey and walnuts",
+    ],
+    "luteal": [
+        "Breakfast: Overnight oats with chia seeds, banana and a spoon of nut butter",
+        "Lunch: Chickpea, roasted squash and feta salad with olive oil dressing",
+        "Dinner: Turkey or bean chilli with brown rice and avocado",
+        "Snack: Dark chocolate (70%+) with a pear; drink an extra 500 ml of water today",
+    ],
+    "recovery": [
+        "Breakfast: Greek yoghurt with tart cherries, oats and flaxseed",
+        "Lunch: Sardines or white beans on wholegrain toast with a large leafy salad",
+        "Dinner: Baked salmon with turmeric roasted vegetables and quinoa",
+        "Snack: Kiwi fruit and a small handful of pistachios",
+    ],
+}
+
+SOURCES = {
+    "hrv_training": {"name": "Endurance training guided individually by daily heart rate variability measurements",
+                     "url": "https://doi.org/10.1007/s00421-007-0552-2"},
+    "phase_training": {"name": "Effects of follicular versus luteal phase-based strength training in young women",
+                       "url": "https://doi.org/10.1186/2193-1801-3-668"},
+    "sleep_injury": {"name": "Chronic lack of sleep is associated with increased sports injuries in adolescent athletes",
+                     "url": "https://doi.org/10.1097/BPO.0000000000000151"},
+    "resonance": {"name": "Heart rate variability biofeedback: how and why does it work?",
+                  "url": "https://doi.org/10.3389/fpsyg.2014.00756"},
+    "nutrient_timing": {"name": "International society of sports nutrition position stand: nutrient timing",
+                        "url": "https://doi.org/10.1186/s12970-017-0189-4"},
+}
+
+
+def _main_sleep(health_data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Per-day HRV and sleep hours from the detailed sleep periods."""
+    df = health_data.get("sleep_detailed")
+    if df is None or df.empty or "day" not in df.columns:
+        return pd.DataFrame(columns=["hrv", "sleep_hours"])
+    if "type" in df.columns and (df["type"] == "long_sleep").any():
+        long_sleep = df[df["type"] == "long_sleep"]
+    else:
+        long_sleep = df
+    days = pd.to_datetime(long_sleep["day"], errors="coerce")
+    frame = pd.DataFrame(index=days)
+    frame["hrv"] = pd.to_numeric(long_sleep["average_hrv"], errors="coerce").values \
+        if "average_hrv" in long_sleep else np.nan
+    # All sleep periods count towards the night's total, naps included
+    totals = (pd.to_numeric(df["total_sleep_duration"], errors="coerce")
+              .groupby(pd.to_datetime(df["day"], errors="coerce")).sum(min_count=1) / 3600
+              if "total_sleep_duration" in df else None)
+    frame = frame.groupby(level=0).mean()
+    frame["sleep_hours"] = totals.reindex(frame.index) if totals is not None else np.nan
+    return frame
+
+
+def daily_features(health_data: Dict[str, pd.DataFrame],
+                   user_metadata: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+    """
+    Compute the recommendation features and decisions for every day.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        user_metadata: User information (cycle_phase / cycle_length are used)
+
+    Returns:
+        DataFrame indexed by day with hrv, hrv_source, hrv_baseline, hrv_ratio,
+        sleep_hours, sleep_debt_hours, cycle_phase, intensity and volume_factor.
+        hrv_source is 'readiness' when the readiness score stands in for HRV.
+    """
+    user_metadata = user_metadata or {}
+    features = _main_sleep(health_data)
+    source = "hrv"
+
+    # Fall back to the readiness score when there is no HRV
+    readiness = health_data.get("daily_readiness")
+    if features["hrv"].isna().all() and readiness is not None and {"day", "score"} <= set(readiness.columns):
+        score = pd.to_numeric(readiness["score"], errors="coerce")
+        score.index = pd.to_datetime(readiness["day"], errors="coerce")
+        score = score.groupby(level=0).mean()
+        features = features.reindex(features.index.union(score.index))
+        features["hrv"] = score.reindex(features.index)
+        source = "readiness"
+
+    if features.empty:
+        return features.assign(hrv_source=[], hrv_baseline=[], hrv_ratio=[], sleep_debt_hours=[], cycle_phase=[],
+                               intensity=[], volume_factor=[])
+
+    features = features.sort_index()
+    features = features.asfreq("D") if features.index.is_unique else features
+    features["hrv_source"] = source
+
+    phases = cycle_phases(features.index, period_starts(health_data), int(user_metadata.get("cycle_length") or 28))
+    if user_metadata.get("cycle_phase"):
+        phases[-1] = str(user_metadata["cycle_phase"]).lower()
+    features["cycle_phase"] = phases
+
+    # Separate follicular and luteal baselines: the mean of earlier same-group days
+    group = np.where(phases == "luteal", "luteal", np.where(pd.isna(phases), "unknown", "follicular"))
+    hrv = features["hrv"]
+    baseline = (hrv.groupby(group)
+                .transform(lambda s: s.shift().rolling(BASELINE_DAYS, min_periods=3).mean()))
+    overall = hrv.shift().rolling(BASELINE_DAYS, min_periods=3).mean()
+    features["hrv_baseline"] = baseline.fillna(overall)
+    features["hrv_ratio"] = hrv / features["hrv_baseline"]
+
+    deficit = (SLEEP_TARGET_HOURS - features["sleep_hours"]).clip(lower=0)
+    features["sleep_debt_hours"] = deficit.rolling(SLEEP_DEBT_WINDOW, min_periods=1).sum()
+
+    ratio = features["hrv_ratio"].to_numpy(dtype=float)
+    level = np.select([ratio > HRV_HIGH, ratio >= HRV_LOW, ratio < HRV_LOW], [2, 1, 0], default=1)
+    debt = features["sleep_debt_hours"].fillna(0).to_numpy()
+    cap = np.select([debt >= SLEEP_DEBT_RECOVERY, debt >= SLEEP_DEBT_MODERATE], [0, 1], default=2)
+    features["intensity"] = INTENSITY_LEVELS[np.minimum(level, cap)]
+    features["volume_factor"] = np.where(phases == "luteal", LUTEAL_VOLUME, 1.0)
+    return features
+
+
+def _reasons(row: pd.Series) -> List[str]:
+    reasons = []
+    if pd.notna(row["hrv_ratio"]):
+        measure = "readiness score" if row["hrv_source"] == "readiness" else "HRV"
+        reasons.append(f"your {measure} is at {row['hrv_ratio']:.0%} of your "
+                       f"{row['cycle_phase'] + ' ' if row['cycle_phase'] == 'luteal' else ''}baseline")
+    if pd.notna(row["sleep_debt_hours"]) and row["sleep_debt_hours"] >= SLEEP_DEBT_MODERATE:
+        reasons.append(f"you have built up {row['sleep_debt_hours']:.1f} hours of sleep debt over the last week")
+    if row["cycle_phase"]:
+        reasons.append(f"you are likely in the {row['cycle_phase']} phase of your cycle")
+    return reasons
+
+
+def _sentence(reasons: List[str]) -> str:
+    if not reasons:
+        return "There is not enough recent data to personalise this further"
+    if len(reasons) == 1:
+        return reasons[0][0].upper() + reasons[0][1:]
+    text = ", ".join(reasons[:-1]) + " and " + reasons[-1]
+    return text[0].upper() + text[1:]
+
+
+def _movement_card(row: pd.Series) -> Dict[str, Any]:
+    intensity = row["intensity"]
+    volume = row["volume_factor"]
+    sets = max(2, int(round((4 if intensity == "high" else 3) * volume)))
+    values = {"sets": sets, "intervals": max(2, int(round(4 * volume))),
+              "minutes": int(round((40 if intensity == "moderate" else 30) * volume))}
+    items = [item.format(**values) for item in MOVEMENT_PROGRAMMES[intensity]]
+
+    focus = {"high": "a high-intensity strength and interval session",
+             "moderate": "a moderate session you can adjust by feel",
+             "recovery": "active recovery instead of hard training"}[intensity]
+    description = f"{_sentence(_reasons(row))}, so today calls for {focus}."
+    if volume < 1:
+        description += " Volume is reduced by about 15% for the luteal phase, when recovery takes longer."
+    sources = [SOURCES["hrv_training"]]
+    if row["cycle_phase"]:
+        sources.append(SOURCES["phase_training"])
+    if pd.notna(row["sleep_debt_hours"]) and row["sleep_debt_hours"] >= SLEEP_DEBT_MODERATE:
+        sources.append(SOURCES["sleep_injury"])
+    return {"title": "Movement", "items": items, "description": description, "sources": sources}
+
+
+def _mindfulness_card(row: pd.Series) -> Dict[str, Any]:
+    calming = row["intensity"] == "recovery" or row["cycle_phase"] in ("luteal", "menstrual")
+    items = list(MINDFULNESS_PROGRAMMES["resonance" if calming else "box"])
+    if calming:
+        description = ("Slow breathing at about six breaths per minute raises parasympathetic activity and HRV, "
+                       "which helps most when recovery is low or HRV is naturally suppressed late in the cycle.")
+    else:
+        description = ("Your recovery markers are good, so a short box-breathing practice is enough to keep "
+                       "stress in check and build resilience while your capacity is high.")
+    return {"title": "Mindfulness", "items": items, "description": description, "sources": [SOURCES["resonance"]]}
+
+
+def _nutrition_card(row: pd.Series) -> Dict[str, Any]:
+    phase = row["cycle_phase"]
+    if row["intensity"] == "recovery":
+        low = "low-readiness" if row["hrv_source"] == "readiness" else "low-HRV"
+        plan, why = "recovery", f"anti-inflammatory foods and omega-3s support recovery on a {low} day"
+    elif phase == "luteal":
+        plan, why = "luteal", ("complex carbohydrates, magnesium and extra fluids help with the higher energy needs "
+                               "and body temperature of the luteal phase")
+    elif phase == "menstrual":
+        plan, why = "menstrual", "iron- and vitamin C-rich meals help replace iron lost during menstruation"
+    else:
+        plan, why = "follicular", "protein spread across the day supports strength gains while recovery is strong"
+    description = f"This meal plan focuses on {why}. Each meal includes protein to support today's training."
+    return {"title": "Nutrition", "items": list(NUTRITION_PROGRAMMES[plan]), "description": description,
+            "sources": [SOURCES["nutrient_timing"]]}
+
+
+def recommend_daily_programs(health_data: Dict[str, pd.DataFrame],
+                             user_metadata: Optional[Dict[str, Any]] = None,
+                             day: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build today's movement, mindfulness and nutrition cards from the rules.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        user_metadata: User information (name, cycle_phase, cycle_length)
+        day: Day to recommend for (YYYY-MM-DD); the latest day with data by default
+
+    Returns:
+        Dictionary in the generate_daily_advice_structured() format, plus
+        'source': 'local', the 'day' and the 'features' used, or an error dictionary
+    """
+    user_metadata = user_metadata or {}
+    features = daily_features(health_data, user_metadata)
+    if day is not None:
+        features = features.loc[:pd.Timestamp(day)]
+    features = features.dropna(subset=["hrv", "sleep_hours"], how="all")
+    if features.empty:
+        return {"error": "Not enough sleep or readiness data for local recommendations."}
+
+    row = features.iloc[-1]
+    return {
+        "title": f"{user_metadata.get('name', 'User')}'s Daily Health Programs",
+        "cards": [_movement_card(row), _mindfulness_card(row), _nutrition_card(row)],
+        "source": "local",
+        "day": features.index[-1].strftime("%Y-%m-%d"),
+        "features": {
+            "intensity": row["intensity"],
+            "cycle_phase": row["cycle_phase"],
+            "hrv_ratio": None if pd.isna(row["hrv_ratio"]) else round(float(row["hrv_ratio"]), 3),
+            "hrv_source": row["hrv_source"],
+            "sleep_debt_hours": None if pd.isna(row["sleep_debt_hours"]) else round(float(row["sleep_debt_hours"]), 2),
+        },
+    }
@@ -0,0 +1,221 @@
+"""
+Memory budget mode: shrink loaded datasets and keep them within a byte limit.
+
+Oura exports load with every text column as Python strings and every number as
+64 bits, so most of a warm analyzer's memory is spent on columns that do not need
+to exist in that form. optimize_frame() rewrites a dataset losslessly:
+
+- low-cardinality strings (activity types, sources, stress levels) become categoricals;
+- integers are downcast (no narrower than int32, so arithmetic keeps headroom);
+- floats become float32 where no value moves by more than a tolerance;
+- ISO date and timestamp strings become datetime64 (timestamps with a single UTC
+  offset keep it; columns mixing offsets, e.g. across DST changes, stay strings);
+- redundant `id` columns (unique surrogate keys nothing joins on) are dropped.
+
+optimize_health_data() applies it to every dataset and, given a budget, admits
+datasets smallest first; the rest are refused (not kept at all) or spilled to
+disk, where OuraAnalysis reads them back one at a time when it needs them.
+
+    python memory_optimizer.py data/ --budget-mb 8
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_SPILL_DIR = Path(__file__).parent / "cache" / "spilled"
+MAX_CATEGORY_RATIO = 0.5
+FLOAT_TOLERANCE = 1e-3
+MIN_INT_DTYPE = np.int32
+REDUNDANT_COLUMNS = ("id",)
+ON_EXCEED = ("spill", "refuse")
+
+ISO_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?")
+UTC_OFFSET = r"(Z|[+-]\d{2}:?\d{2})$"
+
+
+def frame_memory(df: pd.DataFrame) -> int:
+    """Bytes held by a DataFrame, including the contents of string columns."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def _as_datetime(values: pd.Series) -> Optional[pd.Series]:
+    """Parse a column of ISO date/timestamp strings, or None if it is anything else."""
+    present = values.dropna()
+    if present.empty or pd.api.types.infer_dtype(present, skipna=False) != "string":
+        return None
+    if not present.str.fullmatch(ISO_DATETIME.pattern).all():
+        return None
+    if present.str.extract(UTC_OFFSET)[0].nunique(dropna=False) > 1:
+        return None
+    try:
+        return pd.to_datetime(values, format="ISO8601")
+    except (ValueError, OverflowError):
+        return None
+
+
+def _downcast_float(values: pd.Series, tolerance: float) -> Optional[pd.Series]:
+    narrow = values.astype(np.float32)
+    if ((narrow.astype(np.float64) - values).abs() > tolerance).any():
+        return None
+    return narrow
+
+
+def optimize_frame(df: pd.DataFrame, max_category_ratio: float = MAX_CATEGORY_RATIO,
+                   float_tolerance: float = FLOAT_TOLERANCE,
+                   redundant_columns: Iterable[str] = REDUNDANT_COLUMNS) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Rewrite a dataset with compact dtypes.
+
+    Args:
+        df: Dataset to optimize (not modified)
+        max_category_ratio: Largest share of distinct values for a string column
+            to become categorical
+        float_tolerance: Largest absolute change allowed when narrowing floats
+        redundant_columns: Columns dropped when they are unique row identifiers
+
+    Returns:
+        Tuple of (optimized DataFrame, {column: 'old dtype -> new dtype' or 'dropped'})
+    """
+    columns = {}
+    changes = {}
+    redundant = set(redundant_columns)
+    for name, values in df.items():
+        if name in redundant and values.notna().all() and values.is_unique:
+            changes[name] = "dropped"
+            continue
+        optimized = None
+        if pd.api.types.is_bool_dtype(values):
+            pass
+        elif pd.api.types.is_integer_dtype(values):
+            optimized = pd.to_numeric(values, downcast="integer")
+            if optimized.dtype.itemsize < np.dtype(MIN_INT_DTYPE).itemsize:
+                optimized = optimized.astype(MIN_INT_DTYPE)
+        elif pd.api.types.is_float_dtype(values) and values.dtype.itemsize > 4:
+            optimized = _downcast_float(values, float_tolerance)
+        elif _is_text(values):
+            optimized = _as_datetime(values)
+            if optimized is None:
+                try:
+                    present = values.count()
+                    if present and values.nunique() <= max_category_ratio * present:
+                        optimized = values.astype("category")
+                except TypeError:
+                    # Unhashable values (lists, dicts) stay as they are
+                    pass
+        if optimized is not None and optimized.dtype != values.dtype:
+            changes[name] = f"{values.dtype} -> {optimized.dtype}"
+            values = optimized
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index), changes
+
+
+def spill_path(spill_dir: Path, dataset_name: str) -> Path:
+    """File a spilled dataset is written to."""
+    return Path(spill_dir) / f"{dataset_name}.pkl"
+
+
+def optimize_health_data(health_data: Dict[str, pd.DataFrame], budget_bytes: Optional[int] = None,
+                         on_exceed: str = "spill", spill_dir: Optional[Path] = None,
+                         **options: Any) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Path], pd.DataFrame]:
+    """
+    Optimize every dataset and keep the resident ones within a budget.
+
+    Args:
+        health_data: Dataset name -> DataFrame (not modified)
+        budget_bytes: Total bytes of resident datasets; None keeps everything
+        on_exceed: 'spill' writes datasets beyond the budget to spill_dir,
+            'refuse' drops them
+        spill_dir: Directory for spilled datasets (required to spill)
+        **options: Passed to optimize_frame()
+
+    Returns:
+        Tuple of (resident datasets, spilled dataset paths, report). The report
+        has one row per dataset with rows, bytes before and after, the share
+        saved, the number of changed columns and the status ('resident',
+        'spilled' or 'refused').
+    """
+    if on_exceed not in ON_EXCEED:
+        raise ValueError(f"on_exceed must be one of {ON_EXCEED}, not {on_exceed!r}")
+    if budget_bytes is not None and on_exceed == "spill" and spill_dir is None:
+        raise ValueError("spill_dir is required to spill datasets")
+
+    optimized = {}
+    rows = []
+    for name, df in health_data.items():
+        optimized[name], changes = optimize_frame(df, **options)
+        rows.append({"dataset": name, "rows": len(df), "bytes_before": frame_memory(df),
+                     "bytes_after": frame_memory(optimized[name]), "columns_changed": len(changes)})
+    report = pd.DataFrame(rows, columns=["dataset", "rows", "bytes_before", "bytes_after", "columns_changed"])
+    report = report.set_index("dataset")
+    report["saved"] = (1 - report["bytes_after"] / report["bytes_before"]).fillna(0.0)
+    report["status"] = "resident"
+
+    resident, spilled = {}, {}
+    used = 0
+    # Smallest first, so a budget keeps as many datasets as possible
+    for name in report["bytes_after"].sort_values(kind="stable").index:
+        size = int(report.at[name, "bytes_after"])
+        if budget_bytes is None or used + size <= budget_bytes:
+            resident[name] = optimized[name]
+            used += size
+        elif on_exceed == "spill":
+            path = spill_path(spill_dir, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            optimized[name].to_pickle(path)
+            spilled[name] = path
+            report.at[name, "status"] = "spilled"
+        else:
+            report.at[name, "status"] = "refused"
+    # Keep the original dataset order
+    resident = {name: resident[name] for name in health_data if name in resident}
+    return resident, spilled, report
+
+
+def format_report(report: pd.DataFrame) -> str:
+    """
+    Human-readable memory report.
+
+    Args:
+        report: Report from optimize_health_data()
+
+    Returns:
+        One line per dataset and a total
+    """
+    lines = []
+    for name, row in report.iterrows():
+        status = "" if row["status"] == "resident" else f"  [{row['status']}]"
+        lines.append(f"  {name:<20} {row['bytes_before'] / 1024 ** 2:8.2f} MB -> "
+                     f"{row['bytes_after'] / 1024 ** 2:8.2f} MB  ({row['saved']:.0%} saved){status}")
+    before = report["bytes_before"].sum()
+    resident = report.loc[report["status"] == "resident", "bytes_after"].sum()
+    lines.append(f"  {'total':<20} {before / 1024 ** 2:8.2f} MB -> {resident / 1024 ** 2:8.2f} MB resident")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    from oura_analysis import OuraAnalysis
+
+    parser = argparse.ArgumentParser(description="Report memory savings of the optimization pass on a data directory")
+    parser.add_argument("data_dir", nargs="?", default=str(Path(__file__).parent / "data"))
+    parser.add_argument("--budget-mb", type=float, help="Resident memory budget for the datasets")
+    parser.add_argument("--refuse", action="store_true", help="Refuse datasets beyond the budget instead of spilling")
+    args = parser.parse_args()
+
+    analyzer = OuraAnalysis()
+    analyzer.load_from_cache(args.data_dir)
+    budget = int(args.budget_mb * 1024 ** 2) if args.budget_mb is not None else None
+    analyzer.optimize_memory(budget, on_exceed="refuse" if args.refuse else "spill")
+
+
+if __name__ == "__main__":
+    main()
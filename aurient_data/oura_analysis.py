@@ -1,20 +1,197 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import json
+import asyncio
+import itertools
+import re
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import AsyncExitStack, ExitStack, contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import (TYPE_CHECKING, Dict, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable,
+                    Iterator, List, Optional, Tuple)
 import warnings
-import anthropic
 import os
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+from daily_context import build_day_context, fingerprint, material_changes
+from ingest import DIGIT_STRING_COLUMNS
+from generation_scheduler import INTERACTIVE, GenerationScheduler, estimate_request_tokens
+from instrumentation import Instrumentation, default_instrumentation
+from llm_telemetry import DEFAULT_DB_NAME, TOKEN_FIELDS, TelemetryLog, estimate_cost, new_generation
+from local_recommendations import recommend_daily_programs
+from memory_optimizer import DEFAULT_SPILL_DIR, format_report, optimize_health_data
+from prompt_templates import DAILY_SECTIONS, load_data_dictionary, render_user_prompt, system_blocks
+from response_cache import ResponseCache
+from sleep_architecture import SleepArchitectureStore, cached_night_table
+from stats_digest import build_stats_digest
+from stream_json import (ADVICE_SECTIONS, DAILY_CARD_SCHEMA, DAILY_CARD_SECTIONS,
+                         IncrementalJSONExtractor, extract_json, validate)
+
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+DAILY_ADVICE_MAX_TOKENS = 3000
+
+# Oura export file name -> dataset name
+DATA_FILES = {
+    "dailyactivity_2023-01-07_2025-06-18.csv": "daily_activity",
+    "dailycardiovascularage_2023-01-07_2025-06-18.csv": "cardiovascular_age",
+    "dailyreadiness_2023-01-07_2025-06-18.csv": "daily_readiness",
+    "dailyresilience_2023-01-07_2025-06-18.csv": "daily_resilience",
+    "dailysleep_2023-01-07_2025-06-18.csv": "daily_sleep",
+    "dailyspo2_2023-01-07_2025-06-18.csv": "daily_spo2",
+    "dailystress_2023-01-07_2025-06-18.csv": "daily_stress",
+    "heartrate_2023-01-07_2025-06-18.csv": "heart_rate",
+    "ringconfiguration_2023-01-07_2025-06-18.csv": "ring_config",
+    "session_2023-01-07_2025-06-18.csv": "sessions",
+    "sleep_2023-01-07_2025-06-18.csv": "sleep_detailed",
+    "tag_2023-01-07_2025-06-18.csv": "tags",
+    "vo2max_2023-01-07_2025-06-18.csv": "vo2_max",
+    "workout_2023-01-07_2025-06-18.csv": "workouts",
+}
+
+
+# matplotlib/seaborn, anthropic and dotenv take most of the import time and are
+# only needed for plots and API calls, so they are imported on first use.
+
+@lru_cache(maxsize=None)
+def _pyplot():
+    """Import pyplot and seaborn and apply the plotting style (once per process)."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.style.use('default')
+    sns.set_palette("husl")
+    return plt
+
+
+@lru_cache(maxsize=None)
+def _load_env() -> None:
+    """Load environment variables from the .env file (once per process)."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+class _LazyFigures(Mapping):
+    """Dataset figures keyed by dataset name, each created on first access."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._figures: Dict[str, Any] = {}
+
+    def add(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+        self._figures.pop(name, None)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._figures:
+            self._figures[name] = self._factories[name]()
+        return self._figures[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    def drawn(self) -> Dict[str, Any]:
+        """Figures created so far, without drawing the rest."""
+        return dict(self._figures)
+
+
+# Dataset versions are unique within the process, so a memo key never matches a later dataset
+_DATASET_VERSIONS = itertools.count(1)
+
+
+class _HealthData(dict):
+    """
+    Datasets by name, with a version for each that changes whenever the dataset is replaced.
+    
+    Results derived from a dataset are memoized on its version. Frames are not
+    watched for changes in place, so modify a dataset by assigning a new frame.
+    """
+
+    def __init__(self, datasets: Any = ()):
+        super().__init__(datasets)
+        self.versions = {name: next(_DATASET_VERSIONS) for name in self}
+
+    def __setitem__(self, name: str, df: pd.DataFrame) -> None:
+        super().__setitem__(name, df)
+        self.versions[name] = next(_DATASET_VERSIONS)
+
+    def __delitem__(self, name: str) -> None:
+        super().__delitem__(name)
+        del self.versions[name]
+
+    def pop(self, name: str, *default: Any) -> Any:
+        self.versions.pop(name, None)
+        return super().pop(name, *default)
+
+    def popitem(self) -> Tuple[str, pd.DataFrame]:
+        name, df = super().popitem()
+        del self.versions[name]
+        return name, df
+
+    def clear(self) -> None:
+        super().clear()
+        self.versions.clear()
+
+    def setdefault(self, name: str, default: Any = None) -> Any:
+        if name not in self:
+            self[name] = default
+        return self[name]
 
-warnings.filterwarnings('ignore')
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for name, df in dict(*args, **kwargs).items():
+            self[name] = df
+
+    def __ior__(self, other: Any) -> "_HealthData":
+        self.update(other)
+        return self
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Unpickled datasets get new versions, as for any other assignment
+        return _HealthData, (dict(self),)
+
+
+class _DatasetView(Mapping):
+    """
+    Resident and spilled datasets as one mapping, for the prompt, day context and local rules.
+    
+    Spilled datasets are read back on access; only the last one read is kept, so
+    iterating holds at most one of them in memory.
+    """
+
+    def __init__(self, analyzer: "OuraAnalysis"):
+        self._analyzer = analyzer
+        self._last: Tuple[Optional[str], Optional[pd.DataFrame]] = (None, None)
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name in self._analyzer.health_data:
+            return self._analyzer.health_data[name]
+        if name not in self._analyzer.spilled_datasets:
+            raise KeyError(name)
+        if self._last[0] != name:
+            # Drop the previous frame before reading the next one
+            self._last = (name, None)
+            self._last = (name, self._analyzer.load_spilled(name))
+        return self._last[1]
+
+    def __iter__(self) -> Iterator[str]:
+        # In load order, so spilling a dataset does not reorder the prompt
+        names = [*self._analyzer.health_data,
+                 *(name for name in self._analyzer.spilled_datasets if name not in self._analyzer.health_data)]
+        order = {name: i for i, name in enumerate(DATA_FILES.values())}
+        return iter(sorted(names, key=lambda name: order.get(name, len(order))))
+
+    def __len__(self) -> int:
+        return len(set(self._analyzer.health_data) | set(self._analyzer.spilled_datasets))
 
 
 class OuraAnalysis:
@@ -23,49 +200,128 @@ class OuraAnalysis:
     """
     
     def __init__(self, health_data: Optional[Dict[str, pd.DataFrame]] = None, 
-                 user_metadata: Optional[Dict[str, Any]] = None):
+                 user_metadata: Optional[Dict[str, Any]] = None,
+                 claude_client: Optional[Any] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 async_claude_client: Optional[Any] = None,
+                 max_concurrency: int = 4,
+                 prompt_token_budget: int = 1500,
+                 scheduler: Optional[GenerationScheduler] = None,
+                 priority: int = INTERACTIVE,
+                 daily_context_store: Optional[ResponseCache] = None,
+                 daily_tolerances: Optional[Dict[str, float]] = None,
+                 instrumentation: Optional[Instrumentation] = None,
+                 telemetry: Optional[TelemetryLog] = None,
+                 sleep_architecture_store: Optional[SleepArchitectureStore] = None,
+                 daily_latency_budget: Optional[float] = None):
         """
         Initialize the OuraAnalysis class.
         
         Args:
             health_data: Dictionary of DataFrames with health data
             user_metadata: Dictionary with user information (name, age, goals, etc.)
+            claude_client: Optional pre-built Anthropic client (or compatible fake);
+                created from ANTHROPIC_API_KEY when omitted
+            response_cache: Cache for Claude responses; a shared on-disk cache is
+                used when omitted
+            async_claude_client: Optional AsyncAnthropic client for the async API;
+                without one, async calls run the sync client in worker threads
+            max_concurrency: Maximum number of Claude requests in flight at once
+                for the async API
+            prompt_token_budget: Token budget for the stats digest in each prompt
+            scheduler: Optional scheduler enforcing rate limits and retrying
+                throttled requests; may be shared between analyzers
+            priority: Scheduling priority of this analyzer's requests
+                (generation_scheduler.INTERACTIVE or BATCH)
+            daily_context_store: Store for the last structured daily advice and
+                the day context it was generated from; kept next to the response
+                cache, without expiry, when omitted
+            daily_tolerances: Per-field tolerances overriding
+                daily_context.DEFAULT_TOLERANCES when deciding whether daily
+                advice must be regenerated
+            instrumentation: Collector for per-stage timing spans; the process
+                default (disabled unless enabled) when omitted
+            telemetry: Log receiving one record per generation (tokens, latency,
+                retries, cost); kept next to the response cache when omitted
+            sleep_architecture_store: Store for per-night sleep architecture
+                tables; kept next to the response cache when omitted
+            daily_latency_budget: Seconds to wait for Claude's daily advice
+                before returning the local programmes instead; None waits for it
         """
         self.health_data = health_data or {}
         self.user_metadata = user_metadata or {}
         self.data_dictionary = self._load_data_dictionary()
         self.summary_stats = {}
-        self.plots = {}
-        self.claude_client = None
+        self.plots = _LazyFigures()
+        self.spilled_datasets: Dict[str, Path] = {}
+        self.claude_client = claude_client
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        self.async_claude_client = async_claude_client
+        self.max_concurrency = max_concurrency
+        self.prompt_token_budget = prompt_token_budget
+        self._stats_digest = None
+        self.scheduler = scheduler
+        self.priority = priority
+        if daily_context_store is None and self.response_cache is not None:
+            daily_context_store = ResponseCache(Path(self.response_cache.cache_dir) / "daily_context",
+                                                ttl_seconds=None)
+        self.daily_context_store = daily_context_store
+        self.daily_tolerances = daily_tolerances
+        self.daily_latency_budget = daily_latency_budget
+        self.instrumentation = instrumentation if instrumentation is not None else default_instrumentation()
+        if telemetry is None and self.response_cache is not None:
+            telemetry = TelemetryLog(Path(self.response_cache.cache_dir) / DEFAULT_DB_NAME)
+        self.telemetry = telemetry
+        if sleep_architecture_store is None and self.response_cache is not None:
+            sleep_architecture_store = SleepArchitectureStore(Path(self.response_cache.cache_dir) / "sleep_architecture")
+        self.sleep_architecture_store = sleep_architecture_store
+        self._sleep_architecture = None
+        self._semaphore = None
+        self._semaphore_loop = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.llm_usage = {
+            "calls": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "response_cache_hits": 0,
+            "daily_advice_reused": 0,
+        }
         
         # Initialize Claude client if API key is available
-        self._init_claude_client()
-        
-        # Set up plotting style
-        plt.style.use('default')
-        sns.set_palette("husl")
+        if self.claude_client is None:
+            self._init_claude_client()
         
     def _init_claude_client(self) -> None:
         """Initialize the Claude API client."""
+        _load_env()
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if api_key:
             try:
+                import anthropic
+
                 self.claude_client = anthropic.Anthropic(api_key=api_key)
+                if self.async_claude_client is None:
+                    self.async_claude_client = anthropic.AsyncAnthropic(api_key=api_key)
                 print("✓ Claude API client initialized")
             except Exception as e:
                 print(f"Warning: Failed to initialize Claude client: {e}")
         else:
             print("Warning: ANTHROPIC_API_KEY not found in environment variables")
     
+    @property
+    def health_data(self) -> Dict[str, pd.DataFrame]:
+        """Resident datasets by name; assigning a dict (or a dataset) gives it a new version."""
+        return self._health_data
+
+    @health_data.setter
+    def health_data(self, datasets: Dict[str, pd.DataFrame]) -> None:
+        self._health_data = _HealthData(datasets)
+
     def _load_data_dictionary(self) -> Dict[str, Dict[str, str]]:
-        """Load the Oura data dictionary from JSON file."""
-        dict_path = Path(__file__).parent / "static" / "oura_data_dictionary.json"
-        try:
-            with open(dict_path, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"Warning: Data dictionary not found at {dict_path}")
-            return {}
+        """Load the Oura data dictionary (read once per process and shared between instances)."""
+        return load_data_dictionary()
     
     def load_from_cache(self, data_dir: str = "data/") -> None:
         """
@@ -76,31 +332,17 @@ class OuraAnalysis:
         """
         data_path = Path(data_dir)
         
-        file_mappings = {
-            'dailyactivity_2023-01-07_2025-06-18.csv': 'daily_activity',
-            'dailycardiovascularage_2023-01-07_2025-06-18.csv': 'cardiovascular_age',
-            'dailyreadiness_2023-01-07_2025-06-18.csv': 'daily_readiness',
-            'dailyresilience_2023-01-07_2025-06-18.csv': 'daily_resilience',
-            'dailysleep_2023-01-07_2025-06-18.csv': 'daily_sleep',
-            'dailyspo2_2023-01-07_2025-06-18.csv': 'daily_spo2',
-            'dailystress_2023-01-07_2025-06-18.csv': 'daily_stress',
-            'heartrate_2023-01-07_2025-06-18.csv': 'heart_rate',
-            'ringconfiguration_2023-01-07_2025-06-18.csv': 'ring_config',
-            'session_2023-01-07_2025-06-18.csv': 'sessions',
-            'sleep_2023-01-07_2025-06-18.csv': 'sleep_detailed',
-            'tag_2023-01-07_2025-06-18.csv': 'tags',
-            'vo2max_2023-01-07_2025-06-18.csv': 'vo2_max',
-            'workout_2023-01-07_2025-06-18.csv': 'workouts'
-        }
-        
         self.health_data = {}
+        self.spilled_datasets = {}
         print("Loading health data files...")
         
-        for filename, key in file_mappings.items():
+        for filename, key in DATA_FILES.items():
             file_path = data_path / filename
             if file_path.exists():
                 try:
-                    df = pd.read_csv(file_path)
+                    with self.instrumentation.span("load", dataset=key, file=filename) as span:
+                        df = pd.read_csv(file_path, dtype={c: str for c in DIGIT_STRING_COLUMNS})
+                        span.set(rows=len(df))
                     self.health_data[key] = df
                     print(f"✓ Loaded {key}: {df.shape[0]} rows, {df.shape[1]} columns")
                 except Exception as e:
@@ -110,7 +352,87 @@ class OuraAnalysis:
         
         print(f"\\nSuccessfully loaded {len(self.health_data)} datasets")
     
-    def analyze_dataset(self, dataset_name: str, df: pd.DataFrame) -> Tuple[Dict[str, Any], plt.Figure]:
+    def optimize_memory(self, budget_bytes: Optional[int] = None, on_exceed: str = "spill",
+                        spill_dir: Optional[str] = None, **options: Any) -> pd.DataFrame:
+        """
+        Shrink the loaded datasets with compact dtypes and keep them within a memory budget.
+        
+        Low-cardinality strings become categoricals, numbers are downcast, ISO
+        timestamps become datetime64 and unique `id` columns are dropped (see
+        memory_optimizer). Datasets beyond the budget are spilled to disk, where
+        analyze_all_datasets(), plots, the prompt digest, the day context and the
+        local programmes read them back one at a time, or refused.
+        
+        Args:
+            budget_bytes: Total bytes of resident datasets; None keeps all of them
+            on_exceed: 'spill' or 'refuse' for datasets beyond the budget
+            spill_dir: Directory for spilled datasets; cache/spilled/<user> by default
+            **options: Passed to memory_optimizer.optimize_frame()
+            
+        Returns:
+            Per-dataset report of memory before and after, and each dataset's status
+        """
+        if spill_dir is None:
+            spill_dir = DEFAULT_SPILL_DIR / re.sub(r"[^A-Za-z0-9_-]", "_", self.user_id)
+        datasets = dict(self.health_data)
+        for dataset_name in list(self.spilled_datasets):
+            datasets[dataset_name] = self.load_spilled(dataset_name)
+        self.health_data, self.spilled_datasets, report = optimize_health_data(
+            datasets, budget_bytes, on_exceed, Path(spill_dir), **options)
+        
+        print("Memory usage by dataset:")
+        print(format_report(report))
+        for dataset_name, status in report["status"].items():
+            if status == "refused":
+                print(f"✗ {dataset_name} exceeds the memory budget and was not kept")
+        
+        if self.summary_stats:
+            # Plots must draw from the optimized frames, so the originals can be freed
+            self.restore_analysis({name: stats for name, stats in self.summary_stats.items()
+                                   if name in self.health_data or name in self.spilled_datasets})
+        return report
+    
+    def load_spilled(self, dataset_name: str) -> Optional[pd.DataFrame]:
+        """
+        Read a dataset spilled to disk by optimize_memory().
+        
+        Args:
+            dataset_name: Name of the dataset
+            
+        Returns:
+            The DataFrame, or None if the dataset was not spilled
+        """
+        path = self.spilled_datasets.get(dataset_name)
+        return pd.read_pickle(path) if path is not None else None
+    
+    def _all_datasets(self) -> Mapping:
+        """Resident and spilled datasets by name; spilled ones are read back when accessed."""
+        if not self.spilled_datasets:
+            return self.health_data
+        return _DatasetView(self)
+    
+    def _datasets_version(self) -> Tuple[Any, ...]:
+        """Version of the current datasets, resident by assignment and spilled by file."""
+        resident = tuple(self.health_data.versions.items())
+        spilled = tuple((name, str(path), path.stat().st_mtime_ns if path.exists() else None)
+                        for name, path in self.spilled_datasets.items())
+        return resident + spilled
+    
+    def _iter_datasets(self) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Resident datasets, then spilled ones read back one at a time."""
+        yield from self.health_data.items()
+        for dataset_name in self.spilled_datasets:
+            yield dataset_name, self.load_spilled(dataset_name)
+    
+    def _add_plot(self, dataset_name: str) -> None:
+        """Register a dataset's figure, drawn on first access."""
+        if dataset_name in self.health_data:
+            df = self.health_data[dataset_name]
+            self.plots.add(dataset_name, lambda: self._plot(dataset_name, df))
+        else:
+            self.plots.add(dataset_name, lambda: self._plot(dataset_name, self.load_spilled(dataset_name)))
+    
+    def analyze_dataset(self, dataset_name: str, df: pd.DataFrame) -> Tuple[Dict[str, Any], "plt.Figure"]:
         """
         Generate summary statistics and plots for a single dataset.
         
@@ -121,6 +443,16 @@ class OuraAnalysis:
         Returns:
             Tuple of (summary_stats_dict, matplotlib_figure)
         """
+        stats = self._summarize_dataset(dataset_name, df)
+        fig = self._create_plots(dataset_name, df, self._numeric_columns(df))
+        return stats, fig
+    
+    @staticmethod
+    def _numeric_columns(df: pd.DataFrame) -> List[str]:
+        return df.select_dtypes(include=[np.number]).columns.tolist()
+    
+    def _summarize_dataset(self, dataset_name: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Summary statistics for a single dataset (no plotting)."""
         stats = {
             'dataset_name': dataset_name,
             'shape': df.shape,
@@ -130,7 +462,7 @@ class OuraAnalysis:
         }
         
         # Get numeric columns for statistical analysis
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = self._numeric_columns(df)
         
         if numeric_cols:
             stats['numeric_summary'] = df[numeric_cols].describe().to_dict()
@@ -139,12 +471,17 @@ class OuraAnalysis:
             stats['numeric_summary'] = {}
             stats['correlations'] = {}
         
-        # Generate plots
-        fig = self._create_plots(dataset_name, df, numeric_cols)
-        
-        return stats, fig
+        return stats
     
-    def _create_plots(self, dataset_name: str, df: pd.DataFrame, numeric_cols: list) -> plt.Figure:
+    def _plot(self, dataset_name: str, df: pd.DataFrame) -> "plt.Figure":
+        """Draw a dataset's figure (on first access through self.plots)."""
+        # seaborn/matplotlib warn about empty or constant columns; only silence them while drawing
+        with self.instrumentation.span("plot", dataset=dataset_name) as span, warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            span.set(rows=len(df))
+            return self._create_plots(dataset_name, df, self._numeric_columns(df))
+    
+    def _create_plots(self, dataset_name: str, df: pd.DataFrame, numeric_cols: list) -> "plt.Figure":
         """
         Create comprehensive plots for a dataset.
         
@@ -156,6 +493,7 @@ class OuraAnalysis:
         Returns:
             matplotlib Figure object
         """
+        plt = _pyplot()
         if not numeric_cols:
             # Create a simple info plot for non-numeric datasets
             fig, ax = plt.subplots(1, 1, figsize=(8, 6))
@@ -216,22 +554,26 @@ class OuraAnalysis:
     def analyze_all_datasets(self) -> None:
         """
         Run analysis on all datasets and store results in the instance.
+        
+        Summary statistics are computed now; each dataset's figure in self.plots
+        is only drawn when it is first accessed.
         """
-        if not self.health_data:
+        if not self.health_data and not self.spilled_datasets:
             print("No health data loaded. Use load_from_cache() first.")
             return
         
         print("Analyzing all datasets...")
         self.summary_stats = {}
-        self.plots = {}
+        self.plots = _LazyFigures()
         
-        for dataset_name, df in self.health_data.items():
+        for dataset_name, df in self._iter_datasets():
             print(f"\\nAnalyzing {dataset_name}...")
             
             try:
-                stats, fig = self.analyze_dataset(dataset_name, df)
-                self.summary_stats[dataset_name] = stats
-                self.plots[dataset_name] = fig
+                with self.instrumentation.span("analyze", dataset=dataset_name) as span:
+                    self.summary_stats[dataset_name] = self._summarize_dataset(dataset_name, df)
+                    span.set(rows=len(df))
+                self._add_plot(dataset_name)
                 print(f"✓ Completed analysis for {dataset_name}")
                 
             except Exception as e:
@@ -239,6 +581,37 @@ class OuraAnalysis:
         
         print(f"\\nCompleted analysis for {len(self.summary_stats)} datasets")
     
+    def restore_analysis(self, summary_stats: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Restore previously computed summary statistics instead of re-running the analysis.
+        
+        Args:
+            summary_stats: summary_stats of an earlier analyze_all_datasets() on the same health_data
+        """
+        self.summary_stats = dict(summary_stats)
+        self._stats_digest = None
+        self.plots = _LazyFigures()
+        for dataset_name in self.summary_stats:
+            if dataset_name in self.health_data or dataset_name in self.spilled_datasets:
+                self._add_plot(dataset_name)
+    
+    def cached_state(self) -> Dict[str, Any]:
+        """
+        In-memory state derived from the datasets, for measuring an analyzer's footprint.
+        
+        Returns:
+            Dictionary with the summary statistics, drawn figures, sleep architecture table,
+            prompt digest, LLM usage counters and in-flight generations
+        """
+        return {
+            "summary_stats": self.summary_stats,
+            "figures": self.plots.drawn(),
+            "sleep_architecture": self._sleep_architecture[1] if self._sleep_architecture else None,
+            "stats_digest": self._stats_digest,
+            "llm_usage": self.llm_usage,
+            "inflight": self._inflight,
+        }
+    
     def get_dataset_info(self, dataset_name: str) -> None:
         """
         Print detailed information about a specific dataset.
@@ -246,15 +619,19 @@ class OuraAnalysis:
         Args:
             dataset_name: Name of the dataset to describe
         """
-        if dataset_name not in self.health_data:
+        if dataset_name not in self.health_data and dataset_name not in self.spilled_datasets:
             print(f"Dataset '{dataset_name}' not found.")
             return
         
-        df = self.health_data[dataset_name]
+        df = self.health_data.get(dataset_name)
+        if df is None:
+            df = self.load_spilled(dataset_name)
         print(f"\\n{dataset_name.replace('_', ' ').title()} Dataset Information")
         print("=" * 60)
         print(f"Shape: {df.shape[0]} rows, {df.shape[1]} columns")
         print(f"Memory usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+        if dataset_name in self.spilled_datasets:
+            print(f"Spilled to disk: {self.spilled_datasets[dataset_name]}")
         
         if dataset_name in self.data_dictionary:
             print("\\nColumn Descriptions:")
@@ -290,7 +667,7 @@ class OuraAnalysis:
             print(f"No plot available for '{dataset_name}'. Run analyze_all_datasets() first.")
             return
         
-        plt.figure(figsize=(12, 8))
+        _pyplot().figure(figsize=(12, 8))
         self.plots[dataset_name].show()
     
     def get_summary_stats(self, dataset_name: str) -> Dict[str, Any]:
@@ -309,6 +686,38 @@ class OuraAnalysis:
         
         return self.summary_stats[dataset_name]
     
+    def get_sleep_architecture(self) -> Optional[pd.DataFrame]:
+        """
+        Per-night sleep architecture from the detailed sleep periods.
+        
+        Stage durations and latencies, transitions, fragmentation, heart rate and
+        HRV curve features and regularity (see sleep_architecture.night_table()).
+        The table is kept in memory while the data is unchanged and stored on
+        disk per user, so it is only recomputed when the sleep data changes.
+        
+        Returns:
+            DataFrame with one row per sleep period, or None without sleep_detailed data
+        """
+        df = self.health_data.get('sleep_detailed')
+        if df is None:
+            df = self.load_spilled('sleep_detailed')
+        if df is None:
+            print("No detailed sleep data available.")
+            return None
+        
+        key = self.health_data.versions.get('sleep_detailed')
+        with self.instrumentation.span("analyze", dataset="sleep_architecture") as span:
+            if self._sleep_architecture is None or self._sleep_architecture[0] != key:
+                user_dir = re.sub(r"[^A-Za-z0-9_-]", "_", self.user_id)
+                nights, stored = cached_night_table(df, user_dir, self.sleep_architecture_store)
+                span.set(rows=len(df), cache="hit" if stored else "miss")
+                # Spilled data is read back on every call, so only resident frames are memoized
+                if 'sleep_detailed' in self.health_data:
+                    self._sleep_architecture = (key, nights)
+                return nights
+            span.set(cache="hit")
+            return self._sleep_architecture[1]
+    
     def list_datasets(self) -> None:
         """Print all available datasets."""
         if not self.health_data:
@@ -318,37 +727,75 @@ class OuraAnalysis:
         print("Available datasets:")
         for name, df in self.health_data.items():
             print(f"  {name}: {df.shape[0]} rows, {df.shape[1]} columns")
+        for name in self.spilled_datasets:
+            print(f"  {name}: spilled to disk")
     
     def _prepare_stats_summary(self) -> str:
-        """Prepare a concise summary of key statistics for Claude analysis."""
+        """Prepare a concise, token-budgeted summary of the most relevant metrics for Claude analysis."""
         if not self.summary_stats:
             return "No analysis data available. Please run analyze_all_datasets() first."
         
-        summary_text = "## Health Data Summary\n\n"
+        # The digest is reused across prompts until the data or budget changes
+        key = (self.prompt_token_budget, self._datasets_version())
+        with self.instrumentation.span("prompt") as span:
+            if self._stats_digest is None or self._stats_digest[0] != key:
+                span.set(rows=sum(len(df) for df in self.health_data.values()),
+                         spilled=len(self.spilled_datasets), cache="miss")
+                digest = build_stats_digest(self._all_datasets(), self.data_dictionary,
+                                            token_budget=self.prompt_token_budget)
+                self._stats_digest = (key, digest)
+            else:
+                span.set(cache="hit")
+            return self._stats_digest[1]
+    
+    def _user_profile_prompt(self, closing: bool = False) -> str:
+        """Format the per-user profile and statistics that vary between requests."""
+        return render_user_prompt(self.user_metadata, self._prepare_stats_summary(), closing=closing)
+
+    def _system_blocks(self, kind: str) -> List[Dict[str, Any]]:
+        """
+        Get the static system content blocks shared by every analysis request.
         
-        for dataset_name, stats in self.summary_stats.items():
-            summary_text += f"### {dataset_name.replace('_', ' ').title()}\n"
-            summary_text += f"- Records: {stats['shape'][0]} days of data\n"
-            summary_text += f"- Columns: {len(stats['columns'])}\n"
-            
-            # Add key numeric statistics
-            if stats['numeric_summary']:
-                summary_text += "- Key Metrics:\n"
-                for col, summary in list(stats['numeric_summary'].items())[:5]:  # Top 5 columns
-                    if 'mean' in summary and 'std' in summary:
-                        mean_val = summary['mean']
-                        std_val = summary['std']
-                        summary_text += f"  - {col}: Mean = {mean_val:.2f}, Std = {std_val:.2f}\n"
+        The blocks are rendered once per process by prompt_templates. The research
+        block comes first and each block carries a cache breakpoint, so requests
+        that share a prefix (e.g. the markdown and structured variants) still reuse
+        the cached research text.
+        
+        Args:
+            kind: Request kind, e.g. 'advice', 'advice_structured', 'daily' or 'daily_movement'
             
-            # Add missing data info
-            missing_total = sum(stats['missing_values'].values())
-            if missing_total > 0:
-                summary_text += f"- Missing data: {missing_total} total missing values\n"
+        Returns:
+            List of Anthropic system content blocks
+        """
+        return system_blocks(kind)
+
+    def get_analysis_prompt_blocks(self, structured: bool = False) -> Dict[str, Any]:
+        """
+        Build the analysis request split into cacheable system blocks and a per-user message.
+        
+        Args:
+            structured: Whether to request the JSON output format
             
-            summary_text += "\n"
+        Returns:
+            Dictionary with 'system' blocks and 'messages' ready for messages.create
+        """
+        return {
+            "system": self._system_blocks("advice_structured" if structured else "advice"),
+            "messages": [{"role": "user", "content": self._user_profile_prompt(closing=not structured)}],
+        }
+
+    def get_daily_prompt_blocks(self) -> Dict[str, Any]:
+        """
+        Build the structured daily programmes request, grounded on this user's analysis.
         
-        return summary_text
-    
+        Returns:
+            Dictionary with 'system' blocks and 'messages' ready for messages.create
+        """
+        return {
+            "system": self._system_blocks("daily"),
+            "messages": [{"role": "user", "content": self._user_profile_prompt()}],
+        }
+
     def get_analysis_prompt(self) -> str:
         """
         Generate and return the prompt that would be sent to Claude API.
@@ -359,197 +806,214 @@ class OuraAnalysis:
         if not self.summary_stats:
             return "No analysis data available. Please run analyze_all_datasets() first."
         
-        # Prepare the data summary
-        stats_summary = self._prepare_stats_summary()
-        md_report ="""# Evidence-Based Women's Health Optimization Using Wearable Technology
-
-Comprehensive research reveals that **progesterone-driven physiological changes across the menstrual cycle fundamentally alter all major wearable metrics**, requiring cycle-integrated approaches for accurate health optimization. Recent large-scale studies analyzing over 45,000 menstrual cycles demonstrate that women's health recommendations must account for significant phase-specific variations in heart rate variability, resting heart rate, and body temperature. This evidence-based framework provides actionable strategies for developing personalized women's health applications that leverage wearable technology data while addressing the unique physiological patterns of female health across diverse age ranges, fitness levels, and health conditions.
-
-The clinical significance extends beyond simple tracking - HRV suppression during the luteal phase correlates directly with premenstrual mood symptoms, while phase-specific recovery patterns influence injury risk and training adaptations. Contraceptive use fundamentally alters these patterns, requiring separate algorithmic approaches for synthetic hormone users. This research synthesis establishes the foundation for evidence-based app development that moves beyond one-size-fits-all approaches to deliver truly personalized women's health optimization.
-
-## General wellness optimization for women using wearable data
-
-**Progesterone emerges as the primary hormonal driver** of cardiovascular changes throughout the menstrual cycle, with profound implications for wellness optimization strategies. Large-scale research involving 11,590 participants across 45,811 cycles reveals that traditional single-baseline approaches fail to capture the dynamic nature of women's physiology.
-
-### Foundational cycle-aware metrics establish personalized baselines
-
-Heart rate variability demonstrates the most significant cyclical variation, with **RMSSD peaking around day 5 (follicular phase) and reaching minimum values around day 27 (late luteal phase)**. This represents more than measurement noise - the progesterone-induced HRV suppression directly correlates with reduced stress resilience and premenstrual symptom severity. Resting heart rate follows predictable patterns, increasing 2-7 beats per minute from follicular to luteal phases due to progesterone-induced sympathetic nervous system activation.
-
-Body temperature tracking via wearable devices shows **90% accuracy for ovulation detection** when combined with other physiological metrics. The traditional biphasic temperature pattern, while clinically validated, benefits from sophisticated cosinor modeling that accounts for individual oscillation patterns rather than simple before-and-after comparisons.
-
-### Phase-specific wellness recommendations optimize health outcomes
-
-**Early follicular phase (days 1-5)** represents a recovery optimization window. Peak HRV values during this period indicate maximum stress resilience and adaptation capacity. Wellness applications should capitalize on this physiological state by recommending challenging stress exposure, intensive recovery protocols, and establishment of new health routines.
-
-**Late follicular phase (days 6-14)** provides the optimal performance window for most health interventions. Enhanced recovery capacity, peak cardiovascular resilience, and stable hormonal patterns make this the ideal time for progressive overload in exercise, intensive stress management training, and implementation of challenging lifestyle changes.
-
-**Luteal phase (days 15-28)** requires modified approaches acknowledging reduced stress adaptation capacity. HRV decreases of 15-20% from follicular baselines indicate the need for extended recovery periods, intensified stress management protocols, and gentler introduction of new health interventions. Temperature regulation challenges during this phase require enhanced hydration strategies and environmental cooling approaches.
-
-### Contraceptive considerations fundamentally alter recommendations
-
-Oral contraceptive pills create **significantly attenuated cardiovascular patterns** compared to natural cycles. Research demonstrates no significant HRV differences between high and low hormone phases in OCP users, eliminating the cycle-based optimization advantages available to naturally cycling women. This population requires separate algorithmic approaches emphasizing sleep quality, nutrition optimization, and stress management over hormonal cycle tracking.
-
-The clinical implications extend to all major wearable metrics - recovery recommendations for contraceptive users should focus on non-hormonal indicators while maintaining different baseline ranges for cardiovascular parameters.
-
-## Fitness and performance optimization specific to women
-
-Evidence-based fitness optimization using wearable technology reveals **only trivial performance differences between menstrual cycle phases**, but recovery needs vary dramatically. Meta-analyses of 73 studies establish that while absolute performance capacity remains relatively stable, the physiological cost and recovery requirements fluctuate significantly throughout the cycle.
-
-### HRV-guided training protocols enhance women's fitness outcomes
-
-**Root mean square of successive differences (lnRMSSD) serves as the optimal metric** for training readiness in women. Morning measurements during the last 5 minutes of slow-wave sleep provide the most reliable data for training decisions. Research demonstrates 33% greater strength improvements with HRV-guided periodization compared to predetermined training schedules.
-
-Implementation requires establishing separate baselines for follicular versus luteal phases. When HRV exceeds 102% of phase-specific baseline, proceed with planned high-intensity work. Values between 98-102% indicate moderate training with potential adjustments, while readings below 98% signal the need for reduced intensity or active recovery protocols.
-
-### Cycle-based periodization strategies show promising results
-
-**Follicular phase-focused training** demonstrates superior strength and muscle mass adaptations in controlled studies. Research by Sung et al. showed 42% greater strength gains and 46% more muscle growth when training frequency concentrated in the first two weeks versus the second two weeks of the cycle. The IMPACT Study, currently underway with 120 well-trained women, will provide definitive evidence for optimal periodization strategies.
-
-**Practical implementation** involves scheduling 4-5 strength sessions and 2-3 high-intensity endurance sessions during the follicular phase, while emphasizing technique refinement, power development, and recovery modalities during the luteal phase. This approach capitalizes on enhanced protein synthesis and reduced exercise-induced muscle damage during high-estrogen phases.
-
-### Recovery optimization using wearable data addresses gender-specific patterns
-
-**Sleep quality emerges as the single most predictive factor** for injury prevention in female athletes, with greater than 8 hours of sleep reducing injury odds by 61%. Wearable sleep tracking provides actionable insights for recovery optimization, particularly important given women's increased susceptibility to sleep disruption during luteal phases.
-
-Metabolically suppressed female athletes demonstrate significantly lower HRV values (81±27 ms versus 110±35 ms in healthy athletes), establishing wearable-derived HRV as a practical screening tool for energy deficiency - a condition disproportionately affecting women athletes.
-
-### Load management principles prevent overtraining and injury
-
-**Player load metrics customized for women** account for cycle-specific capacity changes and positional demands. Acute-to-chronic workload ratios require adjustment for luteal phase capacity reductions, with research suggesting 10-15% decreases in strength endurance and voluntary activation during high-progesterone phases.
-
-Critical implementation involves monitoring the convergence of multiple wearable metrics - consistently low HRV combined with elevated resting heart rate and poor sleep quality indicates potential overreaching requiring immediate intervention.
-
-## Sleep improvement strategies for women based on wearable metrics
-
-**Consumer wearables demonstrate 86-89% accuracy for sleep-wake detection** with variable performance for specific sleep stages, providing sufficient precision for practical sleep optimization in women. The integration of multiple metrics - HRV, temperature, and sleep architecture - enables personalized approaches that account for menstrual cycle influences on sleep quality.
-
-### Menstrual cycle effects on sleep architecture require targeted interventions
-
-**Core body temperature increases of 0.3-0.7°C during the luteal phase** directly impact sleep quality through altered thermoregulation. Wearable temperature data from devices like the Oura Ring successfully track these oscillations across cycles, enabling personalized sleep environment recommendations.
-
-**Sleep architecture changes** include reduced REM sleep and increased slow-wave sleep during the luteal phase, accompanied by subjective sleep quality decline premenstrually. Heart rate variability decreases and resting heart rate increases create measurable signatures that wearables can detect and use for intervention timing.
-
-### Phase-specific sleep optimization protocols improve outcomes
-
-**Follicular phase strategies** leverage naturally higher HRV and lower core temperature for intensive recovery. Earlier bedtime recommendations capitalize on natural temperature drops, while the enhanced recovery capacity supports more intensive exercise programs that improve sleep quality.
-
-**Luteal phase adaptations** address elevated core temperature through cooler sleep environments, earlier bedtime recommendations to compensate for potential fragmentation, and increased focus on stress management techniques due to reduced HRV. Targeted interventions for bloating and breast tenderness help optimize sleep positioning and comfort.
-
-**Menstruation phase protocols** emphasize comfort optimization through heated sleep environments for cramp relief and allowance for longer sleep opportunities to compensate for quality reduction. Pain management integration with sleep position recommendations provides comprehensive support during symptomatic phases.
-
-### Age-related sleep considerations span the reproductive lifespan
-
-**Reproductive years (18-35)** benefit from full menstrual cycle optimization using temperature and HRV data. Integration with career demands requires circadian rhythm maintenance strategies for shift work and travel, while performance optimization aligns training and recovery with hormonal patterns.
-
-**Perimenopause (40-55)** presents unique challenges requiring adaptive algorithms for irregular cycles. Vasomotor symptoms detected through temperature monitoring enable targeted hot flash management, while increased sleep fragmentation demands enhanced focus on sleep efficiency and wake episode reduction.
-
-**Postmenopause (55+)** shifts emphasis to circadian rhythm stability through consistent sleep-wake patterns. Stable temperature monitoring enables sleep optimization without cycle considerations, while integration with other health conditions affecting sleep becomes increasingly important.
-
-### Evidence-based interventions demonstrate measurable improvements
-
-**Sleep hygiene interventions** show statistically significant improvements in sleep duration, efficiency, and quality in 7 of 9 recent studies when individualized to wearable metrics rather than using generic approaches. Automated coaching systems like WHOOP 4.0 and Rise Science provide personalized recommendations based on HRV, sleep debt, and circadian phase calculations.
-
-**HRV-guided recovery protocols** establish 2-4 week baseline periods for individual pattern recognition. Rising HRV trends indicate successful recovery, while declining patterns signal the need for extended recovery periods or stress intervention. Sleep debt management using wearable data enables strategic recovery periods aligned with performance demands.
-
-## Stress management approaches using wearable data for women
-
-**Heart rate variability serves as the gold standard biomarker** for autonomic nervous system assessment and stress management in women, with research demonstrating significant cyclical fluctuations that require phase-aware interpretation. Meta-analyses confirm HRV decreases progressively from menstrual through proliferative to secretory phases, with sympathetic nervous activity predominating during luteal phases while parasympathetic activity peaks during follicular phases.
-
-### Real-time stress detection enables just-in-time interventions
-
-**Validated stress biomarkers** tracked by consumer wearables include HRV patterns (higher HRV indicating better stress resilience), heart rate elevation, sleep quality deterioration, and emerging sweat-based cortisol detection. Large-scale studies with over 1,000 subjects confirm associations between wearable physiological signals and self-reported daily-life stress.
-
-**Machine learning approaches** achieve 85% accuracy for stress state classification using random forest models combining HRV, sleep, activity, and contextual data. Individual baseline establishment over 2-4 weeks enables personalized detection models that outperform population-based approaches.
-
-### Evidence-based interventions demonstrate measurable physiological improvements
-
-**Breathing exercises paced at 6 breaths per minute** significantly increase HRV parameters including SDNN, LF power, and improve LF/HF ratios. Four-week resonance breathing training shows lasting improvements in stress resilience, cognitive performance, and perceived stress reduction. Extended exhale techniques specifically stimulate parasympathetic activity for immediate stress relief.
-
-**HRV biofeedback training** at individual optimal frequencies provides superior outcomes compared to generic protocols. Real-time wearable feedback during coherent breathing exercises (5 breaths per minute) optimizes HRV responses and builds long-term stress resilience.
-
-**Mindfulness interventions** delivered through smartwatch notifications show effectiveness in improving RMSSD (parasympathetic activity) and reducing perceived stress in 10-day protocols. Just-in-time adaptive interventions (JITAIs) that incorporate menstrual cycle phase as a time-varying factor demonstrate enhanced effectiveness.
-
-### Cycle-aware stress management addresses hormonal influences
-
-**Late luteal and menstrual phases** require intensified intervention approaches due to decreased estrogen levels creating higher perceived stress scores and increased cortisol reactivity. Wearable applications should automatically adjust intervention frequency and intensity during these vulnerable periods.
-
-**Follicular phase opportunities** capitalize on lower stress perception and higher stress resilience for building coping skills and stress tolerance. This represents the optimal window for introducing challenging stress management techniques and building psychological resilience.
-
-### Chronic stress identification prevents long-term health consequences
-
-**Prolonged HRV suppression** over weeks to months, combined with sleep disruption patterns and altered activity rhythms, provides early warning signals for chronic stress states. Digital biomarkers including consistently low HRV, reduced sleep efficiency, and altered circadian patterns enable intervention before clinical symptoms develop.
-
-**Personalized alert systems** notify users when chronic stress indicators exceed individual thresholds, triggering recommendations for professional support, lifestyle modifications, or medical consultation. Integration with healthcare providers enables seamless transition from self-management to clinical care when appropriate.
-
-### Sleep-stress-performance interactions guide comprehensive interventions
-
-**Sleep quality emerges as the strongest predictor** of next-day stress resilience in university studies using Oura Ring data. Women demonstrate distinct heart rate curves during sleep, with stress-related delayed heart rate drops providing measurable indicators of stress impact on recovery processes.
-
-**Performance optimization protocols** adjust daily workloads and demands based on sleep-stress interaction patterns. Recovery recommendations emphasize sleep hygiene when stress indicators suggest compromised resilience, while stress management intensifies when sleep quality deteriorates.
-
-## Implementation considerations for evidence-based women's health apps
-
-**Multi-sensor data fusion approaches** combining temperature, HRV, and activity data achieve significantly higher accuracy (87% versus 72% for single metrics) for cycle tracking and health optimization. Individual baseline establishment requires minimum 2-3 complete cycles for naturally cycling women, with extended 6-month periods needed for irregular cycles or perimenopausal women.
-
-### Privacy and security considerations address unique vulnerabilities
-
-**Enhanced data protection standards** are essential for reproductive health data, with 20 of 23 popular femtech apps currently sharing data with third parties without clear user consent. The post-Dobbs legal landscape increases risks of data misuse, requiring end-to-end encryption, local processing capabilities, and granular user controls for data deletion and sharing.
-
-**Clinical integration opportunities** exist through shareable reports for healthcare providers, automated alerts for potential sleep disorders or chronic stress requiring medical attention, and consideration of medication interactions with wearable metrics. FDA-cleared features demonstrate higher accuracy than general wellness metrics, suggesting pathways for clinical-grade applications.
-
-### Algorithm development priorities ensure effectiveness and equity
-
-**Transfer learning approaches** adapt general models to individual users with limited personal data, while federated learning enables training across diverse populations while preserving privacy. Continual learning systems update models as user physiology and behavior patterns change over time.
-
-**Bias detection and correction** requires systematic evaluation of algorithmic performance across demographic groups, with current validation studies skewing toward young, affluent, technology-proficient users. Representative validation across age ranges, ethnicities, and health conditions ensures equitable outcomes.
-
-The convergence of advancing sensor technology, sophisticated AI/ML approaches, and growing understanding of women's physiological patterns creates unprecedented opportunities for evidence-based, personalized health optimization systems that truly account for the complexity of female physiology across the lifespan."""
-        # Create the prompt
-        prompt = f"""You are a health and performance expert analyzing Oura Ring data for a client. Please provide personalized, science-backed advice based on the data analysis and user profile below.
-
-## User Profile
-Name: {self.user_metadata.get('name', 'User')}
-Age: {self.user_metadata.get('age', 'Not specified')}
-Goals: {self.user_metadata.get('goals', 'General health')}
-
-## Data Dictionary Context
-The following data comes from an Oura Ring, which tracks various health metrics:
-
-{json.dumps(self.data_dictionary, indent=2)}
-
-## Health Data Analysis
-{stats_summary}
-
-## Instructions
-Based on this data analysis and the user's profile, provide comprehensive, actionable advice. 
-Your advice should be specific to women. Use the following markdown scientific report on research for women's health to guide you.
-{md_report}
-
-Structure your response with the following sections:
-
-### Behavioral Recommendations
-Provide specific lifestyle and daily habit recommendations based on the data patterns observed.
-
-### Exercise Recommendations  
-Suggest specific workout types, intensities, timing, and recovery protocols based on the readiness, activity, and cardiovascular data.
-
-### Nutrition Recommendations
-Recommend dietary strategies that align with the observed sleep, recovery, and performance patterns.
-
-### Supplementation Recommendations
-Suggest evidence-based supplements that could support the user's goals and address any deficiencies suggested by the data.
-
-Make sure all recommendations are:
-- Science-backed with brief explanations of the reasoning
-- Specific and actionable
-- Tailored to the user's age, goals, and data patterns
-- Realistic for implementation
-- take into account the menstrual cycle
+        request = self.get_analysis_prompt_blocks()
+        parts = [block["text"] for block in request["system"]]
+        parts += [message["content"] for message in request["messages"]]
+        return "\n\n".join(parts)
+
+    @property
+    def user_id(self) -> str:
+        """Identifier used to isolate this user's cached responses."""
+        return str(self.user_metadata.get('user_id') or self.user_metadata.get('name') or 'anonymous')
+
+    @staticmethod
+    def _request_params(messages: List[Dict[str, Any]], max_tokens: int,
+                        system: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """Assemble messages.create parameters (without the model) for a request."""
+        params = {"max_tokens": max_tokens, "messages": messages}
+        if system:
+            params["system"] = system
+        return params
+
+    def response_cache_key(self, params: Dict[str, Any]) -> str:
+        """
+        Get the response cache key for a request made on behalf of this user.
+        
+        Args:
+            params: Request parameters as built by _request_params
+            
+        Returns:
+            Cache key, shared by the sync, async, streaming and batch paths
+        """
+        return ResponseCache.make_key(self.user_id, CLAUDE_MODEL, params)
 
-Focus on the most impactful recommendations rather than overwhelming with too many suggestions.
-begin response with 'Emma's Personalized Health Advice:' and ensure the response is concise yet comprehensive."""
+    def _create_message(self, messages: List[Dict[str, Any]], max_tokens: int,
+                        system: Optional[List[Dict[str, Any]]] = None, method: Optional[str] = None) -> str:
+        """
+        Get a Claude response for a request, serving repeats from the response cache.
+        
+        Args:
+            messages: Conversation messages for the request
+            max_tokens: Maximum number of tokens to generate
+            system: Optional system content blocks
+            method: Public method requesting the response, for telemetry
+            
+        Returns:
+            Text of the response
+        """
+        params = self._request_params(messages, max_tokens, system)
+        
+        with self.instrumentation.span("llm", max_tokens=max_tokens) as span, \
+                self._generation(max_tokens, method=method) as record:
+            if self.response_cache is None:
+                span.set(cache="miss")
+                return self._call_claude(params, record)
+            
+            key = self.response_cache_key(params)
+            text, hit = self.response_cache.get_or_create(key, lambda: self._call_claude(params, record),
+                                                          user_id=self.user_id)
+            span.set(cache="hit" if hit else "miss")
+            if hit:
+                self.llm_usage["response_cache_hits"] += 1
+                self._served_from(record, "response_cache")
+            return text
+
+    def _cached_response(self, key: str) -> Optional[str]:
+        """Cached response for a key, or None on a miss or without a response cache."""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get(key, user_id=self.user_id)
+
+    def _cache_response(self, key: str, text: str) -> None:
+        """Store a complete response, if there is a response cache."""
+        if self.response_cache is not None:
+            self.response_cache.set(key, text, user_id=self.user_id)
+
+    @contextmanager
+    def _generation(self, max_tokens: int, streamed: bool = False, method: Optional[str] = None,
+                    batch: bool = False) -> Iterator[Any]:
+        """
+        Telemetry record for one generation, written to the telemetry log on exit.
+        
+        Args:
+            max_tokens: Maximum number of tokens to generate
+            streamed: Whether the response is streamed
+            method: Public method requesting the generation
+            batch: Whether it was sent through the Message Batches API (priced at batch rates)
+            
+        Yields:
+            The record to fill in, or None when telemetry is off
+        """
+        if self.telemetry is None:
+            yield None
+            return
+        record = new_generation(self.user_id, method, CLAUDE_MODEL, max_tokens, streamed)
+        try:
+            yield record
+        except GeneratorExit:
+            if record["source"] == "api":
+                record["error"] = "abandoned"
+            raise
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["latency_seconds"] = time.perf_counter() - record["_start"]
+            record["retries"] = max(record["_attempts"] - 1, 0)
+            record["cost_usd"] = estimate_cost(CLAUDE_MODEL, record, batch) if record["source"] == "api" else 0.0
+            self.telemetry.record(record)
+
+    @staticmethod
+    def _served_from(record: Optional[Dict[str, Any]], source: str) -> None:
+        if record is not None:
+            record["source"] = source
+
+    @staticmethod
+    def _first_token(record: Optional[Dict[str, Any]]) -> None:
+        if record is not None and record["ttft_seconds"] is None:
+            record["ttft_seconds"] = time.perf_counter() - record["_start"]
+
+    @staticmethod
+    def _counting_attempts(send: Callable[[], Any], record: Optional[Dict[str, Any]]) -> Callable[[], Any]:
+        """Wrap send so the record counts each attempt, including retries by the scheduler."""
+        if record is None:
+            return send
+        
+        def attempt() -> Any:
+            record["_attempts"] += 1
+            return send()
+        return attempt
+
+    def _scheduled(self, send: Callable[[], Any], params: Dict[str, Any],
+                   record: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a request through the scheduler, if one is configured."""
+        send = self._counting_attempts(send, record)
+        if self.scheduler is None:
+            return send()
+        return self.scheduler.call(send, self.priority, estimate_request_tokens(params), params["max_tokens"])
+
+    async def _ascheduled(self, send: Callable[[], Awaitable[Any]], params: Dict[str, Any],
+                          record: Optional[Dict[str, Any]] = None) -> Any:
+        """Async version of _scheduled()."""
+        send = self._counting_attempts(send, record)
+        if self.scheduler is None:
+            return await send()
+        return await self.scheduler.acall(send, self.priority, estimate_request_tokens(params),
+                                          params["max_tokens"])
+
+    def _call_claude(self, params: Dict[str, Any], record: Optional[Dict[str, Any]] = None) -> str:
+        """Send a request to Claude and record its token usage."""
+        response = self._scheduled(lambda: self.claude_client.messages.create(model=CLAUDE_MODEL, **params),
+                                   params, record)
+        self._record_usage(getattr(response, "usage", None), record)
+        return response.content[0].text
+
+    def _record_usage(self, usage: Any, record: Optional[Dict[str, Any]] = None) -> None:
+        """Accumulate token counts, including prompt cache reads and writes."""
+        self.llm_usage["calls"] += 1
+        if usage is None:
+            return
+        for field in TOKEN_FIELDS:
+            tokens = getattr(usage, field, None) or 0
+            self.llm_usage[field] += tokens
+            if record is not None:
+                record[field] = tokens
 
-        return prompt
+    def get_llm_usage(self) -> Dict[str, Any]:
+        """
+        Get accumulated Claude token usage for this analyzer.
+        
+        Returns:
+            Dictionary of token counters plus the share of prompt tokens served
+            from cache and the estimated cost in USD
+        """
+        usage = dict(self.llm_usage)
+        prompt_tokens = (usage["input_tokens"] + usage["cache_creation_input_tokens"]
+                         + usage["cache_read_input_tokens"])
+        usage["cache_hit_ratio"] = usage["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        usage["estimated_cost_usd"] = estimate_cost(CLAUDE_MODEL, usage)
+        return usage
+
+    def _parse_structured_response(self, advice_text: str,
+                                   sections: Optional[Dict[Tuple[Any, ...], Dict[str, Any]]] = None,
+                                   schema: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Parse a JSON response from Claude, tolerating markdown fences and surrounding text.
+        
+        Args:
+            advice_text: Raw response text
+            sections: Section patterns and schemas used to salvage a truncated response
+            schema: Optional schema the whole document must satisfy
+            
+        Returns:
+            Parsed (possibly partial) dictionary, or an error dictionary including the raw response
+        """
+        structured_advice = extract_json(advice_text, sections)
+        
+        if "error" not in structured_advice and schema is not None:
+            errors = validate(structured_advice, schema)
+            if errors:
+                structured_advice = {"error": "Response did not match schema: " + "; ".join(errors)}
+        
+        for error in structured_advice.get("errors") or []:
+            print(f"Warning: {error}")
+        if "error" in structured_advice or "parse_error" in structured_advice:
+            print(f"JSON parsing error: {structured_advice.get('error') or structured_advice['parse_error']}")
+            print(f"Raw response: {advice_text[:200]}...")
+        if "error" in structured_advice:
+            # Fallback to text response
+            structured_advice["raw_response"] = advice_text
+        return structured_advice
 
     def generate_personalized_advice(self) -> str:
         """
@@ -564,24 +1028,12 @@ begin response with 'Emma's Personalized Health Advice:' and ensure the response
         if not self.summary_stats:
             return "No analysis data available. Please run analyze_all_datasets() first."
         
-        # Get the prompt using the new method
-        prompt = self.get_analysis_prompt()
+        request = self.get_analysis_prompt_blocks()
 
         try:
             # Call Claude API
-            response = self.claude_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            )
-            with open("claude_response.json", "w") as f:
-                json.dump(response.content[0].text, f)
-            return response.content[0].text
+            return self._create_message(request["messages"], max_tokens=4000, system=request["system"],
+                                        method="generate_personalized_advice")
             
         except Exception as e:
             return f"Error generating advice: {str(e)}"
@@ -599,328 +1051,633 @@ begin response with 'Emma's Personalized Health Advice:' and ensure the response
         if not self.summary_stats:
             return {"error": "No analysis data available. Please run analyze_all_datasets() first."}
         
-        # Get the base prompt and modify for JSON output
-        base_prompt = self.get_analysis_prompt()
-        
-        # Add JSON structure requirements
-        json_prompt = base_prompt + """
-
-Please provide your response in the following JSON format:
-
-{
-  "title": "Emma's Personalized Health Advice",
-  "user_profile": {
-    "name": "Emma",
-    "age": 26,
-    "focus_areas": ["sleep optimization", "recovery", "cardiovascular health"]
-  },
-  "sections": {
-    "behavioral": {
-      "title": "Behavioral Recommendations",
-      "icon": "🧠",
-      "recommendations": [
-        {
-          "title": "Recommendation title",
-          "description": "Detailed description of the recommendation",
-          "reasoning": "Brief scientific reasoning behind this recommendation",
-          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
-        }
-      ]
-    },
-    "exercise": {
-      "title": "Exercise Recommendations", 
-      "icon": "💪",
-      "recommendations": [
-        {
-          "title": "Recommendation title",
-          "description": "Detailed description of the recommendation",
-          "reasoning": "Brief scientific reasoning behind this recommendation",
-          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
-        }
-      ]
-    },
-    "nutrition": {
-      "title": "Nutrition Recommendations",
-      "icon": "🥗", 
-      "recommendations": [
-        {
-          "title": "Recommendation title",
-          "description": "Detailed description of the recommendation",
-          "reasoning": "Brief scientific reasoning behind this recommendation",
-          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
-        }
-      ]
-    },
-    "supplementation": {
-      "title": "Supplementation Recommendations",
-      "icon": "💊",
-      "recommendations": [
-        {
-          "title": "Recommendation title", 
-          "description": "Detailed description of the recommendation",
-          "reasoning": "Brief scientific reasoning behind this recommendation",
-          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
-        }
-      ]
-    }
-  }
-}
-
-Provide 2-4 specific, actionable recommendations per section. Make sure all recommendations are science-backed and personalized to Emma's data patterns."""
+        request = self.get_analysis_prompt_blocks(structured=True)
 
         try:
             # Call Claude API with JSON mode
-            response = self.claude_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=4000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": json_prompt
-                    }
-                ]
-            )
-            
-            # Parse the JSON response
-            advice_text = response.content[0].text
-            
-            # Save raw response for debugging
-            with open("claude_response.json", "w") as f:
-                json.dump(advice_text, f)
-            
-            # Try to parse as JSON
-            try:
-                # Clean the response text more thoroughly
-                cleaned_text = advice_text.strip()
-                
-                # Remove markdown formatting
-                if cleaned_text.startswith('```json'):
-                    cleaned_text = cleaned_text[7:]
-                elif cleaned_text.startswith('```'):
-                    cleaned_text = cleaned_text[3:]
-                    
-                if cleaned_text.endswith('```'):
-                    cleaned_text = cleaned_text[:-3]
-                
-                cleaned_text = cleaned_text.strip()
-                
-                # Find JSON object boundaries
-                start_idx = cleaned_text.find('{')
-                end_idx = cleaned_text.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    cleaned_text = cleaned_text[start_idx:end_idx+1]
-                
-                structured_advice = json.loads(cleaned_text)
-                
-                # Save structured response
-                with open("claude_structured_response.json", "w") as f:
-                    json.dump(structured_advice, f, indent=2)
-                
-                return structured_advice
-                
-            except json.JSONDecodeError as json_error:
-                print(f"JSON parsing error: {json_error}")
-                print(f"Raw response: {advice_text[:200]}...")
-                # Fallback to text response
-                return {"error": f"Failed to parse JSON response: {str(json_error)}", "raw_response": advice_text}
+            advice_text = self._create_message(request["messages"], max_tokens=4000, system=request["system"],
+                                               method="generate_personalized_advice_structured")
+            return self._parse_structured_response(advice_text, ADVICE_SECTIONS)
             
         except Exception as e:
             return {"error": f"Error generating advice: {str(e)}"}
     
-    def generate_daily_advice_structured(self) -> dict:
+    def get_day_context(self) -> Dict[str, Any]:
+        """
+        Get the day-level inputs daily advice depends on (latest readiness, sleep,
+        stress, cycle phase and anomalous metrics).
+        
+        Returns:
+            Day context dictionary from daily_context.build_day_context()
+        """
+        return build_day_context(self._all_datasets(), self.user_metadata)
+
+    def _daily_advice_key(self) -> str:
+        return self.daily_context_store.make_key(self.user_id, CLAUDE_MODEL, {"kind": "daily_advice_structured"})
+
+    def _reusable_daily_advice(self, context: Dict[str, Any]) -> Optional[dict]:
+        """Return the previous daily advice if today's context has not changed materially."""
+        if self.daily_context_store is None:
+            return None
+        previous = self.daily_context_store.get(self._daily_advice_key(), user_id=self.user_id)
+        if not previous:
+            return None
+        if previous.get("fingerprint") != fingerprint(context):
+            changes = material_changes(previous["context"], context, self.daily_tolerances)
+            if changes:
+                print(f"Daily inputs changed ({', '.join(changes)}); regenerating daily advice")
+                return None
+        self.llm_usage["daily_advice_reused"] += 1
+        return previous["advice"]
+
+    def _remember_daily_advice(self, context: Dict[str, Any], advice: dict) -> None:
+        """Store complete daily advice with the context it was generated from."""
+        if self.daily_context_store is None or "error" in advice or advice.get("partial") or advice.get("errors"):
+            return
+        record = {"context": context, "fingerprint": fingerprint(context), "advice": advice}
+        self.daily_context_store.set(self._daily_advice_key(), record, user_id=self.user_id)
+
+    def generate_local_daily_advice(self) -> dict:
+        """
+        Generate today's programmes with the deterministic local rules, without an API call.
+        
+        Returns:
+            Dictionary in the generate_daily_advice_structured() format with
+            'source': 'local', or an error dictionary if there is too little data
+        """
+        return recommend_daily_programs(self._all_datasets(), self.user_metadata)
+
+    def _local_fallback(self, error: str) -> dict:
+        """Local programmes annotated with the LLM error, or the error itself if they are unavailable."""
+        local = self.generate_local_daily_advice()
+        if "error" in local:
+            return {"error": error}
+        return {**local, "llm_error": error}
+
+    def _within_latency_budget(self, call: Callable[[], str]) -> str:
+        """
+        Run a Claude call, giving up after daily_latency_budget seconds.
+        
+        The call keeps running in a worker thread after a timeout, so its response
+        still lands in the response cache for the next request.
+        
+        Raises:
+            TimeoutError: If the call did not finish within the budget
+        """
+        if self.daily_latency_budget is None:
+            return call()
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(call)
+        executor.shutdown(wait=False)
+        try:
+            return future.result(timeout=self.daily_latency_budget)
+        except FuturesTimeoutError:
+            raise TimeoutError(f"Claude did not respond within {self.daily_latency_budget:g}s") from None
+
+    def generate_daily_advice_structured(self, force: bool = False) -> dict:
         """
         Generate structured daily advice using Claude API with JSON output.
         
+        The programmes are grounded on this user's own analysis, sharing the cached
+        research block with the overview advice. The previous advice is reused while
+        the day context (see get_day_context()) stays within the configured tolerances.
+        Without a Claude client, if the API call fails or if it takes longer than
+        daily_latency_budget, the local rule-based programmes (see
+        generate_local_daily_advice()) are returned instead.
+        
+        Args:
+            force: Regenerate even if the day context has not changed
+        
         Returns:
             Dictionary containing structured daily programs for movement, mindfulness, and nutrition
         """
         if not self.claude_client:
-            return {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}
+            return self._local_fallback("Claude API client not available. Please set ANTHROPIC_API_KEY environment variable.")
         
-        # Load the previous Claude response from file
-        try:
-            with open("claude_response.json", "r") as f:
-                previous_response = json.load(f)
-        except Exception as e:
-            return {"error": f"Failed to load previous response: {e}"}
+        if not self.summary_stats:
+            return {"error": "No analysis data available. Please run analyze_all_datasets() first."}
+        
+        context = self.get_day_context()
+        if not force:
+            reused = self._reusable_daily_advice(context)
+            if reused is not None:
+                return reused
         
         # Generate structured daily advice in card format with scientific citations
-        json_prompt = f"""Based on the existing advice that you have on Emma and her metadata:
-{previous_response}
-
-IMPORTANT: You must respond ONLY with valid JSON. Do not include any text before or after the JSON. Do not use markdown formatting. Respond with pure JSON only.
-
-Please provide 3 different daily programmes that will be displayed as flippable cards.
-The daily programmes should pertain to one activity only, be that one full workout, one breating exercise routine or one day's meal plan.
-The meal plan should only contain breakfast, lunch, dinner and 1 snack.
-
- Each card should have actionable items on the front and scientific backing on the back. Use this exact JSON format:
-
-{{
-  "title": "Emma's Daily Health Programs",
-  "cards": [
-    {{
-      "title": "Movement",
-      "items": [
-      "Burpees 60 seconds",
-      "Shoulder taps 60 seconds", 
-      "V Ups 60 seconds",
-      "30 Second rest",
-      "Repeat x5"
-        
-      ],
-      "description": "2-3 sentence explanation of why this movement program works specifically for Emma based on her Oura data patterns, menstrual cycle phase, and health goals. Mention specific benefits for performance optimization and recovery.",
-      "sources": [
-        {{"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"}},
-        {{"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}}
-      ]
-    }},
-    {{
-      "title": "Mindfulness",
-      "items": [
-       "The 4-2-8 Breathing Method",
-       "Inhale: Breathe in slowly and deeply through your nose for a count of four."
-"Hold: Hold your breath for a count of two."
-"Exhale: Exhale slowly and completely through your mouth for a count of one."
-"Repeat: Repeat this cycle for a set number of repetitions, usually between 5-10 minutes, or until you feel calmer."
-      ],
-      "description": "2-3 sentence explanation of why this mindfulness program works specifically for Emma based on her stress patterns, HRV data, and cycle phase. Mention benefits for stress resilience and sleep optimization.",
-      "sources": [
-        {{"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"}},
-        {{"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}}
-      ]
-    }},
-    {{
-      "title": "Nutrition",
-      "items": [
-        "Breakfast: Granola with Greek Yogurt and blueberries and honey",
-        "Lunch: Salmon and quinoa salad with kale", 
-        "Dinner: Paprika chicken with brown rice and broccoli",
-        "Snack: Mixed nuts and apple slices"
-      ],
-      "description": "2-3 sentence explanation of why this nutrition program works specifically for Emma based on her activity levels, recovery patterns, and cycle phase. Mention benefits for performance and hormonal balance.",
-      "sources": [
-        {{"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"}},
-        {{"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}}
-      ]
-    }}
-  ]
-}}
-
-CRITICAL: 
-- Each item should be part of a programme that you are giving the user. Each item should therefore have enough detail for the user to carry out the activity without any outside help.
-- For Movement cards: Do NOT include warm-ups or cool-downs. Focus only on the main exercise routine.
-- For Nutrition cards: ALWAYS structure as "Breakfast: ...", "Lunch: ...", "Dinner: ...", "Snack: ..." for easy parsing into subheadings.
-- Descriptions should reference Emma's actual data patterns and be personalized
-- Sources MUST be real, existing research papers. You must provide the exact title of an actual published study along with its correct corresponding URL. Verify that the title and URL match the same study. Use real PubMed URLs or DOI links that actually lead to the cited paper
-- Your response must be valid JSON only. No explanatory text. No markdown. Just JSON."""
+        request = self.get_daily_prompt_blocks()
 
         try:
             # Call Claude API with JSON mode
-            response = self.claude_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=3000,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": json_prompt
-                    }
-                ]
-            )
+            advice_text = self._within_latency_budget(lambda: self._create_message(
+                request["messages"], max_tokens=DAILY_ADVICE_MAX_TOKENS, system=request["system"],
+                method="generate_daily_advice_structured"))
+            advice = self._parse_structured_response(advice_text, DAILY_CARD_SECTIONS)
+            self._remember_daily_advice(context, advice)
+            return advice
+            
+        except Exception as e:
+            return self._local_fallback(f"Error generating daily advice: {str(e)}")
+    
+    def generate_daily_advice(self) -> Optional[str]:
+        """
+        Generate today's movement, mindfulness and nutrition programmes as markdown.
+        
+        Returns:
+            String containing the daily programmes, or None if generation failed
+        """
+        if not self.claude_client:
+            print("Claude API client not available. Please set ANTHROPIC_API_KEY environment variable.")
+            return None
+        
+        if not self.summary_stats:
+            print("No analysis data available. Please run analyze_all_datasets() first.")
+            return None
+        
+        system = self._system_blocks("daily_markdown")
+        messages = [{"role": "user", "content": self._user_profile_prompt()}]
+
+        try:
+            return self._create_message(messages, max_tokens=4000, system=system, method="generate_daily_advice")
+        except Exception as e:
+            print(f"Error generating new advice: {e}")
+            return None
+
+    def _llm_semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore bounding concurrent Claude requests on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+            self._inflight = {}
+        return self._semaphore
+
+    async def _acreate_message(self, messages: List[Dict[str, Any]], max_tokens: int,
+                               system: Optional[List[Dict[str, Any]]] = None, method: Optional[str] = None) -> str:
+        """
+        Async counterpart of _create_message with bounded concurrency.
+        
+        Identical requests issued concurrently share a single in-flight call.
+        
+        Args:
+            messages: Conversation messages for the request
+            max_tokens: Maximum number of tokens to generate
+            system: Optional system content blocks
+            method: Public method requesting the response, for telemetry
             
-            # Parse the JSON response
-            advice_text = response.content[0].text
+        Returns:
+            Text of the response
+        """
+        params = self._request_params(messages, max_tokens, system)
+        with self.instrumentation.span("llm", max_tokens=max_tokens) as span, \
+                self._generation(max_tokens, method=method) as record:
+            semaphore = self._llm_semaphore()
+            
+            key = self.response_cache_key(params)
+            cached = self._cached_response(key)
+            if cached is not None:
+                span.set(cache="hit")
+                self.llm_usage["response_cache_hits"] += 1
+                self._served_from(record, "response_cache")
+                return cached
+            span.set(cache="miss")
+            if key in self._inflight:
+                self._served_from(record, "inflight")
+                return await asyncio.shield(self._inflight[key])
+            
+            async def call() -> str:
+                async with semaphore:
+                    if self.async_claude_client is not None:
+                        response = await self._ascheduled(
+                            lambda: self.async_claude_client.messages.create(model=CLAUDE_MODEL, **params), params,
+                            record)
+                        self._record_usage(getattr(response, "usage", None), record)
+                        text = response.content[0].text
+                    else:
+                        text = await asyncio.to_thread(self._call_claude, params, record)
+                self._cache_response(key, text)
+                return text
             
-            # Try to parse as JSON
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
             try:
-                # Clean the response text more thoroughly
-                cleaned_text = advice_text.strip()
-                
-                # Remove markdown formatting
-                if cleaned_text.startswith('```json'):
-                    cleaned_text = cleaned_text[7:]
-                elif cleaned_text.startswith('```'):
-                    cleaned_text = cleaned_text[3:]
-                    
-                if cleaned_text.endswith('```'):
-                    cleaned_text = cleaned_text[:-3]
-                
-                cleaned_text = cleaned_text.strip()
-                
-                # Find JSON object boundaries
-                start_idx = cleaned_text.find('{')
-                end_idx = cleaned_text.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    cleaned_text = cleaned_text[start_idx:end_idx+1]
-                
-                structured_advice = json.loads(cleaned_text)
-                
-                # Save structured response
-                with open("claude_daily_structured_response.json", "w") as f:
-                    json.dump(structured_advice, f, indent=2)
-                
-                return structured_advice
-                
-            except json.JSONDecodeError as json_error:
-                print(f"JSON parsing error: {json_error}")
-                print(f"Raw response: {advice_text[:200]}...")
-                # Fallback to text response
-                return {"error": f"Failed to parse JSON response: {str(json_error)}", "raw_response": advice_text}
+                return await task
+            finally:
+                self._inflight.pop(key, None)
+
+    def _has_claude_client(self) -> bool:
+        return self.async_claude_client is not None or self.claude_client is not None
+
+    async def agenerate_personalized_advice_structured(self) -> dict:
+        """
+        Async version of generate_personalized_advice_structured().
+        
+        Returns:
+            Dictionary containing structured advice, or an error dictionary
+        """
+        if not self._has_claude_client():
+            return {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}
+        
+        if not self.summary_stats:
+            return {"error": "No analysis data available. Please run analyze_all_datasets() first."}
+        
+        request = self.get_analysis_prompt_blocks(structured=True)
+        try:
+            advice_text = await self._acreate_message(request["messages"], max_tokens=4000, system=request["system"],
+                                                      method="agenerate_personalized_advice_structured")
+            return self._parse_structured_response(advice_text, ADVICE_SECTIONS)
+        except Exception as e:
+            return {"error": f"Error generating advice: {str(e)}"}
+
+    async def agenerate_daily_section(self, section: str) -> dict:
+        """
+        Generate a single daily programme card (movement, mindfulness or nutrition).
+        
+        Args:
+            section: Key of DAILY_SECTIONS
             
+        Returns:
+            Card dictionary with title, items, description and sources, or an error dictionary
+        """
+        if section not in DAILY_SECTIONS:
+            return {"error": f"Unknown daily section '{section}'"}
+        
+        if not self._has_claude_client():
+            return {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}
+        
+        if not self.summary_stats:
+            return {"error": "No analysis data available. Please run analyze_all_datasets() first."}
+        
+        system = self._system_blocks(f"daily_{section}")
+        messages = [{"role": "user", "content": self._user_profile_prompt()}]
+        try:
+            advice_text = await self._acreate_message(messages, max_tokens=1500, system=system,
+                                                      method="agenerate_daily_section")
+            return self._parse_structured_response(advice_text, schema=DAILY_CARD_SCHEMA)
         except Exception as e:
-            return {"error": f"Error generating daily advice: {str(e)}"}
-    
-    def generate_daily_advice(self)->None:
-            # Load the previous Claude response from file
-            try:
-                with open("claude_response.json", "r") as f:
-                    previous_response = json.load(f)
-                print("Loaded previous Claude response from claude_response.json:")
-                print(previous_response)
-            except Exception as e:
-                print(f"Failed to load previous response: {e}")
+            return {"error": f"Error generating {section} programme: {str(e)}"}
+
+    async def agenerate_daily_advice_structured(self, force: bool = False) -> dict:
+        """
+        Generate the daily programme cards concurrently and assemble them.
+        
+        Like generate_daily_advice_structured(), the previous advice is reused while
+        the day context has not changed materially, and the local programmes are
+        returned without a Claude client, if every section fails or if the cards
+        take longer than daily_latency_budget.
+        
+        Args:
+            force: Regenerate even if the day context has not changed
+        
+        Returns:
+            Dictionary in the generate_daily_advice_structured() format, with an
+            'errors' entry for any section that failed
+        """
+        if not self._has_claude_client():
+            return self._local_fallback("Claude API client not available. Please set ANTHROPIC_API_KEY environment variable.")
+        
+        if not self.summary_stats:
+            return {"error": "No analysis data available. Please run analyze_all_datasets() first."}
+        
+        context = self.get_day_context()
+        if not force:
+            reused = self._reusable_daily_advice(context)
+            if reused is not None:
+                return reused
+        
+        sections = list(DAILY_SECTIONS)
+        generation = asyncio.gather(*(self.agenerate_daily_section(section) for section in sections))
+        try:
+            # Shielded, so the cards still reach the response cache after a timeout
+            cards = await asyncio.wait_for(asyncio.shield(generation), timeout=self.daily_latency_budget)
+        except asyncio.TimeoutError:
+            return self._local_fallback(f"Error generating daily advice: Claude did not respond within "
+                                        f"{self.daily_latency_budget:g}s")
+        
+        result = {"title": f"{self.user_metadata.get('name', 'User')}'s Daily Health Programs", "cards": []}
+        errors = {}
+        for section, card in zip(sections, cards):
+            if "error" in card:
+                errors[section] = card["error"]
+            else:
+                result["cards"].append(card)
+        if not result["cards"]:
+            return self._local_fallback("Error generating daily advice: " + "; ".join(errors.values()))
+        if errors:
+            result["errors"] = errors
+        self._remember_daily_advice(context, result)
+        return result
+
+    async def agenerate_all(self) -> Dict[str, dict]:
+        """
+        Generate the structured overview and daily programmes concurrently.
+        
+        Returns:
+            Dictionary with 'overview' and 'daily' results
+        """
+        overview, daily = await asyncio.gather(
+            self.agenerate_personalized_advice_structured(),
+            self.agenerate_daily_advice_structured(),
+        )
+        return {"overview": overview, "daily": daily}
+
+    def _stream_message(self, messages: List[Dict[str, Any]], max_tokens: int,
+                        system: Optional[List[Dict[str, Any]]] = None,
+                        method: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream a Claude response as text deltas, caching it once complete.
+        
+        A cached response is yielded as a single chunk. The "llm" span covers the
+        whole stream and records the time to the first delta as ttft_seconds.
+        
+        Args:
+            messages: Conversation messages for the request
+            max_tokens: Maximum number of tokens to generate
+            system: Optional system content blocks
+            method: Public method requesting the stream, for telemetry
             
-            # Generate a new advice response using an empty prompt
-            if not self.claude_client:
-                print("Claude API client not available. Please set ANTHROPIC_API_KEY environment variable.")
+        Yields:
+            Text deltas of the response
+        """
+        params = self._request_params(messages, max_tokens, system)
+        
+        start = time.perf_counter()
+        with self.instrumentation.span("llm", max_tokens=max_tokens, streamed=True) as span, \
+                self._generation(max_tokens, streamed=True, method=method) as record:
+            key = self.response_cache_key(params)
+            cached = self._cached_response(key)
+            if cached is not None:
+                span.set(cache="hit")
+                self.llm_usage["response_cache_hits"] += 1
+                self._served_from(record, "response_cache")
+                yield cached
                 return
-            prompt = f"""Based on the existing advice that you have on emma and her metadata:
-            {previous_response}.
+            span.set(cache="miss")
             
-            Suggest 3 different daily programmes. They should be structured as:
-            ## Movment
-            Suggest a movement programme for today based on the health advice.
-            Give one workout/activity only and give details on it + why it's good
-            ## Mindfulness
-            Suggest a mindfulness programme for today based on the health advice.
-            Give one workout/activity only and give details on it + why it's good
-            ## Nutrition
-            Suggest a nutrition programme for today based on the health advice.
-            Give actual meal ideas and details on why they are good for the user.
-            The meal plan should only contain breakfast, lunch, dinner and 1 snack. Do not give pre or post workout meals or any other meals.
-
-            Only do one programme, assume user is in early stage of cycle.
-            In all cases, explain why it is good, relevant to the user's own data!
-            Begin response with: Here are some ideas for you to try today to achive your goals
-
+            chunks = []
+            with ExitStack() as stack:
+                # Opening the stream sends the request, so only that step is scheduled and retried
+                stream = self._scheduled(lambda: stack.enter_context(
+                    self.claude_client.messages.stream(model=CLAUDE_MODEL, **params)), params, record)
+                for text in stream.text_stream:
+                    if not chunks:
+                        span.set(ttft_seconds=time.perf_counter() - start)
+                    self._first_token(record)
+                    chunks.append(text)
+                    yield text
+                final_message = stream.get_final_message()
+            self._record_usage(getattr(final_message, "usage", None), record)
+            if self.scheduler is not None:
+                self.scheduler.settle(estimate_request_tokens(params), max_tokens,
+                                      getattr(final_message, "usage", None))
+            # Only complete responses are cached; an abandoned stream never reaches here
+            self._cache_response(key, "".join(chunks))
+
+    async def _astream_message(self, messages: List[Dict[str, Any]], max_tokens: int,
+                               system: Optional[List[Dict[str, Any]]] = None,
+                               method: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Async counterpart of _stream_message.
+        
+        Without an async client the sync stream is driven from a worker thread.
+        """
+        if self.async_claude_client is None:
+            stream = self._stream_message(messages, max_tokens, system, method=method)
+            async for text in _iterate_in_thread(stream):
+                yield text
+            return
+        
+        params = self._request_params(messages, max_tokens, system)
+        
+        start = time.perf_counter()
+        with self.instrumentation.span("llm", max_tokens=max_tokens, streamed=True) as span, \
+                self._generation(max_tokens, streamed=True, method=method) as record:
+            key = self.response_cache_key(params)
+            cached = self._cached_response(key)
+            if cached is not None:
+                span.set(cache="hit")
+                self.llm_usage["response_cache_hits"] += 1
+                self._served_from(record, "response_cache")
+                yield cached
+                return
+            span.set(cache="miss")
             
-            """
+            chunks = []
+            async with self._llm_semaphore():
+                async with AsyncExitStack() as stack:
+                    stream = await self._ascheduled(lambda: stack.enter_async_context(
+                        self.async_claude_client.messages.stream(model=CLAUDE_MODEL, **params)), params, record)
+                    async for text in stream.text_stream:
+                        if not chunks:
+                            span.set(ttft_seconds=time.perf_counter() - start)
+                        self._first_token(record)
+                        chunks.append(text)
+                        yield text
+                    final_message = await stream.get_final_message()
+            self._record_usage(getattr(final_message, "usage", None), record)
+            if self.scheduler is not None:
+                self.scheduler.settle(estimate_request_tokens(params), max_tokens,
+                                      getattr(final_message, "usage", None))
+            self._cache_response(key, "".join(chunks))
+
+    def stream_personalized_advice(self) -> Iterator[str]:
+        """
+        Streaming version of generate_personalized_advice().
+        
+        Yields:
+            Text deltas of the advice as they are generated
+        """
+        if not self.claude_client:
+            yield "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."
+            return
+        
+        if not self.summary_stats:
+            yield "No analysis data available. Please run analyze_all_datasets() first."
+            return
+        
+        request = self.get_analysis_prompt_blocks()
+        try:
+            yield from self._stream_message(request["messages"], max_tokens=4000, system=request["system"],
+                                            method="stream_personalized_advice")
+        except Exception as e:
+            yield f"\n\nError generating advice: {str(e)}"
 
+    def stream_daily_advice(self) -> Iterator[str]:
+        """
+        Streaming version of generate_daily_advice().
+        
+        Yields:
+            Text deltas of the daily programmes as they are generated
+        """
+        if not self.claude_client:
+            yield "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."
+            return
+        
+        if not self.summary_stats:
+            yield "No analysis data available. Please run analyze_all_datasets() first."
+            return
+        
+        system = self._system_blocks("daily_markdown")
+        messages = [{"role": "user", "content": self._user_profile_prompt()}]
+        try:
+            yield from self._stream_message(messages, max_tokens=4000, system=system, method="stream_daily_advice")
+        except Exception as e:
+            yield f"\n\nError generating daily advice: {str(e)}"
 
-            try:
-                response = self.claude_client.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=4000,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                new_response = response.content[0].text
-                return new_response
-            except Exception as e:
-                print(f"Error generating new advice: {e}")
+    async def astream_personalized_advice(self) -> AsyncIterator[str]:
+        """
+        Async iterator version of stream_personalized_advice().
+        
+        Yields:
+            Text deltas of the advice as they are generated
+        """
+        if not self._has_claude_client():
+            yield "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."
+            return
+        
+        if not self.summary_stats:
+            yield "No analysis data available. Please run analyze_all_datasets() first."
+            return
+        
+        request = self.get_analysis_prompt_blocks()
+        try:
+            async for text in self._astream_message(request["messages"], max_tokens=4000, system=request["system"],
+                                                    method="astream_personalized_advice"):
+                yield text
+        except Exception as e:
+            yield f"\n\nError generating advice: {str(e)}"
+
+    async def astream_daily_advice(self) -> AsyncIterator[str]:
+        """
+        Async iterator version of stream_daily_advice().
+        
+        Yields:
+            Text deltas of the daily programmes as they are generated
+        """
+        if not self._has_claude_client():
+            yield "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."
+            return
+        
+        if not self.summary_stats:
+            yield "No analysis data available. Please run analyze_all_datasets() first."
+            return
+        
+        system = self._system_blocks("daily_markdown")
+        messages = [{"role": "user", "content": self._user_profile_prompt()}]
+        try:
+            async for text in self._astream_message(messages, max_tokens=4000, system=system,
+                                                    method="astream_daily_advice"):
+                yield text
+        except Exception as e:
+            yield f"\n\nError generating daily advice: {str(e)}"
+
+    def _stream_structured(self, messages: List[Dict[str, Any]], max_tokens: int,
+                           system: List[Dict[str, Any]],
+                           sections: Dict[Tuple[Any, ...], Dict[str, Any]],
+                           method: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream a structured response as section events followed by the final result."""
+        extractor = IncrementalJSONExtractor(sections)
+        text = []
+        try:
+            for delta in self._stream_message(messages, max_tokens, system, method=method):
+                text.append(delta)
+                for event in extractor.feed(delta):
+                    yield {"type": "section", **event}
+        except Exception as e:
+            yield {"type": "error", "error": f"Error generating advice: {str(e)}"}
+        yield {"type": "done", "result": self._finish_structured(extractor, "".join(text))}
+
+    async def _astream_structured(self, messages: List[Dict[str, Any]], max_tokens: int,
+                                  system: List[Dict[str, Any]],
+                                  sections: Dict[Tuple[Any, ...], Dict[str, Any]],
+                                  method: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of _stream_structured."""
+        extractor = IncrementalJSONExtractor(sections)
+        text = []
+        try:
+            async for delta in self._astream_message(messages, max_tokens, system, method=method):
+                text.append(delta)
+                for event in extractor.feed(delta):
+                    yield {"type": "section", **event}
+        except Exception as e:
+            yield {"type": "error", "error": f"Error generating advice: {str(e)}"}
+        yield {"type": "done", "result": self._finish_structured(extractor, "".join(text))}
+
+    def _finish_structured(self, extractor: IncrementalJSONExtractor, advice_text: str) -> dict:
+        result = extractor.result()
+        if "error" in result:
+            result["raw_response"] = advice_text
+        return result
+
+    def stream_personalized_advice_structured(self) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming version of generate_personalized_advice_structured().
+        
+        Yields:
+            {"type": "section", ...} as each recommendation section completes, then
+            {"type": "done", "result": ...} with the full (or partial) document
+        """
+        if not self.claude_client:
+            yield {"type": "done", "result": {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}}
+            return
+        
+        if not self.summary_stats:
+            yield {"type": "done", "result": {"error": "No analysis data available. Please run analyze_all_datasets() first."}}
+            return
+        
+        request = self.get_analysis_prompt_blocks(structured=True)
+        yield from self._stream_structured(request["messages"], 4000, request["system"], ADVICE_SECTIONS,
+                                           method="stream_personalized_advice_structured")
+
+    def stream_daily_advice_structured(self) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming version of generate_daily_advice_structured().
+        
+        Yields:
+            {"type": "section", ...} as each programme card completes, then
+            {"type": "done", "result": ...} with the full (or partial) document
+        """
+        if not self.claude_client:
+            yield {"type": "done", "result": {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}}
+            return
+        
+        if not self.summary_stats:
+            yield {"type": "done", "result": {"error": "No analysis data available. Please run analyze_all_datasets() first."}}
+            return
+        
+        request = self.get_daily_prompt_blocks()
+        yield from self._stream_structured(request["messages"], DAILY_ADVICE_MAX_TOKENS, request["system"],
+                                           DAILY_CARD_SECTIONS, method="stream_daily_advice_structured")
+
+    async def astream_personalized_advice_structured(self) -> AsyncIterator[Dict[str, Any]]:
+        """Async iterator version of stream_personalized_advice_structured()."""
+        if not self._has_claude_client():
+            yield {"type": "done", "result": {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}}
+            return
+        
+        if not self.summary_stats:
+            yield {"type": "done", "result": {"error": "No analysis data available. Please run analyze_all_datasets() first."}}
+            return
+        
+        request = self.get_analysis_prompt_blocks(structured=True)
+        async for event in self._astream_structured(request["messages"], 4000, request["system"], ADVICE_SECTIONS,
+                                                    method="astream_personalized_advice_structured"):
+            yield event
+
+    async def astream_daily_advice_structured(self) -> AsyncIterator[Dict[str, Any]]:
+        """Async iterator version of stream_daily_advice_structured()."""
+        if not self._has_claude_client():
+            yield {"type": "done", "result": {"error": "Claude API client not available. Please set ANTHROPIC_API_KEY environment variable."}}
+            return
+        
+        if not self.summary_stats:
+            yield {"type": "done", "result": {"error": "No analysis data available. Please run analyze_all_datasets() first."}}
+            return
+        
+        request = self.get_daily_prompt_blocks()
+        async for event in self._astream_structured(request["messages"], DAILY_ADVICE_MAX_TOKENS,
+                                                    request["system"], DAILY_CARD_SECTIONS,
+                                                    method="astream_daily_advice_structured"):
+            yield event
 
     def print_daily_advice(self) -> None:
         print("Generating daily advice...")
@@ -945,8 +1702,12 @@ CRITICAL:
         print("Generating personalized health advice...")
         print("=" * 60)
         
-        advice = self.generate_personalized_advice()
-        print(advice)
+        chunks = []
+        for chunk in self.stream_personalized_advice():
+            print(chunk, end="", flush=True)
+            chunks.append(chunk)
+        print()
+        advice = "".join(chunks)
         
         # Save advice to file with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -960,4 +1721,63 @@ CRITICAL:
                 f.write(advice)
             print(f"\n✓ Advice saved to: {advice_path}")
         except Exception as e:
-            print(f"\nWarning: Could not save advice to file: {e}")
\ No newline at end of file
+            print(f"\nWarning: Could not save advice to file: {e}")
+
+
+async def _iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Drive a blocking iterator from a worker thread, yielding its items asynchronously."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+    
+    def pump() -> None:
+        try:
+            for item in iterator:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (finished, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (finished, None))
+    
+    worker = loop.run_in_executor(None, pump)
+    while True:
+        item, error = await queue.get()
+        if item is finished:
+            break
+        yield item
+    await worker
+    if error is not None:
+        raise error
+
+
+def iter_ndjson(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Convert streamed text deltas into newline-delimited JSON for API consumers.
+    
+    Each delta becomes {"type": "delta", "text": ...}; the stream ends with
+    {"type": "done"} or, if generation fails, {"type": "error", "error": ...}.
+    
+    Args:
+        chunks: Text deltas, e.g. from stream_personalized_advice()
+        
+    Yields:
+        One JSON document per line
+    """
+    try:
+        for chunk in chunks:
+            yield json.dumps({"type": "delta", "text": chunk}, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+        return
+    yield json.dumps({"type": "done"}) + "\n"
+
+
+async def aiter_ndjson(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """Async counterpart of iter_ndjson()."""
+    try:
+        async for chunk in chunks:
+            yield json.dumps({"type": "delta", "text": chunk}, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+        return
+    yield json.dumps({"type": "done"}) + "\n"
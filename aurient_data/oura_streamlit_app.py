@@ -1,8 +1,7 @@
 import streamlit as st
+import asyncio
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -18,7 +17,9 @@ load_dotenv()
 # Add current directory to path for imports
 sys.path.append(str(Path(__file__).parent))
 
-from oura_analysis import OuraAnalysis
+from analyzer_registry import AnalyzerRegistry, data_version
+from data_explorer import DEFAULT_PAGE_SIZE, DatasetExplorer
+from sleep_architecture import summarize_nights, transition_matrix
 
 # Page configuration
 st.set_page_config(
@@ -53,22 +54,61 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# @st.cache_data
-def load_oura_data():
-    """Load and cache the Oura data."""
-    emma_metadata = {
-        'name': 'Emma',
-        'age': 26,
-        'goals': 'performance',
-        'activity_level': 'high',
-        'focus_areas': ['sleep optimization', 'recovery', 'cardiovascular health']
-    }
+@st.cache_resource(show_spinner=False)
+def shared_registry():
+    """Analyzers shared by all sessions and reruns, reloaded when a user's data changes."""
+    return AnalyzerRegistry()
+
+def load_oura_data(user_id='emma'):
+    """
+    Load the Oura data for a user.
     
-    analyzer = OuraAnalysis(user_metadata=emma_metadata)
-    analyzer.load_from_cache('data/')
-    analyzer.analyze_all_datasets()
+    The analyzer is cached across reruns and reloaded only when the user's CSV
+    files change (name, size or modification time).
+    
+    Returns:
+        Tuple of (analyzer, data version used as part of derived-artifact cache keys)
+    """
+    registry = shared_registry()
+    return registry.get(user_id), data_version(registry.config(user_id)['data_dir'])
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def dataset_tables(_analyzer, version, dataset_name):
+    """Preview, statistics, dtype and missing-value tables for a dataset tab."""
+    df = _analyzer.health_data[dataset_name]
+    stats = _analyzer.get_summary_stats(dataset_name)
     
-    return analyzer
+    missing_df = pd.DataFrame({
+        'Column': list(stats['missing_values'].keys()) if stats else [],
+        'Missing Count': list(stats['missing_values'].values()) if stats else []
+    })
+    return {
+        'stats': pd.DataFrame(stats['numeric_summary']).round(3) if stats and stats['numeric_summary'] else None,
+        'dtypes': pd.DataFrame({
+            'Column': df.dtypes.index,
+            'Type': df.dtypes.values.astype(str)
+        }),
+        'missing': missing_df[missing_df['Missing Count'] > 0],
+    }
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def dataset_figures(_analyzer, version, dataset_name):
+    """Distribution and correlation Plotly figures for a dataset tab."""
+    df = _analyzer.health_data[dataset_name]
+    stats = _analyzer.get_summary_stats(dataset_name)
+    numeric_cols = list(stats['numeric_summary'].keys()) if stats and stats['numeric_summary'] else []
+    
+    figures = {'distribution': None, 'correlation': None}
+    if numeric_cols:
+        figures['distribution'] = create_interactive_plot(df, dataset_name, numeric_cols)
+    if len(numeric_cols) > 1:
+        figures['correlation'] = px.imshow(
+            df[numeric_cols].corr(),
+            title=f"{dataset_name.replace('_', ' ').title()} - Feature Correlations",
+            color_continuous_scale="RdBu_r",
+            aspect="auto"
+        )
+    return figures
 
 def create_interactive_plot(df, dataset_name, numeric_cols):
     """Create interactive Plotly visualizations."""
@@ -140,7 +180,90 @@ def create_interactive_plot(df, dataset_name, numeric_cols):
     
     return fig
 
-def display_dataset_tab(analyzer, dataset_name):
+@st.cache_resource(show_spinner=False, max_entries=64)
+def dataset_explorer(_analyzer, version, dataset_name):
+    """Explorer over a dataset, with its filter choices computed once."""
+    explorer = DatasetExplorer(_analyzer.health_data[dataset_name])
+    options = {column: explorer.filter_options(column) for column in explorer.category_columns}
+    return explorer, options, explorer.date_bounds()
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def explorer_page(_explorer, version, dataset_name, page, page_size, columns, start, end, equals, sort_by, ascending):
+    """One page of an explorer query (all arguments after _explorer form the cache key)."""
+    return _explorer.page(page=page, page_size=page_size, columns=list(columns), start=start, end=end,
+                          equals=dict(equals), sort_by=sort_by, ascending=ascending)
+
+def display_data_explorer(analyzer, dataset_name, version):
+    """Browse a dataset page by page; only the visible page is sent to the browser."""
+    explorer, options, bounds = dataset_explorer(analyzer, version, dataset_name)
+    key = f"explore_{dataset_name}"
+    
+    with st.expander("Columns, filters and sorting", expanded=False):
+        columns = st.multiselect("Columns", explorer.columns, default=explorer.columns, key=f"{key}_columns")
+        start = end = None
+        if bounds:
+            low, high = (pd.Timestamp(day).date() for day in bounds)
+            dates = st.date_input("Date range", value=(low, high), min_value=low, max_value=high,
+                                  key=f"{key}_dates")
+            if isinstance(dates, (list, tuple)) and len(dates) == 2:
+                start, end = (d.isoformat() for d in dates)
+        equals = []
+        for column, values in options.items():
+            chosen = st.multiselect(column.replace('_', ' ').title(), values, key=f"{key}_{column}")
+            if chosen:
+                equals.append((column, tuple(chosen)))
+        sort_col, order_col, size_col = st.columns(3)
+        with sort_col:
+            sort_by = st.selectbox("Sort by", ["(file order)"] + explorer.columns, key=f"{key}_sort")
+        with order_col:
+            ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True,
+                                 key=f"{key}_order") == "Ascending"
+        with size_col:
+            page_size = st.selectbox("Rows per page", [25, 50, DEFAULT_PAGE_SIZE, 250, 500], index=2,
+                                     key=f"{key}_page_size")
+    
+    page = st.number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+    result = explorer_page(explorer, version, dataset_name, int(page), page_size, tuple(columns or explorer.columns),
+                           start, end, tuple(equals), None if sort_by == "(file order)" else sort_by, ascending)
+    if 'error' in result:
+        st.error(result['error'])
+        return
+    st.caption(f"Page {result['page']} of {result['pages']} · {result['total_rows']:,} matching rows")
+    st.dataframe(result['rows'], use_container_width=True, hide_index=True)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def local_programs(_analyzer, version):
+    """Rule-based daily programmes for the Daily Programs tab."""
+    return _analyzer.generate_local_daily_advice()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def sleep_architecture_tables(_analyzer, version):
+    """Per-night sleep architecture, its averages and the stage transition matrix."""
+    nights = _analyzer.get_sleep_architecture()
+    if nights is None or nights.empty:
+        return None
+    return {'nights': nights, 'summary': summarize_nights(nights).T, 'transitions': transition_matrix(nights)}
+
+def display_sleep_architecture(analyzer, version):
+    """Sleep architecture section of the detailed sleep tab."""
+    tables = sleep_architecture_tables(analyzer, version)
+    if tables is None:
+        return
+    st.subheader("🌙 Sleep Architecture")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Average night (main sleeps):**")
+        st.dataframe(tables['summary'], use_container_width=True)
+    with col2:
+        st.write("**Stage transitions (probability of the next stage):**")
+        st.plotly_chart(px.imshow(tables['transitions'], text_auto='.2f', color_continuous_scale='Blues'),
+                        use_container_width=True)
+    metric = st.selectbox("Nightly metric", [c for c in tables['nights'].columns
+                                            if tables['nights'][c].dtype.kind in 'fiu' and '_to_' not in c])
+    st.plotly_chart(px.line(tables['nights'], x='bedtime_start', y=metric, color='type', markers=True),
+                    use_container_width=True)
+
+def display_dataset_tab(analyzer, dataset_name, version=None):
     """Display content for a dataset tab."""
     if dataset_name not in analyzer.health_data:
         st.error(f"Dataset {dataset_name} not found!")
@@ -148,6 +271,8 @@ def display_dataset_tab(analyzer, dataset_name):
     
     df = analyzer.health_data[dataset_name]
     stats = analyzer.get_summary_stats(dataset_name)
+    tables = dataset_tables(analyzer, version, dataset_name)
+    figures = dataset_figures(analyzer, version, dataset_name)
     
     # Dataset overview
     col1, col2, col3, col4 = st.columns(4)
@@ -167,37 +292,23 @@ def display_dataset_tab(analyzer, dataset_name):
         st.metric("Numeric Features", numeric_count)
     
     # Data preview
-    st.subheader("📊 Data Preview")
-    st.dataframe(df.head(10), use_container_width=True)
+    st.subheader("📊 Data Explorer")
+    display_data_explorer(analyzer, dataset_name, version)
     
     # Statistics
-    if stats and stats['numeric_summary']:
+    if tables['stats'] is not None:
         st.subheader("📈 Statistical Summary")
-        
-        # Convert to DataFrame for better display
-        stats_df = pd.DataFrame(stats['numeric_summary']).round(3)
-        st.dataframe(stats_df, use_container_width=True)
+        st.dataframe(tables['stats'], use_container_width=True)
         
         # Interactive plots
         st.subheader("📉 Interactive Visualizations")
-        numeric_cols = list(stats['numeric_summary'].keys())
-        
-        if len(numeric_cols) > 0:
-            fig = create_interactive_plot(df, dataset_name, numeric_cols)
-            st.plotly_chart(fig, use_container_width=True)
+        if figures['distribution'] is not None:
+            st.plotly_chart(figures['distribution'], use_container_width=True)
         
         # Correlation matrix if applicable
-        if len(numeric_cols) > 1:
+        if figures['correlation'] is not None:
             st.subheader("🔗 Correlation Matrix")
-            corr_data = df[numeric_cols].corr()
-            
-            fig_corr = px.imshow(
-                corr_data,
-                title=f"{dataset_name.replace('_', ' ').title()} - Feature Correlations",
-                color_continuous_scale="RdBu_r",
-                aspect="auto"
-            )
-            st.plotly_chart(fig_corr, use_container_width=True)
+            st.plotly_chart(figures['correlation'], use_container_width=True)
     
     # Data quality information
     st.subheader("🔍 Data Quality")
@@ -206,25 +317,48 @@ def display_dataset_tab(analyzer, dataset_name):
     
     with col1:
         st.write("**Data Types:**")
-        dtype_df = pd.DataFrame({
-            'Column': df.dtypes.index,
-            'Type': df.dtypes.values.astype(str)
-        })
-        st.dataframe(dtype_df, use_container_width=True, hide_index=True)
+        st.dataframe(tables['dtypes'], use_container_width=True, hide_index=True)
     
     with col2:
         if stats:
             st.write("**Missing Values:**")
-            missing_df = pd.DataFrame({
-                'Column': list(stats['missing_values'].keys()),
-                'Missing Count': list(stats['missing_values'].values())
-            })
-            missing_df = missing_df[missing_df['Missing Count'] > 0]
-            
-            if len(missing_df) > 0:
-                st.dataframe(missing_df, use_container_width=True, hide_index=True)
+            if len(tables['missing']) > 0:
+                st.dataframe(tables['missing'], use_container_width=True, hide_index=True)
             else:
                 st.success("No missing values! ✅")
+    
+    if dataset_name == 'sleep_detailed':
+        display_sleep_architecture(analyzer, version)
+
+def display_structured_advice(result):
+    """Render the structured overview and daily programme cards."""
+    overview = result.get('overview', {})
+    if 'error' in overview:
+        st.error(overview['error'])
+    else:
+        for section in overview.get('sections', {}).values():
+            with st.expander(f"{section.get('icon', '')} {section.get('title', '')}", expanded=False):
+                for rec in section.get('recommendations', []):
+                    st.markdown(f"**{rec.get('title', '')}**")
+                    st.write(rec.get('description', ''))
+                    for step in rec.get('actionable_steps', []):
+                        st.markdown(f"- {step}")
+    
+    daily = result.get('daily', {})
+    cards = daily.get('cards', [])
+    if cards:
+        st.subheader(daily.get('title', 'Daily Health Programs'))
+        for column, card in zip(st.columns(len(cards)), cards):
+            with column:
+                st.markdown(f"#### {card.get('title', '')}")
+                for item in card.get('items', []):
+                    st.markdown(f"- {item}")
+                with st.expander("Why this works"):
+                    st.write(card.get('description', ''))
+                    for source in card.get('sources', []):
+                        st.markdown(f"- [{source.get('name', '')}]({source.get('url', '')})")
+    for section, error in daily.get('errors', {}).items():
+        st.error(f"{section.title()}: {error}")
 
 def main():
     """Main Streamlit app function."""
@@ -239,7 +373,7 @@ def main():
     # Load data with progress indicator
     with st.spinner("Loading Oura health data..."):
         try:
-            analyzer = load_oura_data()
+            analyzer, data_key = load_oura_data()
             st.sidebar.success(f"✅ Loaded {len(analyzer.health_data)} datasets")
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
@@ -267,7 +401,7 @@ def main():
         st.header("🤖 AI-Powered Health Insights")
         
         # Create sub-tabs for insights and prompt
-        insight_tabs = st.tabs(["💡 Generated Insights", "Daily Insights", "📋 Previous Insights"])
+        insight_tabs = st.tabs(["💡 Generated Insights", "Daily Insights", "📋 Previous Insights", "🃏 Daily Programs"])
         
         # Generated Insights tab
         with insight_tabs[0]:
@@ -287,24 +421,20 @@ def main():
                 """)
             else:
                 if st.button("🔮 Generate AI Health Insights", type="primary"):
-                    with st.spinner("Generating personalized health insights..."):
-                        try:
-                            advice = analyzer.generate_personalized_advice()
-                            
-                            st.markdown('<div class="insight-box">', unsafe_allow_html=True)
-                            st.markdown(advice)
-                            st.markdown('</div>', unsafe_allow_html=True)
-                            
-                            # Option to download advice
-                            st.download_button(
-                                label="📥 Download Health Insights",
-                                data=advice,
-                                file_name=f"health_insights_{analyzer.user_metadata['name']}.md",
-                                mime="text/markdown"
-                            )
-                            
-                        except Exception as e:
-                            st.error(f"Error generating insights: {str(e)}")
+                    try:
+                        # Render tokens as they arrive instead of waiting for the full response
+                        advice = st.write_stream(analyzer.stream_personalized_advice())
+                        
+                        # Option to download advice
+                        st.download_button(
+                            label="📥 Download Health Insights",
+                            data=advice,
+                            file_name=f"health_insights_{analyzer.user_metadata['name']}.md",
+                            mime="text/markdown"
+                        )
+                        
+                    except Exception as e:
+                        st.error(f"Error generating insights: {str(e)}")
         with insight_tabs[1]:
             with insight_tabs[1]:
                 st.header("📅 Daily Insights")
@@ -321,22 +451,17 @@ def main():
                     )
                 else:
                     if st.button("🔮 Generate Daily Insights", type="primary"):
-                        with st.spinner("Generating daily health insights..."):
-                            try:
-                                advice = analyzer.generate_daily_advice()
-
-                                st.markdown('<div class="insight-box">', unsafe_allow_html=True)
-                                st.markdown(advice)
-                                st.markdown('</div>', unsafe_allow_html=True)
+                        try:
+                            advice = st.write_stream(analyzer.stream_daily_advice())
 
-                                st.download_button(
-                                    label="📥 Download Daily Insights",
-                                    data=advice,
-                                    file_name=f"daily_insights_{analyzer.user_metadata['name']}.md",
-                                    mime="text/markdown"
-                                )
-                            except Exception as e:
-                                st.error(f"Error generating insights: {str(e)}")
+                            st.download_button(
+                                label="📥 Download Daily Insights",
+                                data=advice,
+                                file_name=f"daily_insights_{analyzer.user_metadata['name']}.md",
+                                mime="text/markdown"
+                            )
+                        except Exception as e:
+                            st.error(f"Error generating insights: {str(e)}")
         # Analysis Prompt tab
         # with insight_tabs[1]:
         #     st.subheader("📝 Claude Analysis Prompt")
@@ -439,10 +564,31 @@ def main():
             else:
                 st.info("Static directory not found. Generate some insights first!")
     
+        # Structured overview + daily programmes, generated concurrently
+        with insight_tabs[3]:
+            st.subheader("🃏 Overview & Daily Programs")
+            # Rule-based programmes render instantly; the AI version replaces them when generated
+            programs = st.empty()
+            local = local_programs(analyzer, data_key)
+            if 'error' not in local:
+                with programs.container():
+                    st.caption("Quick programmes from your latest HRV, sleep and cycle phase")
+                    display_structured_advice({'daily': local})
+            if not os.getenv("ANTHROPIC_API_KEY"):
+                st.warning("⚠️ **Claude API Key Required** - set ANTHROPIC_API_KEY and restart the Streamlit app.")
+            elif st.button("⚡ Generate Overview & Daily Programs", type="primary"):
+                with st.spinner("Generating overview and daily programs in parallel..."):
+                    try:
+                        result = asyncio.run(analyzer.agenerate_all())
+                        with programs.container():
+                            display_structured_advice(result)
+                    except Exception as e:
+                        st.error(f"Error generating programs: {str(e)}")
+    
     # Dataset tabs
     for i, dataset_name in enumerate(analyzer.health_data.keys(), 1):
         with tabs[i]:
-            display_dataset_tab(analyzer, dataset_name)
+            display_dataset_tab(analyzer, dataset_name, data_key)
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,476 @@
+"""
+Prompt templates for Claude analysis requests.
+
+Everything that does not depend on the user - the research report, the output
+format instructions and the per-section daily programme instructions - is
+rendered once at import and shared as ready-made system blocks. Only the user
+profile and stats digest are interpolated per request. The Oura data dictionary
+is read from disk once per process.
+"""
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+
+DATA_DICTIONARY_PATH = Path(__file__).parent / "static" / "oura_data_dictionary.json"
+
+# Research report used to ground every analysis prompt. It never changes between
+# users, so it is sent as a cacheable system block rather than per request.
+WOMENS_HEALTH_RESEARCH = """# Evidence-Based Women's Health Optimization Using Wearable Technology
+
+Comprehensive research reveals that **progesterone-driven physiological changes across the menstrual cycle fundamentally alter all major wearable metrics**, requiring cycle-integrated approaches for accurate health optimization. Recent large-scale studies analyzing over 45,000 menstrual cycles demonstrate that women's health recommendations must account for significant phase-specific variations in heart rate variability, resting heart rate, and body temperature. This evidence-based framework provides actionable strategies for developing personalized women's health applications that leverage wearable technology data while addressing the unique physiological patterns of female health across diverse age ranges, fitness levels, and health conditions.
+
+The clinical significance extends beyond simple tracking - HRV suppression during the luteal phase correlates directly with premenstrual mood symptoms, while phase-specific recovery patterns influence injury risk and training adaptations. Contraceptive use fundamentally alters these patterns, requiring separate algorithmic approaches for synthetic hormone users. This research synthesis establishes the foundation for evidence-based app development that moves beyond one-size-fits-all approaches to deliver truly personalized women's health optimization.
+
+## General wellness optimization for women using wearable data
+
+**Progesterone emerges as the primary hormonal driver** of cardiovascular changes throughout the menstrual cycle, with profound implications for wellness optimization strategies. Large-scale research involving 11,590 participants across 45,811 cycles reveals that traditional single-baseline approaches fail to capture the dynamic nature of women's physiology.
+
+### Foundational cycle-aware metrics establish personalized baselines
+
+Heart rate variability demonstrates the most significant cyclical variation, with **RMSSD peaking around day 5 (follicular phase) and reaching minimum values around day 27 (late luteal phase)**. This represents more than measurement noise - the progesterone-induced HRV suppression directly correlates with reduced stress resilience and premenstrual symptom severity. Resting heart rate follows predictable patterns, increasing 2-7 beats per minute from follicular to luteal phases due to progesterone-induced sympathetic nervous system activation.
+
+Body temperature tracking via wearable devices shows **90% accuracy for ovulation detection** when combined with other physiological metrics. The traditional biphasic temperature pattern, while clinically validated, benefits from sophisticated cosinor modeling that accounts for individual oscillation patterns rather than simple before-and-after comparisons.
+
+### Phase-specific wellness recommendations optimize health outcomes
+
+**Early follicular phase (days 1-5)** represents a recovery optimization window. Peak HRV values during this period indicate maximum stress resilience and adaptation capacity. Wellness applications should capitalize on this physiological state by recommending challenging stress exposure, intensive recovery protocols, and establishment of new health routines.
+
+**Late follicular phase (days 6-14)** provides the optimal performance window for most health interventions. Enhanced recovery capacity, peak cardiovascular resilience, and stable hormonal patterns make this the ideal time for progressive overload in exercise, intensive stress management training, and implementation of challenging lifestyle changes.
+
+**Luteal phase (days 15-28)** requires modified approaches acknowledging reduced stress adaptation capacity. HRV decreases of 15-20% from follicular baselines indicate the need for extended recovery periods, intensified stress management protocols, and gentler introduction of new health interventions. Temperature regulation challenges during this phase require enhanced hydration strategies and environmental cooling approaches.
+
+### Contraceptive considerations fundamentally alter recommendations
+
+Oral contraceptive pills create **significantly attenuated cardiovascular patterns** compared to natural cycles. Research demonstrates no significant HRV differences between high and low hormone phases in OCP users, eliminating the cycle-based optimization advantages available to naturally cycling women. This population requires separate algorithmic approaches emphasizing sleep quality, nutrition optimization, and stress management over hormonal cycle tracking.
+
+The clinical implications extend to all major wearable metrics - recovery recommendations for contraceptive users should focus on non-hormonal indicators while maintaining different baseline ranges for cardiovascular parameters.
+
+## Fitness and performance optimization specific to women
+
+Evidence-based fitness optimization using wearable technology reveals **only trivial performance differences between menstrual cycle phases**, but recovery needs vary dramatically. Meta-analyses of 73 studies establish that while absolute performance capacity remains relatively stable, the physiological cost and recovery requirements fluctuate significantly throughout the cycle.
+
+### HRV-guided training protocols enhance women's fitness outcomes
+
+**Root mean square of successive differences (lnRMSSD) serves as the optimal metric** for training readiness in women. Morning measurements during the last 5 minutes of slow-wave sleep provide the most reliable data for training decisions. Research demonstrates 33% greater strength improvements with HRV-guided periodization compared to predetermined training schedules.
+
+Implementation requires establishing separate baselines for follicular versus luteal phases. When HRV exceeds 102% of phase-specific baseline, proceed with planned high-intensity work. Values between 98-102% indicate moderate training with potential adjustments, while readings below 98% signal the need for reduced intensity or active recovery protocols.
+
+### Cycle-based periodization strategies show promising results
+
+**Follicular phase-focused training** demonstrates superior strength and muscle mass adaptations in controlled studies. Research by Sung et al. showed 42% greater strength gains and 46% more muscle growth when training frequency concentrated in the first two weeks versus the second two weeks of the cycle. The IMPACT Study, currently underway with 120 well-trained women, will provide definitive evidence for optimal periodization strategies.
+
+**Practical implementation** involves scheduling 4-5 strength sessions and 2-3 high-intensity endurance sessions during the follicular phase, while emphasizing technique refinement, power development, and recovery modalities during the luteal phase. This approach capitalizes on enhanced protein synthesis and reduced exercise-induced muscle damage during high-estrogen phases.
+
+### Recovery optimization using wearable data addresses gender-specific patterns
+
+**Sleep quality emerges as the single most predictive factor** for injury prevention in female athletes, with greater than 8 hours of sleep reducing injury odds by 61%. Wearable sleep tracking provides actionable insights for recovery optimization, particularly important given women's increased susceptibility to sleep disruption during luteal phases.
+
+Metabolically suppressed female athletes demonstrate significantly lower HRV values (81±27 ms versus 110±35 ms in healthy athletes), establishing wearable-derived HRV as a practical screening tool for energy deficiency - a condition disproportionately affecting women athletes.
+
+### Load management principles prevent overtraining and injury
+
+**Player load metrics customized for women** account for cycle-specific capacity changes and positional demands. Acute-to-chronic workload ratios require adjustment for luteal phase capacity reductions, with research suggesting 10-15% decreases in strength endurance and voluntary activation during high-progesterone phases.
+
+Critical implementation involves monitoring the convergence of multiple wearable metrics - consistently low HRV combined with elevated resting heart rate and poor sleep quality indicates potential overreaching requiring immediate intervention.
+
+## Sleep improvement strategies for women based on wearable metrics
+
+**Consumer wearables demonstrate 86-89% accuracy for sleep-wake detection** with variable performance for specific sleep stages, providing sufficient precision for practical sleep optimization in women. The integration of multiple metrics - HRV, temperature, and sleep architecture - enables personalized approaches that account for menstrual cycle influences on sleep quality.
+
+### Menstrual cycle effects on sleep architecture require targeted interventions
+
+**Core body temperature increases of 0.3-0.7°C during the luteal phase** directly impact sleep quality through altered thermoregulation. Wearable temperature data from devices like the Oura Ring successfully track these oscillations across cycles, enabling personalized sleep environment recommendations.
+
+**Sleep architecture changes** include reduced REM sleep and increased slow-wave sleep during the luteal phase, accompanied by subjective sleep quality decline premenstrually. Heart rate variability decreases and resting heart rate increases create measurable signatures that wearables can detect and use for intervention timing.
+
+### Phase-specific sleep optimization protocols improve outcomes
+
+**Follicular phase strategies** leverage naturally higher HRV and lower core temperature for intensive recovery. Earlier bedtime recommendations capitalize on natural temperature drops, while the enhanced recovery capacity supports more intensive exercise programs that improve sleep quality.
+
+**Luteal phase adaptations** address elevated core temperature through cooler sleep environments, earlier bedtime recommendations to compensate for potential fragmentation, and increased focus on stress management techniques due to reduced HRV. Targeted interventions for bloating and breast tenderness help optimize sleep positioning and comfort.
+
+**Menstruation phase protocols** emphasize comfort optimization through heated sleep environments for cramp relief and allowance for longer sleep opportunities to compensate for quality reduction. Pain management integration with sleep position recommendations provides comprehensive support during symptomatic phases.
+
+### Age-related sleep considerations span the reproductive lifespan
+
+**Reproductive years (18-35)** benefit from full menstrual cycle optimization using temperature and HRV data. Integration with career demands requires circadian rhythm maintenance strategies for shift work and travel, while performance optimization aligns training and recovery with hormonal patterns.
+
+**Perimenopause (40-55)** presents unique challenges requiring adaptive algorithms for irregular cycles. Vasomotor symptoms detected through temperature monitoring enable targeted hot flash management, while increased sleep fragmentation demands enhanced focus on sleep efficiency and wake episode reduction.
+
+**Postmenopause (55+)** shifts emphasis to circadian rhythm stability through consistent sleep-wake patterns. Stable temperature monitoring enables sleep optimization without cycle considerations, while integration with other health conditions affecting sleep becomes increasingly important.
+
+### Evidence-based interventions demonstrate measurable improvements
+
+**Sleep hygiene interventions** show statistically significant improvements in sleep duration, efficiency, and quality in 7 of 9 recent studies when individualized to wearable metrics rather than using generic approaches. Automated coaching systems like WHOOP 4.0 and Rise Science provide personalized recommendations based on HRV, sleep debt, and circadian phase calculations.
+
+**HRV-guided recovery protocols** establish 2-4 week baseline periods for individual pattern recognition. Rising HRV trends indicate successful recovery, while declining patterns signal the need for extended recovery periods or stress intervention. Sleep debt management using wearable data enables strategic recovery periods aligned with performance demands.
+
+## Stress management approaches using wearable data for women
+
+**Heart rate variability serves as the gold standard biomarker** for autonomic nervous system assessment and stress management in women, with research demonstrating significant cyclical fluctuations that require phase-aware interpretation. Meta-analyses confirm HRV decreases progressively from menstrual through proliferative to secretory phases, with sympathetic nervous activity predominating during luteal phases while parasympathetic activity peaks during follicular phases.
+
+### Real-time stress detection enables just-in-time interventions
+
+**Validated stress biomarkers** tracked by consumer wearables include HRV patterns (higher HRV indicating better stress resilience), heart rate elevation, sleep quality deterioration, and emerging sweat-based cortisol detection. Large-scale studies with over 1,000 subjects confirm associations between wearable physiological signals and self-reported daily-life stress.
+
+**Machine learning approaches** achieve 85% accuracy for stress state classification using random forest models combining HRV, sleep, activity, and contextual data. Individual baseline establishment over 2-4 weeks enables personalized detection models that outperform population-based approaches.
+
+### Evidence-based interventions demonstrate measurable physiological improvements
+
+**Breathing exercises paced at 6 breaths per minute** significantly increase HRV parameters including SDNN, LF power, and improve LF/HF ratios. Four-week resonance breathing training shows lasting improvements in stress resilience, cognitive performance, and perceived stress reduction. Extended exhale techniques specifically stimulate parasympathetic activity for immediate stress relief.
+
+**HRV biofeedback training** at individual optimal frequencies provides superior outcomes compared to generic protocols. Real-time wearable feedback during coherent breathing exercises (5 breaths per minute) optimizes HRV responses and builds long-term stress resilience.
+
+**Mindfulness interventions** delivered through smartwatch notifications show effectiveness in improving RMSSD (parasympathetic activity) and reducing perceived stress in 10-day protocols. Just-in-time adaptive interventions (JITAIs) that incorporate menstrual cycle phase as a time-varying factor demonstrate enhanced effectiveness.
+
+### Cycle-aware stress management addresses hormonal influences
+
+**Late luteal and menstrual phases** require intensified intervention approaches due to decreased estrogen levels creating higher perceived stress scores and increased cortisol reactivity. Wearable applications should automatically adjust intervention frequency and intensity during these vulnerable periods.
+
+**Follicular phase opportunities** capitalize on lower stress perception and higher stress resilience for building coping skills and stress tolerance. This represents the optimal window for introducing challenging stress management techniques and building psychological resilience.
+
+### Chronic stress identification prevents long-term health consequences
+
+**Prolonged HRV suppression** over weeks to months, combined with sleep disruption patterns and altered activity rhythms, provides early warning signals for chronic stress states. Digital biomarkers including consistently low HRV, reduced sleep efficiency, and altered circadian patterns enable intervention before clinical symptoms develop.
+
+**Personalized alert systems** notify users when chronic stress indicators exceed individual thresholds, triggering recommendations for professional support, lifestyle modifications, or medical consultation. Integration with healthcare providers enables seamless transition from self-management to clinical care when appropriate.
+
+### Sleep-stress-performance interactions guide comprehensive interventions
+
+**Sleep quality emerges as the strongest predictor** of next-day stress resilience in university studies using Oura Ring data. Women demonstrate distinct heart rate curves during sleep, with stress-related delayed heart rate drops providing measurable indicators of stress impact on recovery processes.
+
+**Performance optimization protocols** adjust daily workloads and demands based on sleep-stress interaction patterns. Recovery recommendations emphasize sleep hygiene when stress indicators suggest compromised resilience, while stress management intensifies when sleep quality deteriorates.
+
+## Implementation considerations for evidence-based women's health apps
+
+**Multi-sensor data fusion approaches** combining temperature, HRV, and activity data achieve significantly higher accuracy (87% versus 72% for single metrics) for cycle tracking and health optimization. Individual baseline establishment requires minimum 2-3 complete cycles for naturally cycling women, with extended 6-month periods needed for irregular cycles or perimenopausal women.
+
+### Privacy and security considerations address unique vulnerabilities
+
+**Enhanced data protection standards** are essential for reproductive health data, with 20 of 23 popular femtech apps currently sharing data with third parties without clear user consent. The post-Dobbs legal landscape increases risks of data misuse, requiring end-to-end encryption, local processing capabilities, and granular user controls for data deletion and sharing.
+
+**Clinical integration opportunities** exist through shareable reports for healthcare providers, automated alerts for potential sleep disorders or chronic stress requiring medical attention, and consideration of medication interactions with wearable metrics. FDA-cleared features demonstrate higher accuracy than general wellness metrics, suggesting pathways for clinical-grade applications.
+
+### Algorithm development priorities ensure effectiveness and equity
+
+**Transfer learning approaches** adapt general models to individual users with limited personal data, while federated learning enables training across diverse populations while preserving privacy. Continual learning systems update models as user physiology and behavior patterns change over time.
+
+**Bias detection and correction** requires systematic evaluation of algorithmic performance across demographic groups, with current validation studies skewing toward young, affluent, technology-proficient users. Representative validation across age ranges, ethnicities, and health conditions ensures equitable outcomes.
+
+The convergence of advancing sensor technology, sophisticated AI/ML approaches, and growing understanding of women's physiological patterns creates unprecedented opportunities for evidence-based, personalized health optimization systems that truly account for the complexity of female physiology across the lifespan."""
+
+
+ANALYSIS_SYSTEM_PROMPT = """You are a health and performance expert analyzing Oura Ring data for a client. Please provide personalized, science-backed advice based on the data analysis and user profile provided.
+
+Your advice should be specific to women. Use the following markdown scientific report on research for women's health to guide you.
+
+""" + WOMENS_HEALTH_RESEARCH
+
+ADVICE_INSTRUCTIONS = """## Instructions
+Based on the data analysis and the user's profile, provide comprehensive, actionable advice.
+
+Structure your response with the following sections:
+
+### Behavioral Recommendations
+Provide specific lifestyle and daily habit recommendations based on the data patterns observed.
+
+### Exercise Recommendations  
+Suggest specific workout types, intensities, timing, and recovery protocols based on the readiness, activity, and cardiovascular data.
+
+### Nutrition Recommendations
+Recommend dietary strategies that align with the observed sleep, recovery, and performance patterns.
+
+### Supplementation Recommendations
+Suggest evidence-based supplements that could support the user's goals and address any deficiencies suggested by the data.
+
+Make sure all recommendations are:
+- Science-backed with brief explanations of the reasoning
+- Specific and actionable
+- Tailored to the user's age, goals, and data patterns
+- Realistic for implementation
+- take into account the menstrual cycle
+
+Focus on the most impactful recommendations rather than overwhelming with too many suggestions."""
+
+ADVICE_JSON_FORMAT = """Please provide your response in the following JSON format:
+
+{
+  "title": "Emma's Personalized Health Advice",
+  "user_profile": {
+    "name": "Emma",
+    "age": 26,
+    "focus_areas": ["sleep optimization", "recovery", "cardiovascular health"]
+  },
+  "sections": {
+    "behavioral": {
+      "title": "Behavioral Recommendations",
+      "icon": "🧠",
+      "recommendations": [
+        {
+          "title": "Recommendation title",
+          "description": "Detailed description of the recommendation",
+          "reasoning": "Brief scientific reasoning behind this recommendation",
+          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
+        }
+      ]
+    },
+    "exercise": {
+      "title": "Exercise Recommendations", 
+      "icon": "💪",
+      "recommendations": [
+        {
+          "title": "Recommendation title",
+          "description": "Detailed description of the recommendation",
+          "reasoning": "Brief scientific reasoning behind this recommendation",
+          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
+        }
+      ]
+    },
+    "nutrition": {
+      "title": "Nutrition Recommendations",
+      "icon": "🥗", 
+      "recommendations": [
+        {
+          "title": "Recommendation title",
+          "description": "Detailed description of the recommendation",
+          "reasoning": "Brief scientific reasoning behind this recommendation",
+          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
+        }
+      ]
+    },
+    "supplementation": {
+      "title": "Supplementation Recommendations",
+      "icon": "💊",
+      "recommendations": [
+        {
+          "title": "Recommendation title", 
+          "description": "Detailed description of the recommendation",
+          "reasoning": "Brief scientific reasoning behind this recommendation",
+          "actionable_steps": ["Step 1", "Step 2", "Step 3"]
+        }
+      ]
+    }
+  }
+}
+
+Provide 2-4 specific, actionable recommendations per section. Make sure all recommendations are science-backed and personalized to Emma's data patterns."""
+
+DAILY_ADVICE_INSTRUCTIONS = """IMPORTANT: You must respond ONLY with valid JSON. Do not include any text before or after the JSON. Do not use markdown formatting. Respond with pure JSON only.
+
+Please provide 3 different daily programmes that will be displayed as flippable cards.
+The daily programmes should pertain to one activity only, be that one full workout, one breating exercise routine or one day's meal plan.
+The meal plan should only contain breakfast, lunch, dinner and 1 snack.
+
+ Each card should have actionable items on the front and scientific backing on the back. Use this exact JSON format:
+
+{
+  "title": "Emma's Daily Health Programs",
+  "cards": [
+    {
+      "title": "Movement",
+      "items": [
+      "Burpees 60 seconds",
+      "Shoulder taps 60 seconds", 
+      "V Ups 60 seconds",
+      "30 Second rest",
+      "Repeat x5"
+        
+      ],
+      "description": "2-3 sentence explanation of why this movement program works specifically for Emma based on her Oura data patterns, menstrual cycle phase, and health goals. Mention specific benefits for performance optimization and recovery.",
+      "sources": [
+        {"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"},
+        {"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}
+      ]
+    },
+    {
+      "title": "Mindfulness",
+      "items": [
+       "The 4-2-8 Breathing Method",
+       "Inhale: Breathe in slowly and deeply through your nose for a count of four."
+"Hold: Hold your breath for a count of two."
+"Exhale: Exhale slowly and completely through your mouth for a count of one."
+"Repeat: Repeat this cycle for a set number of repetitions, usually between 5-10 minutes, or until you feel calmer."
+      ],
+      "description": "2-3 sentence explanation of why this mindfulness program works specifically for Emma based on her stress patterns, HRV data, and cycle phase. Mention benefits for stress resilience and sleep optimization.",
+      "sources": [
+        {"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"},
+        {"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}
+      ]
+    },
+    {
+      "title": "Nutrition",
+      "items": [
+        "Breakfast: Granola with Greek Yogurt and blueberries and honey",
+        "Lunch: Salmon and quinoa salad with kale", 
+        "Dinner: Paprika chicken with brown rice and broccoli",
+        "Snack: Mixed nuts and apple slices"
+      ],
+      "description": "2-3 sentence explanation of why this nutrition program works specifically for Emma based on her activity levels, recovery patterns, and cycle phase. Mention benefits for performance and hormonal balance.",
+      "sources": [
+        {"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"},
+        {"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}
+      ]
+    }
+  ]
+}
+
+CRITICAL: 
+- Each item should be part of a programme that you are giving the user. Each item should therefore have enough detail for the user to carry out the activity without any outside help.
+- For Movement cards: Do NOT include warm-ups or cool-downs. Focus only on the main exercise routine.
+- For Nutrition cards: ALWAYS structure as "Breakfast: ...", "Lunch: ...", "Dinner: ...", "Snack: ..." for easy parsing into subheadings.
+- Descriptions should reference Emma's actual data patterns and be personalized
+- Sources MUST be real, existing research papers. You must provide the exact title of an actual published study along with its correct corresponding URL. Verify that the title and URL match the same study. Use real PubMed URLs or DOI links that actually lead to the cited paper
+- Your response must be valid JSON only. No explanatory text. No markdown. Just JSON."""
+DAILY_ADVICE_MARKDOWN_INSTRUCTIONS = """Suggest 3 different daily programmes based on the user's data and profile. They should be structured as:
+## Movment
+Suggest a movement programme for today based on the health advice.
+Give one workout/activity only and give details on it + why it's good
+## Mindfulness
+Suggest a mindfulness programme for today based on the health advice.
+Give one workout/activity only and give details on it + why it's good
+## Nutrition
+Suggest a nutrition programme for today based on the health advice.
+Give actual meal ideas and details on why they are good for the user.
+The meal plan should only contain breakfast, lunch, dinner and 1 snack. Do not give pre or post workout meals or any other meals.
+
+Only do one programme, assume user is in early stage of cycle.
+In all cases, explain why it is good, relevant to the user's own data!
+Begin response with: Here are some ideas for you to try today to achive your goals"""
+
+# Per-section daily programmes, generated as independent requests by the async pipeline
+DAILY_SECTIONS = {
+    "movement": {
+        "title": "Movement",
+        "programme": "one full workout",
+        "rules": "Do NOT include warm-ups or cool-downs. Focus only on the main exercise routine.",
+        "description": "why this movement program works specifically for the user based on her Oura data patterns, menstrual cycle phase, and health goals. Mention specific benefits for performance optimization and recovery.",
+    },
+    "mindfulness": {
+        "title": "Mindfulness",
+        "programme": "one breathing exercise routine",
+        "rules": "Give each step of the routine as its own item, including counts and the number of repetitions.",
+        "description": "why this mindfulness program works specifically for the user based on her stress patterns, HRV data, and cycle phase. Mention benefits for stress resilience and sleep optimization.",
+    },
+    "nutrition": {
+        "title": "Nutrition",
+        "programme": "one day's meal plan containing only breakfast, lunch, dinner and 1 snack",
+        "rules": 'ALWAYS structure items as "Breakfast: ...", "Lunch: ...", "Dinner: ...", "Snack: ..." for easy parsing into subheadings.',
+        "description": "why this nutrition program works specifically for the user based on her activity levels, recovery patterns, and cycle phase. Mention benefits for performance and hormonal balance.",
+    },
+}
+
+DAILY_SECTION_INSTRUCTIONS = """IMPORTANT: You must respond ONLY with valid JSON. Do not include any text before or after the JSON. Do not use markdown formatting. Respond with pure JSON only.
+
+Please provide a daily {title} programme for today that will be displayed as a flippable card. The programme should be {programme}.
+The card should have actionable items on the front and scientific backing on the back. Use this exact JSON format:
+
+{{
+  "title": "{title}",
+  "items": ["Step or item 1", "Step or item 2"],
+  "description": "2-3 sentence explanation of {description}",
+  "sources": [
+    {{"name": "Actual study title", "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/"}},
+    {{"name": "Another actual study title", "url": "https://doi.org/10.1234/example"}}
+  ]
+}}
+
+CRITICAL:
+- Each item should be part of the programme you are giving the user, with enough detail to carry out the activity without any outside help.
+- {rules}
+- The description should reference the user's actual data patterns and be personalized
+- Sources MUST be real, existing research papers. You must provide the exact title of an actual published study along with its correct corresponding URL. Verify that the title and URL match the same study. Use real PubMed URLs or DOI links that actually lead to the cited paper
+- Your response must be valid JSON only. No explanatory text. No markdown. Just JSON."""
+
+
+# Output instructions by request kind; the daily sections are rendered up front
+INSTRUCTIONS: Dict[str, str] = {
+    "advice": ADVICE_INSTRUCTIONS,
+    "advice_structured": ADVICE_INSTRUCTIONS + "\n\n" + ADVICE_JSON_FORMAT,
+    "daily": DAILY_ADVICE_INSTRUCTIONS,
+    "daily_markdown": DAILY_ADVICE_MARKDOWN_INSTRUCTIONS,
+    **{f"daily_{name}": DAILY_SECTION_INSTRUCTIONS.format(**section)
+       for name, section in DAILY_SECTIONS.items()},
+}
+
+USER_PROFILE_TEMPLATE = """## User Profile
+Name: {name}
+Age: {age}
+Goals: {goals}
+
+## Health Data Analysis
+{stats}"""
+
+ADVICE_CLOSING_TEMPLATE = ("\n\nBegin response with '{name}'s Personalized Health Advice:' "
+                           "and ensure the response is concise yet comprehensive.")
+
+_ANALYSIS_BLOCK = {"type": "text", "text": ANALYSIS_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+_SYSTEM_BLOCKS = {
+    kind: (_ANALYSIS_BLOCK, {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}})
+    for kind, text in INSTRUCTIONS.items()
+}
+
+
+def system_blocks(kind: str) -> List[Dict[str, Any]]:
+    """
+    Get the static system content blocks for a request kind.
+
+    The research block comes first and each block carries a cache breakpoint, so
+    every request kind shares the cached research prefix. The block dictionaries
+    are shared between requests and must not be modified.
+
+    Args:
+        kind: Key of INSTRUCTIONS, e.g. 'advice' or 'daily_movement'
+
+    Returns:
+        List of Anthropic system content blocks
+    """
+    return list(_SYSTEM_BLOCKS[kind])
+
+
+def render_user_prompt(user_metadata: Mapping[str, Any], stats: str, closing: bool = False) -> str:
+    """
+    Render the per-user message from the profile and stats digest.
+
+    Args:
+        user_metadata: Dictionary with user information (name, age, goals, etc.)
+        stats: Stats digest for the user's health data
+        closing: Whether to append the markdown advice opening instruction
+
+    Returns:
+        User message content
+    """
+    name = user_metadata.get('name', 'User')
+    prompt = USER_PROFILE_TEMPLATE.format(
+        name=name,
+        age=user_metadata.get('age', 'Not specified'),
+        goals=user_metadata.get('goals', 'General health'),
+        stats=stats,
+    )
+    if closing:
+        prompt += ADVICE_CLOSING_TEMPLATE.format(name=name)
+    return prompt
+
+
+@lru_cache(maxsize=None)
+def load_data_dictionary(path: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+    """
+    Load the Oura data dictionary, reading each file only once per process.
+
+    The returned dictionary is shared by every caller and must not be modified.
+
+    Args:
+        path: Path to the dictionary JSON file; the bundled dictionary by default
+
+    Returns:
+        Mapping of dataset name to column descriptions
+    """
+    dict_path = Path(path) if path else DATA_DICTIONARY_PATH
+    try:
+        with open(dict_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Warning: Data dictionary not found at {dict_path}")
+        return {}
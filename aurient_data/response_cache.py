@@ -0,0 +1,235 @@
+"""
+Keyed, on-disk cache for Claude responses.
+
+Entries are keyed by user, model, generation parameters and a hash of the full
+prompt, so two users can never read each other's advice and identical requests
+are only paid for once. The cache is safe to share between threads and
+processes: entries are written atomically, a per-key lock ensures only one caller
+generates a missing entry, and eviction (TTL + LRU by size) runs under a global
+lock. Eviction scans every entry, so it runs once every `evict_every` writes
+rather than on each one; the limits may be overshot by that many entries.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "cache" / "llm_responses"
+
+
+class ResponseCache:
+    """
+    File-based LLM response cache with TTL, LRU size limits and cross-process locking.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None,
+                 ttl_seconds: Optional[float] = 24 * 3600,
+                 max_entries: Optional[int] = 5000,
+                 max_bytes: Optional[int] = 256 * 1024 ** 2,
+                 evict_every: int = 100):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory for cache entries (created if missing)
+            ttl_seconds: Entry lifetime in seconds, or None to never expire
+            max_entries: Maximum number of entries kept, or None for no limit
+            max_bytes: Maximum total size of entries in bytes, or None for no limit
+            evict_every: Number of writes by this instance between evictions
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_guard = threading.Lock()
+
+    @staticmethod
+    def make_key(user_id: str, model: str, params: Dict[str, Any]) -> str:
+        """
+        Build a cache key for a generation request.
+
+        Args:
+            user_id: Identifier of the user the response belongs to
+            model: Model name
+            params: Remaining request parameters (system, messages, max_tokens, ...)
+
+        Returns:
+            Hex digest identifying the request
+        """
+        prompt_hash = hashlib.sha256(
+            json.dumps({k: params.get(k) for k in ("system", "messages")},
+                       sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        settings = {k: v for k, v in params.items() if k not in ("system", "messages")}
+        material = json.dumps({"user": user_id, "model": model, "prompt": prompt_hash, "params": settings},
+                              sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str, user_id: Optional[str] = None) -> Optional[Any]:
+        """
+        Return the cached value for a key, or None on a miss or expired entry.
+
+        Args:
+            key: Cache key from make_key()
+            user_id: If given, entries stored for a different user are treated as misses
+        """
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if self.ttl_seconds is not None and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+        if user_id is not None and entry.get("user_id") != user_id:
+            return None
+
+        # Bump mtime so eviction treats this entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry.get("value")
+
+    def set(self, key: str, value: Any, user_id: Optional[str] = None) -> None:
+        """
+        Store a JSON-serialisable value atomically, evicting every `evict_every` writes.
+
+        Args:
+            key: Cache key from make_key()
+            value: Value to store
+            user_id: Owner of the entry
+        """
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "user_id": user_id, "created_at": time.time(), "value": value}
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(Path(tmp_path))
+            raise
+
+        with self._thread_locks_guard:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def get_or_create(self, key: str, producer: Callable[[], Any],
+                      user_id: Optional[str] = None) -> Tuple[Any, bool]:
+        """
+        Return a cached value, generating and storing it if missing.
+
+        Concurrent callers (threads or processes) asking for the same key wait for
+        the first one instead of generating a duplicate response.
+
+        Args:
+            key: Cache key from make_key()
+            producer: Callable generating the value on a miss
+            user_id: Owner of the entry
+
+        Returns:
+            Tuple of (value, cache_hit)
+        """
+        value = self.get(key, user_id)
+        if value is not None:
+            return value, True
+
+        # Lock stripes keep the number of lock files bounded
+        with self._lock(f"{key[:3]}.lock"):
+            value = self.get(key, user_id)
+            if value is not None:
+                return value, True
+            value = producer()
+            if value is not None:
+                self.set(key, value, user_id)
+            return value, False
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then least recently used ones beyond the limits.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock(".evict.lock"):
+            now = time.time()
+            entries = []
+            removed = 0
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds * 2:
+                    # mtime is refreshed on read, so this is only a cheap pre-filter;
+                    # created_at is still checked in get()
+                    self._remove(path)
+                    removed += 1
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and ((self.max_entries is not None and len(entries) > self.max_entries)
+                               or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                _, size, path = entries.pop(0)
+                self._remove(path)
+                total_bytes -= size
+                removed += 1
+            return removed
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for path in self.cache_dir.glob("*/*.json"):
+            self._remove(path)
+
+    @contextmanager
+    def _lock(self, name: str) -> Iterator[None]:
+        """Hold a named lock across threads and, where supported, processes."""
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(name, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_dir = self.cache_dir / ".locks"
+            lock_dir.mkdir(exist_ok=True)
+            with open(lock_dir / name, "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
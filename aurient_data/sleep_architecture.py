@@ -0,0 +1,400 @@
+"""
+Sleep architecture analytics over decoded hypnograms.
+
+Oura's `sleep_detailed` rows carry the night as strings: a 5-minute hypnogram
+(`sleep_phase_5_min`, 1 = deep, 2 = light, 3 = REM, 4 = awake), 30-second
+movement (`movement_30_sec`, 1 = still to 4 = active) and JSON series of the
+5-minute heart rate and HRV (RMSSD, ms). night_table() decodes every night at
+once into padded arrays and computes, without a per-night Python loop:
+
+- stage durations, efficiency, sleep onset latency, deep and REM latency from
+  onset, and wake after sleep onset;
+- stage transition counts (aggregated by transition_matrix()), stage shifts and
+  awakenings per hour of sleep (fragmentation) and the share of restless movement;
+- heart rate mean, nadir and nadir timing, and RMSSD mean, peak and peak timing;
+- sleep midpoint, the variability of bedtime and midpoint over the previous nights,
+  and the Sleep Regularity Index against the previous day (long sleeps only).
+
+The result has one row per sleep period and is cached on disk per user by
+SleepArchitectureStore, keyed by a fingerprint of the sleep data:
+
+    table = cached_night_table(health_data["sleep_detailed"], "emma", SleepArchitectureStore())
+    transition_matrix(table)
+"""
+
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ingest import HAS_PARQUET, local_time
+
+
+DEFAULT_STORE_DIR = Path(__file__).parent / "cache" / "sleep_architecture"
+# Bump when the table's columns or definitions change, to invalidate stored tables
+TABLE_VERSION = 1
+
+STAGE_CODES = {1: "deep", 2: "light", 3: "rem", 4: "awake"}
+STAGES = tuple(STAGE_CODES.values())
+HYPNOGRAM_EPOCH_SECONDS = 300
+RESTLESS_MOVEMENT = 2
+MAIN_SLEEP_TYPE = "long_sleep"
+REGULARITY_NIGHTS = 7
+# The regularity grid runs from noon to noon in hypnogram epochs
+GRID_EPOCHS = 24 * 3600 // HYPNOGRAM_EPOCH_SECONDS
+
+SOURCE_COLUMNS = ("day", "type", "bedtime_start", "sleep_phase_5_min", "movement_30_sec", "heart_rate", "hrv")
+
+
+def decode_digit_strings(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode digit strings (hypnograms, movement) into a zero-padded matrix.
+
+    Args:
+        values: One digit string per row; missing values decode to empty rows
+
+    Returns:
+        Tuple of (uint8 matrix with one row per value, row lengths). Padding and
+        characters other than digits are 0.
+    """
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    lengths = text.str.len().to_numpy(dtype=np.int64)
+    matrix = np.zeros((len(text), int(lengths.max()) if len(text) else 0), dtype=np.uint8)
+    if lengths.sum():
+        raw = np.frombuffer("".join(text).encode("ascii", "replace"), dtype=np.uint8)
+        codes = np.where((raw >= 48) & (raw <= 57), raw - 48, 0).astype(np.uint8)
+        rows = np.repeat(np.arange(len(text)), lengths)
+        columns = np.arange(len(raw)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        matrix[rows, columns] = codes
+    return matrix, lengths
+
+
+def decode_series(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode Oura sample series ({"interval": ..., "items": [...]}) into a NaN-padded matrix.
+
+    Args:
+        values: One JSON series per row; nulls within a series become NaN
+
+    Returns:
+        Tuple of (float matrix with one row per value, interval of each row in seconds)
+    """
+    text = values.astype(object).where(values.notna(), "").astype(str)
+    items = (text.str.extract(r"""["']items["']\s*:\s*\[([^\]]*)\]""", expand=False).fillna("")
+             .str.replace(r"null|None", "nan", regex=True).str.strip())
+    interval = pd.to_numeric(text.str.extract(r"""["']interval["']\s*:\s*([\d.]+)""", expand=False),
+                             errors="coerce").to_numpy(dtype=np.float64)
+    lengths = np.where(items.str.len() > 0, items.str.count(",") + 1, 0).astype(np.int64)
+    matrix = np.full((len(text), int(lengths.max()) if len(text) else 0), np.nan)
+    if lengths.sum():
+        tokens = ",".join(items[lengths > 0]).split(",")
+        try:
+            flat = np.array(tokens, dtype=np.float64)
+        except ValueError:
+            flat = pd.to_numeric(pd.Series(tokens).str.strip(), errors="coerce").to_numpy(dtype=np.float64)
+        rows = np.repeat(np.arange(len(text)), lengths)
+        columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        matrix[rows, columns] = flat
+    return matrix, interval
+
+
+def _first(mask: np.ndarray) -> np.ndarray:
+    """Index of the first True in each row, NaN for rows without one."""
+    found = mask.any(axis=1)
+    return np.where(found, mask.argmax(axis=1), np.nan)
+
+
+def _per_hour(counts: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(seconds > 0, counts / (seconds / 3600), np.nan)
+
+
+def _curve_features(matrix: np.ndarray, interval: np.ndarray, extreme: str) -> Dict[str, np.ndarray]:
+    """Mean, extreme (min or max) and the extreme's time and position within the night, per row."""
+    if matrix.shape[1] == 0:
+        matrix = np.full((len(matrix), 1), np.nan)
+    present = ~np.isnan(matrix)
+    count = present.sum(axis=1)
+    has_data = count > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.where(has_data, np.where(present, matrix, 0).sum(axis=1) / count, np.nan)
+    if extreme == "min":
+        index = np.where(present, matrix, np.inf).argmin(axis=1)
+    else:
+        index = np.where(present, matrix, -np.inf).argmax(axis=1)
+    value = np.where(has_data, matrix[np.arange(len(matrix)), index], np.nan)
+    # Position relative to the last sample, so padding does not stretch the night
+    length = np.where(present, np.arange(matrix.shape[1]) + 1, 0).max(axis=1, initial=0)
+    return {
+        "mean": mean,
+        "value": value,
+        "seconds": np.where(has_data, index * interval, np.nan),
+        "fraction": np.where(has_data, index / np.maximum(length - 1, 1), np.nan),
+    }
+
+
+def _clock_minutes(times: pd.Series) -> pd.Series:
+    """Minutes after noon of the clock time (so bedtimes around midnight are continuous)."""
+    minutes = times.dt.hour * 60 + times.dt.minute + times.dt.second / 60
+    return (minutes - 720) % 1440
+
+
+def _regularity(nights: pd.DataFrame, hypnogram: np.ndarray, start: pd.Series,
+                group: pd.Series) -> Dict[str, pd.Series]:
+    """Bedtime/midpoint variability and the Sleep Regularity Index of main sleeps."""
+    index = nights.index
+    main = (nights["type"] == MAIN_SLEEP_TYPE) if nights["type"].notna().any() else pd.Series(True, index=index)
+    main &= start.notna()
+    duration = pd.to_timedelta(nights["time_in_bed_seconds"], unit="s")
+    midpoint = _clock_minutes(start + duration / 2)
+    bedtime = _clock_minutes(start)
+    out = {"bedtime_minutes": bedtime.where(main), "midpoint_minutes": midpoint.where(main)}
+    for name, values in (("bedtime", bedtime), ("midpoint", midpoint)):
+        rolling = values[main].groupby(group[main]).rolling(REGULARITY_NIGHTS, min_periods=3).std()
+        out[f"{name}_variability_minutes"] = rolling.reset_index(level=0, drop=True).reindex(index)
+
+    # Asleep/awake on a noon-to-noon grid per main sleep, compared with the previous day's grid
+    rows = np.flatnonzero(main.to_numpy())
+    sri = pd.Series(np.nan, index=index)
+    if len(rows):
+        anchor = (start.iloc[rows] - pd.Timedelta(hours=12)).dt.normalize() + pd.Timedelta(hours=12)
+        offset = ((start.iloc[rows] - anchor).dt.total_seconds() // HYPNOGRAM_EPOCH_SECONDS).to_numpy(np.int64)
+        asleep = (hypnogram[rows] >= 1) & (hypnogram[rows] <= 3)
+        row, epoch = np.nonzero(asleep)
+        slot = offset[row] + epoch
+        keep = slot < GRID_EPOCHS
+        grid = np.zeros((len(rows), GRID_EPOCHS), dtype=bool)
+        grid[row[keep], slot[keep]] = True
+        days = anchor.dt.normalize().to_numpy()
+        groups = group.iloc[rows].to_numpy()
+        consecutive = (np.diff(days) == np.timedelta64(1, "D")) & (groups[1:] == groups[:-1])
+        agreement = (grid[1:] == grid[:-1]).mean(axis=1)
+        sri.iloc[rows[1:][consecutive]] = 200 * agreement[consecutive] - 100
+    out["sleep_regularity_index"] = sri
+    return out
+
+
+def night_table(sleep_detailed: pd.DataFrame, user_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    Sleep architecture of every sleep period, computed in batched array operations.
+
+    Args:
+        sleep_detailed: Oura sleep periods (one or many users)
+        user_column: Column identifying the user when several users' periods are
+            combined; regularity is computed within each user
+
+    Returns:
+        DataFrame with one row per sleep period, ordered by user, day and bedtime.
+        Durations and latencies are in seconds, clock times in minutes after noon.
+    """
+    df = sleep_detailed.copy()
+    for column in SOURCE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    start = local_time(df["bedtime_start"])
+    order = [c for c in (user_column, "day") if c] + ["_start"]
+    df = df.assign(_start=start).sort_values(order, kind="stable").reset_index(drop=True)
+    start = df.pop("_start")
+    group = df[user_column] if user_column else pd.Series(0, index=df.index)
+
+    hypnogram, epochs = decode_digit_strings(df["sleep_phase_5_min"])
+    seconds = HYPNOGRAM_EPOCH_SECONDS
+    nights = pd.DataFrame({"day": df["day"], "type": df["type"], "bedtime_start": start})
+    if user_column:
+        nights.insert(0, user_column, df[user_column])
+
+    # Stage durations and latencies
+    stage_seconds = {stage: (hypnogram == code).sum(axis=1) * seconds for code, stage in STAGE_CODES.items()}
+    for stage in STAGES:
+        nights[f"{stage}_seconds"] = stage_seconds[stage]
+    asleep = (hypnogram >= 1) & (hypnogram <= 3)
+    total_sleep = stage_seconds["deep"] + stage_seconds["light"] + stage_seconds["rem"]
+    nights["total_sleep_seconds"] = total_sleep
+    nights["time_in_bed_seconds"] = epochs * seconds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nights["efficiency"] = np.where(epochs > 0, total_sleep / (epochs * seconds), np.nan)
+    onset = _first(asleep)
+    nights["sleep_latency_seconds"] = onset * seconds
+    for code, stage in ((1, "deep"), (3, "rem")):
+        nights[f"{stage}_latency_seconds"] = (_first(hypnogram == code) - onset) * seconds
+    last_sleep = np.where(asleep.any(axis=1), hypnogram.shape[1] - 1 - asleep[:, ::-1].argmax(axis=1), -1)
+    columns = np.arange(hypnogram.shape[1])
+    in_period = (columns >= np.nan_to_num(onset, nan=hypnogram.shape[1])[:, None]) & (columns <= last_sleep[:, None])
+    nights["waso_seconds"] = ((hypnogram == 4) & in_period).sum(axis=1) * seconds
+
+    # Transitions and fragmentation
+    before, after = hypnogram[:, :-1].astype(np.int64), hypnogram[:, 1:].astype(np.int64)
+    valid = (before > 0) & (before <= 4) & (after > 0) & (after <= 4)
+    row = np.nonzero(valid)[0]
+    cell = (before[valid] - 1) * 4 + (after[valid] - 1)
+    counts = np.bincount(row * 16 + cell, minlength=len(df) * 16).reshape(len(df), 4, 4)
+    for i, source in enumerate(STAGES):
+        for j, target in enumerate(STAGES):
+            nights[f"{source}_to_{target}"] = counts[:, i, j]
+    shifts = counts.sum(axis=(1, 2)) - np.trace(counts, axis1=1, axis2=2)
+    awakenings = counts[:, :3, 3].sum(axis=1)
+    nights["stage_shifts"] = shifts
+    nights["awakenings"] = awakenings
+    nights["fragmentation_index"] = _per_hour(shifts, total_sleep)
+    nights["awakenings_per_hour"] = _per_hour(awakenings, total_sleep)
+    movement, movement_epochs = decode_digit_strings(df["movement_30_sec"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        nights["restless_share"] = np.where(movement_epochs > 0,
+                                            (movement >= RESTLESS_MOVEMENT).sum(axis=1) / movement_epochs, np.nan)
+
+    # Heart rate and HRV curves
+    heart_rate = _curve_features(*decode_series(df["heart_rate"]), extreme="min")
+    nights["hr_mean"] = heart_rate["mean"]
+    nights["hr_nadir"] = heart_rate["value"]
+    nights["hr_nadir_seconds"] = heart_rate["seconds"]
+    nights["hr_nadir_fraction"] = heart_rate["fraction"]
+    hrv = _curve_features(*decode_series(df["hrv"]), extreme="max")
+    nights["rmssd_mean"] = hrv["mean"]
+    nights["rmssd_peak"] = hrv["value"]
+    nights["rmssd_peak_seconds"] = hrv["seconds"]
+    nights["rmssd_peak_fraction"] = hrv["fraction"]
+
+    # Timing and regularity
+    for name, values in _regularity(nights, hypnogram, start, group).items():
+        nights[name] = values.to_numpy()
+    return nights
+
+
+def transition_matrix(nights: pd.DataFrame, normalize: bool = True) -> pd.DataFrame:
+    """
+    Stage transition matrix over many nights.
+
+    Args:
+        nights: Table from night_table()
+        normalize: Return the probability of each next stage given the current
+            one instead of counts
+
+    Returns:
+        4x4 DataFrame indexed by the current stage with the next stage as columns
+    """
+    counts = pd.DataFrame([[nights[f"{a}_to_{b}"].sum() for b in STAGES] for a in STAGES],
+                          index=pd.Index(STAGES, name="from"), columns=pd.Index(STAGES, name="to"))
+    if not normalize:
+        return counts
+    return counts.div(counts.sum(axis=1).replace(0, np.nan), axis=0)
+
+
+def summarize_nights(nights: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Average sleep architecture of main sleeps.
+
+    Args:
+        nights: Table from night_table()
+        by: Column to group by (e.g. the user column); one overall row when None
+
+    Returns:
+        DataFrame of per-night means with the number of nights
+    """
+    main = nights[nights["type"] == MAIN_SLEEP_TYPE] if nights["type"].notna().any() else nights
+    metrics = [c for c in main.columns if main[c].dtype.kind in "fiu" and "_to_" not in c]
+    groups = main.groupby(by if by else np.zeros(len(main), dtype=int))
+    summary = groups[metrics].mean()
+    summary.insert(0, "nights", groups.size())
+    return summary if by else summary.set_axis(["all"])
+
+
+def sleep_fingerprint(sleep_detailed: pd.DataFrame) -> str:
+    """Fingerprint of the columns night_table() reads, and the table version."""
+    columns = [c for c in SOURCE_COLUMNS if c in sleep_detailed.columns]
+    digest = hashlib.sha256(f"v{TABLE_VERSION}:{','.join(columns)}:".encode("utf-8"))
+    hashed = pd.util.hash_pandas_object(sleep_detailed[columns].astype(object), index=False)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class SleepArchitectureStore:
+    """
+    Per-user night tables on disk (Parquet, or pickle without pyarrow).
+    """
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_STORE_DIR):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding one subdirectory per user
+        """
+        self.root = Path(root)
+        self.extension = "parquet" if HAS_PARQUET else "pkl"
+
+    def load(self, user_id: str, fingerprint: str) -> Optional[pd.DataFrame]:
+        """
+        A user's night table, if stored for the same sleep data.
+
+        Args:
+            user_id: User id
+            fingerprint: Fingerprint of the sleep data (see sleep_fingerprint)
+
+        Returns:
+            The night table, or None if missing or stale
+        """
+        user_dir = self.root / user_id
+        try:
+            manifest = json.loads((user_dir / "manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if manifest.get("fingerprint") != fingerprint or manifest.get("format") != self.extension:
+            return None
+        try:
+            read = pd.read_parquet if HAS_PARQUET else pd.read_pickle
+            return read(user_dir / f"nights.{self.extension}")
+        except Exception as e:
+            print(f"Warning: Failed to read the sleep architecture of {user_id}: {e}")
+            return None
+
+    def save(self, user_id: str, fingerprint: str, nights: pd.DataFrame) -> None:
+        """
+        Store a user's night table.
+
+        Args:
+            user_id: User id
+            fingerprint: Fingerprint of the sleep data it was computed from
+            nights: Table from night_table()
+        """
+        user_dir = self.root / user_id
+        try:
+            user_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=user_dir, suffix=".tmp")
+            with open(fd, "wb") as f:
+                if HAS_PARQUET:
+                    nights.to_parquet(f, index=False)
+                else:
+                    nights.to_pickle(f)
+            Path(tmp).replace(user_dir / f"nights.{self.extension}")
+            manifest = {"fingerprint": fingerprint, "format": self.extension, "nights": len(nights)}
+            (user_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        except Exception as e:
+            print(f"Warning: Failed to write the sleep architecture of {user_id}: {e}")
+
+
+def cached_night_table(sleep_detailed: pd.DataFrame, user_id: str,
+                       store: Optional[SleepArchitectureStore] = None) -> Tuple[pd.DataFrame, bool]:
+    """
+    A user's night table, reused from the store while their sleep data is unchanged.
+
+    Args:
+        sleep_detailed: The user's Oura sleep periods
+        user_id: User id
+        store: Store for night tables (None disables persistence)
+
+    Returns:
+        Tuple of (night table, whether it came from the store)
+    """
+    if store is None:
+        return night_table(sleep_detailed), False
+    fingerprint = sleep_fingerprint(sleep_detailed)
+    nights = store.load(user_id, fingerprint)
+    if nights is not None:
+        return nights, True
+    nights = night_table(sleep_detailed)
+    store.save(user_id, fingerprint, nights)
+    return nights, False
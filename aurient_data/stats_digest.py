@@ -0,0 +1,212 @@
+"""
+Compact, token-budgeted digest of health statistics for analysis prompts.
+
+Instead of listing the first few columns of every dataset, the digest ranks every
+day-level metric by how much it has recently moved (deviation of the last week
+from the preceding baseline, short-term trend and anomalous days) and keeps the
+most relevant ones until a token budget is reached. Only dictionary entries for
+the metrics actually cited are included.
+"""
+
+import math
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+ID_LIKE_COLUMN = re.compile(r"(^id$|_id$|^index$|^unnamed)", re.IGNORECASE)
+DATE_COLUMNS = ("day", "start_day", "date")
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a piece of text without a tokenizer.
+
+    Words count as one token per four characters (at least one), punctuation and
+    symbols as one token each, which tracks Claude's tokenizer closely enough for
+    budgeting prompts.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def daily_frame(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Aggregate a dataset to one row per day of its usable numeric metrics."""
+    if df.empty:
+        return None
+    date_col = next((c for c in DATE_COLUMNS if c in df.columns), None)
+    if date_col is not None:
+        days = pd.to_datetime(df[date_col], errors="coerce")
+    elif "timestamp" in df.columns:
+        days = pd.to_datetime(df["timestamp"], errors="coerce", utc=True).dt.tz_localize(None)
+    else:
+        return None
+
+    numeric = df.select_dtypes(include=[np.number])
+    numeric = numeric[[c for c in numeric.columns if not ID_LIKE_COLUMN.search(c)]]
+    if numeric.empty:
+        return None
+    daily = numeric.groupby(days.dt.normalize().values).mean().sort_index()
+    daily = daily.loc[daily.index.notna()]
+    # Drop columns with no data or no variation - they carry no signal
+    spread = daily.max() - daily.min()
+    return daily.loc[:, spread.fillna(0) > 0]
+
+
+def rank_metrics(health_data: Dict[str, pd.DataFrame], recent_days: int = 7,
+                 baseline_days: int = 28, trend_days: int = 14) -> pd.DataFrame:
+    """
+    Score every day-level metric by recent deviation, trend and anomalies.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        recent_days: Size of the recent window in days
+        baseline_days: Size of the baseline window preceding the recent window
+        trend_days: Window used for the linear trend
+
+    Returns:
+        DataFrame with one row per (dataset, metric), sorted by descending relevance
+    """
+    rows = []
+    for dataset_name, df in health_data.items():
+        daily = daily_frame(df)
+        if daily is None or daily.empty:
+            continue
+
+        recent = daily.iloc[-recent_days:]
+        baseline = daily.iloc[-(recent_days + baseline_days):-recent_days]
+        if len(baseline.dropna(how="all")) < 3:
+            baseline = daily
+
+        base_mean = baseline.mean()
+        base_std = baseline.std().replace(0, np.nan)
+        recent_mean = recent.mean()
+        deviation = ((recent_mean - base_mean) / base_std).fillna(0)
+        anomalies = ((recent - base_mean).abs() > 2 * base_std).sum()
+
+        # Least-squares slope over the trend window, for all columns at once
+        window = daily.iloc[-trend_days:]
+        t = np.arange(len(window), dtype=float)
+        values = window.to_numpy(dtype=float)
+        mask = ~np.isnan(values)
+        counts = mask.sum(axis=0)
+        t_mean = np.where(counts > 0, (mask * t[:, None]).sum(axis=0) / np.maximum(counts, 1), 0)
+        y_mean = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0)
+        dt = np.where(mask, t[:, None] - t_mean, 0)
+        dy = np.where(mask, values - y_mean, 0)
+        denom = (dt ** 2).sum(axis=0)
+        slope = np.divide((dt * dy).sum(axis=0), denom, out=np.zeros_like(denom), where=denom > 0)
+        # Change over the window expressed in baseline standard deviations
+        trend = pd.Series(slope * max(len(window) - 1, 1), index=daily.columns) / base_std
+        trend = trend.fillna(0)
+
+        frame = pd.DataFrame({
+            "dataset": dataset_name,
+            "metric": daily.columns,
+            "recent_mean": recent_mean.values,
+            "baseline_mean": base_mean.values,
+            "deviation": deviation.values,
+            "trend": trend.values,
+            "anomalies": anomalies.values,
+            "days": daily.notna().sum().values,
+            "latest_day": daily.index[-1],
+        })
+        rows.append(frame)
+
+    if not rows:
+        return pd.DataFrame(columns=["dataset", "metric", "recent_mean", "baseline_mean", "deviation",
+                                     "trend", "anomalies", "days", "latest_day", "relevance"])
+
+    ranked = pd.concat(rows, ignore_index=True)
+    ranked["relevance"] = (ranked["deviation"].abs() + 0.5 * ranked["trend"].abs().clip(upper=4)
+                           + 0.5 * ranked["anomalies"]
+                           # Composite scores summarise a whole dataset; prefer them on ties
+                           + 0.25 * (ranked["metric"] == "score"))
+    return ranked.sort_values("relevance", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _fmt(value: float) -> str:
+    if pd.isna(value):
+        return "n/a"
+    return f"{value:.3g}" if abs(value) < 1000 else f"{value:,.0f}"
+
+
+def _metric_line(row: pd.Series) -> str:
+    direction = "rising" if row["trend"] > 0.5 else "falling" if row["trend"] < -0.5 else "stable"
+    line = (f"- {row['metric']}: recent {_fmt(row['recent_mean'])} vs baseline {_fmt(row['baseline_mean'])} "
+            f"({row['deviation']:+.1f} SD), {direction}")
+    if row["anomalies"]:
+        line += f", {int(row['anomalies'])} anomalous day{'s' if row['anomalies'] > 1 else ''}"
+    return line
+
+
+def _dataset_heading(dataset_name: str) -> str:
+    return f"### {dataset_name.replace('_', ' ').title()}"
+
+
+def build_stats_digest(health_data: Dict[str, pd.DataFrame],
+                       data_dictionary: Optional[Dict[str, Dict[str, str]]] = None,
+                       token_budget: int = 1500, recent_days: int = 7,
+                       baseline_days: int = 28) -> str:
+    """
+    Build a ranked health data summary that fits within a token budget.
+
+    Args:
+        health_data: Dictionary of DataFrames keyed by dataset name
+        data_dictionary: Oura data dictionary; entries are included only for cited metrics
+        token_budget: Maximum estimated tokens for the digest
+        recent_days: Size of the recent window in days
+        baseline_days: Size of the baseline window preceding the recent window
+
+    Returns:
+        Markdown digest for the analysis prompt
+    """
+    data_dictionary = data_dictionary or {}
+    ranked = rank_metrics(health_data, recent_days, baseline_days)
+
+    coverage = ", ".join(f"{name.replace('_', ' ')} ({len(df)} records)"
+                         for name, df in health_data.items() if not df.empty)
+    header = "## Health Data Summary\n\n"
+    if not ranked.empty:
+        latest = pd.Timestamp(ranked["latest_day"].max()).strftime("%Y-%m-%d")
+        header += (f"Metrics ranked by recent change: last {recent_days} days vs the preceding "
+                   f"{baseline_days}-day baseline (latest data: {latest}).\n")
+    header += f"Available data: {coverage or 'none'}\n"
+    used = estimate_tokens(header)
+
+    selected: Dict[str, List[str]] = {}
+    definitions: List[str] = []
+    for _, row in ranked.iterrows():
+        line = _metric_line(row)
+        definition = data_dictionary.get(row["dataset"], {}).get(row["metric"])
+        definition_line = f"- {row['dataset']}.{row['metric']}: {definition}" if definition else None
+
+        cost = estimate_tokens(line)
+        if row["dataset"] not in selected:
+            cost += estimate_tokens(_dataset_heading(row["dataset"]))
+        if definition_line:
+            cost += estimate_tokens(definition_line)
+            if not definitions:
+                cost += estimate_tokens("### Metric Definitions")
+        if used + cost > token_budget:
+            continue
+
+        selected.setdefault(row["dataset"], []).append(line)
+        if definition_line:
+            definitions.append(definition_line)
+        used += cost
+
+    parts = [header]
+    for dataset_name, lines in selected.items():
+        parts.append(_dataset_heading(dataset_name) + "\n" + "\n".join(lines) + "\n")
+    if definitions:
+        parts.append("### Metric Definitions\n" + "\n".join(definitions) + "\n")
+    return "\n".join(parts)
@@ -0,0 +1,350 @@
+"""
+Incremental JSON extraction for streamed Claude responses.
+
+Structured advice arrives as one JSON document, often wrapped in markdown fences
+or preceded by a sentence of preamble. IncrementalJSONExtractor consumes the
+response as it streams, skips anything before the first '{', and emits each
+configured section (e.g. every entry of "cards") as soon as its closing bracket
+arrives, validated against a small schema. Sections that fail validation are
+dropped from the result and reported under 'errors'. If the tail of the response
+is malformed or truncated, the sections that did complete are still returned.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+Path = Tuple[Any, ...]
+
+ADVICE_SECTION_SCHEMA = {
+    "type": "object",
+    "required": ["title", "recommendations"],
+    "properties": {
+        "title": {"type": "string"},
+        "icon": {"type": "string"},
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["title", "description"],
+                "properties": {
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "reasoning": {"type": "string"},
+                    "actionable_steps": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+        },
+    },
+}
+
+DAILY_CARD_SCHEMA = {
+    "type": "object",
+    "required": ["title", "items", "description"],
+    "properties": {
+        "title": {"type": "string"},
+        "items": {"type": "array", "items": {"type": "string"}},
+        "description": {"type": "string"},
+        "sources": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["name", "url"],
+                "properties": {"name": {"type": "string"}, "url": {"type": "string"}},
+            },
+        },
+    },
+}
+
+# Section layouts of the two structured advice formats
+ADVICE_SECTIONS = {("sections", "*"): ADVICE_SECTION_SCHEMA}
+DAILY_CARD_SECTIONS = {("cards", "*"): DAILY_CARD_SCHEMA}
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+
+def validate(value: Any, schema: Dict[str, Any], where: str = "$") -> List[str]:
+    """
+    Validate a value against a minimal JSON-schema subset.
+
+    Supports 'type', 'required', 'properties' and 'items'.
+
+    Args:
+        value: Parsed JSON value
+        schema: Schema dictionary
+        where: Location used in error messages
+
+    Returns:
+        List of error messages, empty if the value is valid
+    """
+    expected = schema.get("type")
+    # bool is a subclass of int, but true/false are not JSON numbers
+    if expected and (not isinstance(value, _JSON_TYPES[expected])
+                     or (expected == "number" and isinstance(value, bool))):
+        return [f"{where}: expected {expected}, got {type(value).__name__}"]
+
+    errors = []
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{where}: missing required field '{key}'")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], sub_schema, f"{where}.{key}"))
+    elif isinstance(value, list) and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{where}[{i}]"))
+    return errors
+
+
+def _matches(path: Path, pattern: Path) -> bool:
+    return len(path) == len(pattern) and all(p == "*" or p == k for k, p in zip(path, pattern))
+
+
+class IncrementalJSONExtractor:
+    """
+    Streaming extractor emitting completed sections of a JSON document.
+    """
+
+    def __init__(self, sections: Optional[Dict[Path, Dict[str, Any]]] = None):
+        """
+        Initialize the extractor.
+
+        Args:
+            sections: Mapping of section path patterns such as ("cards", "*")
+                ('*' matches any key or index) to the schema each section must satisfy
+        """
+        self.sections = sections or {}
+        self.document: Optional[Any] = None
+        self.emitted: List[Dict[str, Any]] = []
+        self.members: Dict[str, Any] = {}
+        self.errors: List[str] = []
+
+        self._buf: List[str] = []
+        self._length = 0
+        self._started = False
+        self._done = False
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._string_capture: Optional[Path] = None
+        self._scalar: Optional[Tuple[Path, int]] = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Consume the next chunk of streamed text.
+
+        Args:
+            text: Text delta
+
+        Returns:
+            List of section events completed by this chunk, each with 'path',
+            'key', 'value', 'valid' and 'errors'
+        """
+        events: List[Dict[str, Any]] = []
+        for ch in text:
+            if self._done:
+                break
+            if not self._started:
+                if ch != "{":
+                    continue
+                self._started = True
+            self._buf.append(ch)
+            self._consume(ch, self._length, events)
+            self._length += 1
+        return events
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Return the parsed document, or the best partial document available.
+
+        A complete document is returned without the sections that failed
+        validation. Otherwise the completed top-level fields and valid sections
+        are assembled and 'partial' and 'parse_error' are added. Either way,
+        dropped sections are listed under 'errors'. If nothing usable was parsed
+        an error dictionary is returned.
+        """
+        if self._scalar is not None:
+            # A top-level scalar can only be terminated by a delimiter; flush it
+            self._complete_scalar(self._length, [])
+        text = "".join(self._buf)
+        if self._done:
+            try:
+                document = json.loads(text)
+            except json.JSONDecodeError as e:
+                self.errors.append(f"Failed to parse JSON response: {e}")
+            else:
+                self.document = self._drop_invalid(document)
+                return self.document
+
+        # Rebuild members that never closed from their valid, completed sections
+        partial = dict(self.members)
+        for event in self.emitted:
+            key, child = event["path"][0], event["path"][1]
+            if not event["valid"] or key in self.members:
+                continue
+            if isinstance(child, int):
+                partial.setdefault(key, []).append(event["value"])
+            else:
+                partial.setdefault(key, {})[child] = event["value"]
+
+        reason = self.errors[-1] if self.errors else (
+            "Response ended before the JSON document was complete" if self._started
+            else "No JSON object found in response")
+        if not partial:
+            return {"error": reason}
+        partial["partial"] = True
+        partial["parse_error"] = reason
+        dropped = self._invalid_sections()
+        if dropped:
+            partial["errors"] = dropped
+        return partial
+
+    def _invalid_sections(self) -> List[str]:
+        """One message per emitted section that failed validation."""
+        return [f"Dropped invalid section {'/'.join(map(str, event['path']))}: {'; '.join(event['errors'])}"
+                for event in self.emitted if not event["valid"]]
+
+    def _drop_invalid(self, document: Any) -> Any:
+        """Remove the sections that failed validation from a complete document."""
+        invalid = [event for event in self.emitted if not event["valid"]]
+        if not invalid or not isinstance(document, dict):
+            return document
+        # Sections are emitted in document order, so deleting in reverse keeps list indices valid
+        for event in reversed(invalid):
+            *parent_path, key = event["path"]
+            parent = document
+            try:
+                for step in parent_path:
+                    parent = parent[step]
+                del parent[key]
+            except (KeyError, IndexError, TypeError):
+                continue
+        document["errors"] = self._invalid_sections()
+        self.errors.extend(document["errors"])
+        return document
+
+    def _path(self) -> Path:
+        """Path of the value about to start in the current container."""
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        if frame["kind"] == "array":
+            frame["index"] += 1
+            return frame["path"] + (frame["index"],)
+        return frame["path"] + (frame["key"],)
+
+    def _captured(self, path: Path) -> bool:
+        return len(path) == 1 or any(_matches(path, pattern) for pattern in self.sections)
+
+    def _consume(self, ch: str, pos: int, events: List[Dict[str, Any]]) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                raw = "".join(self._buf[self._string_start:pos + 1])
+                if self._string_is_key:
+                    self._stack[-1]["key"] = self._loads(raw)
+                elif self._string_capture is not None:
+                    self._complete(self._string_capture, raw, events)
+            return
+
+        if self._scalar is not None and (ch.isspace() or ch in ",}]"):
+            self._complete_scalar(pos, events)
+
+        if ch.isspace():
+            return
+
+        frame = self._stack[-1] if self._stack else None
+        if ch in "{[":
+            path = self._path()
+            self._stack.append({
+                "kind": "object" if ch == "{" else "array",
+                "path": path,
+                "key": None,
+                "index": -1,
+                "start": pos if self._captured(path) else None,
+            })
+        elif ch in "}]":
+            if not frame:
+                return
+            self._stack.pop()
+            if frame["start"] is not None:
+                self._complete(frame["path"], "".join(self._buf[frame["start"]:pos + 1]), events)
+            if not self._stack:
+                self._done = True
+        elif ch == '"':
+            self._in_string = True
+            self._string_start = pos
+            self._string_is_key = bool(frame and frame["kind"] == "object" and frame.get("expect_key", True))
+            if not self._string_is_key:
+                path = self._path()
+                self._string_capture = path if self._captured(path) else None
+        elif ch == ":":
+            if frame:
+                frame["expect_key"] = False
+        elif ch == ",":
+            if frame and frame["kind"] == "object":
+                frame["expect_key"] = True
+        elif self._scalar is None:
+            path = self._path()
+            self._scalar = (path, pos) if self._captured(path) else ((), -1)
+
+    def _complete_scalar(self, pos: int, events: List[Dict[str, Any]]) -> None:
+        path, start = self._scalar
+        self._scalar = None
+        if start >= 0:
+            self._complete(path, "".join(self._buf[start:pos]).strip(), events)
+
+    def _complete(self, path: Path, raw: str, events: List[Dict[str, Any]]) -> None:
+        """Parse a completed value and record it as a member and/or section."""
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors.append(f"Malformed value at {'/'.join(map(str, path))}: {e}")
+            return
+
+        if len(path) == 1:
+            self.members[path[0]] = value
+        for pattern, schema in self.sections.items():
+            if _matches(path, pattern):
+                errors = validate(value, schema)
+                event = {"path": list(path), "key": path[-1], "value": value,
+                         "valid": not errors, "errors": errors}
+                self.emitted.append(event)
+                events.append(event)
+                break
+
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return raw.strip('"')
+
+
+def extract_json(text: str, sections: Optional[Dict[Path, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Parse a complete response with IncrementalJSONExtractor.
+
+    Args:
+        text: Full response text, possibly fenced or with surrounding prose
+        sections: Section patterns and schemas, as for IncrementalJSONExtractor
+
+    Returns:
+        Parsed (or partial) document, or an error dictionary
+    """
+    extractor = IncrementalJSONExtractor(sections)
+    extractor.feed(text)
+    return extractor.result()
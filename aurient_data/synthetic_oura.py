@@ -0,0 +1,551 @@
+"""
+Synthetic Oura exports for benchmarks and load tests.
+
+generate_user() writes one user's 14 export CSVs, named as OuraAnalysis.load_from_cache
+expects, plus a metadata.json, so a generated cohort (<root>/<user_id>/) can be
+served directly by AnalyzerRegistry(data_root=root). The files follow the real
+export formats, including the parts that dominate file size and parse time:
+
+- heart rate samples every 5 minutes while the ring is worn (awake, rest, sleep
+  and workout sources);
+- `contributors` dictionaries and the 1-minute MET series as JSON strings;
+- sleep hypnograms (`sleep_phase_5_min`), 30-second movement strings and the
+  5-minute sleep heart rate/HRV series;
+- menstrual cycles for about half of the users under 52: tagged period starts,
+  lower HRV and higher resting heart rate and temperature in the luteal phase,
+  and the cycle length in metadata.json.
+
+Each user's data comes from their own seeded generator (seed, user index), so a
+cohort is reproducible and users can be generated in parallel or on demand.
+metadata.json records the generation parameters, and users generated with
+other parameters (or an older generator) are regenerated.
+
+    python synthetic_oura.py out/ --scale medium --jobs 8
+"""
+
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from oura_analysis import DATA_FILES
+
+
+# name -> (users, years)
+SCALES = {
+    "small": (1, 1),
+    "medium": (100, 2),
+    "large": (1000, 5),
+    "xlarge": (10_000, 5),
+}
+END_DAY = "2025-06-18"
+
+GOALS = ("performance", "longevity", "weight loss", "stress management", "general health")
+ACTIVITY_LEVELS = ("low", "moderate", "high")
+FOCUS_AREAS = ("sleep optimization", "recovery", "cardiovascular health", "stress", "endurance", "strength")
+TIMEZONES = ("+00:00", "+01:00", "+02:00", "-05:00", "-08:00", "+08:00")
+WORKOUTS = ("walking", "running", "cycling", "strength_training", "yoga", "swimming", "hiit")
+SESSION_TYPES = ("breathing", "meditation", "nap", "relaxation", "rest", "body_status")
+PERIOD_TAG = "tag_generic_period"
+TAGS = ("tag_generic_alcohol", "tag_generic_caffeine", "tag_generic_late_meal", "tag_generic_sauna",
+        "tag_generic_sick", "tag_generic_travel")
+
+SAMPLES_PER_DAY = 288  # 5-minute heart rate slots
+RING_WEAR_RATE = 0.6
+
+# Share of users under 52 with a tracked menstrual cycle, the share of periods
+# they tag, and the luteal phase's HRV dip, resting heart rate and temperature rise
+CYCLING_SHARE = 0.5
+PERIOD_TAG_RATE = 0.9
+LUTEAL_HRV_FACTOR = 0.9
+LUTEAL_RHR_DELTA = 2.0
+LUTEAL_TEMPERATURE_DELTA = 0.3
+
+# Bumped whenever the generated data changes, so cohorts on disk are regenerated
+GENERATOR_VERSION = 2
+
+
+def _ids(rng: np.random.Generator, n: int) -> List[str]:
+    """Random UUID-like ids."""
+    words = rng.integers(0, 2 ** 63, size=(n, 2), dtype=np.int64)
+    return [f"{a:016x}-{b:016x}" for a, b in words]
+
+
+def _iso(times: pd.Series, offset: str) -> pd.Series:
+    return times.dt.strftime("%Y-%m-%dT%H:%M:%S") + offset
+
+
+def _json_column(**columns: Any) -> List[str]:
+    """One JSON object per row from equal-length columns of values."""
+    keys = list(columns)
+    rows = zip(*(np.round(np.asarray(v, dtype=float)).astype(int).tolist() for v in columns.values()))
+    return [json.dumps(dict(zip(keys, row))) for row in rows]
+
+
+def _digit_string(values: np.ndarray) -> str:
+    """A row of small integers (0-9) as a digit string, e.g. a hypnogram."""
+    return (values.astype(np.uint8) + ord("0")).tobytes().decode("ascii")
+
+
+def _series_json(values: np.ndarray, interval: float, start: str) -> str:
+    return json.dumps({"interval": interval, "items": np.round(values, 1).tolist(), "timestamp": start})
+
+
+def user_profile(rng: np.random.Generator, index: int) -> Dict[str, Any]:
+    """Random but plausible user metadata and physiology."""
+    age = int(rng.integers(18, 70))
+    return {
+        "metadata": {
+            "name": f"User {index}",
+            "age": age,
+            "goals": str(rng.choice(GOALS)),
+            "activity_level": str(rng.choice(ACTIVITY_LEVELS)),
+            "focus_areas": [str(a) for a in rng.choice(FOCUS_AREAS, size=2, replace=False)],
+        },
+        "timezone": str(rng.choice(TIMEZONES)),
+        "hrv": float(np.clip(rng.lognormal(np.log(70 - 0.6 * age), 0.25), 15, 150)),
+        "resting_hr": float(rng.uniform(48, 70)),
+        "sleep_hours": float(rng.uniform(6.5, 8.3)),
+        "steps": float(rng.uniform(4000, 13000)),
+        "workouts_per_day": float(rng.uniform(0.1, 1.0)),
+    }
+
+
+def menstrual_cycle(rng: np.random.Generator, days: int, age: int) -> Tuple[Optional[int], Optional[np.ndarray]]:
+    """
+    Whether a user has a tracked cycle, its length, and the day of the cycle (0 = period start) of each day.
+
+    Args:
+        rng: The user's cycle generator
+        days: Number of days of history
+        age: User's age
+
+    Returns:
+        Tuple of (cycle length, day-in-cycle array), or (None, None) without a cycle
+    """
+    cycles, length, offset = rng.random() < CYCLING_SHARE, int(rng.integers(25, 33)), int(rng.integers(0, 35))
+    if not cycles or age >= 52:
+        return None, None
+    return length, (np.arange(days) + offset) % length
+
+
+def _smooth(rng: np.random.Generator, n: int, scale: float, window: int = 5) -> np.ndarray:
+    """Day-to-day noise with some persistence."""
+    noise = rng.normal(0, scale, n + window)
+    return np.convolve(noise, np.ones(window) / np.sqrt(window), mode="valid")[:n]
+
+
+def generate_user_data(index: int, days: int, seed: int = 0,
+                       end_day: str = END_DAY) -> Tuple[Dict[str, Any], Dict[str, pd.DataFrame]]:
+    """
+    Generate one user's export in memory.
+
+    Args:
+        index: User index (with the seed, determines the data)
+        days: Number of days of history
+        seed: Cohort seed
+        end_day: Last day of history (YYYY-MM-DD)
+
+    Returns:
+        Tuple of (metadata, dictionary of DataFrames keyed by dataset name)
+    """
+    rng = np.random.default_rng([seed, index])
+    profile = user_profile(rng, index)
+    tz = profile["timezone"]
+    day_index = pd.date_range(end=end_day, periods=days, freq="D")
+    day_str = pd.Series(day_index.strftime("%Y-%m-%d"))
+    midnight = pd.Series(day_index)
+    offset = pd.Timedelta(hours=int(tz[:3]), minutes=int(tz[0] + tz[4:]))
+
+    recovery = _smooth(rng, days, 1.0)  # latent daily recovery state
+    hrv = np.clip(profile["hrv"] * np.exp(0.15 * recovery), 8, 200)
+    rhr = np.clip(profile["resting_hr"] - 2.5 * recovery + rng.normal(0, 1, days), 38, 95)
+    total_sleep = np.clip(profile["sleep_hours"] * 3600 + 1800 * _smooth(rng, days, 1.0), 3 * 3600, 11 * 3600)
+    awake = rng.uniform(0.05, 0.15, days) * total_sleep
+    in_bed = total_sleep + awake
+    stage_shares = rng.dirichlet([2, 5, 2.5], size=days)  # deep, light, rem
+    bedtime = midnight - pd.to_timedelta(rng.normal(60, 45, days), unit="min")
+    wake = bedtime + pd.to_timedelta(in_bed, unit="s")
+    sleep_score = np.clip(75 + 8 * recovery + (total_sleep / 3600 - 7.5) * 6, 30, 100)
+    readiness_score = np.clip(75 + 10 * recovery, 20, 100)
+    steps = np.clip(profile["steps"] * np.exp(0.35 * _smooth(rng, days, 1.0)), 200, 45_000).round()
+    activity_score = np.clip(60 + steps / 500 + rng.normal(0, 5, days), 10, 100)
+    temperature = rng.normal(0, 0.25, days)
+
+    # The cycle comes from its own generator, so the rest of a user's data does not depend on it
+    cycle_rng = np.random.default_rng([seed, index, 1])
+    cycle_length, cycle_day = menstrual_cycle(cycle_rng, days, profile["metadata"]["age"])
+    if cycle_length is not None:
+        profile["metadata"]["cycle_length"] = cycle_length
+        # Luteal phase as in daily_context.CYCLE_PHASES: past day 16 of a 28-day cycle
+        luteal = (cycle_day + 1) * 28 / cycle_length > 16
+        hrv = np.where(luteal, hrv * LUTEAL_HRV_FACTOR, hrv)
+        rhr = np.where(luteal, rhr + LUTEAL_RHR_DELTA, rhr)
+        temperature = np.where(luteal, temperature + LUTEAL_TEMPERATURE_DELTA, temperature)
+    temperature = np.round(temperature, 2)
+
+    def contributors(base, *names):
+        return _json_column(**{name: np.clip(base + rng.normal(0, 8, days), 1, 100) for name in names})
+
+    data = {}
+
+    # Detailed sleep periods: one long sleep a night plus occasional naps
+    in_bed_slots = np.ceil(in_bed / 300).astype(int)
+    hypnograms, movements, heart_rates, hrvs = [], [], [], []
+    for i in range(days):
+        slots = in_bed_slots[i]
+        cycle = np.resize(np.repeat([2, 1, 2, 3], [4, 5, 5, 4]), slots)  # ~90 minute cycles
+        stages = np.where(rng.random(slots) < stage_shares[i, 1] * 0.3, 2, cycle)
+        stages[rng.random(slots) < awake[i] / in_bed[i]] = 4
+        start = bedtime.iloc[i].strftime("%Y-%m-%dT%H:%M:%S") + tz
+        hypnograms.append(_digit_string(stages))
+        movements.append(_digit_string(rng.choice([1, 1, 1, 2, 3, 4], slots * 10)))
+        heart_rates.append(_series_json(rhr[i] + 4 + rng.normal(0, 2, slots), 300.0, start))
+        hrvs.append(_series_json(hrv[i] + rng.normal(0, 6, slots), 300.0, start))
+    sleep = pd.DataFrame({
+        "id": _ids(rng, days),
+        "average_breath": np.round(rng.normal(14.5, 1, days), 3),
+        "average_heart_rate": np.round(rhr + 4, 3),
+        "average_hrv": hrv.round(),
+        "awake_time": awake.round(),
+        "bedtime_end": _iso(wake, tz),
+        "bedtime_start": _iso(bedtime, tz),
+        "day": day_str,
+        "deep_sleep_duration": (stage_shares[:, 0] * total_sleep).round(),
+        "efficiency": np.round(100 * total_sleep / in_bed),
+        "heart_rate": heart_rates,
+        "hrv": hrvs,
+        "latency": rng.integers(120, 1800, days),
+        "light_sleep_duration": (stage_shares[:, 1] * total_sleep).round(),
+        "low_battery_alert": False,
+        "lowest_heart_rate": rhr.round(),
+        "movement_30_sec": movements,
+        "period": 0,
+        "readiness": [json.dumps({"score": int(s), "temperature_deviation": float(t)})
+                      for s, t in zip(readiness_score, temperature)],
+        "readiness_score_delta": 0,
+        "rem_sleep_duration": (stage_shares[:, 2] * total_sleep).round(),
+        "restless_periods": rng.integers(50, 400, days),
+        "sleep_phase_5_min": hypnograms,
+        "sleep_score_delta": 0,
+        "sleep_algorithm_version": "v2",
+        "time_in_bed": in_bed.round(),
+        "total_sleep_duration": total_sleep.round(),
+        "type": "long_sleep",
+    })
+    naps = sleep.sample(frac=0.05, random_state=int(rng.integers(2 ** 31))).assign(
+        type="sleep", period=1, total_sleep_duration=lambda d: (d["total_sleep_duration"] * 0.1).round())
+    data["sleep_detailed"] = pd.concat([sleep, naps]).sort_values(["day", "period"]).reset_index(drop=True)
+
+    data["daily_sleep"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "contributors": contributors(sleep_score, "deep_sleep", "efficiency", "latency", "rem_sleep",
+                                     "restfulness", "timing", "total_sleep"),
+        "day": day_str,
+        "score": sleep_score.round(),
+        "timestamp": day_str + "T00:00:00" + tz,
+    })
+
+    data["daily_readiness"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "contributors": contributors(readiness_score, "activity_balance", "body_temperature", "hrv_balance",
+                                     "previous_day_activity", "previous_night", "recovery_index",
+                                     "resting_heart_rate", "sleep_balance"),
+        "day": day_str,
+        "score": readiness_score.round(),
+        "temperature_deviation": temperature,
+        "temperature_trend_deviation": np.round(pd.Series(temperature).rolling(3, min_periods=1).mean(), 2),
+        "timestamp": day_str + "T00:00:00" + tz,
+    })
+
+    # Activity: 5-minute activity classes and the 1-minute MET series
+    classes = rng.choice([0, 1, 2, 3, 4, 5], size=(days, SAMPLES_PER_DAY), p=[0.15, 0.3, 0.35, 0.12, 0.06, 0.02])
+    mets = np.clip(rng.gamma(1.5, 0.9, size=(days, 1440)), 0.9, 12)
+    active_calories = (steps * 0.045 + rng.normal(0, 40, days)).clip(0).round()
+    data["daily_activity"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "class_5_min": [_digit_string(row) for row in classes],
+        "score": activity_score.round(),
+        "active_calories": active_calories,
+        "average_met_minutes": mets.mean(axis=1).round(3),
+        "contributors": contributors(activity_score, "meet_daily_targets", "move_every_hour", "recovery_time",
+                                     "stay_active", "training_frequency", "training_volume"),
+        "equivalent_walking_distance": (steps * 0.75).round(),
+        "high_activity_met_minutes": (classes == 5).sum(axis=1) * 5,
+        "high_activity_time": (classes == 5).sum(axis=1) * 300,
+        "inactivity_alerts": rng.integers(0, 4, days),
+        "low_activity_met_minutes": (classes == 3).sum(axis=1) * 5,
+        "low_activity_time": (classes == 3).sum(axis=1) * 300,
+        "medium_activity_met_minutes": (classes == 4).sum(axis=1) * 5,
+        "medium_activity_time": (classes == 4).sum(axis=1) * 300,
+        "met": [_series_json(row, 60.0, f"{d}T04:00:00{tz}") for row, d in zip(mets, day_str)],
+        "meters_to_target": rng.integers(-4000, 6000, days),
+        "non_wear_time": ((classes == 0).sum(axis=1) * 300),
+        "resting_time": (classes == 1).sum(axis=1) * 300,
+        "sedentary_met_minutes": (classes == 2).sum(axis=1) * 5,
+        "sedentary_time": (classes == 2).sum(axis=1) * 300,
+        "steps": steps.astype(int),
+        "target_calories": 500,
+        "target_meters": 10_000,
+        "total_calories": (active_calories + 1700 + rng.normal(0, 60, days)).round(),
+        "day": day_str,
+        "timestamp": day_str + "T04:00:00" + tz,
+    })
+
+    data["cardiovascular_age"] = pd.DataFrame({
+        "day": day_str,
+        "vascular_age": np.clip(profile["metadata"]["age"] + _smooth(rng, days, 0.5) - 0.02 * (hrv - 50), 18, 90)
+        .round(),
+    })
+
+    data["daily_resilience"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "day": day_str,
+        "contributors": contributors(readiness_score, "sleep_recovery", "daytime_recovery", "stress"),
+        "level": pd.cut(readiness_score, [0, 55, 65, 75, 85, 101],
+                        labels=["limited", "adequate", "solid", "strong", "exceptional"]).astype(str),
+    })
+
+    spo2 = np.clip(rng.normal(97, 1, days), 88, 100).round(3)
+    data["daily_spo2"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "day": day_str,
+        "spo2_percentage": [json.dumps({"average": v}) for v in spo2.tolist()],
+        "breathing_disturbance_index": rng.integers(0, 15, days),
+    })
+
+    stress_high = np.clip(rng.gamma(2, 1800, days) * np.exp(-0.3 * recovery), 0, 40_000).round(-2)
+    recovery_high = np.clip(rng.gamma(2, 1800, days) * np.exp(0.3 * recovery), 0, 40_000).round(-2)
+    data["daily_stress"] = pd.DataFrame({
+        "id": _ids(rng, days),
+        "day": day_str,
+        "stress_high": stress_high,
+        "recovery_high": recovery_high,
+        "day_summary": np.where(stress_high > 2 * recovery_high, "stressful",
+                                np.where(recovery_high > 2 * stress_high, "restored", "normal")),
+    })
+
+    # Workouts and their heart rate
+    n_workouts = rng.poisson(profile["workouts_per_day"] * days)
+    workout_days = np.sort(rng.integers(0, days, n_workouts))
+    workout_start = midnight.iloc[workout_days].reset_index(drop=True) + pd.to_timedelta(
+        rng.integers(6 * 60, 20 * 60, n_workouts), unit="min")
+    workout_minutes = rng.integers(15, 120, n_workouts)
+    workout_end = workout_start + pd.to_timedelta(workout_minutes, unit="min")
+    data["workouts"] = pd.DataFrame({
+        "id": _ids(rng, n_workouts),
+        "activity": rng.choice(WORKOUTS, n_workouts),
+        "calories": (workout_minutes * rng.uniform(5, 12, n_workouts)).round(3),
+        "day": day_str.iloc[workout_days].to_numpy(),
+        "distance": np.where(rng.random(n_workouts) < 0.6, (workout_minutes * rng.uniform(80, 250, n_workouts))
+                             .round(), np.nan),
+        "end_datetime": _iso(workout_end, tz),
+        "intensity": rng.choice(["easy", "moderate", "hard"], n_workouts, p=[0.4, 0.4, 0.2]),
+        "label": None,
+        "source": rng.choice(["manual", "autodetected", "confirmed", "workout_heart_rate"], n_workouts),
+        "start_datetime": _iso(workout_start, tz),
+    })
+
+    # Heart rate: 5-minute samples (UTC) while the ring is worn
+    slots = midnight.to_numpy()[:, None] + np.arange(SAMPLES_PER_DAY) * np.timedelta64(300, "s")
+    local = slots.ravel()
+    day_of_slot = np.repeat(np.arange(days), SAMPLES_PER_DAY)
+    asleep = (local >= bedtime.to_numpy()[day_of_slot]) & (local < wake.to_numpy()[day_of_slot])
+    working_out = np.zeros(local.shape, dtype=bool)
+    if n_workouts:
+        starts = np.searchsorted(local, workout_start.to_numpy())
+        ends = np.searchsorted(local, workout_end.to_numpy())
+        marks = np.zeros(local.size + 1, dtype=int)
+        np.add.at(marks, starts, 1)
+        np.add.at(marks, ends, -1)
+        working_out = np.cumsum(marks[:-1]) > 0
+    worn = asleep | working_out | (rng.random(local.size) < RING_WEAR_RATE)
+    source = np.where(working_out, "workout", np.where(asleep, "sleep",
+                      np.where(rng.random(local.size) < 0.2, "rest", "awake")))
+    base = rhr[day_of_slot]
+    bpm = np.select([working_out, asleep, source == "rest"],
+                    [base + rng.uniform(40, 100, local.size), base + 3, base + 10],
+                    base + 25) + rng.normal(0, 4, local.size)
+    utc = pd.Series(local[worn] - offset.to_timedelta64())
+    data["heart_rate"] = pd.DataFrame({
+        "bpm": np.clip(bpm[worn], 35, 200).round().astype(int),
+        "source": source[worn],
+        "timestamp": utc.dt.strftime("%Y-%m-%dT%H:%M:%S") + "+00:00",
+    })
+
+    data["ring_config"] = pd.DataFrame({
+        "id": _ids(rng, 1),
+        "color": rng.choice(["silver", "black", "stealth_black", "gold", "rose"]),
+        "design": rng.choice(["heritage", "horizon"]),
+        "firmware_version": f"2.{rng.integers(0, 10)}.{rng.integers(0, 30)}",
+        "hardware_type": "gen3",
+        "set_up_at": (day_str.iloc[0] + "T09:00:00" + tz),
+        "size": int(rng.integers(6, 14)),
+    })
+
+    n_sessions = rng.poisson(0.3 * days)
+    session_days = np.sort(rng.integers(0, days, n_sessions))
+    session_start = midnight.iloc[session_days].reset_index(drop=True) + pd.to_timedelta(
+        rng.integers(7 * 60, 22 * 60, n_sessions), unit="min")
+    session_minutes = rng.integers(5, 30, n_sessions)
+    session_starts = _iso(session_start, tz)
+    data["sessions"] = pd.DataFrame({
+        "id": _ids(rng, n_sessions),
+        "day": day_str.iloc[session_days].to_numpy(),
+        "start_datetime": session_starts,
+        "end_datetime": _iso(session_start + pd.to_timedelta(session_minutes, unit="min"), tz),
+        "type": rng.choice(SESSION_TYPES, n_sessions),
+        "heart_rate": [_series_json(rhr[d] + rng.normal(5, 3, m), 5.0, s)
+                       for d, m, s in zip(session_days, session_minutes, session_starts)],
+        "heart_rate_variability": [_series_json(hrv[d] + rng.normal(0, 8, m), 5.0, s)
+                                   for d, m, s in zip(session_days, session_minutes, session_starts)],
+        "mood": rng.choice(["bad", "worse", "same", "good", "great", None], n_sessions),
+        "motion_count": [_series_json(rng.integers(0, 5, m).astype(float), 5.0, s)
+                         for m, s in zip(session_minutes, session_starts)],
+    })
+
+    n_tags = rng.poisson(0.2 * days)
+    tag_days = np.sort(rng.integers(0, days, n_tags))
+    tag_start = midnight.iloc[tag_days].reset_index(drop=True) + pd.to_timedelta(
+        rng.integers(8 * 60, 23 * 60, n_tags), unit="min")
+    tags = pd.DataFrame({
+        "id": _ids(rng, n_tags),
+        "tag_type_code": rng.choice(TAGS, n_tags),
+        "start_time": _iso(tag_start, tz),
+        "end_time": None,
+        "start_day": day_str.iloc[tag_days].to_numpy(),
+        "end_day": None,
+        "comment": np.where(rng.random(n_tags) < 0.2, "felt off", None),
+        "custom_name": None,
+    })
+    if cycle_length is not None:
+        period_days = np.flatnonzero(cycle_day == 0)
+        period_days = period_days[cycle_rng.random(len(period_days)) < PERIOD_TAG_RATE]
+        period_start = midnight.iloc[period_days].reset_index(drop=True) + pd.Timedelta(hours=8)
+        periods = pd.DataFrame({
+            "id": _ids(cycle_rng, len(period_days)),
+            "tag_type_code": PERIOD_TAG,
+            "start_time": _iso(period_start, tz),
+            "end_time": None,
+            "start_day": day_str.iloc[period_days].to_numpy(),
+            "end_day": None,
+            "comment": None,
+            "custom_name": None,
+        })
+        tags = pd.concat([tags, periods]).sort_values("start_time", kind="stable").reset_index(drop=True)
+    data["tags"] = tags
+
+    weeks = np.arange(days % 7, days, 7)
+    data["vo2_max"] = pd.DataFrame({
+        "id": _ids(rng, len(weeks)),
+        "day": day_str.iloc[weeks].to_numpy(),
+        "timestamp": (day_str.iloc[weeks] + "T00:00:00" + tz).to_numpy(),
+        "vo2_max": np.clip(60 - 0.35 * profile["metadata"]["age"] + 0.05 * (hrv[weeks] - 50)
+                           + rng.normal(0, 1, len(weeks)), 20, 70).round(),
+    })
+
+    return profile["metadata"], data
+
+
+def generate_user(out_dir: Union[str, Path], index: int, days: int, seed: int = 0,
+                  end_day: str = END_DAY) -> Dict[str, int]:
+    """
+    Write one user's export CSVs and metadata.json into a directory.
+
+    Args:
+        out_dir: User's data directory (created)
+        index: User index (with the seed, determines the data)
+        days: Number of days of history
+        seed: Cohort seed
+        end_day: Last day of history (YYYY-MM-DD)
+
+    Returns:
+        Rows written per dataset
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    metadata, data = generate_user_data(index, days, seed, end_day)
+    for filename, name in DATA_FILES.items():
+        data[name].to_csv(out_dir / filename, index=False)
+    metadata["generation"] = generation_params(days, seed, end_day)
+    (out_dir / "metadata.json").write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+    return {name: len(df) for name, df in data.items()}
+
+
+def generation_params(days: int, seed: int, end_day: str) -> Dict[str, Any]:
+    """Parameters a generated user's data depends on (besides its index), as stored in metadata.json."""
+    return {"days": days, "seed": seed, "end_day": end_day, "version": GENERATOR_VERSION}
+
+
+def is_generated(user_dir: Path, params: Dict[str, Any]) -> bool:
+    """Whether a user directory holds data generated with these parameters."""
+    try:
+        metadata = json.loads((user_dir / "metadata.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return metadata.get("generation") == params
+
+
+def user_ids(users: int) -> List[str]:
+    """Directory names of a generated cohort's users."""
+    return [f"user-{i:05d}" for i in range(users)]
+
+
+def generate_cohort(root: Union[str, Path], users: int, years: float, seed: int = 0,
+                    jobs: Optional[int] = 1, end_day: str = END_DAY,
+                    indices: Optional[Sequence[int]] = None) -> List[str]:
+    """
+    Write a cohort partitioned as <root>/<user_id>/, skipping users already generated
+    with the same parameters.
+
+    Args:
+        root: Cohort directory
+        users: Number of users
+        years: Years of history per user
+        seed: Cohort seed
+        jobs: Worker processes (None for one per CPU)
+        end_day: Last day of history (YYYY-MM-DD)
+        indices: Only write these users (all by default); each user's data depends
+            only on the seed and its index, so a sample matches the full cohort
+
+    Returns:
+        User ids of the cohort
+    """
+    root = Path(root)
+    days = int(round(365 * years))
+    ids = user_ids(users)
+    wanted = range(users) if indices is None else sorted(set(indices))
+    params = generation_params(days, seed, end_day)
+    todo = [(i, ids[i]) for i in wanted if not is_generated(root / ids[i], params)]
+    print(f"Generating {len(todo)} of {len(wanted)} users ({days} days each) in {root}...")
+    if jobs == 1:
+        for i, user_id in todo:
+            generate_user(root / user_id, i, days, seed, end_day)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(generate_user, [root / u for _, u in todo], [i for i, _ in todo],
+                          [days] * len(todo), [seed] * len(todo), [end_day] * len(todo), chunksize=8))
+    print(f"✓ Cohort ready: {len(wanted)} of {users} users in {root}")
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic Oura exports")
+    parser.add_argument("out_dir", help="Cohort directory (one subdirectory per user)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Preset users and years")
+    parser.add_argument("--users", type=int, help="Number of users (overrides the scale)")
+    parser.add_argument("--years", type=float, help="Years of history per user (overrides the scale)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes (0 for one per CPU)")
+    args = parser.parse_args()
+
+    users, years = SCALES[args.scale]
+    generate_cohort(args.out_dir, args.users or users, args.years or years, args.seed, args.jobs or None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent analysis service.
+"""
+
+import gc
+import json
+import os
+import signal
+import sys
+import threading
+import unittest
+import unittest.mock
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from analysis_server import AnalysisHTTPServer, AnalysisService, PreforkArbiter
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_health_data, offline_analyzer, temp_dir
+from response_cache import ResponseCache
+
+
+class AnalysisServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = temp_dir(self)
+        Path(self.data_dir, 'sleep.csv').write_text('day\n2025-05-01\n')
+        self.loaded = []
+        cache = ResponseCache(temp_dir(self))
+
+        def loader(metadata, data_dir):
+            self.loaded.append(data_dir)
+            return offline_analyzer(make_health_data(), metadata, cache)
+
+        self.service = AnalysisService({'emma': {'metadata': {'name': 'Emma'}, 'data_dir': self.data_dir}}, loader)
+        self.server = AnalysisHTTPServer(('127.0.0.1', 0), self.service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.base_url + path) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_analyzer_stays_warm_across_requests(self):
+        status, body = self.get('/users/emma/daily')
+        self.assertEqual(status, 200)
+        self.assertTrue(body['success'])
+        self.assertEqual(body['structured_advice']['source'], 'local')
+        self.assertEqual(body['user_metadata'], {'user_id': 'emma', 'name': 'Emma'})
+
+        self.assertEqual(self.get('/users/emma/local')[0], 200)
+        self.assertIn('error', self.get('/users/emma/overview')[1]['structured_advice'])
+        self.assertEqual(len(self.loaded), 1)
+        self.assertEqual(self.get('/health')[1]['loaded_users'], ['emma'])
+
+    def test_changed_data_reloads(self):
+        self.get('/users/emma/local')
+        csv = Path(self.data_dir, 'sleep.csv')
+        csv.write_text('day\n2025-05-01\n2025-05-02\n')
+        os.utime(csv, ns=(0, csv.stat().st_mtime_ns + 10**9))
+
+        self.get('/users/emma/local')
+        self.assertEqual(len(self.loaded), 2)
+
+    def test_local_is_not_held_up_by_a_claude_call(self):
+        started, release = threading.Event(), threading.Event()
+
+        def respond(params):
+            started.set()
+            release.wait(10)
+            return '{"title": "Daily", "cards": []}'
+
+        analyzer = self.service.registry.get('emma')
+        analyzer.claude_client = FakeClaudeClient(respond)
+        analyzer.response_cache = analyzer.daily_context_store = None
+        daily = threading.Thread(target=self.get, args=('/users/emma/daily?force=1',))
+        daily.start()
+        try:
+            self.assertTrue(started.wait(10))
+            status, body = self.get('/users/emma/local')
+            self.assertEqual(status, 200)
+            self.assertEqual(body['structured_advice']['source'], 'local')
+            self.assertTrue(daily.is_alive(), 'the daily request is still waiting on Claude')
+        finally:
+            release.set()
+            daily.join(10)
+        self.assertEqual(len(analyzer.claude_client.calls), 1)
+
+    def test_unknown_routes(self):
+        self.assertEqual(self.get('/users/bob/daily')[0], 404)
+        self.assertEqual(self.get('/users/emma/nothing')[0], 404)
+        self.assertEqual(self.get('/nowhere')[0], 404)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'pre-forking needs os.fork')
+class PreforkArbiterTest(unittest.TestCase):
+
+    def test_workers_share_preloaded_service_and_recycle(self):
+        loads = Path(temp_dir(self), 'loads')
+        cache = ResponseCache(temp_dir(self))
+
+        def loader(metadata, data_dir):
+            with open(loads, 'a') as f:
+                f.write(f'{os.getpid()}\n')
+            return offline_analyzer(make_health_data(), metadata, cache)
+
+        service = AnalysisService({'emma': {'metadata': {'name': 'Emma'}, 'data_dir': temp_dir(self)}}, loader)
+        server = AnalysisHTTPServer(('127.0.0.1', 0), service)
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        arbiter_pid = os.fork()
+        if arbiter_pid == 0:
+            try:
+                PreforkArbiter(server, workers=2, max_requests=3, max_requests_jitter=0, poll_interval=0.05).run()
+            finally:
+                os._exit(0)
+        server.server_close()
+
+        try:
+            pids = set()
+            for _ in range(12):
+                with urllib.request.urlopen(url + '/users/emma/local', timeout=10) as response:
+                    self.assertEqual(json.loads(response.read())['structured_advice']['source'], 'local')
+                with urllib.request.urlopen(url + '/health', timeout=10) as response:
+                    pids.add(json.loads(response.read())['pid'])
+        finally:
+            os.kill(arbiter_pid, signal.SIGTERM)
+            _, status = os.waitpid(arbiter_pid, 0)
+
+        self.assertEqual(status, 0)
+        # Each worker serves 3 requests before it is replaced
+        self.assertGreater(len(pids), 2)
+        self.assertNotIn(arbiter_pid, pids)
+        # Loaded once in the parent; workers reuse the inherited analyzer
+        self.assertEqual(loads.read_text().split(), [str(arbiter_pid)])
+
+    def test_preload_can_be_disabled(self):
+        cache = ResponseCache(temp_dir(self))
+        service = AnalysisService({'emma': {'metadata': {'name': 'Emma'}, 'data_dir': temp_dir(self)}},
+                                  lambda metadata, data_dir: offline_analyzer(make_health_data(), metadata, cache))
+        arbiter = PreforkArbiter(AnalysisHTTPServer(('127.0.0.1', 0), service), workers=1, preload=False)
+        arbiter.stopping = True
+        handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            with unittest.mock.patch.object(service, 'preload') as preload:
+                arbiter.run()
+        finally:
+            gc.unfreeze()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        preload.assert_not_called()
+        self.assertEqual(arbiter.stats['spawned'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
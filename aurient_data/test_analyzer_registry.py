@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-budgeted analyzer registry.
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from analyzer_registry import AnalyzerRegistry, analyzer_memory
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_health_data, temp_dir
+from oura_analysis import OuraAnalysis
+from response_cache import ResponseCache
+
+
+def make_partitions(root, user_ids):
+    for user_id in user_ids:
+        user_dir = Path(root, user_id)
+        user_dir.mkdir()
+        (user_dir / 'metadata.json').write_text(json.dumps({'name': user_id.title(), 'age': 30}))
+        (user_dir / 'sleep.csv').write_text('day\n2025-05-01\n')
+
+
+class AnalyzerRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = temp_dir(self)
+        make_partitions(self.root, ['ana', 'bea', 'cleo'])
+        self.loaded = []
+
+        cache = ResponseCache(temp_dir(self))
+
+        def factory(metadata, health_data):
+            return OuraAnalysis(health_data=health_data, user_metadata=metadata, claude_client=FakeClaudeClient('{}'),
+                                response_cache=cache)
+
+        def loader(metadata, data_dir):
+            self.loaded.append(metadata['user_id'])
+            analyzer = factory(metadata, make_health_data())
+            analyzer.analyze_all_datasets()
+            return analyzer
+
+        self.user_bytes = analyzer_memory(loader({'user_id': 'probe'}, None))
+        self.loaded.clear()
+        self.factory, self.loader = factory, loader
+
+    def make_registry(self, users_in_budget=2, **kwargs):
+        return AnalyzerRegistry(data_root=self.root, memory_budget=int(self.user_bytes * (users_in_budget + 0.5)),
+                                loader=self.loader, factory=self.factory, snapshot_dir=temp_dir(self), **kwargs)
+
+    def test_partitioned_users_load_on_demand(self):
+        registry = self.make_registry()
+        analyzer = registry.get('ana')
+
+        self.assertEqual(analyzer.user_metadata, {'user_id': 'ana', 'name': 'Ana', 'age': 30})
+        self.assertIs(registry.get('ana'), analyzer)
+        self.assertEqual(self.loaded, ['ana'])
+        self.assertNotIn('dora', registry)
+        self.assertNotIn('../ana', registry)
+        with self.assertRaises(KeyError):
+            registry.get('dora')
+
+    def test_least_recently_used_users_are_evicted(self):
+        registry = self.make_registry()
+        registry.get('ana')
+        registry.get('bea')
+        registry.get('ana')
+        registry.get('cleo')
+
+        self.assertEqual(registry.loaded_users(), ['ana', 'cleo'])
+        self.assertLessEqual(registry.memory_usage(), registry.memory_budget)
+        self.assertEqual(registry.stats['evictions'], 1)
+
+    def test_evicted_users_restore_from_snapshot(self):
+        registry = self.make_registry(users_in_budget=1)
+        stats = registry.get('ana').summary_stats
+        registry.get('bea')
+
+        restored = registry.get('ana')
+        self.assertEqual(self.loaded, ['ana', 'bea'])
+        self.assertEqual(registry.stats['restores'], 1)
+        self.assertEqual(restored.summary_stats.keys(), stats.keys())
+        self.assertEqual(restored.generate_local_daily_advice()['source'], 'local')
+        self.assertIn('sleep_detailed', restored.plots)
+
+        # Changed data invalidates the snapshot
+        registry.evict('ana')
+        Path(self.root, 'ana', 'sleep.csv').write_text('day\n2025-05-01\n2025-05-02\n')
+        registry.get('ana')
+        self.assertEqual(self.loaded, ['ana', 'bea', 'ana'])
+
+    def test_drawn_figures_and_derived_state_count_towards_the_budget(self):
+        registry = self.make_registry()
+        ana = registry.get('ana')
+        datasets = sum(df.memory_usage(deep=True).sum() for df in ana.health_data.values())
+        self.assertGreater(analyzer_memory(ana), datasets)
+
+        registry.get('bea')
+        before = registry.memory_usage()
+        for name in ana.plots:
+            ana.plots[name]
+        # Figures are drawn after loading; the next use re-measures and evicts to make room
+        self.assertIs(registry.get('ana'), ana)
+        self.assertEqual(registry.stats['hits'], 1)
+        self.assertGreater(analyzer_memory(ana), before)
+        self.assertEqual(registry.loaded_users(), ['ana'])
+        self.assertEqual(registry.memory_usage(), analyzer_memory(ana))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio advice generation API, run against local fake clients.
+"""
+
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import make_analyzer
+from oura_analysis import DAILY_SECTIONS
+
+
+def respond(params):
+    """Return a card for daily section prompts and an overview otherwise."""
+    instructions = params['system'][-1]['text']
+    for section in DAILY_SECTIONS.values():
+        if f"daily {section['title']} programme" in instructions:
+            return json.dumps({'title': section['title'], 'items': ['item'], 'description': 'why', 'sources': []})
+    return json.dumps({'title': 'Overview', 'sections': {}})
+
+
+class AsyncGenerationTest(unittest.TestCase):
+
+    def test_generations_run_concurrently(self):
+        client = FakeAsyncClaudeClient(respond, latency=0.2)
+        analyzer = make_analyzer(self, async_claude_client=client)
+
+        result = asyncio.run(analyzer.agenerate_all())
+
+        self.assertEqual(len(client.calls), 4)
+        # All four requests were waiting on the client at once
+        self.assertEqual(client.max_in_flight, 4)
+        self.assertEqual(result['overview']['title'], 'Overview')
+        self.assertEqual([card['title'] for card in result['daily']['cards']],
+                         ['Movement', 'Mindfulness', 'Nutrition'])
+
+    def test_concurrency_is_bounded(self):
+        client = FakeAsyncClaudeClient(respond, latency=0.05)
+        analyzer = make_analyzer(self, max_concurrency=2, async_claude_client=client)
+
+        asyncio.run(analyzer.agenerate_all())
+
+        self.assertEqual(client.max_in_flight, 2)
+
+    def test_sync_client_runs_in_worker_threads(self):
+        client = FakeClaudeClient(respond, latency=0.2)
+        analyzer = make_analyzer(self, claude_client=client)
+
+        daily = asyncio.run(analyzer.agenerate_daily_advice_structured())
+
+        self.assertEqual(client.max_in_flight, len(DAILY_SECTIONS))
+        self.assertEqual(len(daily['cards']), 3)
+        self.assertNotIn('errors', daily)
+
+    def test_failed_section_is_reported_without_losing_others(self):
+        def flaky(params):
+            if 'daily Nutrition programme' in params['system'][-1]['text']:
+                return 'not json'
+            return respond(params)
+
+        analyzer = make_analyzer(self, async_claude_client=FakeAsyncClaudeClient(flaky))
+        daily = asyncio.run(analyzer.agenerate_daily_advice_structured())
+
+        self.assertEqual([card['title'] for card in daily['cards']], ['Movement', 'Mindfulness'])
+        self.assertIn('nutrition', daily['errors'])
+
+    def test_responses_are_cached_between_runs(self):
+        client = FakeAsyncClaudeClient(respond)
+        analyzer = make_analyzer(self, async_claude_client=client)
+
+        asyncio.run(analyzer.agenerate_all())
+        asyncio.run(analyzer.agenerate_all())
+
+        self.assertEqual(len(client.calls), 4)
+        # Unchanged daily inputs reuse the stored daily advice without a cache lookup per section
+        self.assertEqual(analyzer.get_llm_usage()['response_cache_hits'], 1)
+        self.assertEqual(analyzer.get_llm_usage()['daily_advice_reused'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for bulk daily advice generation through message batches, run against the local backend.
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from batch_advice import BatchAdviceGenerator, LocalBatchBackend
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_analyzer, temp_dir
+from llm_telemetry import estimate_cost
+from oura_analysis import CLAUDE_MODEL
+from response_cache import ResponseCache
+
+
+CARDS = {"title": "Daily Health Programs", "cards": [
+    {"title": "Movement", "items": ["Walk 30 minutes"], "description": "Gentle load.", "sources": []},
+]}
+
+
+def respond(params):
+    if 'Name: Olivia' in params['messages'][0]['content']:
+        raise RuntimeError('overloaded')
+    return json.dumps(CARDS)
+
+
+def make_analyzers(test, names=('Emma', 'Olivia', 'Sofia')):
+    cache = ResponseCache(temp_dir(test))
+    analyzers = []
+    for i, name in enumerate(names):
+        health_data = {'daily_sleep': pd.DataFrame({'day': ['2025-06-01', '2025-06-02'], 'score': [80, 75 + i]})}
+        analyzers.append(make_analyzer(test, health_data, {'name': name, 'user_id': f'u{i}'},
+                                       claude_client=FakeClaudeClient(), response_cache=cache))
+    return analyzers
+
+
+class BatchAdviceGeneratorTest(unittest.TestCase):
+
+    def test_results_are_fanned_back_into_user_caches(self):
+        analyzers = make_analyzers(self, ('Emma', 'Sofia'))
+        backend_client = FakeClaudeClient(json.dumps(CARDS))
+        sleeps = []
+
+        generator = BatchAdviceGenerator(analyzers, LocalBatchBackend(backend_client, polls_until_ended=2),
+                                         poll_interval=5, sleep=sleeps.append)
+        results = generator.run()
+
+        self.assertEqual(results, {'u0': CARDS, 'u1': CARDS})
+        self.assertEqual(len(backend_client.calls), 2)
+        self.assertEqual(sleeps, [5, 5])
+        self.assertEqual(backend_client.calls[0]['system'], analyzers[0].get_daily_prompt_blocks()['system'])
+        # The synchronous path now reads the same cache entries
+        for analyzer in analyzers:
+            self.assertEqual(analyzer.generate_daily_advice_structured(), CARDS)
+            self.assertEqual(analyzer.claude_client.calls, [])
+            self.assertEqual(analyzer.get_llm_usage()['calls'], 1)
+
+    def test_unchanged_users_are_not_resubmitted(self):
+        analyzers = make_analyzers(self)
+        backend = LocalBatchBackend(FakeClaudeClient(respond), polls_until_ended=0)
+
+        BatchAdviceGenerator(analyzers, backend, sleep=lambda _: None).run()
+        generator = BatchAdviceGenerator(analyzers, backend, sleep=lambda _: None)
+        results = generator.run()
+
+        self.assertEqual(len(backend.batches), 2)
+        self.assertEqual(len(backend.batches['msgbatch_local_2']['requests']), 1)
+        # Users whose day context is unchanged reuse their stored advice
+        self.assertEqual(generator.stats['reused'], 2)
+        self.assertEqual(results['u0'], CARDS)
+
+    def test_cached_responses_are_not_resubmitted(self):
+        analyzers = make_analyzers(self, ('Emma',))
+        analyzers[0].claude_client = FakeClaudeClient(json.dumps(CARDS))
+        analyzers[0].generate_daily_advice_structured()
+        analyzers[0].daily_context_store.clear()
+        backend = LocalBatchBackend(FakeClaudeClient(), 0)
+
+        generator = BatchAdviceGenerator(analyzers, backend)
+        results = generator.run()
+
+        self.assertEqual(backend.batches, {})
+        self.assertEqual(generator.stats['cached'], 1)
+        self.assertEqual(results['u0'], CARDS)
+
+    def test_failed_requests_are_reported_per_user(self):
+        generator = BatchAdviceGenerator(make_analyzers(self), LocalBatchBackend(FakeClaudeClient(respond), 0))
+
+        results = generator.run()
+
+        self.assertEqual(results['u1'], {'error': 'Batch request errored: overloaded'})
+        self.assertEqual(results['u0'], CARDS)
+        self.assertEqual(results['u2'], CARDS)
+        self.assertEqual((generator.stats['succeeded'], generator.stats['failed']), (2, 1))
+
+    def test_results_are_logged_at_batch_rates(self):
+        analyzers = make_analyzers(self)
+        BatchAdviceGenerator(analyzers, LocalBatchBackend(FakeClaudeClient(respond), 0)).run()
+
+        records = analyzers[0].telemetry.records().set_index('user_id')
+        self.assertEqual(set(records['method']), {'generate_daily_advice_structured'})
+        self.assertEqual(records.loc['u1', 'error'], 'errored')
+        generated = records.loc['u0']
+        self.assertEqual(generated['source'], 'api')
+        self.assertGreater(generated['output_tokens'], 0)
+        self.assertAlmostEqual(generated['cost_usd'], estimate_cost(CLAUDE_MODEL, generated.to_dict()) / 2)
+
+        # Served from the response cache on the next run, at no cost
+        analyzers[0].daily_context_store.clear()
+        BatchAdviceGenerator(analyzers[:1], LocalBatchBackend(FakeClaudeClient(respond), 0)).run()
+        cached = analyzers[0].telemetry.records(user_id='u0').iloc[0]
+        self.assertEqual((cached['method'], cached['source'], cached['cost_usd']),
+                         ('generate_daily_advice_structured', 'response_cache', 0))
+
+    def test_requests_are_split_into_batches(self):
+        backend = LocalBatchBackend(FakeClaudeClient(json.dumps(CARDS)), 0)
+        generator = BatchAdviceGenerator(make_analyzers(self), backend, batch_limit=2)
+
+        results = generator.run()
+
+        self.assertEqual([len(b['requests']) for b in backend.batches.values()], [2, 1])
+        self.assertEqual(len(results), 3)
+
+    def test_timeout_raises(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        generator = BatchAdviceGenerator(make_analyzers(self, ('Emma',)), LocalBatchBackend(FakeClaudeClient(), 100),
+                                         poll_interval=60, timeout=300, sleep=sleep, clock=lambda: now[0])
+
+        with self.assertRaises(TimeoutError):
+            generator.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
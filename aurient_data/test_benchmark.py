@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic Oura generator and the benchmark harness.
+"""
+
+import contextlib
+import io
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from benchmark import compare, profile_user, run_benchmark, summarize
+from daily_context import cycle_phases, period_starts
+from fake_health_data import load_user, temp_dir
+from oura_analysis import DATA_FILES
+from synthetic_oura import SAMPLES_PER_DAY, generate_cohort, generate_user_data
+
+
+class SyntheticOuraTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.metadata, cls.data = generate_user_data(3, days=30, seed=7)
+
+    def test_all_export_formats(self):
+        self.assertEqual(set(self.data), set(DATA_FILES.values()))
+        self.assertEqual(len(self.data['daily_sleep']), 30)
+        self.assertEqual(self.data['daily_sleep']['day'].iloc[-1], '2025-06-18')
+
+        per_day = len(self.data['heart_rate']) / 30
+        self.assertGreater(per_day, SAMPLES_PER_DAY * 0.5)
+        self.assertLessEqual(per_day, SAMPLES_PER_DAY)
+        self.assertTrue(self.data['heart_rate']['timestamp'].str.endswith('+00:00').all())
+
+        contributors = json.loads(self.data['daily_readiness']['contributors'][0])
+        self.assertIn('hrv_balance', contributors)
+        self.assertEqual(json.loads(self.data['daily_spo2']['spo2_percentage'][0]).keys(), {'average'})
+
+        sleep = self.data['sleep_detailed']
+        hypnogram = sleep['sleep_phase_5_min'][0]
+        self.assertTrue(set(hypnogram) <= set('1234'))
+        self.assertEqual(len(hypnogram), -(-sleep['time_in_bed'][0] // 300))
+        self.assertEqual(len(sleep['movement_30_sec'][0]), 10 * len(hypnogram))
+        self.assertEqual(len(json.loads(self.data['daily_activity']['met'][0])['items']), 1440)
+
+    def test_reproducible_per_user(self):
+        metadata, data = generate_user_data(3, days=30, seed=7)
+        self.assertEqual(metadata, self.metadata)
+        for name, df in data.items():
+            pd.testing.assert_frame_equal(df, self.data[name])
+        self.assertNotEqual(generate_user_data(4, days=30, seed=7)[0], self.metadata)
+
+    def test_cycles_are_tagged_and_shift_hrv_and_temperature(self):
+        cycling = [i for i in range(10) if 'cycle_length' in generate_user_data(i, days=30)[0]]
+        self.assertTrue(0 < len(cycling) < 10)
+
+        # A year of history, so the luteal changes stand out from day-to-day variation
+        metadata, data = generate_user_data(cycling[0], days=365)
+        readiness = data['daily_readiness']
+        phases = cycle_phases(pd.DatetimeIndex(readiness['day']), period_starts(data), metadata['cycle_length'])
+        self.assertGreater(pd.notna(phases).mean(), 0.7)
+        self.assertEqual(set(phases[pd.notna(phases)]), {'menstrual', 'follicular', 'ovulatory', 'luteal'})
+
+        sleep = data['sleep_detailed'].drop_duplicates('day').set_index('day')
+        luteal, follicular = phases == 'luteal', phases == 'follicular'
+        hrv = sleep.loc[readiness['day'], 'average_hrv'].to_numpy()
+        self.assertLess(hrv[luteal].mean(), 0.97 * hrv[follicular].mean())
+        temperature = readiness['temperature_deviation'].to_numpy()
+        self.assertGreater(temperature[luteal].mean(), temperature[follicular].mean() + 0.15)
+
+    def test_cohorts_are_regenerated_for_other_parameters(self):
+        root = Path(temp_dir(self))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            generate_cohort(root, users=1, years=30 / 365)
+            generate_cohort(root, users=1, years=30 / 365)
+            generate_cohort(root, users=1, years=30 / 365, seed=1)
+        self.assertEqual([line.split(' (')[0] for line in out.getvalue().splitlines() if line.startswith('Generating')],
+                         ['Generating 1 of 1 users', 'Generating 0 of 1 users', 'Generating 1 of 1 users'])
+        metadata = json.loads((root / 'user-00000' / 'metadata.json').read_text())
+        self.assertEqual((metadata['generation']['seed'], metadata['generation']['days']), (1, 30))
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_profiles_generated_cohort(self):
+        root = Path(temp_dir(self))
+        ids = generate_cohort(root, users=2, years=30 / 365)
+        self.assertEqual(ids, ['user-00000', 'user-00001'])
+
+        analyzer = load_user(self, str(root / ids[0]))
+        self.assertEqual(len(analyzer.health_data), len(DATA_FILES))
+
+        metadata = json.loads((root / ids[1] / 'metadata.json').read_text())
+        run = profile_user(root / ids[1], metadata, stages=['load', 'analyze', 'prompt'])
+        self.assertEqual(list(run['stages']), ['load', 'analyze', 'prompt'])
+        self.assertGreater(run['stages']['load']['peak_mb'], 0)
+        self.assertGreater(run['analyzer_mb'], 0)
+
+        summary = summarize([run, run], users=100)
+        self.assertAlmostEqual(summary['stages']['load']['cohort_seconds'],
+                               run['stages']['load']['seconds'] * 100)
+
+    def test_only_profiled_users_are_generated(self):
+        root = Path(temp_dir(self))
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = run_benchmark(users=1000, years=30 / 365, data_dir=root, profile_users=2,
+                                    stages=['load'], memory=False)
+        self.assertEqual(sorted(p.name for p in root.iterdir()), ['user-00000', 'user-00999'])
+        self.assertEqual((summary['users'], summary['profiled_users']), (1000, 2))
+        self.assertGreater(summary['stages']['load']['cohort_seconds'],
+                           summary['stages']['load']['median_seconds'] * 100)
+
+        # A sampled user has the same data as in a fully generated cohort
+        full = Path(temp_dir(self))
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_cohort(full, users=1, years=30 / 365)
+        for path in (full / 'user-00000').iterdir():
+            self.assertEqual(path.read_bytes(), (root / 'user-00000' / path.name).read_bytes())
+
+    def test_compare_flags_regressions_beyond_noise(self):
+        baseline = {'stages': {'load': {'median_seconds': 1.0, 'peak_mb': 100.0},
+                               'prompt': {'median_seconds': 0.01, 'peak_mb': 1.0}}}
+        current = {'stages': {'load': {'median_seconds': 1.5, 'peak_mb': 110.0},
+                              'prompt': {'median_seconds': 0.03, 'peak_mb': 3.0},
+                              'render': {'median_seconds': 9.0, 'peak_mb': None}}}
+        regressions = compare(current, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('load median_seconds'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for cohort analytics across users.
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from cohort_analytics import (CohortSummary, age_bands, build_cohort, percentile_ranks, summarize_long_table,
+                              user_profiles)
+
+
+def make_long_table(users=400, days=35, seed=5):
+    rng = np.random.default_rng(seed)
+    user_ids = np.repeat([f'u{i:04d}' for i in range(users)], days)
+    day = np.tile(pd.date_range('2025-05-01', periods=days), users)
+    base = np.repeat(rng.normal(75, 8, users), days)
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'day': day,
+        'readiness_score': base + rng.normal(0, 3, users * days),
+        'steps': np.repeat(rng.integers(3000, 15000, users), days).astype(float),
+        'age': np.repeat(rng.integers(18, 70, users), days),
+        'goals': np.repeat(rng.choice(['performance', 'longevity'], users), days),
+    })
+
+
+class CohortAnalyticsTest(unittest.TestCase):
+
+    def test_profiles_use_recent_window(self):
+        daily = pd.DataFrame({'user_id': ['a'] * 3, 'day': ['2025-01-01', '2025-02-01', '2025-02-02'],
+                              'readiness_score': [10.0, 70.0, 80.0], 'goals': 'performance'})
+        profiles = user_profiles(daily, window_days=7)
+        self.assertEqual(profiles.loc['a', 'readiness_score'], 75)
+        self.assertEqual(profiles.loc['a', 'goals'], 'performance')
+        self.assertEqual(age_bands([17, 26, 70, None]).tolist(), [None, '25-34', '65+', None])
+
+    def test_build_cohort_from_health_data(self):
+        def health(score):
+            day = pd.date_range('2025-05-01', periods=10).strftime('%Y-%m-%d')
+            return {'daily_readiness': pd.DataFrame({'day': day, 'score': score}),
+                    'daily_stress': pd.DataFrame({'day': day, 'stress_high': 3600.0})}
+
+        cohort = build_cohort([({'user_id': 'a', 'age': 30, 'goals': 'sleep'}, health(60.0)),
+                               ({'user_id': 'b', 'age': 50, 'goals': 'sleep'}, health(80.0)),
+                               ({'user_id': 'c'}, {})])
+        self.assertEqual(list(cohort.index), ['a', 'b'])
+        self.assertEqual(cohort.loc['b', 'age_band'], '45-54')
+        self.assertEqual(cohort.loc['a', 'stress_high_minutes'], 60)
+        self.assertEqual(percentile_ranks(cohort).loc['b', 'readiness_score'], 100)
+
+    def test_partitions_merge_to_the_same_summary(self):
+        table = make_long_table()
+        users = table['user_id'].unique()
+        partitions = [table[table['user_id'].isin(part)] for part in np.array_split(users, 4)]
+
+        merged = summarize_long_table(partitions, metrics=['readiness_score', 'steps'])
+        whole = summarize_long_table([table], metrics=['readiness_score', 'steps'])
+        restored = CohortSummary.from_dict(json.loads(json.dumps(merged.to_dict())))
+
+        for summary in (merged, restored):
+            self.assertEqual(summary.users, whole.users)
+            np.testing.assert_array_equal(summary.counts['all'], whole.counts['all'])
+            np.testing.assert_allclose(summary.moments['all'], whole.moments['all'])
+
+    def test_distribution_and_ranks_match_exact_values(self):
+        table = make_long_table()
+        table['age_band'] = age_bands(table.pop('age')).to_numpy()
+        profiles = user_profiles(table)
+        summary = CohortSummary(['readiness_score', 'steps']).add(profiles)
+
+        distribution = summary.distribution('readiness_score')
+        self.assertEqual(distribution['users'], 400)
+        self.assertAlmostEqual(distribution['mean'], profiles['readiness_score'].mean(), places=6)
+        self.assertAlmostEqual(distribution['quantiles']['p50'], profiles['readiness_score'].median(), delta=1)
+
+        exact = percentile_ranks(profiles)['readiness_score']
+        approximate = summary.percentile_rank('readiness_score', profiles['readiness_score'])
+        self.assertLess(np.abs(exact.to_numpy() - approximate).max(), 2)
+
+        table = summary.segment_table('steps')
+        self.assertIn('goals=performance', table.index)
+        self.assertTrue((table['users'] >= summary.min_users).all())
+        self.assertIsNone(CohortSummary(['steps'], min_users=500).add(profiles).distribution('steps'))
+
+
+if __name__ == '__main__':
+    unittest.main()
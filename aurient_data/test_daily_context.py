@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for day context fingerprints and change-aware daily advice regeneration.
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from daily_context import build_day_context, cycle_phase, material_changes
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_analyzer, make_daily_inputs, temp_dir
+from response_cache import ResponseCache
+
+
+CARDS = {"title": "Daily Health Programs", "cards": [
+    {"title": "Movement", "items": ["Walk 30 minutes"], "description": "Gentle load.", "sources": []},
+]}
+
+
+class DayContextTest(unittest.TestCase):
+
+    def test_context_extracts_latest_day_inputs(self):
+        context = build_day_context(make_daily_inputs(readiness=50))
+
+        self.assertEqual(context['latest_day'], '2025-05-30')
+        self.assertEqual(context['readiness_score'], 50)
+        self.assertEqual(context['stress_high_minutes'], 60)
+        self.assertEqual(context['stress_summary'], 'normal')
+        self.assertEqual(context['cycle_phase'], 'follicular')
+        self.assertEqual(context['anomalies'], ['daily_readiness.score'])
+        json.dumps(context)
+
+    def test_cycle_phase_from_tags_and_metadata(self):
+        data = make_daily_inputs()
+        as_of = pd.Timestamp('2025-05-20')
+
+        self.assertEqual(cycle_phase(data, as_of=as_of), 'menstrual')
+        self.assertEqual(cycle_phase(data, as_of=as_of + pd.Timedelta(days=20)), 'luteal')
+        self.assertEqual(cycle_phase(data, {'cycle_length': 35}, as_of + pd.Timedelta(days=17)), 'ovulatory')
+        self.assertIsNone(cycle_phase(data, as_of=as_of + pd.Timedelta(days=70)))
+        self.assertEqual(cycle_phase(data, {'cycle_phase': 'Luteal'}), 'luteal')
+
+    def test_small_moves_are_not_material(self):
+        previous = build_day_context(make_daily_inputs())
+        current = dict(previous, latest_day='2025-05-31', readiness_score=previous['readiness_score'] + 3)
+
+        self.assertEqual(material_changes(previous, current), [])
+        self.assertEqual(material_changes(previous, current, {'readiness_score': 2}), ['readiness_score'])
+        self.assertEqual(material_changes(previous, dict(current, cycle_phase='luteal')), ['cycle_phase'])
+        self.assertEqual(material_changes(previous, dict(current, latest_day='2025-06-10')), ['latest_day'])
+        self.assertEqual(material_changes(previous, dict(current, sleep_score=None)), ['sleep_score'])
+
+
+class ChangeAwareRegenerationTest(unittest.TestCase):
+
+    def test_advice_is_reused_until_inputs_move(self):
+        client = FakeClaudeClient(json.dumps(CARDS))
+        cache = ResponseCache(temp_dir(self))
+
+        first = make_analyzer(self, make_daily_inputs(), claude_client=client, response_cache=cache)
+        self.assertEqual(first.generate_daily_advice_structured(), CARDS)
+
+        # A new day of data with small moves: the prompt differs but the advice is reused
+        next_day = make_analyzer(self, make_daily_inputs(days=31), claude_client=client, response_cache=cache)
+        self.assertEqual(next_day.generate_daily_advice_structured(), CARDS)
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(next_day.get_llm_usage()['daily_advice_reused'], 1)
+
+        stressed = make_analyzer(self, make_daily_inputs(days=31, stress_high=4 * 3600), claude_client=client, response_cache=cache)
+        stressed.generate_daily_advice_structured()
+        self.assertEqual(len(client.calls), 2)
+
+    def test_force_and_failures_bypass_reuse(self):
+        client = FakeClaudeClient('not json')
+        analyzer = make_analyzer(self, make_daily_inputs(), claude_client=client)
+
+        self.assertIn('error', analyzer.generate_daily_advice_structured())
+        client.responder = json.dumps(CARDS)
+        analyzer.response_cache.clear()
+        self.assertEqual(analyzer.generate_daily_advice_structured(), CARDS)
+        analyzer.generate_daily_advice_structured(force=True)
+
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(analyzer.get_llm_usage()['response_cache_hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
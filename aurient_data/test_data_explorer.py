@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the paginated dataset explorer.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from data_explorer import DatasetExplorer
+from fake_health_data import temp_dir
+
+
+def make_heart_rate(rows=5000):
+    rng = np.random.default_rng(11)
+    timestamps = pd.date_range('2025-01-01', periods=rows, freq='5min').strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'bpm': rng.integers(45, 160, rows),
+        'source': rng.choice(['awake', 'rest', 'sleep', 'workout'], rows),
+    })
+
+
+class DatasetExplorerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_heart_rate()
+        cls.csv = Path(temp_dir(cls)) / 'heartrate.csv'
+        cls.df.to_csv(cls.csv, index=False)
+        cls.explorers = [DatasetExplorer(cls.df), DatasetExplorer(cls.csv, chunk_size=700)]
+
+    def test_pages_in_file_order(self):
+        for explorer in self.explorers:
+            result = explorer.page(page=3, page_size=50, columns=['bpm'])
+            self.assertEqual(result['total_rows'], 5000)
+            self.assertEqual(result['pages'], 100)
+            self.assertEqual(list(result['rows'].columns), ['bpm'])
+            self.assertEqual(result['rows']['bpm'].tolist(), self.df['bpm'].iloc[100:150].tolist())
+
+    def test_filters_and_sorting_match_pandas(self):
+        days = self.df['timestamp'].str[:10]
+        expected = self.df[(days >= '2025-01-05') & (days <= '2025-01-10') & self.df['source'].isin(['rest', 'sleep'])]
+        expected = expected.sort_values('bpm', ascending=False, kind='stable')
+
+        for explorer in self.explorers:
+            result = explorer.page(page=2, page_size=25, start='2025-01-05', end='2025-01-10',
+                                   equals={'source': ['rest', 'sleep']}, sort_by='bpm', ascending=False)
+            self.assertEqual(result['total_rows'], len(expected))
+            pd.testing.assert_frame_equal(result['rows'], expected.iloc[25:50].reset_index(drop=True),
+                                          check_dtype=False)
+
+    def test_filter_options_and_bounds(self):
+        for explorer in self.explorers:
+            self.assertEqual(explorer.date_column, 'timestamp')
+            self.assertEqual(explorer.category_columns, ['source'])
+            self.assertEqual(explorer.filter_options('source'), ['awake', 'rest', 'sleep', 'workout'])
+            self.assertEqual(explorer.date_bounds(), ('2025-01-01', '2025-01-18'))
+
+    def test_out_of_range_and_unknown_columns(self):
+        explorer = self.explorers[1]
+        self.assertTrue(explorer.page(page=500, page_size=50)['rows'].empty)
+        self.assertIn('error', explorer.page(columns=['nope']))
+        self.assertEqual(explorer.page(equals={'source': 'none'})['total_rows'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for pseudonymized export bundles.
+"""
+
+import gzip
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from export_bundle import date_shift_days, export_bundle, verify_bundle
+from fake_health_data import temp_dir
+
+SECRET = b'test-secret'
+
+
+def make_sources(csv_dir):
+    heart_rate = pd.DataFrame({
+        'timestamp': pd.date_range('2025-05-01 06:17:42', periods=250, freq='7min').strftime('%Y-%m-%dT%H:%M:%S+02:00'),
+        'bpm': range(250),
+        'source': 'rest',
+    })
+    heart_rate_csv = Path(csv_dir) / 'heartrate.csv'
+    heart_rate.to_csv(heart_rate_csv, index=False)
+    return {
+        'daily_readiness': pd.DataFrame({'id': ['a', 'b', 'c'], 'day': ['2025-05-01', '2025-05-02', '2025-05-03'],
+                                         'score': [70, 80, 90]}),
+        'heart_rate': heart_rate_csv,
+        'tags': pd.DataFrame({'id': ['t'], 'start_day': ['2025-05-02'], 'comment': ['at my home address']}),
+        'ring_config': pd.DataFrame({'id': ['r'], 'color': ['silver']}),
+    }
+
+
+def read_parts(bundle, dataset, manifest):
+    frames = []
+    for part in manifest['datasets'][dataset]['parts']:
+        with gzip.open(Path(bundle, part['path'])) as f:
+            frames.append(pd.read_csv(f))
+    return pd.concat(frames, ignore_index=True)
+
+
+class ExportBundleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = make_sources(temp_dir(self))
+        self.bundle = temp_dir(self)
+        self.manifest = export_bundle(self.sources, self.bundle, 'emma', SECRET, chunk_rows=100, columnar=False)
+
+    def test_pseudonymizes_and_chunks(self):
+        shift = pd.Timedelta(days=date_shift_days('emma', SECRET))
+        self.assertEqual(shift.days % 7, 0)
+        self.assertNotIn('ring_config', self.manifest['datasets'])
+        self.assertNotIn('emma', json.dumps(self.manifest))
+
+        readiness = read_parts(self.bundle, 'daily_readiness', self.manifest)
+        self.assertNotIn('id', readiness.columns)
+        self.assertEqual(readiness['day'][0], (pd.Timestamp('2025-05-01') + shift).strftime('%Y-%m-%d'))
+        self.assertEqual(read_parts(self.bundle, 'tags', self.manifest).columns.tolist(), ['start_day'])
+
+        heart_rate = self.manifest['datasets']['heart_rate']
+        self.assertEqual([p['rows'] for p in heart_rate['parts']], [100, 100, 50])
+        timestamps = read_parts(self.bundle, 'heart_rate', self.manifest)['timestamp']
+        self.assertEqual(timestamps[0], (pd.Timestamp('2025-05-01 06:00') + shift).strftime('%Y-%m-%dT%H:%M:%S'))
+        self.assertFalse(timestamps.str.contains(r'\+').any())
+
+    def test_reproducible_and_verifiable(self):
+        again = export_bundle(self.sources, temp_dir(self), 'emma', SECRET, chunk_rows=100, columnar=False)
+        self.assertEqual(again['bundle_sha256'], self.manifest['bundle_sha256'])
+        other = export_bundle(self.sources, temp_dir(self), 'emma', b'other', chunk_rows=100, columnar=False)
+        self.assertNotEqual(other['bundle_sha256'], self.manifest['bundle_sha256'])
+
+        self.assertEqual(verify_bundle(self.bundle), [])
+        Path(self.bundle, 'heart_rate', 'part-00001.csv.gz').write_bytes(b'tampered')
+        self.assertEqual(verify_bundle(self.bundle), ['heart_rate/part-00001.csv.gz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
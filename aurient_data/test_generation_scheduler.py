@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for rate-limit-aware scheduling, run against fake clients that inject throttling.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import make_analyzer
+from generation_scheduler import BATCH, INTERACTIVE, GenerationScheduler, TokenBucket
+
+
+ADVICE = "Emma's Personalized Health Advice: sleep more."
+
+
+def fast_scheduler(**kwargs):
+    sleeps = []
+    kwargs.setdefault('base_delay', 0.01)
+    kwargs.setdefault('max_delay', 0.05)
+    kwargs.setdefault('input_tokens_per_minute', None)
+    scheduler = GenerationScheduler(sleep=lambda s: (sleeps.append(s), time.sleep(s)), **kwargs)
+    return scheduler, sleeps
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_refills_continuously_up_to_capacity(self):
+        now = [0.0]
+        bucket = TokenBucket(60, burst_seconds=5, clock=lambda: now[0])
+
+        self.assertEqual(bucket.capacity, 5)
+        bucket.consume(5)
+        self.assertEqual(bucket.wait_time(2), 2.0)
+        now[0] = 1.5
+        self.assertEqual(bucket.wait_time(1), 0)
+        now[0] = 100
+        bucket.refund(10)
+        self.assertEqual(bucket.tokens, 5)
+
+    def test_oversized_request_waits_for_a_full_bucket(self):
+        now = [0.0]
+        bucket = TokenBucket(60, burst_seconds=2, clock=lambda: now[0])
+        bucket.consume(1)
+
+        self.assertEqual(bucket.wait_time(50), 1.0)
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_throttled_requests_are_retried_with_backoff(self):
+        scheduler, sleeps = fast_scheduler()
+        client = FakeClaudeClient(ADVICE, failures=[429, 529])
+        analyzer = make_analyzer(self, claude_client=client, scheduler=scheduler)
+
+        self.assertEqual(analyzer.generate_personalized_advice(), ADVICE)
+
+        self.assertEqual(client.rejected, [429, 529])
+        self.assertEqual(len(sleeps), 2)
+        self.assertTrue(all(0 <= s <= 0.05 for s in sleeps))
+        stats = scheduler.get_stats()
+        self.assertEqual((stats['retries'], stats['throttled'], stats['completed']), (2, 2, 1))
+
+    def test_client_errors_are_not_retried(self):
+        scheduler, sleeps = fast_scheduler()
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, failures=[400]), scheduler=scheduler)
+
+        self.assertEqual(analyzer.generate_personalized_advice(), 'Error generating advice: Error code: 400')
+        self.assertEqual(sleeps, [])
+        self.assertEqual(scheduler.get_stats()['failed'], 1)
+
+    def test_gives_up_after_max_retries(self):
+        scheduler, sleeps = fast_scheduler(max_retries=2)
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, failures=[529] * 5), scheduler=scheduler)
+
+        self.assertIn('Error code: 529', analyzer.generate_personalized_advice())
+        self.assertEqual(len(sleeps), 2)
+
+    def test_retry_after_header_is_respected(self):
+        scheduler, sleeps = fast_scheduler()
+        client = FakeClaudeClient(ADVICE, requests_per_minute=1)
+        first = make_analyzer(self, user_metadata={'name': 'Emma'}, claude_client=client, scheduler=scheduler)
+        second = make_analyzer(self, user_metadata={'name': 'Olivia'}, claude_client=client, scheduler=scheduler)
+        first.generate_personalized_advice()
+        # Pretend the fake's window started a minute ago, less 300ms
+        client._accepted_at[0] = time.monotonic() - 59.7
+
+        self.assertEqual(second.generate_personalized_advice(), ADVICE)
+        self.assertGreaterEqual(sleeps[0], 0.2)
+
+    def test_stream_opening_is_retried(self):
+        scheduler, _ = fast_scheduler()
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, failures=[529]), scheduler=scheduler)
+
+        self.assertEqual(''.join(analyzer.stream_personalized_advice()), ADVICE)
+
+    def test_no_async_jobs_are_dropped_under_throttling(self):
+        scheduler, _ = fast_scheduler(max_retries=8, requests_per_minute=6000)
+        client = FakeAsyncClaudeClient('{"title": "Advice", "sections": {}}', latency=0.01,
+                                       failures=[None, 429, None, 529, 429, 429, None, 529])
+        analyzers = [make_analyzer(self, user_metadata={'name': f'user{i}'}, async_claude_client=client, scheduler=scheduler,
+                                   priority=BATCH) for i in range(8)]
+
+        async def run_all():
+            return await asyncio.gather(*(a.agenerate_personalized_advice_structured() for a in analyzers))
+
+        results = asyncio.run(run_all())
+
+        self.assertTrue(all(r == {'title': 'Advice', 'sections': {}} for r in results))
+        self.assertEqual(len(client.rejected), 5)
+        self.assertEqual(scheduler.get_stats()['completed'], 8)
+
+
+class AdmissionTest(unittest.TestCase):
+
+    def test_interactive_requests_overtake_queued_batch_work(self):
+        # One request per 100ms, no bursts
+        scheduler = GenerationScheduler(requests_per_minute=600, input_tokens_per_minute=None,
+                                        output_tokens_per_minute=None, burst_seconds=0.1)
+        order = []
+        scheduler.call(lambda: order.append('warmup'))
+
+        def submit(name, priority):
+            scheduler.call(lambda: order.append(name), priority=priority)
+
+        threads = [threading.Thread(target=submit, args=(f'batch{i}', BATCH)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=submit, args=('interactive', INTERACTIVE))
+        interactive.start()
+        self.assertGreaterEqual(scheduler.get_stats()['max_queue_depth'], 3)
+        for thread in threads + [interactive]:
+            thread.join()
+
+        self.assertEqual(order[:2], ['warmup', 'interactive'])
+        stats = scheduler.get_stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertLess(stats['wait_by_priority'][INTERACTIVE]['max'], stats['wait_by_priority'][BATCH]['max'])
+
+    def test_unused_output_reservation_is_returned(self):
+        scheduler = GenerationScheduler(output_tokens_per_minute=60_000, burst_seconds=1)
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE), scheduler=scheduler)
+
+        analyzer.generate_personalized_advice()
+
+        bucket = scheduler.buckets['output_tokens']
+        self.assertGreater(bucket.tokens, bucket.capacity - 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Import-time checks for oura_analysis: plotting and LLM dependencies load on first use.
+
+The tests check which modules get imported, not how long that takes, so they
+do not depend on the machine. Run directly to print a timing breakdown, which
+exits 1 when the import is over budget:
+
+    python test_import_time.py --benchmark
+"""
+
+import json
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+
+HEAVY_MODULES = ("matplotlib", "seaborn", "anthropic", "dotenv")
+
+# Budget for `import oura_analysis` on top of pandas/numpy, which every caller needs anyway.
+# Eager imports of matplotlib, seaborn and anthropic took well over a second.
+IMPORT_BUDGET_SECONDS = 0.5
+
+PROBE = """
+import json, os, sys, tempfile, time, warnings
+sys.path.insert(0, {here!r})
+os.environ['ANTHROPIC_API_KEY'] = ''
+heavy = {heavy!r}
+loaded = lambda: [m for m in heavy if m in sys.modules]
+
+start = time.perf_counter()
+import numpy, pandas
+baseline = time.perf_counter()
+filters = list(warnings.filters)
+import oura_analysis
+imported = time.perf_counter()
+after_import = loaded()
+filters_unchanged = warnings.filters == filters
+
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_health_data, offline_analyzer
+from response_cache import ResponseCache
+cache_dir = tempfile.TemporaryDirectory()
+analyzer = offline_analyzer(make_health_data(), {{'name': 'Emma'}}, ResponseCache(cache_dir.name),
+                            claude_client=FakeClaudeClient('{{}}'))
+analyzed = time.perf_counter()
+after_analysis = loaded()
+
+analyzer.plots['sleep_detailed']
+plotted = time.perf_counter()
+
+print(json.dumps({{
+    'pandas_seconds': baseline - start,
+    'import_seconds': imported - baseline,
+    'analyze_seconds': analyzed - imported,
+    'first_plot_seconds': plotted - analyzed,
+    'after_import': after_import,
+    'after_analysis': after_analysis,
+    'after_plot': loaded(),
+    'warning_filters_unchanged': filters_unchanged and warnings.filters == filters,
+}}))
+cache_dir.cleanup()
+"""
+
+
+def measure() -> dict:
+    """Time a cold import, analysis and first plot in a fresh interpreter."""
+    here = str(Path(__file__).parent)
+    output = subprocess.run([sys.executable, "-c", PROBE.format(here=here, heavy=HEAVY_MODULES)],
+                            capture_output=True, text=True, check=True, cwd=here).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.result = measure()
+
+    def test_import_defers_heavy_dependencies(self):
+        self.assertEqual(self.result['after_import'], [])
+
+    def test_import_and_plotting_leave_warning_filters_alone(self):
+        self.assertTrue(self.result['warning_filters_unchanged'])
+
+    def test_stats_only_callers_never_load_plotting(self):
+        self.assertEqual(self.result['after_analysis'], [])
+
+    def test_plots_load_on_first_access(self):
+        self.assertIn('matplotlib', self.result['after_plot'])
+        self.assertIn('seaborn', self.result['after_plot'])
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        result = measure()
+        for key, value in result.items():
+            print(f"{key}: {value:.3f}s" if isinstance(value, float) else f"{key}: {value}")
+        if result['import_seconds'] > IMPORT_BUDGET_SECONDS:
+            print(f"✗ import took longer than the {IMPORT_BUDGET_SECONDS}s budget")
+            sys.exit(1)
+    else:
+        unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Tests for the normalized Oura + WHOOP ingest layer.
+"""
+
+import contextlib
+import io
+import json
+import sys
+import unittest
+import unittest.mock
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from analyzer_registry import AnalyzerRegistry
+from fake_health_data import load_user, temp_dir
+from ingest import (NormalizedStore, SCHEMA, analysis_datasets, combine, ingest_user, load_normalized_analyzer,
+                    normalize_oura, normalize_whoop)
+from response_cache import ResponseCache
+from synthetic_oura import generate_user
+
+SUFFIX = '_2025-05-01_2025-05-03.csv'
+
+
+def make_oura():
+    days = ['2025-05-01', '2025-05-02', '2025-05-03']
+    return {
+        'daily_sleep': pd.DataFrame({'day': days, 'score': [80, 70, 90]}),
+        'daily_readiness': pd.DataFrame({'day': days, 'score': [75, 65, 85], 'temperature_deviation': [0.1, -0.2, 0.0]}),
+        'daily_activity': pd.DataFrame({'day': days, 'score': [60, 70, 80], 'steps': [8000, 12000, 4000],
+                                        'total_calories': [2200, 2600, 2000]}),
+        'daily_spo2': pd.DataFrame({'day': days, 'spo2_percentage': ["{'average': 97.5}", "{'average': 96.0}", '']}),
+        'sleep_detailed': pd.DataFrame({
+            'day': ['2025-05-01', '2025-05-02', '2025-05-02', '2025-05-03'],
+            'type': ['long_sleep', 'long_sleep', 'sleep', 'long_sleep'],
+            'bedtime_start': ['2025-04-30T23:05:00+02:00', '2025-05-01T22:40:00+02:00',
+                              '2025-05-02T14:00:00+02:00', '2025-05-02T23:30:00+02:00'],
+            'bedtime_end': ['2025-05-01T07:00:00+02:00', '2025-05-02T06:30:00+02:00',
+                            '2025-05-02T14:30:00+02:00', '2025-05-03T07:15:00+02:00'],
+            'total_sleep_duration': [25200, 24000, 1500, 26000],
+            'deep_sleep_duration': [5000, 4000, 0, 6000],
+            'average_hrv': [55, 48, 40, 60],
+            'lowest_heart_rate': [50, 53, 58, 49],
+        }),
+        'heart_rate': pd.DataFrame({'timestamp': ['2025-05-01T05:00:00+00:00', '2025-05-01T05:05:00+00:00'],
+                                    'bpm': [52, 55], 'source': ['rest', 'rest']}),
+    }
+
+
+def make_whoop():
+    return {
+        'sleep': {'records': [{
+            'id': 93845, 'start': '2025-05-02T03:00:00.000Z', 'end': '2025-05-02T11:00:00.000Z',
+            'timezone_offset': '-05:00', 'nap': False, 'score_state': 'SCORED',
+            'score': {'stage_summary': {'total_light_sleep_time_milli': 14400000,
+                                        'total_slow_wave_sleep_time_milli': 5400000,
+                                        'total_rem_sleep_time_milli': 5400000,
+                                        'total_awake_time_milli': 3600000},
+                      'respiratory_rate': 15.5, 'sleep_performance_percentage': 88,
+                      'sleep_efficiency_percentage': 91.2},
+        }], 'next_token': None},
+        'recovery': [{'cycle_id': 1, 'sleep_id': 93845, 'created_at': '2025-05-02T11:30:00.000Z',
+                      'score_state': 'SCORED',
+                      'score': {'recovery_score': 66, 'resting_heart_rate': 51, 'hrv_rmssd_milli': 61.3,
+                                'spo2_percentage': 95.8, 'skin_temp_celsius': 33.7}}],
+        'cycle': [{'id': 1, 'start': '2025-05-02T11:00:00.000Z', 'end': None, 'timezone_offset': '-05:00',
+                   'score': {'strain': 12.4, 'kilojoule': 8368.0, 'average_heart_rate': 68,
+                             'max_heart_rate': 171}}],
+    }
+
+
+class IngestTest(unittest.TestCase):
+
+    def assertConforms(self, tables):
+        self.assertEqual(set(tables), set(SCHEMA))
+        for table, df in tables.items():
+            self.assertEqual(list(df.columns), list(SCHEMA[table]))
+            self.assertEqual(str(df['source'].dtype), 'category')
+
+    def test_normalize_oura(self):
+        tables = normalize_oura(make_oura())
+        self.assertConforms(tables)
+        sleep = tables['sleep']
+        self.assertEqual(sleep['nap'].tolist(), [False, False, True, False])
+        self.assertEqual(sleep['start'][0], pd.Timestamp('2025-04-30 23:05'))
+        self.assertEqual(sleep['score'].tolist()[:2], [80, 70])
+        self.assertTrue(pd.isna(sleep['score'][2]))
+
+        recovery = tables['recovery'].set_index('day')
+        self.assertEqual(recovery.loc['2025-05-02', 'hrv'], 48)
+        self.assertEqual(recovery.loc['2025-05-01', 'spo2_percentage'], 97.5)
+        self.assertTrue(pd.isna(recovery.loc['2025-05-03', 'spo2_percentage']))
+        self.assertEqual(tables['heartrate']['timestamp'][0], pd.Timestamp('2025-05-01 05:00'))
+
+    def test_normalize_whoop(self):
+        tables = normalize_whoop(make_whoop())
+        self.assertConforms(tables)
+        sleep = tables['sleep'].iloc[0]
+        self.assertEqual(sleep['start'], pd.Timestamp('2025-05-01 22:00'))
+        self.assertEqual(sleep['day'], pd.Timestamp('2025-05-02'))
+        self.assertEqual(sleep['total_sleep_seconds'], 25200)
+        self.assertEqual(sleep['awake_seconds'], 3600)
+
+        recovery = tables['recovery'].iloc[0]
+        self.assertEqual(recovery['day'], pd.Timestamp('2025-05-02'))
+        self.assertEqual(recovery['hrv'], 61.3)
+        self.assertAlmostEqual(tables['activity']['total_calories'][0], 2000)
+        self.assertTrue(tables['heartrate'].empty)
+        self.assertConforms(normalize_whoop({}))
+
+    def test_combined_sources(self):
+        tables = combine(normalize_oura(make_oura()), normalize_whoop(make_whoop()))
+        self.assertConforms(tables)
+        recovery = tables['recovery']
+        self.assertEqual(recovery[recovery['day'] == '2025-05-02']['source'].tolist(), ['oura', 'whoop'])
+
+    def test_store_skips_reparsing(self):
+        root = Path(temp_dir(self))
+        user_dir = root / 'data' / 'mia'
+        user_dir.mkdir(parents=True)
+        for name, prefix in [('daily_readiness', 'dailyreadiness'), ('sleep_detailed', 'sleep'),
+                             ('heart_rate', 'heartrate')]:
+            make_oura()[name].to_csv(user_dir / f'{prefix}{SUFFIX}', index=False)
+        store = NormalizedStore(root / 'store')
+
+        first = ingest_user('mia', user_dir, make_whoop(), store)
+        self.assertIsNotNone(store.load('mia', json.loads((root / 'store' / 'mia' / 'manifest.json')
+                                                          .read_text())['fingerprint']))
+        with unittest.mock.patch('ingest.normalize_oura') as normalize:
+            again = ingest_user('mia', user_dir, make_whoop(), store)
+            normalize.assert_not_called()
+        for table in SCHEMA:
+            pd.testing.assert_frame_equal(first[table], again[table])
+
+        changed = make_whoop()
+        changed['recovery'][0]['score']['recovery_score'] = 30
+        with unittest.mock.patch('ingest.normalize_oura', wraps=normalize_oura) as normalize:
+            self.assertIn(30, ingest_user('mia', user_dir, changed, store)['recovery']['score'].tolist())
+            normalize.assert_called_once()
+
+    def test_registry_loader(self):
+        root = Path(temp_dir(self))
+        user_dir = root / 'data' / 'mia'
+        user_dir.mkdir(parents=True)
+        (user_dir / 'whoop.json').write_text(json.dumps(make_whoop()))
+        store = NormalizedStore(root / 'store')
+        cache = ResponseCache(temp_dir(self))
+        registry = AnalyzerRegistry(data_root=str(root / 'data'), snapshot_dir=None,
+                                    loader=lambda metadata, data_dir: load_normalized_analyzer(
+                                        metadata, data_dir, store, response_cache=cache))
+        analyzer = registry.get('mia')
+        self.assertEqual(sorted(analyzer.health_data),
+                         ['daily_activity', 'daily_readiness', 'daily_sleep', 'sleep_detailed'])
+        self.assertIn('daily_readiness', analyzer.summary_stats)
+        # WHOOP's HRV comes from the recovery scored on that sleep
+        self.assertEqual(analyzer.get_day_context()['average_hrv'], 61.3)
+
+    def test_analysis_datasets_use_oura_names(self):
+        datasets = analysis_datasets(combine(normalize_oura(make_oura()), normalize_whoop(make_whoop())))
+        detailed = datasets['sleep_detailed']
+        self.assertEqual(detailed['type'].tolist(), ['long_sleep', 'long_sleep', 'sleep', 'long_sleep', 'long_sleep'])
+        self.assertEqual(detailed['bedtime_start'][0], pd.Timestamp('2025-04-30 23:05'))
+        self.assertEqual(detailed['total_sleep_duration'][0], 25200)
+        self.assertEqual(datasets['daily_sleep']['score'].tolist(), [80, 70, 88, 90])
+        self.assertEqual(set(datasets['daily_readiness']['source']), {'oura', 'whoop'})
+
+
+class ExportIngestTest(unittest.TestCase):
+    """Normalizing complete exports, with hypnogram strings, as written by synthetic_oura."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.root = Path(temp_dir(cls))
+        generate_user(cls.root / 'data' / 'emma', 0, days=60)
+
+    def test_normalized_user_keeps_day_context_and_local_advice(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            normalized = load_normalized_analyzer({'user_id': 'emma', 'name': 'Emma'}, str(self.root / 'data' / 'emma'),
+                                                  NormalizedStore(self.root / 'store'),
+                                                  response_cache=ResponseCache(temp_dir(self)))
+        original = load_user(self, str(self.root / 'data' / 'emma'))
+        self.assertGreater(len(normalized.health_data['sleep_detailed']), 50)
+
+        context, expected = normalized.get_day_context(), original.get_day_context()
+        for field in ('latest_day', 'readiness_score', 'temperature_deviation', 'sleep_score', 'average_hrv'):
+            self.assertIsNotNone(context[field], field)
+            self.assertEqual(context[field], expected[field], field)
+        cards = normalized.generate_local_daily_advice()
+        self.assertEqual(len(cards), len(original.generate_local_daily_advice()))
+        self.assertGreater(len(cards), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage instrumentation of OuraAnalysis.
+"""
+
+import asyncio
+import sys
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import load_user, make_analyzer, temp_dir
+from instrumentation import NULL_SPAN, Instrumentation
+from synthetic_oura import generate_user
+
+
+class FakeTracer:
+    """Records spans like an OpenTelemetry tracer."""
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = {'name': name, 'attributes': dict(attributes or {})}
+        span['set_attribute'] = lambda key, value: span['attributes'].__setitem__(key, value)
+        self.spans.append(span)
+        yield type('Span', (), {'set_attribute': staticmethod(span['set_attribute'])})
+
+
+def instrumented_analyzer(test, instrumentation):
+    data_dir = temp_dir(test)
+    generate_user(data_dir, 0, days=14)
+    analyzer = load_user(test, data_dir, claude_client=FakeClaudeClient(), instrumentation=instrumentation)
+    analyzer.analyze_all_datasets()
+    return analyzer
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def test_pipeline_stages_are_recorded(self):
+        instrumentation = Instrumentation()
+        analyzer = instrumented_analyzer(self, instrumentation)
+        analyzer.get_analysis_prompt_blocks()
+        analyzer.get_daily_prompt_blocks()
+        analyzer.generate_personalized_advice()
+        analyzer.generate_personalized_advice()
+        asyncio.run(analyzer._acreate_message([{'role': 'user', 'content': 'hi'}], max_tokens=10))
+        analyzer.plots['vo2_max']
+
+        stages = instrumentation.metrics()['stages']
+        self.assertEqual(stages['load']['count'], 14)
+        self.assertEqual(stages['load']['rows'], sum(len(df) for df in analyzer.health_data.values()))
+        self.assertEqual(stages['analyze']['count'], 14)
+        self.assertEqual((stages['prompt']['cache_misses'], stages['prompt']['cache_hits']), (1, 3))
+        self.assertEqual((stages['llm']['cache_misses'], stages['llm']['cache_hits']), (2, 1))
+        self.assertEqual(stages['plot']['count'], 1)
+        for stage in stages.values():
+            self.assertGreaterEqual(stage['wall_seconds'], 0)
+            self.assertIsNone(stage['max_memory_delta_bytes'])
+
+        spans = instrumentation.metrics()['spans']
+        heart_rate = next(s for s in spans if s['name'] == 'load' and s['attributes']['dataset'] == 'heart_rate')
+        self.assertEqual(heart_rate['rows'], len(analyzer.health_data['heart_rate']))
+
+    def test_streams_are_timed_to_the_first_token(self):
+        instrumentation = Instrumentation()
+        advice = 'Sleep more, train in the follicular phase.'
+        analyzer = make_analyzer(self, instrumentation=instrumentation,
+                                 claude_client=FakeClaudeClient(advice, chunk_size=8, chunk_delay=0.01),
+                                 async_claude_client=FakeAsyncClaudeClient(advice, chunk_size=8, chunk_delay=0.01))
+
+        async def astream():
+            return [text async for text in analyzer._astream_message([{'role': 'user', 'content': 'hi'}], 50)]
+
+        self.assertEqual(''.join(analyzer.stream_personalized_advice()), advice)
+        self.assertEqual(''.join(analyzer.stream_personalized_advice()), advice)
+        self.assertEqual(''.join(asyncio.run(astream())), advice)
+
+        spans = [s for s in instrumentation.metrics()['spans'] if s['name'] == 'llm']
+        self.assertEqual([s['cache'] for s in spans], ['miss', 'hit', 'miss'])
+        for span in spans:
+            self.assertTrue(span['attributes']['streamed'])
+        for span in (spans[0], spans[2]):
+            # Later chunks arrive after the first, so the stream outlasts its first token
+            self.assertLess(0, span['attributes']['ttft_seconds'])
+            self.assertLess(span['attributes']['ttft_seconds'], span['wall_seconds'])
+        self.assertNotIn('ttft_seconds', spans[1]['attributes'])
+
+    def test_prometheus_and_otel_exports(self):
+        tracer = FakeTracer()
+        instrumentation = Instrumentation(tracer=tracer)
+        with instrumentation.span('prompt') as span:
+            span.set(cache='hit', rows=3)
+        with self.assertRaises(ValueError):
+            with instrumentation.span('load', dataset='heart_rate'):
+                raise ValueError('bad file')
+
+        text = instrumentation.prometheus()
+        self.assertIn('# TYPE aurient_stage_seconds_total counter', text)
+        self.assertIn('aurient_stage_calls_total{stage="load"} 1', text)
+        self.assertIn('aurient_stage_errors_total{stage="load"} 1', text)
+        self.assertIn('aurient_stage_rows_total{stage="prompt"} 3', text)
+        self.assertIn('aurient_cache_requests_total{stage="prompt",result="hit"} 1', text)
+
+        exported = instrumentation.otel_spans()
+        self.assertEqual([s['status']['code'] for s in exported], ['OK', 'ERROR'])
+        self.assertEqual(exported[1]['attributes']['aurient.dataset'], 'heart_rate')
+        self.assertEqual([s['name'] for s in tracer.spans], ['prompt', 'load'])
+        self.assertEqual(tracer.spans[0]['attributes']['aurient.cache'], 'hit')
+        self.assertEqual(tracer.spans[1]['attributes']['aurient.error'], 'ValueError')
+
+    def test_memory_deltas_cover_nested_spans(self):
+        instrumentation = Instrumentation(trace_memory=True)
+        with instrumentation.span('analyze'):
+            with instrumentation.span('plot'):
+                block = bytearray(4 * 1024 ** 2)
+                del block
+        spans = {s['name']: s for s in instrumentation.metrics()['spans']}
+        self.assertGreaterEqual(spans['plot']['memory_delta_bytes'], 4 * 1024 ** 2)
+        self.assertGreaterEqual(spans['analyze']['memory_delta_bytes'], spans['plot']['memory_delta_bytes'])
+
+    def test_disabled_is_negligible(self):
+        instrumentation = Instrumentation(enabled=False)
+        self.assertIs(instrumentation.span('load', dataset='x'), NULL_SPAN)
+        # A disabled span reads no clock and traces no memory: it is only a method call
+        with mock.patch('instrumentation.time') as clock, mock.patch('instrumentation.tracemalloc') as memory:
+            for _ in range(100):
+                with instrumentation.span('load', dataset='x') as span:
+                    span.set(rows=1)
+        self.assertEqual((clock.mock_calls, memory.mock_calls), ([], []))
+        self.assertEqual(instrumentation.metrics(), {'stages': {}, 'spans': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for per-generation LLM telemetry.
+"""
+
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import make_analyzer, temp_dir
+from generation_scheduler import GenerationScheduler
+from llm_telemetry import TelemetryLog, estimate_cost
+from oura_analysis import CLAUDE_MODEL
+
+
+ADVICE = "Emma's Personalized Health Advice: sleep more."
+
+
+def streaming_client():
+    return FakeClaudeClient(ADVICE, chunk_size=8, chunk_delay=0.002)
+
+
+class LLMTelemetryTest(unittest.TestCase):
+
+    def test_generations_are_logged_per_method_with_cost(self):
+        analyzer = make_analyzer(self, claude_client=streaming_client())
+        analyzer.generate_personalized_advice()
+        analyzer.generate_personalized_advice()
+
+        records = analyzer.telemetry.records(method='generate_personalized_advice')
+        self.assertEqual(len(records), 2)
+        self.assertEqual(sorted(records['source']), ['api', 'response_cache'])
+        self.assertEqual(set(records['user_id']), {'Emma'})
+        api = records[records['source'] == 'api'].iloc[0]
+        self.assertEqual(api['model'], CLAUDE_MODEL)
+        self.assertGreater(api['input_tokens'] + api['cache_creation_input_tokens'], 0)
+        self.assertGreater(api['output_tokens'], 0)
+        self.assertAlmostEqual(api['cost_usd'], estimate_cost(CLAUDE_MODEL, api.to_dict()))
+        self.assertEqual(api['retries'], 0)
+        self.assertGreater(api['latency_seconds'], 0)
+        self.assertEqual(records[records['source'] == 'response_cache'].iloc[0]['cost_usd'], 0)
+        self.assertAlmostEqual(analyzer.get_llm_usage()['estimated_cost_usd'], api['cost_usd'])
+
+    def test_retries_and_errors_are_recorded(self):
+        scheduler = GenerationScheduler(base_delay=0.01, max_delay=0.02, input_tokens_per_minute=None)
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, failures=[429, 529]), scheduler=scheduler)
+        analyzer.generate_personalized_advice()
+        self.assertEqual(analyzer.telemetry.records().iloc[0]['retries'], 2)
+
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, failures=[400]))
+        result = analyzer.generate_personalized_advice()
+        self.assertIn('Error', result)
+        self.assertEqual(analyzer.telemetry.records().iloc[0]['error'], 'FakeAPIStatusError')
+
+    def test_streams_record_time_to_first_token(self):
+        analyzer = make_analyzer(self, claude_client=streaming_client())
+        list(analyzer.stream_personalized_advice())
+        stream = analyzer.stream_daily_advice()
+        next(stream)
+        stream.close()
+
+        records = analyzer.telemetry.records().set_index('method')
+        completed = records.loc['stream_personalized_advice']
+        self.assertEqual(completed['streamed'], 1)
+        self.assertLess(completed['ttft_seconds'], completed['latency_seconds'])
+        self.assertTrue(pd.isna(completed['error']))
+        self.assertEqual(records.loc['stream_daily_advice']['error'], 'abandoned')
+
+    def test_async_paths_name_the_calling_method(self):
+        async def run(analyzer):
+            await asyncio.gather(analyzer.agenerate_personalized_advice_structured(),
+                                 analyzer.agenerate_personalized_advice_structured())
+            return [chunk async for chunk in analyzer.astream_personalized_advice()]
+
+        for clients in ({'async_claude_client': FakeAsyncClaudeClient(ADVICE, latency=0.02)}, {}):
+            analyzer = make_analyzer(self, claude_client=streaming_client(), **clients)
+            asyncio.run(run(analyzer))
+            records = analyzer.telemetry.records()
+            methods = records.groupby('method')['source'].apply(sorted).to_dict()
+            self.assertEqual(methods['agenerate_personalized_advice_structured'], ['api', 'inflight'])
+            self.assertIn('astream_personalized_advice', methods)
+
+    def test_daily_advice_within_a_latency_budget_names_its_method(self):
+        # The call runs on a worker thread, so the method cannot come from the call stack
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient('{"title": "Daily", "cards": []}'),
+                                 daily_latency_budget=5)
+        analyzer.generate_daily_advice_structured()
+        self.assertEqual(list(analyzer.telemetry.records()['method']), ['generate_daily_advice_structured'])
+
+    def test_summary_percentiles(self):
+        log = TelemetryLog(Path(temp_dir(self)) / 'telemetry.sqlite3')
+        now = time.time()
+        for i in range(100):
+            log.record({'timestamp': now - i, 'user_id': f'user{i % 2}', 'method': 'generate_daily_advice',
+                        'model': CLAUDE_MODEL, 'source': 'api' if i < 80 else 'response_cache',
+                        'latency_seconds': i + 1.0, 'input_tokens': 100, 'output_tokens': 10,
+                        'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 300,
+                        'retries': 1 if i < 5 else 0, 'cost_usd': 0.001 if i < 80 else 0.0})
+
+        summary = log.summary().loc['generate_daily_advice']
+        self.assertEqual(summary['calls'], 100)
+        self.assertEqual(summary['api_calls'], 80)
+        self.assertAlmostEqual(summary['response_cache_hit_rate'], 0.2)
+        self.assertAlmostEqual(summary['latency_p50'], 40.5)
+        self.assertAlmostEqual(summary['latency_p99'], 79.21)
+        self.assertEqual(summary['retries'], 5)
+        self.assertAlmostEqual(summary['prompt_cache_read_ratio'], 0.75)
+        self.assertAlmostEqual(summary['cost_usd'], 0.08)
+        self.assertEqual(len(log.summary(by=['user_id'])), 2)
+        self.assertEqual(len(log.records(since=now - 9.5)), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the rule-based local daily programmes.
+"""
+
+import asyncio
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import make_analyzer, make_health_data
+from local_recommendations import daily_features, recommend_daily_programs
+
+
+class LocalRecommendationsTest(unittest.TestCase):
+
+    def test_hrv_ratio_sets_intensity(self):
+        # 2025-06-09 is cycle day 12 (follicular) for a period starting 2025-05-29
+        data = dict(make_health_data(last_hrv=55), tags=pd.DataFrame(
+            {'start_day': ['2025-05-01', '2025-05-29'], 'tag_type_code': 'tag_generic_period'}))
+        self.assertEqual(recommend_daily_programs(data)['features']['intensity'], 'high')
+
+        data['sleep_detailed'].loc[39, 'average_hrv'] = 50
+        self.assertEqual(recommend_daily_programs(data)['features']['intensity'], 'moderate')
+
+        data['sleep_detailed'].loc[39, 'average_hrv'] = 45
+        result = recommend_daily_programs(data)
+        self.assertEqual(result['features']['intensity'], 'recovery')
+        self.assertEqual(result['features']['hrv_ratio'], 0.9)
+        self.assertEqual(result['features']['hrv_source'], 'hrv')
+        self.assertIn('Brisk walk', result['cards'][0]['items'][0])
+        self.assertIn('Your HRV is at 90% of your baseline', result['cards'][0]['description'])
+
+    def test_readiness_stands_in_for_missing_hrv(self):
+        data = make_health_data()
+        data['sleep_detailed'] = data['sleep_detailed'].drop(columns='average_hrv')
+        data['daily_readiness'].loc[39, 'score'] = 60
+        result = recommend_daily_programs(data)
+
+        self.assertEqual(result['features']['hrv_source'], 'readiness')
+        self.assertEqual(result['features']['hrv_ratio'], 0.75)
+        self.assertEqual(result['features']['intensity'], 'recovery')
+        movement, _, nutrition = result['cards']
+        self.assertIn('Your readiness score is at 75% of your baseline', movement['description'])
+        self.assertNotIn('HRV', movement['description'])
+        self.assertIn('low-readiness day', nutrition['description'])
+
+    def test_luteal_baseline_and_volume(self):
+        # Luteal HRV runs lower; it is compared with the luteal baseline only
+        data = make_health_data(days=28)
+        features = daily_features(data)
+        self.assertEqual(features['cycle_phase'].iloc[-1], 'luteal')
+        data['sleep_detailed']['average_hrv'] = np.where(features['cycle_phase'] == 'luteal', 40.0, 60.0)
+
+        features = daily_features(data)
+        self.assertAlmostEqual(features['hrv_ratio'].iloc[-1], 1.0)
+        self.assertEqual(features['volume_factor'].iloc[-1], 0.85)
+        self.assertIn('luteal', recommend_daily_programs(data)['cards'][0]['description'])
+
+    def test_sleep_debt_caps_intensity(self):
+        data = make_health_data(last_hrv=60, sleep_hours=7.4)
+        features = daily_features(data)
+
+        self.assertAlmostEqual(features['sleep_debt_hours'].iloc[-1], 4.2)
+        self.assertEqual(features['intensity'].iloc[-1], 'moderate')
+        self.assertEqual(daily_features(make_health_data(last_hrv=60, sleep_hours=6.5))['intensity'].iloc[-1],
+                         'recovery')
+
+    def test_cards_match_daily_schema(self):
+        result = recommend_daily_programs(make_health_data(), {'name': 'Emma'}, day='2025-05-20')
+
+        self.assertEqual(result['title'], "Emma's Daily Health Programs")
+        self.assertEqual(result['day'], '2025-05-20')
+        self.assertEqual([card['title'] for card in result['cards']], ['Movement', 'Mindfulness', 'Nutrition'])
+        for card in result['cards']:
+            self.assertTrue(card['items'])
+            self.assertTrue(card['description'])
+            self.assertTrue(all(source['url'].startswith('https://') for source in card['sources']))
+        self.assertIn('error', recommend_daily_programs({}))
+
+    def test_analyzer_falls_back_without_llm(self):
+        data = make_health_data()
+        offline = make_analyzer(self, data)
+        self.assertEqual(offline.generate_daily_advice_structured()['source'], 'local')
+
+        client = FakeClaudeClient('{}', failures=[400])
+        online = make_analyzer(self, data, claude_client=client)
+        result = online.generate_daily_advice_structured()
+        self.assertEqual(result['source'], 'local')
+        self.assertIn('llm_error', result)
+
+    def test_async_analyzer_falls_back_without_llm(self):
+        data = make_health_data()
+        offline = make_analyzer(self, data)
+        self.assertEqual(asyncio.run(offline.agenerate_daily_advice_structured())['source'], 'local')
+
+        online = make_analyzer(self, data, claude_client=FakeClaudeClient('{}', failures=[400] * 3))
+        result = asyncio.run(online.agenerate_daily_advice_structured())
+        self.assertEqual(result['source'], 'local')
+        self.assertIn('llm_error', result)
+
+    def test_slow_llm_falls_back_within_latency_budget(self):
+        data = make_health_data()
+        card = '{"title": "Movement", "items": ["walk"], "description": "d"}'
+        release, answered = threading.Event(), []
+
+        def respond(params):
+            release.wait(30)
+            answered.append(params)
+            return card
+
+        client = FakeClaudeClient(respond)
+        analyzer = make_analyzer(self, data, claude_client=client, daily_latency_budget=0.1)
+        self.addCleanup(release.set)
+        threads = set(threading.enumerate())
+        result = analyzer.generate_daily_advice_structured()
+        self.assertEqual(result['source'], 'local')
+        self.assertIn('0.1s', result['llm_error'])
+        # The local programmes came back while Claude was still working on its answer
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(answered, [])
+        # which still completes, before the response cache directory is removed
+        release.set()
+        for thread in set(threading.enumerate()) - threads:
+            thread.join(30)
+        self.assertEqual(len(answered), 1)
+
+        async def run(analyzer):
+            result = await analyzer.agenerate_daily_advice_structured()
+            return result, analyzer.async_claude_client.in_flight
+
+        client = FakeAsyncClaudeClient(card, latency=30)
+        analyzer = make_analyzer(self, data, claude_client=client, async_claude_client=client,
+                                 daily_latency_budget=0.1)
+        result, in_flight = asyncio.run(run(analyzer))
+        self.assertEqual(result['source'], 'local')
+        self.assertIn('0.1s', result['llm_error'])
+        self.assertEqual(in_flight, 3)
+
+if __name__ == '__main__':
+    unittest.main()
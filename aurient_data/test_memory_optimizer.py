@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory optimization pass and memory budget mode.
+"""
+
+import contextlib
+import io
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from analyzer_registry import AnalyzerRegistry
+from daily_context import build_day_context
+from fake_health_data import load_user, temp_dir
+from memory_optimizer import frame_memory, optimize_frame, optimize_health_data
+from oura_analysis import OuraAnalysis
+from response_cache import ResponseCache
+from synthetic_oura import generate_user
+
+
+class OptimizeFrameTest(unittest.TestCase):
+
+    def test_columns_get_compact_dtypes(self):
+        n = 100
+        df = pd.DataFrame({
+            'id': [f'id-{i}' for i in range(n)],
+            'type': ['long_sleep', 'late_nap'] * (n // 2),
+            'steps': np.arange(n, dtype='int64') * 100,
+            'score': np.linspace(50, 90, n).round(1),
+            'epoch': 1.7e9 + np.arange(n, dtype='float64'),
+            'day': pd.date_range('2025-01-01', periods=n).strftime('%Y-%m-%d'),
+            'timestamp': pd.date_range('2025-01-01', periods=n, freq='h').strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+            'bedtime_start': [f'2025-03-{1 + i % 28:02d}T23:{i % 60:02d}:00-0{7 + i % 2}:00' for i in range(n)],
+            'movement_30_sec': ['1121' * 10 + str(i) for i in range(n)],
+        })
+        optimized, changes = optimize_frame(df)
+
+        self.assertNotIn('id', optimized)
+        self.assertEqual(changes['id'], 'dropped')
+        self.assertIsInstance(optimized['type'].dtype, pd.CategoricalDtype)
+        self.assertEqual(optimized['steps'].dtype, np.int32)
+        self.assertEqual(optimized['score'].dtype, np.float32)
+        # float32 would move epoch seconds by more than the tolerance
+        self.assertEqual(optimized['epoch'].dtype, np.float64)
+        self.assertEqual(optimized['day'].iloc[0], pd.Timestamp('2025-01-01'))
+        self.assertEqual(str(optimized['timestamp'].dt.tz), 'UTC')
+        # Mixed offsets (a DST change) would lose local times, so they stay strings
+        self.assertNotIn('bedtime_start', changes)
+        self.assertNotIn('movement_30_sec', changes)
+        self.assertLess(frame_memory(optimized), frame_memory(df) / 2)
+        pd.testing.assert_series_equal(optimized['score'].astype('float64'), df['score'], atol=1e-3)
+
+    def test_repeated_ids_are_kept(self):
+        df = pd.DataFrame({'id': ['a', 'a', 'b'], 'score': [1, 2, 3]})
+        self.assertIn('id', optimize_frame(df)[0])
+
+
+class MemoryBudgetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data_dir = temp_dir(cls)
+        generate_user(cls.data_dir, 0, days=90)
+
+    def test_optimized_analysis_matches_original(self):
+        original, optimized = load_user(self, self.data_dir), load_user(self, self.data_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = optimized.optimize_memory()
+            original.analyze_all_datasets()
+            optimized.analyze_all_datasets()
+
+        self.assertLess(report['bytes_after'].sum(), report['bytes_before'].sum() / 2)
+        self.assertGreater(report.loc['heart_rate', 'saved'], 0.8)
+        self.assertEqual(set(report['status']), {'resident'})
+        self.assertEqual(optimized.get_day_context(), original.get_day_context())
+        self.assertEqual(optimized.generate_local_daily_advice(), original.generate_local_daily_advice())
+        self.assertEqual(optimized._prepare_stats_summary(), original._prepare_stats_summary())
+
+    def test_datasets_beyond_the_budget_are_spilled_or_refused(self):
+        analyzer = load_user(self, self.data_dir)
+        spill_dir = temp_dir(self)
+        with contextlib.redirect_stdout(io.StringIO()):
+            report = analyzer.optimize_memory(budget_bytes=200_000, spill_dir=spill_dir)
+            analyzer.analyze_all_datasets()
+
+        self.assertEqual(report.loc['heart_rate', 'status'], 'spilled')
+        self.assertNotIn('heart_rate', analyzer.health_data)
+        self.assertLessEqual(report.loc[report['status'] == 'resident', 'bytes_after'].sum(), 200_000)
+        self.assertTrue((Path(spill_dir) / 'heart_rate.pkl').exists())
+        # Spilled datasets are still analyzed, one at a time
+        self.assertEqual(analyzer.get_summary_stats('heart_rate')['shape'][0], report.loc['heart_rate', 'rows'])
+        self.assertEqual(analyzer.load_spilled('heart_rate')['bpm'].dtype, np.int32)
+
+        # The prompt, day context and local programmes read spilled datasets too
+        resident = load_user(self, self.data_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            resident.optimize_memory()
+            resident.analyze_all_datasets()
+        self.assertEqual(analyzer.get_day_context(), resident.get_day_context())
+        self.assertNotEqual(build_day_context(analyzer.health_data, analyzer.user_metadata),
+                            resident.get_day_context())
+        self.assertEqual(analyzer.generate_local_daily_advice(), resident.generate_local_daily_advice())
+        self.assertEqual(analyzer._prepare_stats_summary(), resident._prepare_stats_summary())
+
+        resident, spilled, report = optimize_health_data(load_user(self, self.data_dir).health_data,
+                                                         budget_bytes=200_000, on_exceed='refuse')
+        self.assertEqual(spilled, {})
+        self.assertEqual(report.loc['heart_rate', 'status'], 'refused')
+        self.assertNotIn('heart_rate', resident)
+        with self.assertRaises(ValueError):
+            optimize_health_data({}, budget_bytes=1)
+
+    def test_registry_snapshots_keep_spilled_datasets(self):
+        spill_dir = temp_dir(self)
+
+        def loader(metadata, data_dir):
+            analyzer = load_user(self, data_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.optimize_memory(budget_bytes=200_000, spill_dir=spill_dir)
+                analyzer.analyze_all_datasets()
+            return analyzer
+
+        cache = ResponseCache(temp_dir(self))
+        registry = AnalyzerRegistry(users={'emma': {'metadata': {'name': 'Emma'}, 'data_dir': self.data_dir}},
+                                    loader=loader, snapshot_dir=temp_dir(self),
+                                    factory=lambda metadata, health_data: OuraAnalysis(
+                                        health_data=health_data, user_metadata=metadata, response_cache=cache))
+        loaded = registry.get('emma')
+        registry.evict('emma')
+        restored = registry.get('emma')
+
+        self.assertEqual(registry.stats['restores'], 1)
+        self.assertEqual(restored.spilled_datasets, loaded.spilled_datasets)
+        self.assertIn('heart_rate', restored.plots)
+        self.assertEqual(restored.get_day_context(), loaded.get_day_context())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for the cacheable prompt layout, run against the local fake Claude client.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_analyzer, make_readiness_days
+from prompt_templates import WOMENS_HEALTH_RESEARCH
+
+
+def make_user(test, name='Emma', client=None):
+    return make_analyzer(test, make_readiness_days(), {'name': name, 'age': 26, 'goals': 'performance'},
+                         claude_client=client or FakeClaudeClient())
+
+
+class PromptBlockLayoutTest(unittest.TestCase):
+
+    def test_static_text_lives_in_cached_system_blocks(self):
+        request = make_user(self).get_analysis_prompt_blocks()
+
+        self.assertEqual(len(request['system']), 2)
+        for block in request['system']:
+            self.assertEqual(block['cache_control'], {'type': 'ephemeral'})
+        self.assertIn(WOMENS_HEALTH_RESEARCH, request['system'][0]['text'])
+        self.assertNotIn('Data Dictionary Context', request['system'][1]['text'])
+
+        user_content = request['messages'][0]['content']
+        self.assertNotIn(WOMENS_HEALTH_RESEARCH, user_content)
+        self.assertIn('Name: Emma', user_content)
+        self.assertIn('Health Data Analysis', user_content)
+        self.assertIn('temperature_deviation', user_content)
+
+    def test_system_blocks_identical_across_users(self):
+        emma = make_user(self, 'Emma').get_analysis_prompt_blocks()
+        olivia = make_user(self, 'Olivia').get_analysis_prompt_blocks()
+
+        self.assertEqual(emma['system'], olivia['system'])
+        self.assertNotEqual(emma['messages'], olivia['messages'])
+
+    def test_flat_prompt_still_contains_every_section(self):
+        prompt = make_user(self).get_analysis_prompt()
+
+        self.assertIn(WOMENS_HEALTH_RESEARCH, prompt)
+        self.assertIn('## User Profile', prompt)
+        self.assertIn("Emma's Personalized Health Advice", prompt)
+
+
+class PromptTemplateTest(unittest.TestCase):
+
+    def test_static_sections_are_rendered_once(self):
+        emma, olivia = make_user(self, 'Emma'), make_user(self, 'Olivia')
+
+        self.assertIs(emma.data_dictionary, olivia.data_dictionary)
+        emma_blocks = emma.get_analysis_prompt_blocks()['system']
+        olivia_blocks = olivia.get_analysis_prompt_blocks()['system']
+        for ours, theirs in zip(emma_blocks, olivia_blocks):
+            self.assertIs(ours, theirs)
+
+    def test_stats_digest_is_reused_until_data_changes(self):
+        analyzer = make_user(self)
+
+        with mock.patch('oura_analysis.build_stats_digest', return_value='digest') as build:
+            analyzer.get_analysis_prompt_blocks()
+            analyzer.get_analysis_prompt_blocks(structured=True)
+            analyzer.get_analysis_prompt()
+            self.assertEqual(build.call_count, 1)
+
+            analyzer.health_data['daily_readiness'] = analyzer.health_data['daily_readiness'].iloc[:5]
+            analyzer.get_analysis_prompt_blocks()
+            self.assertEqual(build.call_count, 2)
+
+            # Keyed on dataset versions, not object ids, which a later frame can reuse
+            analyzer.health_data['daily_readiness'] = analyzer.health_data['daily_readiness'].copy()
+            analyzer.get_analysis_prompt_blocks()
+            analyzer.health_data = dict(analyzer.health_data)
+            analyzer.get_analysis_prompt_blocks()
+            analyzer.get_analysis_prompt_blocks()
+            self.assertEqual(build.call_count, 4)
+
+
+class PromptCacheAccountingTest(unittest.TestCase):
+
+    def test_second_user_reads_static_prefix_from_cache(self):
+        client = FakeClaudeClient()
+        emma = make_user(self, 'Emma', client=client)
+        olivia = make_user(self, 'Olivia', client=client)
+
+        emma.generate_personalized_advice()
+        first = emma.get_llm_usage()
+        self.assertEqual(first['cache_read_input_tokens'], 0)
+        self.assertGreater(first['cache_creation_input_tokens'], 0)
+
+        olivia.generate_personalized_advice()
+        second = olivia.get_llm_usage()
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(second['cache_read_input_tokens'], first['cache_creation_input_tokens'])
+        self.assertGreater(second['cache_hit_ratio'], 0.4)
+
+    def test_structured_variant_reuses_shared_prefix(self):
+        client = FakeClaudeClient('{"title": "Advice", "sections": {}}')
+        analyzer = make_user(self, client=client)
+
+        analyzer.generate_personalized_advice()
+        analyzer.generate_personalized_advice_structured()
+
+        usage = analyzer.get_llm_usage()
+        shared = sum(len(b['text']) // 4 for b in client.calls[0]['system'][:1])
+        self.assertEqual(usage['cache_read_input_tokens'], shared)
+
+
+if __name__ == '__main__':
+    unittest.main()
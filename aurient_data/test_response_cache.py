@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for the keyed Claude response cache.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+import unittest.mock
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_analyzer, temp_dir
+from response_cache import ResponseCache
+
+
+PARAMS = {"max_tokens": 100, "messages": [{"role": "user", "content": "hello"}]}
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(temp_dir(self))
+
+    def test_key_depends_on_user_model_prompt_and_params(self):
+        key = ResponseCache.make_key('emma', 'model-a', PARAMS)
+
+        self.assertEqual(key, ResponseCache.make_key('emma', 'model-a', dict(PARAMS)))
+        self.assertNotEqual(key, ResponseCache.make_key('olivia', 'model-a', PARAMS))
+        self.assertNotEqual(key, ResponseCache.make_key('emma', 'model-b', PARAMS))
+        self.assertNotEqual(key, ResponseCache.make_key('emma', 'model-a', {**PARAMS, "max_tokens": 200}))
+        self.assertNotEqual(key, ResponseCache.make_key(
+            'emma', 'model-a', {**PARAMS, "messages": [{"role": "user", "content": "bye"}]}))
+
+    def test_entries_are_isolated_per_user(self):
+        key = ResponseCache.make_key('emma', 'model', PARAMS)
+        self.cache.set(key, 'advice for emma', user_id='emma')
+
+        self.assertEqual(self.cache.get(key, user_id='emma'), 'advice for emma')
+        self.assertIsNone(self.cache.get(key, user_id='olivia'))
+
+    def test_expired_entries_are_misses(self):
+        cache = ResponseCache(self.cache.cache_dir, ttl_seconds=0.01)
+        cache.set('ab' * 32, 'stale')
+        time.sleep(0.05)
+
+        self.assertIsNone(cache.get('ab' * 32))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(self.cache.cache_dir, max_entries=2, evict_every=1)
+        keys = [f'{i:02d}' * 32 for i in range(3)]
+        cache.set(keys[0], 'zero')
+        cache.set(keys[1], 'one')
+        # Age the entries so reads produce a clear recency order
+        for i, key in enumerate(keys[:2]):
+            os.utime(cache._entry_path(key), (time.time() - 100 + i, time.time() - 100 + i))
+        cache.get(keys[0])
+        cache.set(keys[2], 'two')
+
+        self.assertEqual(cache.get(keys[0]), 'zero')
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[2]), 'two')
+
+    def test_eviction_runs_every_n_writes(self):
+        cache = ResponseCache(self.cache.cache_dir, max_entries=2, evict_every=5)
+        with unittest.mock.patch.object(cache, 'evict', wraps=cache.evict) as evict:
+            for i in range(4):
+                cache.set(f'{i:02d}' * 32, i)
+            evict.assert_not_called()
+            cache.set('04' * 32, 4)
+            evict.assert_called_once()
+        self.assertEqual(len(list(Path(cache.cache_dir).glob('*/*.json'))), 2)
+
+    def test_concurrent_callers_generate_once(self):
+        calls = []
+
+        def producer():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'generated'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_create('cd' * 32, producer)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([value for value, _ in results], ['generated'] * 5)
+        self.assertEqual(sum(1 for _, hit in results if not hit), 1)
+
+
+class AnalyzerResponseCacheTest(unittest.TestCase):
+
+    def test_repeat_generation_is_served_from_cache(self):
+        client = FakeClaudeClient(lambda params: params['messages'][0]['content'][:40])
+        cache = ResponseCache(temp_dir(self))
+        emma = make_analyzer(self, claude_client=client, response_cache=cache)
+        olivia = make_analyzer(self, user_metadata={'name': 'Olivia'}, claude_client=client, response_cache=cache)
+
+        first = emma.generate_personalized_advice()
+        second = emma.generate_personalized_advice()
+        other = olivia.generate_personalized_advice()
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(emma.get_llm_usage()['response_cache_hits'], 1)
+
+    def test_every_path_works_without_a_response_cache(self):
+        async def run(analyzer):
+            structured = await analyzer.agenerate_personalized_advice_structured()
+            return structured, [chunk async for chunk in analyzer.astream_personalized_advice()]
+
+        client = FakeClaudeClient('advice')
+        analyzer = make_analyzer(self, claude_client=client)
+        analyzer.response_cache = None
+        self.assertEqual(analyzer.generate_personalized_advice(), 'advice')
+        self.assertEqual(''.join(analyzer.stream_personalized_advice()), 'advice')
+        structured, chunks = asyncio.run(run(analyzer))
+        self.assertIsInstance(structured, dict)
+        self.assertEqual(''.join(chunks), 'advice')
+        self.assertEqual(len(client.calls), 4)
+
+    def test_generation_writes_nothing_to_working_directory(self):
+        cwd = os.getcwd()
+        workdir = temp_dir(self)
+        os.chdir(workdir)
+        try:
+            analyzer = make_analyzer(self, claude_client=FakeClaudeClient('{"cards": []}'))
+            analyzer.generate_personalized_advice()
+            analyzer.generate_daily_advice_structured()
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(os.listdir(workdir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
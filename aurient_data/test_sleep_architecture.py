@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tests for sleep architecture analytics.
+"""
+
+import contextlib
+import io
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_health_data import load_user, temp_dir
+from instrumentation import Instrumentation
+from response_cache import ResponseCache
+from sleep_architecture import (SleepArchitectureStore, cached_night_table, decode_digit_strings,
+                                decode_series, night_table, summarize_nights, transition_matrix)
+from synthetic_oura import generate_user
+
+
+def series(items, interval=300):
+    return json.dumps({"interval": interval, "items": items, "timestamp": "2025-03-01T23:00:00.000-08:00"})
+
+
+def night(day, bedtime, hypnogram, heart_rate=None, hrv=None, movement=None, type_='long_sleep'):
+    return {'day': day, 'type': type_, 'bedtime_start': bedtime, 'sleep_phase_5_min': hypnogram,
+            'movement_30_sec': movement, 'heart_rate': heart_rate and series(heart_rate),
+            'hrv': hrv and series(hrv)}
+
+
+def reference(hypnogram):
+    """Per-night loop over one hypnogram, for comparison with the batched table."""
+    stages = [int(c) for c in hypnogram]
+    asleep = [i for i, s in enumerate(stages) if s in (1, 2, 3)]
+    pairs = list(zip(stages, stages[1:]))
+    return {
+        'deep_seconds': stages.count(1) * 300,
+        'sleep_latency_seconds': asleep[0] * 300,
+        'rem_latency_seconds': (stages.index(3) - asleep[0]) * 300,
+        'waso_seconds': stages[asleep[0]:asleep[-1] + 1].count(4) * 300,
+        'stage_shifts': sum(a != b for a, b in pairs),
+        'awakenings': sum(a != 4 and b == 4 for a, b in pairs),
+        'light_to_deep': pairs.count((2, 1)),
+    }
+
+
+class DecodeTest(unittest.TestCase):
+
+    def test_digit_strings_and_series_decode_into_padded_matrices(self):
+        matrix, lengths = decode_digit_strings(pd.Series(['4221', None, '13']))
+        np.testing.assert_array_equal(matrix, [[4, 2, 2, 1], [0, 0, 0, 0], [1, 3, 0, 0]])
+        np.testing.assert_array_equal(lengths, [4, 0, 2])
+
+        matrix, interval = decode_series(pd.Series([series([60.0, None, 55.5]), np.nan, series([], 60)]))
+        np.testing.assert_array_equal(matrix, [[60.0, np.nan, 55.5], [np.nan] * 3, [np.nan] * 3])
+        np.testing.assert_array_equal(interval, [300, np.nan, 60])
+
+
+class NightTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sleep = pd.DataFrame([
+            night('2025-03-02', '2025-03-01T23:00:00-08:00', '4422211223334421113', heart_rate=[62, 58, None, 55, 57],
+                  hrv=[30, 45, 40], movement='1112341111'),
+            night('2025-03-02', '2025-03-02T14:00:00-08:00', '4222', type_='late_nap'),
+            night('2025-03-03', '2025-03-02T23:30:00-08:00', '422112233224', heart_rate=[60, 56, 59]),
+            night('2025-03-04', '2025-03-03T23:00:00-08:00', None),
+        ])
+
+    def test_night_metrics_match_a_per_night_loop(self):
+        table = night_table(self.sleep)
+        self.assertEqual(len(table), 4)
+        for i in (0, 2):
+            expected = reference(self.sleep['sleep_phase_5_min'][i])
+            for column, value in expected.items():
+                self.assertEqual(table[column][i], value, column)
+
+        first = table.iloc[0]
+        self.assertEqual(first['time_in_bed_seconds'], 19 * 300)
+        self.assertAlmostEqual(first['efficiency'], 15 / 19)
+        self.assertEqual(first['awake_seconds'] + first['total_sleep_seconds'], first['time_in_bed_seconds'])
+        self.assertAlmostEqual(first['fragmentation_index'], first['stage_shifts'] / (15 * 300 / 3600))
+        self.assertAlmostEqual(first['restless_share'], 0.3)
+        self.assertEqual((first['hr_nadir'], first['hr_nadir_seconds'], first['hr_nadir_fraction']), (55, 900, 0.75))
+        self.assertEqual(first['hr_mean'], 58)
+        self.assertEqual((first['rmssd_peak'], first['rmssd_peak_seconds']), (45, 300))
+        # Bedtime and midpoint are minutes after noon, on the local clock
+        self.assertEqual(first['bedtime_minutes'], 660)
+        self.assertEqual(first['midpoint_minutes'], 660 + 19 * 5 / 2)
+
+        self.assertTrue(pd.isna(table['bedtime_minutes'][1]), 'naps are excluded from regularity')
+        self.assertTrue(np.isnan(table['hr_mean'][1]))
+        self.assertEqual(table['time_in_bed_seconds'][3], 0)
+        self.assertTrue(np.isnan(table['efficiency'][3]))
+
+    def test_regularity_index_compares_consecutive_main_sleeps(self):
+        same = '2' * 24
+        sleep = pd.DataFrame([night(f'2025-03-{d:02d}', f'2025-03-{d - 1:02d}T23:00:00+00:00', same)
+                              for d in range(2, 6)]
+                             + [night('2025-03-06', '2025-03-05T23:30:00+00:00', same)])
+        table = night_table(sleep)
+        self.assertTrue(np.isnan(table['sleep_regularity_index'][0]))
+        self.assertEqual(list(table['sleep_regularity_index'][1:4]), [100.0] * 3)
+        # A 30 minute shift disagrees for 2 x 6 of the 288 epochs
+        self.assertAlmostEqual(table['sleep_regularity_index'][4], 200 * (1 - 12 / 288) - 100)
+        self.assertEqual(table['bedtime_variability_minutes'][3], 0)
+        self.assertGreater(table['bedtime_variability_minutes'][4], 0)
+
+    def test_transition_matrix_and_summary(self):
+        table = night_table(self.sleep)
+        counts = transition_matrix(table, normalize=False)
+        self.assertEqual(counts.loc['light', 'deep'], table['light_to_deep'].sum())
+        self.assertEqual(counts.to_numpy().sum(), (table['time_in_bed_seconds'] // 300 - 1).clip(0).sum())
+        probabilities = transition_matrix(table)
+        np.testing.assert_allclose(probabilities.sum(axis=1), 1.0)
+
+        summary = summarize_nights(table)
+        self.assertEqual(summary.loc['all', 'nights'], 3)
+        self.assertEqual(summary.loc['all', 'hr_nadir'], 55.5)
+
+    def test_users_are_kept_apart(self):
+        both = pd.concat([self.sleep.assign(user='b'), self.sleep.assign(user='a')], ignore_index=True)
+        table = night_table(both, user_column='user')
+        self.assertEqual(list(table['user']), ['a'] * 4 + ['b'] * 4)
+        pd.testing.assert_frame_equal(table[table['user'] == 'b'].drop(columns='user').reset_index(drop=True),
+                                      night_table(self.sleep))
+
+
+class SleepArchitectureCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data_dir = temp_dir(cls)
+        generate_user(cls.data_dir, 0, days=60)
+
+    def make_analyzer(self, cache_dir):
+        return load_user(self, self.data_dir, response_cache=ResponseCache(cache_dir),
+                         instrumentation=Instrumentation(enabled=True))
+
+    def test_table_is_stored_and_reused_until_the_data_changes(self):
+        store = SleepArchitectureStore(temp_dir(self))
+        sleep = self.make_analyzer(temp_dir(self)).health_data['sleep_detailed']
+        table, stored = cached_night_table(sleep, 'emma', store)
+        self.assertFalse(stored)
+        self.assertEqual(len(table), len(sleep))
+        again, stored = cached_night_table(sleep.copy(), 'emma', store)
+        self.assertTrue(stored)
+        pd.testing.assert_frame_equal(again, table)
+
+        changed = sleep.copy()
+        changed.loc[0, 'sleep_phase_5_min'] = '4' + changed.loc[0, 'sleep_phase_5_min'][1:]
+        self.assertFalse(cached_night_table(changed, 'emma', store)[1])
+
+    def test_analyzer_memoizes_and_survives_memory_optimization(self):
+        cache_dir = temp_dir(self)
+        analyzer = self.make_analyzer(cache_dir)
+        table = analyzer.get_sleep_architecture()
+        self.assertIs(analyzer.get_sleep_architecture(), table)
+        self.assertEqual([span.cache for span in analyzer.instrumentation.spans
+                          if span.attributes.get('dataset') == 'sleep_architecture'], ['miss', 'hit'])
+        self.assertGreater(table['deep_seconds'].sum(), 0)
+        self.assertTrue(table['sleep_regularity_index'].notna().any())
+
+        # A new analyzer reads the stored table instead of recomputing it
+        pd.testing.assert_frame_equal(self.make_analyzer(cache_dir).get_sleep_architecture(), table)
+
+        optimized = self.make_analyzer(temp_dir(self))
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimized.optimize_memory()
+        # The optimizer parses `day` into datetimes; every metric is unchanged
+        pd.testing.assert_frame_equal(optimized.get_sleep_architecture().drop(columns='day'), table.drop(columns='day'),
+                                      check_dtype=False, check_categorical=False, rtol=1e-5)
+
+
+    def test_replaced_sleep_data_is_not_served_from_the_memo(self):
+        analyzer = self.make_analyzer(temp_dir(self))
+        table = analyzer.get_sleep_architecture()
+        changed = analyzer.health_data['sleep_detailed'].copy()
+        changed.loc[0, 'sleep_phase_5_min'] = '4' * len(changed.loc[0, 'sleep_phase_5_min'])
+        analyzer.health_data['sleep_detailed'] = changed
+
+        # Same shape, and once the old frame is freed possibly the same id: the memo is keyed on versions
+        nights = analyzer.get_sleep_architecture()
+        self.assertIsNot(nights, table)
+        self.assertNotEqual(nights.loc[0, 'awake_seconds'], table.loc[0, 'awake_seconds'])
+        self.assertIs(analyzer.get_sleep_architecture(), nights)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted stats digest used in analysis prompts.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_health_data import make_trending_data
+from stats_digest import build_stats_digest, estimate_tokens, rank_metrics
+
+
+DICTIONARY = {
+    'daily_readiness': {'average_hrv': 'Mean heart rate variability in ms.', 'score': 'Readiness score.'},
+    'daily_sleep': {'contributors_deep_sleep': 'Deep sleep contributor.'},
+    'heartrate': {'bpm': 'Heart rate in beats per minute.'},
+}
+
+
+class RankMetricsTest(unittest.TestCase):
+
+    def test_deviating_metric_ranks_first(self):
+        ranked = rank_metrics(make_trending_data())
+
+        top = ranked.iloc[0]
+        self.assertEqual((top['dataset'], top['metric']), ('daily_readiness', 'average_hrv'))
+        self.assertLess(top['deviation'], -3)
+
+    def test_ids_constants_and_empty_datasets_are_skipped(self):
+        ranked = rank_metrics(make_trending_data())
+
+        self.assertNotIn('id', set(ranked['metric']))
+        self.assertNotIn('constant_flag', set(ranked['metric']))
+        self.assertNotIn('workout', set(ranked['dataset']))
+
+
+class BuildStatsDigestTest(unittest.TestCase):
+
+    def test_digest_respects_token_budget(self):
+        for budget in (60, 120, 400):
+            digest = build_stats_digest(make_trending_data(), DICTIONARY, token_budget=budget)
+            self.assertLessEqual(estimate_tokens(digest), budget + 10)
+
+        small = build_stats_digest(make_trending_data(), DICTIONARY, token_budget=160)
+        self.assertIn('average_hrv', small)
+        self.assertNotIn('contributors_deep_sleep', small)
+
+    def test_only_cited_definitions_are_included(self):
+        digest = build_stats_digest(make_trending_data(), DICTIONARY, token_budget=1500)
+
+        self.assertIn('### Metric Definitions', digest)
+        self.assertIn('Mean heart rate variability in ms.', digest)
+        self.assertNotIn('Heart rate in beats per minute.', digest)
+        self.assertIn('daily readiness (35 records)', digest)
+        self.assertNotIn('workout', digest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental extraction of structured advice from streamed responses.
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeClaudeClient
+from fake_health_data import make_analyzer
+from stream_json import DAILY_CARD_SCHEMA, DAILY_CARD_SECTIONS, IncrementalJSONExtractor, extract_json, validate
+
+
+CARDS = [
+    {"title": "Movement", "items": ["Burpees 60 seconds", "Rest {30} \"seconds\""],
+     "description": "Builds power.", "sources": [{"name": "Study", "url": "https://doi.org/10.1/x"}]},
+    {"title": "Mindfulness", "items": ["Inhale for 4"], "description": "Raises HRV.", "sources": []},
+    {"title": "Nutrition", "items": ["Breakfast: oats", "Lunch: salmon"], "description": "Fuels recovery.",
+     "sources": []},
+]
+DOCUMENT = {"title": "Emma's Daily Health Programs", "cards": CARDS}
+
+
+def feed_in_chunks(extractor, text, size=7):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(extractor.feed(text[i:i + size]))
+    return events
+
+
+class IncrementalJSONExtractorTest(unittest.TestCase):
+
+    def test_sections_are_emitted_as_soon_as_they_close(self):
+        text = json.dumps(DOCUMENT, indent=2)
+        extractor = IncrementalJSONExtractor(DAILY_CARD_SECTIONS)
+
+        first_card_end = text.index('"Mindfulness"')
+        events = extractor.feed(text[:first_card_end])
+        self.assertEqual([e['value'] for e in events], [CARDS[0]])
+
+        events += feed_in_chunks(extractor, text[first_card_end:])
+        self.assertEqual([e['path'] for e in events], [['cards', 0], ['cards', 1], ['cards', 2]])
+        self.assertTrue(all(e['valid'] for e in events))
+        self.assertEqual(extractor.result(), DOCUMENT)
+
+    def test_fences_and_preamble_are_ignored(self):
+        text = "Here are today's programmes:\n```json\n" + json.dumps(DOCUMENT) + "\n```\nEnjoy!"
+
+        self.assertEqual(extract_json(text, DAILY_CARD_SECTIONS), DOCUMENT)
+
+    def test_truncated_tail_keeps_completed_sections(self):
+        text = json.dumps(DOCUMENT)
+        truncated = text[:text.index('"Nutrition"') + 20]
+
+        result = extract_json(truncated, DAILY_CARD_SECTIONS)
+
+        self.assertTrue(result['partial'])
+        self.assertEqual(result['title'], DOCUMENT['title'])
+        self.assertEqual(result['cards'], CARDS[:2])
+
+    def test_invalid_sections_are_flagged_and_dropped_from_partial_results(self):
+        bad = {"title": "Movement", "items": "not a list"}
+        text = json.dumps({"cards": [bad, CARDS[1]]})[:-2]
+        extractor = IncrementalJSONExtractor(DAILY_CARD_SECTIONS)
+
+        events = feed_in_chunks(extractor, text)
+
+        self.assertFalse(events[0]['valid'])
+        self.assertTrue(any('missing required field' in e for e in events[0]['errors']))
+        self.assertEqual(extractor.result()['cards'], [CARDS[1]])
+
+    def test_invalid_sections_are_dropped_from_complete_results(self):
+        result = extract_json(json.dumps({"title": "X", "cards": [{"title": 1}, CARDS[0]]}), DAILY_CARD_SECTIONS)
+
+        self.assertEqual(result['cards'], [CARDS[0]])
+        self.assertNotIn('partial', result)
+        self.assertEqual(len(result['errors']), 1)
+        self.assertIn('cards/0', result['errors'][0])
+        self.assertNotIn('errors', extract_json(json.dumps(DOCUMENT), DAILY_CARD_SECTIONS))
+
+    def test_no_json_at_all_is_an_error(self):
+        self.assertIn('error', extract_json("Sorry, I can't help with that."))
+
+    def test_validate_reports_nested_type_errors(self):
+        errors = validate({"title": "x", "items": [1], "description": "d"}, DAILY_CARD_SCHEMA)
+
+        self.assertEqual(errors, ['$.items[0]: expected string, got int'])
+        self.assertEqual(validate(True, {"type": "number"}), ['$: expected number, got bool'])
+        self.assertEqual(validate(1.5, {"type": "number"}), [])
+
+
+class StructuredStreamingTest(unittest.TestCase):
+
+    def test_daily_stream_yields_cards_then_result(self):
+        client = FakeClaudeClient("```json\n" + json.dumps(DOCUMENT) + "\n```", chunk_size=5)
+        analyzer = make_analyzer(self, {'daily_sleep': pd.DataFrame({'score': [80, 75]})}, claude_client=client)
+
+        events = list(analyzer.stream_daily_advice_structured())
+
+        self.assertEqual([e['type'] for e in events], ['section', 'section', 'section', 'done'])
+        self.assertEqual(events[0]['value'], CARDS[0])
+        self.assertEqual(events[-1]['result'], DOCUMENT)
+        self.assertEqual(analyzer.generate_daily_advice_structured(), DOCUMENT)
+
+    def test_invalid_daily_cards_are_not_returned_or_remembered(self):
+        client = FakeClaudeClient(json.dumps({**DOCUMENT, "cards": [{"title": 1}, *CARDS[1:]]}))
+        analyzer = make_analyzer(self, {'daily_sleep': pd.DataFrame({'score': [80, 75]})}, claude_client=client)
+
+        advice = analyzer.generate_daily_advice_structured()
+
+        self.assertEqual(advice['cards'], CARDS[1:])
+        self.assertTrue(advice['errors'])
+        self.assertIsNone(analyzer.daily_context_store.get(analyzer._daily_advice_key(), user_id=analyzer.user_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
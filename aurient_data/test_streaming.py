@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed advice generation and the NDJSON adapter.
+"""
+
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from fake_claude import FakeAsyncClaudeClient, FakeClaudeClient
+from fake_health_data import make_analyzer
+from oura_analysis import aiter_ndjson, iter_ndjson
+
+
+ADVICE = "Emma's Personalized Health Advice: sleep more, train in the follicular phase."
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class StreamingTest(unittest.TestCase):
+
+    def test_stream_yields_deltas_before_completion(self):
+        client = FakeClaudeClient(ADVICE, chunk_size=8)
+        analyzer = make_analyzer(self, claude_client=client)
+
+        stream = analyzer.stream_personalized_advice()
+        first = next(stream)
+        # Only the first delta had been produced when it reached the caller
+        self.assertEqual(client.chunks_sent, 1)
+        rest = list(stream)
+
+        self.assertEqual(first, ADVICE[:8])
+        self.assertEqual(first + ''.join(rest), ADVICE)
+        self.assertEqual(client.chunks_sent, 1 + len(rest))
+
+    def test_completed_stream_is_cached(self):
+        client = FakeClaudeClient(ADVICE)
+        analyzer = make_analyzer(self, claude_client=client)
+
+        ''.join(analyzer.stream_personalized_advice())
+
+        self.assertEqual(list(analyzer.stream_personalized_advice()), [ADVICE])
+        self.assertEqual(analyzer.generate_personalized_advice(), ADVICE)
+        self.assertEqual(len(client.calls), 1)
+
+    def test_abandoned_stream_is_not_cached(self):
+        client = FakeClaudeClient(ADVICE, chunk_size=4)
+        analyzer = make_analyzer(self, claude_client=client)
+
+        stream = analyzer.stream_personalized_advice()
+        next(stream)
+        stream.close()
+
+        self.assertEqual(analyzer.generate_personalized_advice(), ADVICE)
+        self.assertEqual(len(client.calls), 2)
+
+    def test_async_stream_with_async_client(self):
+        analyzer = make_analyzer(self, async_claude_client=FakeAsyncClaudeClient(ADVICE, chunk_size=8))
+
+        chunks = asyncio.run(collect(analyzer.astream_daily_advice()))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), ADVICE)
+
+    def test_async_stream_falls_back_to_sync_client(self):
+        analyzer = make_analyzer(self, claude_client=FakeClaudeClient(ADVICE, chunk_size=8))
+
+        chunks = asyncio.run(collect(analyzer.astream_personalized_advice()))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), ADVICE)
+
+
+class NdjsonTest(unittest.TestCase):
+
+    def test_each_line_is_a_json_document(self):
+        lines = list(iter_ndjson(['Hello ', 'world']))
+
+        self.assertTrue(all(line.endswith('\n') for line in lines))
+        events = [json.loads(line) for line in lines]
+        self.assertEqual(events, [
+            {'type': 'delta', 'text': 'Hello '},
+            {'type': 'delta', 'text': 'world'},
+            {'type': 'done'},
+        ])
+
+    def test_errors_terminate_the_stream(self):
+        def failing():
+            yield 'partial'
+            raise RuntimeError('overloaded')
+
+        events = [json.loads(line) for line in iter_ndjson(failing())]
+
+        self.assertEqual(events[-1], {'type': 'error', 'error': 'overloaded'})
+
+    def test_async_adapter(self):
+        analyzer = make_analyzer(self, async_claude_client=FakeAsyncClaudeClient(ADVICE))
+
+        lines = asyncio.run(collect(aiter_ndjson(analyzer.astream_personalized_advice())))
+
+        events = [json.loads(line) for line in lines]
+        self.assertEqual(''.join(e['text'] for e in events if e['type'] == 'delta'), ADVICE)
+        self.assertEqual(events[-1], {'type': 'done'})
+
+
+if __name__ == '__main__':
+    unittest.main()
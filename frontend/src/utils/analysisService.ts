@@ -0,0 +1,50 @@
+import { NextResponse } from "next/server";
+
+// Long-running Python analysis service (aurient_data/analysis_server.py)
+const ANALYSIS_SERVICE_URL =
+  process.env.ANALYSIS_SERVICE_URL || "http://127.0.0.1:8765";
+
+export type AnalysisOperation = "daily" | "overview" | "local";
+
+export async function fetchAnalysis(
+  operation: AnalysisOperation,
+  userId = "emma"
+) {
+  try {
+    const response = await fetch(
+      `${ANALYSIS_SERVICE_URL}/users/${encodeURIComponent(userId)}/${operation}`,
+      { cache: "no-store" }
+    );
+    const result = await response.json();
+
+    if (result.success) {
+      return NextResponse.json({
+        success: true,
+        data: {
+          structured_advice: result.structured_advice,
+          userMetadata: result.user_metadata,
+          dataSummary: result.data_summary,
+        },
+      });
+    }
+    return NextResponse.json(
+      {
+        success: false,
+        error: result.error,
+      },
+      { status: response.status >= 400 ? response.status : 500 }
+    );
+  } catch (error) {
+    console.error(`${operation} analysis error:`, error);
+    return NextResponse.json(
+      {
+        success: false,
+        error:
+          error instanceof Error
+            ? `Analysis service unavailable at ${ANALYSIS_SERVICE_URL} (start it with \`python analysis_server.py\` in aurient_data): ${error.message}`
+            : "Unknown error occurred",
+      },
+      { status: 503 }
+    );
+  }
+}